@@ -13,42 +13,71 @@ Buying and selling mechanisms are virtual Uni v2 pools with the following featur
 
  The daily_printout parameter can print out some the pre-arbitrage, pre-event and post-event information for a specific day
  If these printouts are desired, set the parameter to a specific day (defaults to 0)
-'''
 
-import numpy as np
-from random import shuffle
+ The arb_mode parameter sets how wNXM-NXM arbitrage is carried out:
+  - 'analytic' (default) solves for the exact trade size that equalises prices and applies it in one step
+  - 'chunked' trades randomly-sized lots until prices cross, as the original loop did
 
-from BondingCurveNexus import sys_params, model_params
+ The engine parameter sets how the day loop is run:
+  - 'python' (default) calls the instance methods below for every event
+  - 'numba' packs the state into a flat vector and runs the whole day in the compiled kernel
+    of RAMM_HighLowCap_kernel (analytic arbitrage only, without daily printouts).
+    Subclasses give their trade sizes through kernel_trade_sizes() and kernel_wnxm_shifts().
+    If numba isn't installed the kernel runs as plain python.
 
-class RAMMHighLowCapMarkets:
+ Runs can be checkpointed to disk and resumed or extended past model_days - see checkpoint.py.
+'''
 
-    def __init__(self, daily_printout_day=0):
+import numpy as np
+
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.trajectory import Trajectory, TrajectoryViews
+from BondingCurveNexus.streams import RandomStreams
+from BondingCurveNexus.schedule import EventSchedule, EVENT_NAMES, RATCHET, WNXM_SHIFT, PROTOCOL_BUY, PROTOCOL_SALE
+from BondingCurveNexus.checkpoint import Checkpointable
+from BondingCurveNexus.arbitrage import arb_sale_size, arb_buy_size, wnxm_price_after
+from BondingCurveNexus.HighLowCap import RAMM_HighLowCap_kernel as kernel
+
+class RAMMHighLowCapMarkets(Checkpointable, TrajectoryViews):
+
+    def __init__(self, daily_printout_day=0, arb_mode='analytic', params=None, schedule=None, seed=None, engine='python'):
+        # set simulation parameters - defaults to the current sys_params & model_params values
+        self.params = params if params is not None else SimParams.from_modules()
+        # independent random streams of this simulation - pass the same seed to replay it exactly
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
         # OPENING STATE of system upon initializing a projection instance
         # start at day 0 & step 0
         self.current_day = 0
         self.steps = 0
         # set daily printout parameter. If not specified, it defaults to 0 and no printouts happen
         self.daily_printout_day = daily_printout_day
+        # set arbitrage mode - 'analytic' or 'chunked'
+        self.arb_mode = arb_mode
+        # set day loop engine - 'python' or 'numba'
+        if engine == 'numba' and arb_mode != 'analytic':
+            raise ValueError("engine='numba' only supports arb_mode='analytic'")
+        self.engine = engine
         # set current state of system
-        self.act_cover = sys_params.act_cover_now
-        self.cap_pool = sys_params.cap_pool_now
-        self.nxm_supply = sys_params.nxm_supply_now
-        self.wnxm_supply = sys_params.wnxm_supply_now
+        self.act_cover = self.params.act_cover_now
+        self.cap_pool = self.params.cap_pool_now
+        self.nxm_supply = self.params.nxm_supply_now
+        self.wnxm_supply = self.params.wnxm_supply_now
 
         # set opening prices
         self.wnxm_price = self.book_value()
-        self.sell_open_price = self.book_value() * (1 + sys_params.oracle_buffer)
-        self.buy_open_price = self.book_value() * (1 + sys_params.oracle_buffer)
+        self.sell_open_price = self.book_value() * self.params.buffer_above
+        self.buy_open_price = self.book_value() * self.params.buffer_above
 
         # set ETH value for wNXM price shift as a result of 1 ETH of buy/sell
-        self.wnxm_move_size = model_params.wnxm_move_size
+        self.wnxm_move_size = self.params.wnxm_move_size
 
         # OPENING STATE of RAMM pools
 
         # set initial ETH liquidity
-        self.liq = sys_params.open_liq_sell
+        self.liq = self.params.open_liq_sell
         # set target liquidity for the pools in ETH
-        self.target_liq = sys_params.target_liq_sell
+        self.target_liq = self.params.target_liq_sell
 
         # BELOW BOOK
         # set initial NXM liquidity based on opening wnxm price
@@ -66,8 +95,16 @@ class RAMMHighLowCapMarkets:
 
         # base entries and exits - set to zero here
         # set stochasically or deterministically in subclasses
-        self.base_daily_protocol_buys = np.zeros(shape=model_params.model_days, dtype=int)
-        self.base_daily_protocol_sales = np.zeros(shape=model_params.model_days, dtype=int)
+        self.base_daily_protocol_buys = np.zeros(shape=self.params.model_days, dtype=int)
+        self.base_daily_protocol_sales = np.zeros(shape=self.params.model_days, dtype=int)
+
+        # precompiled event schedule - generated from the base entries and exits on the first day if not given
+        self.schedule = schedule
+        # jump table from event code to the method handling it
+        self.event_handlers = {RATCHET: self.ratchet_event,
+                               WNXM_SHIFT: self.wnxm_shift,
+                               PROTOCOL_BUY: self.protocol_buy_event,
+                               PROTOCOL_SALE: self.protocol_sale_event}
 
         # initiate and set cumulative counters to zero
         self.eth_sold = 0
@@ -77,23 +114,13 @@ class RAMMHighLowCapMarkets:
         self.wnxm_removed = 0
         self.wnxm_created = 0
 
-        # set tracking lists for individual instance
-        self.cap_pool_prediction = [self.cap_pool]
-        self.spot_price_b_prediction = [self.spot_price_b()]
-        self.spot_price_a_prediction = [self.spot_price_a()]
-        self.wnxm_price_prediction = [self.wnxm_price]
-        self.nxm_supply_prediction = [self.nxm_supply]
-        self.wnxm_supply_prediction = [self.wnxm_supply]
-        self.book_value_prediction = [self.book_value()]
-        self.liq_prediction = [self.liq]
-        self.liq_NXM_b_prediction = [self.liq_NXM_b]
-        self.liq_NXM_a_prediction = [self.liq_NXM_a]
-        self.eth_sold_prediction = [self.eth_sold]
-        self.eth_acquired_prediction = [self.eth_acquired]
-        self.nxm_burned_prediction = [self.nxm_burned]
-        self.nxm_minted_prediction = [self.nxm_minted]
-        self.wnxm_removed_prediction = [self.wnxm_removed]
-        self.wnxm_created_prediction = [self.wnxm_created]
+        # set tracking trajectory for individual instance and record opening state
+        self.trajectory = Trajectory(metrics=['cap_pool', 'spot_price_b', 'spot_price_a', 'wnxm_price',
+                                              'nxm_supply', 'wnxm_supply', 'book_value', 'liq', 'liq_NXM_b',
+                                              'liq_NXM_a', 'eth_sold', 'eth_acquired', 'nxm_burned',
+                                              'nxm_minted', 'wnxm_removed', 'wnxm_created'],
+                                     length=self.params.model_days + 1)
+        self.trajectory.record(self)
 
     # INSTANCE FUNCTIONS
     # to calculate a variety of ongoing metrics & parameters
@@ -102,7 +129,7 @@ class RAMMHighLowCapMarkets:
     # calculate mcr from current cover amount
     # minimum of 0.01 ETH to avoid division by zero
     def mcr(self):
-        return max(0.01, self.act_cover / sys_params.capital_factor)
+        return max(0.01, self.act_cover / self.params.capital_factor)
 
     # calculate book value from current assets & nxm supply.
     def book_value(self):
@@ -131,7 +158,7 @@ class RAMMHighLowCapMarkets:
     # calculate current ratios between high & low capitalization functionality
     def price_transition_ratio(self):
         return min(1, max(0,
-                (self.cap_pool - self.mcr() - self.target_liq) / sys_params.price_transition_buffer))
+                (self.cap_pool - self.mcr() - self.target_liq) / self.params.price_transition_buffer))
 
     # calculate target for ratchet mechanism based on price transition ratio
     def ratchet_target(self):
@@ -170,7 +197,7 @@ class RAMMHighLowCapMarkets:
     def protocol_nxm_buy(self, n_nxm):
 
         # assume noone buys NXM above a multiple of book
-        if self.spot_price_a() > self.book_value() * model_params.nxm_book_value_multiple:
+        if self.spot_price_a() > self.book_value() * self.params.nxm_book_value_multiple:
             pass
 
         else:
@@ -254,6 +281,12 @@ class RAMMHighLowCapMarkets:
         self.wnxm_market_sell(n_wnxm=num, create=True)
 
     def arbitrage(self):
+        if self.arb_mode == 'chunked':
+            self.chunked_arbitrage()
+        else:
+            self.analytic_arbitrage()
+
+    def chunked_arbitrage(self):
         # system price > wnxm_price arb
             # protocol sale price has to be higher than wnxm price for arbitrage
             # nxm supply has to be greater than zero
@@ -269,24 +302,67 @@ class RAMMHighLowCapMarkets:
                 self.nxm_supply > 0:
             self.arb_buy_transaction()
 
+    def analytic_arbitrage(self):
+        # system price > wnxm_price arb
+            # solve for the NXM sale that brings the below price down to the wnxm price
+            # limit to number of nxm supply and wnxm supply
+        if self.spot_price_b() > self.wnxm_price and \
+                self.nxm_supply > 0 and self.wnxm_supply > 0:
+            num = min(arb_sale_size(self.liq, self.liq_NXM_b, self.wnxm_price, self.wnxm_move_size),
+                      self.wnxm_supply, self.nxm_supply)
+            # buy from open market with the price impact compounded over the whole trade
+            self.wnxm_price = wnxm_price_after(self.wnxm_price, num, self.wnxm_move_size)
+            self.wnxm_supply -= num
+            self.wnxm_removed += num
+            # sell to protocol
+            self.protocol_nxm_sale(n_nxm=num)
+
+        # system price < wnxm_price arb
+            # no closed form if noone buys from the protocol, so fall back to the chunked loop
+        if self.spot_price_a() < self.wnxm_price and self.nxm_supply > 0:
+            if self.spot_price_a() > self.book_value() * self.params.nxm_book_value_multiple:
+                self.chunked_arbitrage()
+                return
+            # solve for the NXM buy that brings the above price up to the wnxm price
+            num = arb_buy_size(self.liq, self.liq_NXM_a, self.wnxm_price, self.wnxm_move_size)
+            # buy from protocol
+            self.liq_NXM_a -= num
+            self.nxm_supply += num
+            new_eth = self.k_a / self.liq_NXM_a
+            self.eth_acquired += new_eth - self.liq
+            self.cap_pool += new_eth - self.liq
+            self.nxm_minted += num
+            # update below NXM reserve to maintain price after liquidity update
+            self.liq_NXM_b = new_eth / self.spot_price_b()
+            # update ETH liquidity & invariants
+            self.liq = new_eth
+            self.k_a = self.liq * self.liq_NXM_a
+            self.k_b = self.liq * self.liq_NXM_b
+            # sell to open market with the price impact compounded over the whole trade
+            # and add to wnxm supply (limited by nxm supply)
+            self.wnxm_price = wnxm_price_after(self.wnxm_price, -num, self.wnxm_move_size)
+            old_supply = self.wnxm_supply
+            self.wnxm_supply = min(self.wnxm_supply + num, self.nxm_supply)
+            self.wnxm_created += self.wnxm_supply - old_supply
+
     # RATCHET & LIQUIDITY FUNCTIONS
     def buy_ratchet(self):
         '''
         Function used to ratchet price downwards and remove liquidity for the above BV/buy pool.
         '''
         # establish price movement required to be relevant percentage of target
-        price_movement = self.ratchet_target() * sys_params.ratchet_down_perc / model_params.ratchets_per_day
+        price_movement = self.ratchet_target() * self.params.ratchet_down_step
 
         # establish target price and cap at target + oracle buffer
         target_price = max(self.spot_price_a() - price_movement,
-                           self.ratchet_target() * (1 + sys_params.oracle_buffer))
+                           self.ratchet_target() * self.params.buffer_above)
 
         # if liquidity is above target and spot prices are above target
         # find new liquidity by moving down to target at daily percentage rate
         # divided by number of times we're ratcheting per day
         # limit at target
         if self.liq > self.target_liq:
-            new_liq = max(self.liq - self.target_liq * sys_params.liq_out_perc / model_params.ratchets_per_day,
+            new_liq = max(self.liq - self.target_liq * self.params.liq_out_step,
                                     self.target_liq)
 
         else:
@@ -309,18 +385,18 @@ class RAMMHighLowCapMarkets:
         Function used to ratchet price upwards and add liquidity for the below BV/sell pool.
         '''
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.ratchet_target() * sys_params.ratchet_up_perc / model_params.ratchets_per_day
+        price_movement = self.ratchet_target() * self.params.ratchet_up_step
 
         # establish target price and cap at book value - oracle buffer
         target_price = min(self.spot_price_b() + price_movement,
-                           self.ratchet_target() * (1 - sys_params.oracle_buffer))
+                           self.ratchet_target() * self.params.buffer_below)
 
         # if liquidity is below target, spot prices are below target and we're still injecting
         # find new liquidity by moving up to target at daily percentage rate
         # divided by number of times we're moving liquidity per day
         # limit at target
         if self.liq < self.target_liq and self.cap_pool > self.mcr() + self.target_liq:
-            new_liq = min(self.liq + self.target_liq * sys_params.liq_in_perc / model_params.ratchets_per_day,
+            new_liq = min(self.liq + self.target_liq * self.params.liq_in_step,
                                     self.target_liq)
 
         else:
@@ -337,15 +413,98 @@ class RAMMHighLowCapMarkets:
         self.k_a = self.liq * self.liq_NXM_a
         self.k_b = self.liq * self.liq_NXM_b
 
+    # EVENTS
+    # ratchet both pools towards book value
+    def ratchet_event(self):
+        # up for below BV/sell pool
+        self.sell_ratchet()
+        # down for above BV/buy pool
+        self.buy_ratchet()
+
+    # protocol buy - not arbitrage-driven
+    def protocol_buy_event(self):
+        # with wNXM in place, don't do buys if buy price is above wNXM price
+        # assume someone would buy wNXM on open market instead
+        # need wnxm supply to exist
+        if round(self.spot_price_a(), 8) > round(self.wnxm_price, 8)\
+            and self.wnxm_supply > 0:
+            self.wnxm_market_buy(n_wnxm=self.nxm_buy_size(), remove=False)
+        else:
+            self.protocol_nxm_buy(n_nxm=self.nxm_buy_size())
+
+    # protocol sale - not arbitrage-driven
+    def protocol_sale_event(self):
+         # with wNXM in place, don't do sells if wNXM price is above protocol
+        # assume someone would sell wNXM on open market instead
+        if round(self.spot_price_b(), 8) < round(self.wnxm_price, 8):
+            self.wnxm_market_sell(n_wnxm=self.nxm_sale_size(), create=False)
+        else:
+            self.protocol_nxm_sale(n_nxm=self.nxm_sale_size())
+
+    # COMPILED ENGINE
+    # fixed trade sizes used by the kernel - NXM per sale and ETH per buy
+    # defined in stoch v det subclasses
+    def kernel_trade_sizes(self):
+        return 0, 0
+
+    # multiplicative wNXM price changes for the day's n_shifts wnxm_shift events
+    def kernel_wnxm_shifts(self, n_shifts):
+        return np.ones(n_shifts)
+
+    # constant vector of the kernel
+    def kernel_constants(self):
+        sale_nxm, buy_eth = self.kernel_trade_sizes()
+        return np.array([self.act_cover, self.target_liq, self.wnxm_move_size,
+                         self.params.capital_factor, self.params.price_transition_buffer,
+                         self.params.ratchet_up_step, self.params.ratchet_down_step,
+                         self.params.buffer_above, self.params.buffer_below,
+                         self.params.liq_in_step, self.params.liq_out_step,
+                         self.params.nxm_book_value_multiple, sale_nxm, buy_eth])
+
+    # run one day in the compiled kernel, reading and writing back the state attributes
+    def kernel_day_passes(self):
+        events = self.event_schedule().day(self.current_day)
+        state = np.array([getattr(self, name) for name in kernel.STATE_ATTRIBUTES])
+        kernel.step_day(state, self.kernel_constants(), events,
+                        self.kernel_wnxm_shifts(np.count_nonzero(events == WNXM_SHIFT)))
+        for name, value in zip(kernel.STATE_ATTRIBUTES, state.tolist()):
+            setattr(self, name, value)
+
+        # record values in tracking trajectory and increment day
+        self.trajectory.record(self)
+        self.current_day += 1
+
+    # number of each event per day the schedule is generated from
+    def schedule_counts(self):
+        return {RATCHET: self.params.ratchets_per_day,
+                WNXM_SHIFT: self.params.wnxm_shifts_per_day,
+                PROTOCOL_BUY: self.base_daily_protocol_buys,
+                PROTOCOL_SALE: self.base_daily_protocol_sales}
+
+    # generate the event schedule for the whole projection, shuffled within each day
+    def event_schedule(self):
+        if self.schedule is None:
+            self.schedule = EventSchedule.build(counts=self.schedule_counts(),
+                                                days=self.params.model_days,
+                                                rng=self.streams.shuffle)
+        return self.schedule
+
+    # add extra days of base entries and exits when extending a run - none here, set in subclasses
+    def extend_arrivals(self, extra_days):
+        self.base_daily_protocol_buys = np.concatenate((self.base_daily_protocol_buys,
+                                                        np.zeros(extra_days, dtype=int)))
+        self.base_daily_protocol_sales = np.concatenate((self.base_daily_protocol_sales,
+                                                         np.zeros(extra_days, dtype=int)))
+
     # create DAY LOOP
     def one_day_passes(self):
-        # create list of events and shuffle it
-        events_today = []
-        events_today.extend(['ratchet'] * model_params.ratchets_per_day)
-        events_today.extend(['wnxm_shift'] * model_params.wnxm_shifts_per_day)
-        events_today.extend(['protocol_buy'] * self.base_daily_protocol_buys[self.current_day])
-        events_today.extend(['protocol_sale'] * self.base_daily_protocol_sales[self.current_day])
-        shuffle(events_today)
+        # run the whole day in the compiled kernel if selected
+        if self.engine == 'numba':
+            self.kernel_day_passes()
+            return
+
+        # today's events from the precompiled schedule
+        events_today = self.event_schedule().day(self.current_day).tolist()
 
         # LOOP THROUGH EVENTS OF DAY
         for event in events_today:
@@ -353,7 +512,7 @@ class RAMMHighLowCapMarkets:
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print pre-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - pre-arbitrage:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - pre-arbitrage:
                         spot_price_b = {self.spot_price_b()}, spot_price_a = {self.spot_price_a()}
                         book_value = {self.book_value()}, wnxm_price = {self.wnxm_price}
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}, wnxm_supply = {self.wnxm_supply}
@@ -366,72 +525,26 @@ class RAMMHighLowCapMarkets:
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-arbitrage:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-arbitrage:
                         spot_price_b = {self.spot_price_b()}, spot_price_a = {self.spot_price_a()}
                         book_value = {self.book_value()}, wnxm_price = {self.wnxm_price}
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}, wnxm_supply = {self.wnxm_supply}
                 ''')
 
-            #-----RATCHET-----#
-            if event == 'ratchet':
-                # up for below BV/sell pool
-                self.sell_ratchet()
-                # down for above BV/buy pool
-                self.buy_ratchet()
-
-            #-----WNXM SHIFT-----#
-            if event == 'wnxm_shift':
-                self.wnxm_shift()
-
-            #-----protocol BUY-----#
-            # not arbitrage-driven
-            if event == 'protocol_buy':
-                # with wNXM in place, don't do buys if buy price is above wNXM price
-                # assume someone would buy wNXM on open market instead
-                # need wnxm supply to exist
-                if round(self.spot_price_a(), 8) > round(self.wnxm_price, 8)\
-                    and self.wnxm_supply > 0:
-                    self.wnxm_market_buy(n_wnxm=self.nxm_buy_size(), remove=False)
-                else:
-                    self.protocol_nxm_buy(n_nxm=self.nxm_buy_size())
-
-            #-----protocol SALE-----#
-            # not arbitrage-driven
-            if event == 'protocol_sale':
-                 # with wNXM in place, don't do sells if wNXM price is above protocol
-                # assume someone would sell wNXM on open market instead
-
-                if round(self.spot_price_b(), 8) < round(self.wnxm_price, 8):
-                    self.wnxm_market_sell(n_wnxm=self.nxm_sale_size(), create=False)
-                else:
-                    self.protocol_nxm_sale(n_nxm=self.nxm_sale_size())
+            #-----EVENT-----#
+            self.event_handlers[event]()
 
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-event:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-event:
                         spot_price_b = {self.spot_price_b()}, spot_price_a = {self.spot_price_a()}
                         book_value = {self.book_value()}, wnxm_price = {self.wnxm_price}
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}, wnxm_supply = {self.wnxm_supply}
                 ''')
 
-        # append values to tracking metrics
-        self.cap_pool_prediction.append(self.cap_pool)
-        self.spot_price_b_prediction.append(self.spot_price_b())
-        self.spot_price_a_prediction.append(self.spot_price_a())
-        self.wnxm_price_prediction.append(self.wnxm_price)
-        self.nxm_supply_prediction.append(self.nxm_supply)
-        self.wnxm_supply_prediction.append(self.wnxm_supply)
-        self.book_value_prediction.append(self.book_value())
-        self.liq_prediction.append(self.liq)
-        self.liq_NXM_b_prediction.append(self.liq_NXM_b)
-        self.liq_NXM_a_prediction.append(self.liq_NXM_a)
-        self.eth_sold_prediction.append(self.eth_sold)
-        self.eth_acquired_prediction.append(self.eth_acquired)
-        self.nxm_burned_prediction.append(self.nxm_burned)
-        self.nxm_minted_prediction.append(self.nxm_minted)
-        self.wnxm_removed_prediction.append(self.wnxm_removed)
-        self.wnxm_created_prediction.append(self.wnxm_created)
+        # record values in tracking trajectory
+        self.trajectory.record(self)
 
         # increment day
         self.current_day += 1
@@ -451,21 +564,8 @@ class RAMMHighLowCapMarkets:
         print(f' Above NXM Reserve: {self.liq_NXM_a}')
 
     def write_metrics(self):
-        # add to record
-        self.cap_pool_prediction.append(self.cap_pool)
-        self.spot_price_b_prediction.append(self.spot_price_b())
-        self.spot_price_a_prediction.append(self.spot_price_a())
-        self.wnxm_price_prediction.append(self.wnxm_price())
-        self.nxm_supply_prediction.append(self.nxm_supply)
-        self.wnxm_supply_prediction.append(self.wnxm_supply)
-        self.book_value_prediction.append(self.book_value())
-        self.liq_prediction.append(self.liq)
-        self.liq_NXM_b_prediction.append(self.liq_NXM_b)
-        self.liq_NXM_a_prediction.append(self.liq_NXM_a)
-        self.eth_sold_prediction.append(self.eth_sold)
-        self.eth_acquired_prediction.append(self.eth_acquired)
-        self.nxm_burned_prediction.append(self.nxm_burned)
-        self.nxm_minted_prediction.append(self.nxm_minted)
+        # record values in tracking trajectory
+        self.trajectory.record(self)
 
         # increment step
         self.steps += 1
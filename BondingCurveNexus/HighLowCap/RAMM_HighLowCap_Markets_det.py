@@ -1,26 +1,35 @@
 import numpy as np
 
 from BondingCurveNexus.HighLowCap.RAMM_HighLowCap_Markets import RAMMHighLowCapMarkets
-from BondingCurveNexus import model_params
+from BondingCurveNexus.checkpoint import repeat_last_day
 
 class RAMMHighLowCapMarketsDet(RAMMHighLowCapMarkets):
-    def __init__(self, daily_printout_day=0):
+    def __init__(self, daily_printout_day=0, arb_mode='analytic', params=None, schedule=None, seed=None, engine='python'):
 
         # initialise all the same stuff as RAMMHighLowCapMarkets
-        super().__init__(daily_printout_day)
+        super().__init__(daily_printout_day, arb_mode, params=params, schedule=schedule, seed=seed, engine=engine)
 
         # base entries and exits using a fixed pre-defined array
-        self.base_daily_protocol_buys = model_params.det_entry_array
-        self.base_daily_protocol_sales = model_params.det_exit_array
+        self.base_daily_protocol_buys = np.array(self.params.det_entry_array)
+        self.base_daily_protocol_sales = np.array(self.params.det_exit_array)
+
+    def extend_arrivals(self, extra_days):
+        # carry on with the last day's entries and exits
+        self.base_daily_protocol_buys = repeat_last_day(self.base_daily_protocol_buys, extra_days)
+        self.base_daily_protocol_sales = repeat_last_day(self.base_daily_protocol_sales, extra_days)
 
     def nxm_sale_size(self):
         # standard deterministic size of nxm sales
-        # return model_params.det_exit_size / self.spot_price_b()
-        return model_params.det_NXM_exit
+        # return self.params.det_exit_size / self.spot_price_b()
+        return self.params.det_NXM_exit
 
     def nxm_buy_size(self):
         # standard deterministic size of nxm buys
-        return model_params.det_entry_size / self.spot_price_a()
+        return self.params.det_entry_size / self.spot_price_a()
+
+    def kernel_trade_sizes(self):
+        # standard deterministic NXM per sale and ETH per buy for the compiled engine
+        return self.params.det_NXM_exit, self.params.det_entry_size
 
     def wnxm_shift(self):
         # no random changes in wNXM price
@@ -13,26 +13,53 @@ Buying and selling mechanisms are virtual Uni v2 pools with the following featur
 
  The daily_printout parameter can print out some the pre-arbitrage, pre-event and post-event information for a specific day
  If these printouts are desired, set the parameter to a specific day (defaults to 0)
-'''
 
-import numpy as np
-from random import shuffle
+ The clock parameter sets how the ratchets are modelled:
+  - 'discrete' (default) runs ratchets_per_day ratchet events a day, shuffled in with the trades
+  - 'continuous' gives every trade a timestamp and brings the pools forward to it in closed form,
+    as the RAMM contract does when its reserves are read - prices move towards the ratchet target and
+    liquidity towards target liquidity linearly in the elapsed time, capped at their targets.
+    Quiet periods cost nothing. The ratchet target is taken at the start of each period, so when it is
+    book value the result doesn't depend on how often advance_to() brings the pools forward (e.g. hourly or daily).
 
-from BondingCurveNexus import sys_params, model_params
+ Deterministic runs that settle on a fixed point are fast-forwarded to the last day by run_model - see steady_state.py
 
-class RAMMHighLowCapProtocol:
+ quote_sale / quote_buy price whole arrays of trade sizes against the current pools without changing them - see quotes.py
+'''
 
-    def __init__(self, daily_printout_day=0):
+import numpy as np
+
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.trajectory import Trajectory, TrajectoryViews
+from BondingCurveNexus.streams import RandomStreams
+from BondingCurveNexus.steady_state import SteadyState
+from BondingCurveNexus.quotes import sale_quote, buy_quote, no_trade
+from BondingCurveNexus.schedule import EventSchedule, EVENT_NAMES, SECONDS_PER_DAY, RATCHET, PROTOCOL_BUY, PROTOCOL_SALE
+
+class RAMMHighLowCapProtocol(SteadyState, TrajectoryViews):
+
+    def __init__(self, daily_printout_day=0, params=None, schedule=None, seed=None, clock='discrete'):
+        # set simulation parameters - defaults to the current sys_params & model_params values
+        self.params = params if params is not None else SimParams.from_modules()
+        # independent random streams of this simulation - pass the same seed to replay it exactly
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
         # OPENING STATE of system upon initializing a projection instance
         # start at day 0 & step 0
         self.current_day = 0
         self.steps = 0
         # set daily printout parameter. If not specified, it defaults to 0 and no printouts happen
         self.daily_printout_day = daily_printout_day
+        # set ratchet clock - 'discrete' or 'continuous'
+        if clock == 'continuous' and schedule is not None and schedule.times is None:
+            raise ValueError("clock='continuous' needs a timed schedule")
+        self.clock = clock
+        # time in seconds from the start of the projection the pools were last brought forward to
+        self.timestamp = 0
         # set current state of system
-        self.act_cover = sys_params.act_cover_now
-        self.cap_pool = sys_params.cap_pool_now
-        self.nxm_supply = sys_params.nxm_supply_now
+        self.act_cover = self.params.act_cover_now
+        self.cap_pool = self.params.cap_pool_now
+        self.nxm_supply = self.params.nxm_supply_now
 
         # set opening prices
         self.sell_open_price = 0.01418
@@ -41,9 +68,9 @@ class RAMMHighLowCapProtocol:
         # OPENING STATE of RAMM pools
 
         # set initial ETH liquidity
-        self.liq = sys_params.open_liq_sell
+        self.liq = self.params.open_liq_sell
         # set target liquidity for the pools in ETH
-        self.target_liq = sys_params.target_liq_sell
+        self.target_liq = self.params.target_liq_sell
 
         # BELOW BOOK
         # set initial NXM liquidity based on opening wnxm price
@@ -61,8 +88,15 @@ class RAMMHighLowCapProtocol:
 
         # base entries and exits - set to zero here
         # set stochasically or deterministically in subclasses
-        self.base_daily_protocol_buys = np.zeros(shape=model_params.model_days, dtype=int)
-        self.base_daily_protocol_sales = np.zeros(shape=model_params.model_days, dtype=int)
+        self.base_daily_protocol_buys = np.zeros(shape=self.params.model_days, dtype=int)
+        self.base_daily_protocol_sales = np.zeros(shape=self.params.model_days, dtype=int)
+
+        # precompiled event schedule - generated from the base entries and exits on the first day if not given
+        self.schedule = schedule
+        # jump table from event code to the method handling it
+        self.event_handlers = {RATCHET: self.ratchet_event,
+                               PROTOCOL_BUY: self.protocol_buy_event,
+                               PROTOCOL_SALE: self.protocol_sale_event}
 
         # initiate and set cumulative counters to zero
         self.eth_sold = 0
@@ -70,19 +104,12 @@ class RAMMHighLowCapProtocol:
         self.nxm_burned = 0
         self.nxm_minted = 0
 
-        # set tracking lists for individual instance
-        self.cap_pool_prediction = [self.cap_pool]
-        self.spot_price_b_prediction = [self.spot_price_b()]
-        self.spot_price_a_prediction = [self.spot_price_a()]
-        self.nxm_supply_prediction = [self.nxm_supply]
-        self.book_value_prediction = [self.book_value()]
-        self.liq_prediction = [self.liq]
-        self.liq_NXM_b_prediction = [self.liq_NXM_b]
-        self.liq_NXM_a_prediction = [self.liq_NXM_a]
-        self.eth_sold_prediction = [self.eth_sold]
-        self.eth_acquired_prediction = [self.eth_acquired]
-        self.nxm_burned_prediction = [self.nxm_burned]
-        self.nxm_minted_prediction = [self.nxm_minted]
+        # set tracking trajectory for individual instance and record opening state
+        self.trajectory = Trajectory(metrics=['cap_pool', 'spot_price_b', 'spot_price_a', 'nxm_supply',
+                                              'book_value', 'liq', 'liq_NXM_b', 'liq_NXM_a', 'eth_sold',
+                                              'eth_acquired', 'nxm_burned', 'nxm_minted'],
+                                     length=self.params.model_days + 1)
+        self.trajectory.record(self)
 
     # INSTANCE FUNCTIONS
     # to calculate a variety of ongoing metrics & parameters
@@ -91,7 +118,7 @@ class RAMMHighLowCapProtocol:
     # calculate mcr from current cover amount
     # minimum of 0.01 ETH to avoid division by zero
     def mcr(self):
-        return max(0.01, self.act_cover / sys_params.capital_factor)
+        return max(0.01, self.act_cover / self.params.capital_factor)
 
     # calculate book value from current assets & nxm supply.
     def book_value(self):
@@ -120,7 +147,7 @@ class RAMMHighLowCapProtocol:
     # calculate current ratios between high & low capitalization functionality
     def price_transition_ratio(self):
         return min(1, max(0,
-                (self.cap_pool - self.mcr() - self.target_liq) / sys_params.price_transition_buffer))
+                (self.cap_pool - self.mcr() - self.target_liq) / self.params.price_transition_buffer))
 
     # calculate target for ratchet mechanism based on price transition ratio
     def ratchet_target(self):
@@ -159,7 +186,7 @@ class RAMMHighLowCapProtocol:
     def protocol_nxm_buy(self, n_nxm):
 
         # assume noone buys NXM above a multiple of book
-        if self.spot_price_a() > self.book_value() * model_params.nxm_book_value_multiple:
+        if self.spot_price_a() > self.book_value() * self.params.nxm_book_value_multiple:
             pass
 
         else:
@@ -187,24 +214,37 @@ class RAMMHighLowCapProtocol:
             self.k_a = self.liq * self.liq_NXM_a
             self.k_b = self.liq * self.liq_NXM_b
 
+    # QUOTES
+    # protocol sales of an array of NXM sizes into the below pool, without changing the pools
+    def quote_sale(self, n_nxm):
+        return sale_quote(self.liq, self.liq_NXM_b, self.k_b, self.cap_pool, self.nxm_supply, n_nxm)
+
+    # protocol buys from the above pool of an array of NXM sizes or exact ETH amounts in, without changing the pools
+    def quote_buy(self, n_nxm=None, eth_in=None):
+        # assume noone buys NXM above a multiple of book
+        if self.spot_price_a() > self.book_value() * self.params.nxm_book_value_multiple:
+            return no_trade(n_nxm if n_nxm is not None else eth_in, self.spot_price_a(), self.book_value())
+        return buy_quote(self.liq, self.liq_NXM_a, self.k_a, self.cap_pool, self.nxm_supply,
+                         n_nxm=n_nxm, eth_in=eth_in)
+
     # RATCHET & LIQUIDITY FUNCTIONS
     def buy_ratchet(self):
         '''
         Function used to ratchet price downwards and remove liquidity for the above BV/buy pool.
         '''
         # establish price movement required to be relevant percentage of target
-        price_movement = self.ratchet_target() * sys_params.ratchet_down_perc / model_params.ratchets_per_day
+        price_movement = self.ratchet_target() * self.params.ratchet_down_step
 
         # establish target price and cap at target + oracle buffer
         target_price = max(self.spot_price_a() - price_movement,
-                           self.ratchet_target() * (1 + sys_params.oracle_buffer))
+                           self.ratchet_target() * self.params.buffer_above)
 
         # if liquidity is above target and spot prices are above target
         # find new liquidity by moving down to target at daily percentage rate
         # divided by number of times we're ratcheting per day
         # limit at target
         if self.liq > self.target_liq:
-            new_liq = max(self.liq - self.target_liq * sys_params.liq_out_perc / model_params.ratchets_per_day,
+            new_liq = max(self.liq - self.target_liq * self.params.liq_out_step,
                                     self.target_liq)
 
         else:
@@ -227,18 +267,18 @@ class RAMMHighLowCapProtocol:
         Function used to ratchet price upwards and add liquidity for the below BV/sell pool.
         '''
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.ratchet_target() * sys_params.ratchet_up_perc / model_params.ratchets_per_day
+        price_movement = self.ratchet_target() * self.params.ratchet_up_step
 
         # establish target price and cap at book value - oracle buffer
         target_price = min(self.spot_price_b() + price_movement,
-                           self.ratchet_target() * (1 - sys_params.oracle_buffer))
+                           self.ratchet_target() * self.params.buffer_below)
 
         # if liquidity is below target, spot prices are below target and we're still injecting
         # find new liquidity by moving up to target at daily percentage rate
         # divided by number of times we're moving liquidity per day
         # limit at target
         if self.liq < self.target_liq and self.cap_pool > self.mcr() + self.target_liq:
-            new_liq = min(self.liq + self.target_liq * sys_params.liq_in_perc / model_params.ratchets_per_day,
+            new_liq = min(self.liq + self.target_liq * self.params.liq_in_step,
                                     self.target_liq)
 
         else:
@@ -255,64 +295,119 @@ class RAMMHighLowCapProtocol:
         self.k_a = self.liq * self.liq_NXM_a
         self.k_b = self.liq * self.liq_NXM_b
 
+    # CONTINUOUS TIME
+    def elapse(self, elapsed):
+        '''
+        Function used to bring both pools forward by elapsed seconds in one step.
+        Equivalent to the sell and buy ratchets run continuously over the period towards the current ratchet target.
+        '''
+        days = elapsed / SECONDS_PER_DAY
+        target = self.ratchet_target()
+
+        # move sell price up and buy price down by the daily percentage of target over the elapsed time
+        # capped at target -/+ oracle buffer
+        sell_price = min(self.spot_price_b() + target * self.params.ratchet_up_perc * days,
+                         target * self.params.buffer_below)
+        buy_price = max(self.spot_price_a() - target * self.params.ratchet_down_perc * days,
+                        target * self.params.buffer_above)
+
+        # move liquidity towards target at daily percentage rate over the elapsed time, limit at target
+        # only inject liquidity while the capital pool is above MCR + target liquidity
+        if self.liq < self.target_liq and self.cap_pool > self.mcr() + self.target_liq:
+            new_liq = min(self.liq + self.target_liq * self.params.liq_in_perc * days,
+                          self.target_liq)
+        elif self.liq > self.target_liq:
+            new_liq = max(self.liq - self.target_liq * self.params.liq_out_perc * days,
+                          self.target_liq)
+        else:
+            new_liq = self.liq
+
+        # update NXM liquidity to reflect new prices & new liquidity
+        self.liq_NXM_b = new_liq / sell_price
+        self.liq_NXM_a = new_liq / buy_price
+
+        # update liquidity and invariants
+        self.liq = new_liq
+        self.k_a = self.liq * self.liq_NXM_a
+        self.k_b = self.liq * self.liq_NXM_b
+
+    # bring the pools forward to a time in seconds from the start of the projection
+    def advance_to(self, timestamp):
+        if timestamp > self.timestamp:
+            self.elapse(timestamp - self.timestamp)
+            self.timestamp = timestamp
+
+    # EVENTS
+    # ratchet both pools towards book value
+    def ratchet_event(self):
+        # up for below BV/sell pool
+        self.sell_ratchet()
+        # down for above BV/buy pool
+        self.buy_ratchet()
+
+    # protocol buy - not arbitrage-driven
+    def protocol_buy_event(self):
+        self.protocol_nxm_buy(n_nxm=self.nxm_buy_size())
+
+    # protocol sale - not arbitrage-driven
+    def protocol_sale_event(self):
+        self.protocol_nxm_sale(n_nxm=self.nxm_sale_size())
+
+    # generate the event schedule for the whole projection, shuffled within each day
+    def event_schedule(self):
+        if self.schedule is None:
+            # the continuous clock brings the pools forward to each event instead of scheduling ratchets
+            counts = {RATCHET: self.params.ratchets_per_day} if self.clock == 'discrete' else {}
+            counts.update({PROTOCOL_BUY: self.base_daily_protocol_buys,
+                           PROTOCOL_SALE: self.base_daily_protocol_sales})
+            self.schedule = EventSchedule.build(counts=counts,
+                                                days=self.params.model_days,
+                                                rng=self.streams.shuffle,
+                                                timed=self.clock == 'continuous')
+        return self.schedule
+
     # create DAY LOOP
     def one_day_passes(self):
-        # create list of events and shuffle it
-        events_today = []
-        events_today.extend(['ratchet'] * model_params.ratchets_per_day)
-        events_today.extend(['protocol_buy'] * self.base_daily_protocol_buys[self.current_day])
-        events_today.extend(['protocol_sale'] * self.base_daily_protocol_sales[self.current_day])
-        shuffle(events_today)
+        # today's events from the precompiled schedule
+        events_today = self.event_schedule().day(self.current_day).tolist()
+        # and their timestamps on the continuous clock
+        if self.clock == 'continuous':
+            times_today = self.schedule.day_times(self.current_day).tolist()
+        else:
+            times_today = [None] * len(events_today)
 
         # LOOP THROUGH EVENTS OF DAY
-        for event in events_today:
+        for event, timestamp in zip(events_today, times_today):
+
+            # bring the pools forward to the time of the event
+            if self.clock == 'continuous':
+                self.advance_to(timestamp)
 
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print pre-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - pre-event:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - pre-event:
                         spot_price_b = {self.spot_price_b()}, spot_price_a = {self.spot_price_a()}
                         book_value = {self.book_value()}, cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
                 ''')
 
-            #-----RATCHET-----#
-            if event == 'ratchet':
-                # up for below BV/sell pool
-                self.sell_ratchet()
-                # down for above BV/buy pool
-                self.buy_ratchet()
-
-            #-----protocol BUY-----#
-            # not arbitrage-driven
-            if event == 'protocol_buy':
-                self.protocol_nxm_buy(n_nxm=self.nxm_buy_size())
-
-            #-----protocol SALE-----#
-            # not arbitrage-driven
-            if event == 'protocol_sale':
-                self.protocol_nxm_sale(n_nxm=self.nxm_sale_size())
+            #-----EVENT-----#
+            self.event_handlers[event]()
 
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-event:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-event:
                         spot_price_b = {self.spot_price_b()}, spot_price_a = {self.spot_price_a()}
                         book_value = {self.book_value()}, cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
                 ''')
 
-        # append values to tracking metrics
-        self.cap_pool_prediction.append(self.cap_pool)
-        self.spot_price_b_prediction.append(self.spot_price_b())
-        self.spot_price_a_prediction.append(self.spot_price_a())
-        self.nxm_supply_prediction.append(self.nxm_supply)
-        self.book_value_prediction.append(self.book_value())
-        self.liq_prediction.append(self.liq)
-        self.liq_NXM_b_prediction.append(self.liq_NXM_b)
-        self.liq_NXM_a_prediction.append(self.liq_NXM_a)
-        self.eth_sold_prediction.append(self.eth_sold)
-        self.eth_acquired_prediction.append(self.eth_acquired)
-        self.nxm_burned_prediction.append(self.nxm_burned)
-        self.nxm_minted_prediction.append(self.nxm_minted)
+        # bring the pools forward to the end of the day
+        if self.clock == 'continuous':
+            self.advance_to((self.current_day + 1) * SECONDS_PER_DAY)
+
+        # record values in tracking trajectory
+        self.trajectory.record(self)
 
         # increment day
         self.current_day += 1
@@ -329,19 +424,8 @@ class RAMMHighLowCapProtocol:
         print(f' Above NXM Reserve: {self.liq_NXM_a}')
 
     def write_metrics(self):
-        # add to record
-        self.cap_pool_prediction.append(self.cap_pool)
-        self.spot_price_b_prediction.append(self.spot_price_b())
-        self.spot_price_a_prediction.append(self.spot_price_a())
-        self.nxm_supply_prediction.append(self.nxm_supply)
-        self.book_value_prediction.append(self.book_value())
-        self.liq_prediction.append(self.liq)
-        self.liq_NXM_b_prediction.append(self.liq_NXM_b)
-        self.liq_NXM_a_prediction.append(self.liq_NXM_a)
-        self.eth_sold_prediction.append(self.eth_sold)
-        self.eth_acquired_prediction.append(self.eth_acquired)
-        self.nxm_burned_prediction.append(self.nxm_burned)
-        self.nxm_minted_prediction.append(self.nxm_minted)
+        # record values in tracking trajectory
+        self.trajectory.record(self)
 
         # increment step
         self.steps += 1
\ No newline at end of file
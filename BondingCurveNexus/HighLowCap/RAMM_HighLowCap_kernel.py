@@ -0,0 +1,250 @@
+'''
+Compiled state transition for the RAMM HighLowCap markets model (engine='numba').
+
+The model state is packed into a flat float64 vector (indexed by the constants below) and the
+parameters it depends on into a second constant vector, so that a whole day of events -
+wNXM-NXM arbitrage before every event, ratchets, protocol buys/sales, wNXM market trades and wNXM shifts -
+runs inside one @njit function without any Python method calls.
+
+The functions mirror the RAMMHighLowCapMarkets methods line by line, with book value, mcr and
+the ratchet target computed once per use rather than on every call.
+Arbitrage is the analytic mode: the Lambert W solution of arbitrage.py (solved here with Halley's method),
+falling back to the chunked loops when nobody buys from the protocol.
+
+If numba isn't installed the same functions run as plain Python.
+'''
+
+import math
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    # run the kernel as plain python if numba isn't installed
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+from BondingCurveNexus.schedule import RATCHET, WNXM_SHIFT, PROTOCOL_BUY, PROTOCOL_SALE
+
+# STATE VECTOR - model attributes in the order they are packed
+STATE_ATTRIBUTES = ['cap_pool', 'nxm_supply', 'wnxm_supply', 'wnxm_price', 'liq', 'liq_NXM_b', 'liq_NXM_a',
+                    'k_b', 'k_a', 'eth_sold', 'eth_acquired', 'nxm_burned', 'nxm_minted',
+                    'wnxm_removed', 'wnxm_created']
+(CAP_POOL, NXM_SUPPLY, WNXM_SUPPLY, WNXM_PRICE, LIQ, LIQ_NXM_B, LIQ_NXM_A, K_B, K_A, ETH_SOLD, ETH_ACQUIRED,
+ NXM_BURNED, NXM_MINTED, WNXM_REMOVED, WNXM_CREATED) = range(len(STATE_ATTRIBUTES))
+
+# CONSTANT VECTOR - model attributes and parameters used by the state transition
+CONSTANT_NAMES = ['act_cover', 'target_liq', 'wnxm_move_size', 'capital_factor', 'price_transition_buffer',
+                  'ratchet_up_step', 'ratchet_down_step', 'buffer_above', 'buffer_below', 'liq_in_step',
+                  'liq_out_step', 'nxm_book_value_multiple', 'sale_nxm', 'buy_eth']
+(ACT_COVER, TARGET_LIQ, WNXM_MOVE_SIZE, CAPITAL_FACTOR, PRICE_TRANSITION_BUFFER, RATCHET_UP_STEP,
+ RATCHET_DOWN_STEP, BUFFER_ABOVE, BUFFER_BELOW, LIQ_IN_STEP, LIQ_OUT_STEP, NXM_BOOK_VALUE_MULTIPLE,
+ SALE_NXM, BUY_ETH) = range(len(CONSTANT_NAMES))
+
+# METRICS
+@njit(cache=True)
+def mcr(c):
+    return max(0.01, c[ACT_COVER] / c[CAPITAL_FACTOR])
+
+@njit(cache=True)
+def book_value(s):
+    if s[NXM_SUPPLY] == 0:
+        return 0.0
+    return s[CAP_POOL] / s[NXM_SUPPLY]
+
+@njit(cache=True)
+def spot_price_b(s):
+    return s[LIQ] / s[LIQ_NXM_B]
+
+@njit(cache=True)
+def spot_price_a(s):
+    return s[LIQ] / s[LIQ_NXM_A]
+
+@njit(cache=True)
+def ratchet_target(s, c):
+    ratio = min(1.0, max(0.0, (s[CAP_POOL] - mcr(c) - c[TARGET_LIQ]) / c[PRICE_TRANSITION_BUFFER]))
+    value = book_value(s)
+    return min(value, ratio * value + (1 - ratio) * (spot_price_a(s) + spot_price_b(s)) / 2)
+
+@njit(cache=True)
+def update_invariants(s):
+    s[K_A] = s[LIQ] * s[LIQ_NXM_A]
+    s[K_B] = s[LIQ] * s[LIQ_NXM_B]
+
+# PROTOCOL TRADES
+@njit(cache=True)
+def protocol_nxm_sale(s, n_nxm):
+    n_nxm = min(n_nxm, s[NXM_SUPPLY])
+    s[LIQ_NXM_B] += n_nxm
+    s[NXM_SUPPLY] -= n_nxm
+    new_eth = s[K_B] / s[LIQ_NXM_B]
+    delta_eth = s[LIQ] - new_eth
+    s[ETH_SOLD] += delta_eth
+    s[CAP_POOL] -= delta_eth
+    s[NXM_BURNED] += n_nxm
+    # keep the above price constant after the liquidity update
+    s[LIQ_NXM_A] = new_eth / spot_price_a(s)
+    s[LIQ] = new_eth
+    update_invariants(s)
+
+@njit(cache=True)
+def protocol_nxm_buy(s, c, n_nxm):
+    # assume noone buys NXM above a multiple of book
+    if spot_price_a(s) > book_value(s) * c[NXM_BOOK_VALUE_MULTIPLE]:
+        return
+    n_nxm = min(n_nxm, 0.5 * s[LIQ_NXM_A])
+    s[LIQ_NXM_A] -= n_nxm
+    s[NXM_SUPPLY] += n_nxm
+    new_eth = s[K_A] / s[LIQ_NXM_A]
+    delta_eth = new_eth - s[LIQ]
+    s[ETH_ACQUIRED] += delta_eth
+    s[CAP_POOL] += delta_eth
+    s[NXM_MINTED] += n_nxm
+    # keep the below price constant after the liquidity update
+    s[LIQ_NXM_B] = new_eth / spot_price_b(s)
+    s[LIQ] = new_eth
+    update_invariants(s)
+
+# WNXM MARKET TRADES
+@njit(cache=True)
+def wnxm_market_buy(s, c, n_wnxm, remove):
+    n_wnxm = min(n_wnxm, s[WNXM_SUPPLY])
+    s[WNXM_PRICE] += n_wnxm * s[WNXM_PRICE] * c[WNXM_MOVE_SIZE]
+    if remove:
+        s[WNXM_SUPPLY] -= n_wnxm
+        s[WNXM_REMOVED] += n_wnxm
+
+@njit(cache=True)
+def wnxm_market_sell(s, c, n_wnxm, create):
+    if not create:
+        n_wnxm = min(n_wnxm, s[WNXM_SUPPLY])
+    s[WNXM_PRICE] -= n_wnxm * s[WNXM_PRICE] * c[WNXM_MOVE_SIZE]
+    if create:
+        old_supply = s[WNXM_SUPPLY]
+        s[WNXM_SUPPLY] = min(s[WNXM_SUPPLY] + n_wnxm, s[NXM_SUPPLY])
+        s[WNXM_CREATED] += s[WNXM_SUPPLY] - old_supply
+
+# ARBITRAGE
+# principal branch of the Lambert W function for z >= 0, by Halley's method
+@njit(cache=True)
+def lambert_w(z):
+    w = math.log1p(z)
+    for i in range(100):
+        ew = math.exp(w)
+        f = w * ew - z
+        new_w = w - f / (ew * (w + 1) - (w + 2) * f / (2 * w + 2))
+        if abs(new_w - w) <= 1e-15 * (1 + abs(new_w)):
+            return new_w
+        w = new_w
+    return w
+
+# NXM reserve at which the pool price equals the (moving) wNXM price - see arbitrage.py
+@njit(cache=True)
+def equilibrium_nxm_reserve(liq_eth, liq_nxm, wnxm_price, wnxm_move_size):
+    invariant = liq_eth * liq_nxm
+    if wnxm_move_size == 0:
+        return math.sqrt(invariant / wnxm_price)
+    z = wnxm_move_size / 2 * math.sqrt(invariant / wnxm_price) * math.exp(wnxm_move_size * liq_nxm / 2)
+    return 2 / wnxm_move_size * lambert_w(z)
+
+@njit(cache=True)
+def chunked_arbitrage(s, c):
+    while spot_price_b(s) > s[WNXM_PRICE] and s[NXM_SUPPLY] > 0 and s[WNXM_SUPPLY] > 0:
+        num = min(c[SALE_NXM], s[WNXM_SUPPLY], s[NXM_SUPPLY])
+        wnxm_market_buy(s, c, num, True)
+        protocol_nxm_sale(s, num)
+
+    while spot_price_a(s) < s[WNXM_PRICE] and s[NXM_SUPPLY] > 0:
+        num = min(c[BUY_ETH] / spot_price_a(s), s[LIQ_NXM_A] * 0.5)
+        protocol_nxm_buy(s, c, num)
+        wnxm_market_sell(s, c, num, True)
+
+@njit(cache=True)
+def analytic_arbitrage(s, c):
+    move = c[WNXM_MOVE_SIZE]
+    if spot_price_b(s) > s[WNXM_PRICE] and s[NXM_SUPPLY] > 0 and s[WNXM_SUPPLY] > 0:
+        num = max(equilibrium_nxm_reserve(s[LIQ], s[LIQ_NXM_B], s[WNXM_PRICE], move) - s[LIQ_NXM_B], 0.0)
+        num = min(num, s[WNXM_SUPPLY], s[NXM_SUPPLY])
+        s[WNXM_PRICE] *= math.exp(move * num)
+        s[WNXM_SUPPLY] -= num
+        s[WNXM_REMOVED] += num
+        protocol_nxm_sale(s, num)
+
+    if spot_price_a(s) < s[WNXM_PRICE] and s[NXM_SUPPLY] > 0:
+        # no closed form if noone buys from the protocol
+        if spot_price_a(s) > book_value(s) * c[NXM_BOOK_VALUE_MULTIPLE]:
+            chunked_arbitrage(s, c)
+            return
+        num = max(s[LIQ_NXM_A] - equilibrium_nxm_reserve(s[LIQ], s[LIQ_NXM_A], s[WNXM_PRICE], move), 0.0)
+        s[LIQ_NXM_A] -= num
+        s[NXM_SUPPLY] += num
+        new_eth = s[K_A] / s[LIQ_NXM_A]
+        s[ETH_ACQUIRED] += new_eth - s[LIQ]
+        s[CAP_POOL] += new_eth - s[LIQ]
+        s[NXM_MINTED] += num
+        s[LIQ_NXM_B] = new_eth / spot_price_b(s)
+        s[LIQ] = new_eth
+        update_invariants(s)
+        s[WNXM_PRICE] *= math.exp(-move * num)
+        old_supply = s[WNXM_SUPPLY]
+        s[WNXM_SUPPLY] = min(s[WNXM_SUPPLY] + num, s[NXM_SUPPLY])
+        s[WNXM_CREATED] += s[WNXM_SUPPLY] - old_supply
+
+# RATCHETS
+@njit(cache=True)
+def buy_ratchet(s, c):
+    target = ratchet_target(s, c)
+    target_price = max(spot_price_a(s) - target * c[RATCHET_DOWN_STEP], target * c[BUFFER_ABOVE])
+    new_liq = s[LIQ]
+    if s[LIQ] > c[TARGET_LIQ]:
+        new_liq = max(s[LIQ] - c[TARGET_LIQ] * c[LIQ_OUT_STEP], c[TARGET_LIQ])
+    s[LIQ_NXM_A] = new_liq / target_price
+    s[LIQ_NXM_B] = new_liq / spot_price_b(s)
+    s[LIQ] = new_liq
+    update_invariants(s)
+
+@njit(cache=True)
+def sell_ratchet(s, c):
+    target = ratchet_target(s, c)
+    target_price = min(spot_price_b(s) + target * c[RATCHET_UP_STEP], target * c[BUFFER_BELOW])
+    new_liq = s[LIQ]
+    if s[LIQ] < c[TARGET_LIQ] and s[CAP_POOL] > mcr(c) + c[TARGET_LIQ]:
+        new_liq = min(s[LIQ] + c[TARGET_LIQ] * c[LIQ_IN_STEP], c[TARGET_LIQ])
+    s[LIQ_NXM_B] = new_liq / target_price
+    s[LIQ_NXM_A] = new_liq / spot_price_a(s)
+    s[LIQ] = new_liq
+    update_invariants(s)
+
+# DAY LOOP
+# apply one day of events to the state vector, consuming one wNXM shift factor per shift event
+@njit(cache=True)
+def step_day(s, c, events, wnxm_shifts):
+    shift = 0
+    for event in events:
+        # wNXM arbitrage happens in between all events
+        analytic_arbitrage(s, c)
+
+        if event == RATCHET:
+            sell_ratchet(s, c)
+            buy_ratchet(s, c)
+
+        elif event == WNXM_SHIFT:
+            s[WNXM_PRICE] *= wnxm_shifts[shift]
+            shift += 1
+
+        elif event == PROTOCOL_BUY:
+            n_nxm = c[BUY_ETH] / spot_price_a(s)
+            if round(spot_price_a(s), 8) > round(s[WNXM_PRICE], 8) and s[WNXM_SUPPLY] > 0:
+                wnxm_market_buy(s, c, n_nxm, False)
+            else:
+                protocol_nxm_buy(s, c, n_nxm)
+
+        elif event == PROTOCOL_SALE:
+            if round(spot_price_b(s), 8) < round(s[WNXM_PRICE], 8):
+                wnxm_market_sell(s, c, c[SALE_NXM], False)
+            else:
+                protocol_nxm_sale(s, c[SALE_NXM])
@@ -0,0 +1,66 @@
+'''
+Benchmark of the compiled HighLowCap engine against the python engine of RAMMHighLowCapMarketsDet:
+ - times the one-off numba compilation (cached on disk after the first run)
+ - times a single path with each engine and checks the trajectories agree
+ - times a number of python paths and extrapolates to the full number of paths
+ - times the full number of paths with the compiled engine
+'''
+
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+from BondingCurveNexus.HighLowCap.RAMM_HighLowCap_Markets_det import RAMMHighLowCapMarketsDet
+from BondingCurveNexus.HighLowCap.RAMM_HighLowCap_kernel import NUMBA_AVAILABLE
+from BondingCurveNexus.model_params import model_days
+
+# run a single path to the end of the projection with one engine
+def run_path(engine, seed):
+    sim = RAMMHighLowCapMarketsDet(engine=engine, seed=seed)
+    for i in range(model_days):
+        sim.one_day_passes()
+    return sim
+
+
+if __name__ == "__main__":
+
+    # number of paths for each engine
+    num_python_sims = 100
+    num_kernel_sims = 10_000
+
+    print(f'numba available: {NUMBA_AVAILABLE}')
+
+    # COMPILATION
+    start = time.perf_counter()
+    run_path('numba', seed=0)
+    print(f'first compiled path (including compilation): {time.perf_counter() - start:.2f}s')
+
+    # SINGLE PATH
+    timings = {}
+    sims = {}
+    for engine in ['python', 'numba']:
+        start = time.perf_counter()
+        sims[engine] = run_path(engine, seed=1)
+        timings[engine] = time.perf_counter() - start
+    max_diff = max(np.max(np.abs(sims['numba'].trajectory[metric] / sims['python'].trajectory[metric] - 1))
+                   for metric in ['cap_pool', 'nxm_supply', 'wnxm_price', 'spot_price_a', 'spot_price_b', 'liq'])
+    print(f'1 path:  python {timings["python"] * 1e3:.1f} ms, numba {timings["numba"] * 1e3:.1f} ms, '
+          f'speedup {timings["python"] / timings["numba"]:.1f}x, max relative difference {max_diff:.1e}')
+
+    # MANY PATHS
+    start = time.perf_counter()
+    for seed in tqdm(range(num_python_sims)):
+        run_path('python', seed)
+    python_per_path = (time.perf_counter() - start) / num_python_sims
+
+    start = time.perf_counter()
+    for seed in tqdm(range(num_kernel_sims)):
+        run_path('numba', seed)
+    kernel_time = time.perf_counter() - start
+    kernel_per_path = kernel_time / num_kernel_sims
+
+    print(f'python: {python_per_path * 1e3:.2f} ms/path (extrapolated {python_per_path * num_kernel_sims:.0f}s '
+          f'for {num_kernel_sims} paths)')
+    print(f'numba:  {kernel_per_path * 1e3:.2f} ms/path ({kernel_time:.0f}s for {num_kernel_sims} paths)')
+    print(f'speedup at {num_kernel_sims} paths: {python_per_path / kernel_per_path:.1f}x')
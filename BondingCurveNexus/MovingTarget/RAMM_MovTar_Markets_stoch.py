@@ -1,37 +1,40 @@
-import numpy as np
-from scipy.stats import lognorm
-
 from BondingCurveNexus.MovingTarget.RAMM_MovTar_Markets import RAMMMovTarMarkets
-from BondingCurveNexus import model_params
+from BondingCurveNexus.streams import LognormalStream
 
 class RAMMMovTarMarketsStoch(RAMMMovTarMarkets):
-    def __init__(self, daily_printout_day=0):
+    def __init__(self, daily_printout_day=0, arb_mode='analytic', params=None, schedule=None, seed=None):
 
         # initialise all the same stuff as RAMMMovTarMarkets
-        super().__init__(daily_printout_day)
+        super().__init__(daily_printout_day, arb_mode, params=params, schedule=schedule, seed=seed)
 
         # base entries and exits using a poisson distribution
-        self.base_daily_platform_buys = np.random.poisson(
-                                                lam=model_params.lambda_entries,
-                                                size=model_params.model_days)
-        self.base_daily_platform_sales = np.random.poisson(
-                                                lam=model_params.lambda_exits,
-                                                size=model_params.model_days)
+        self.base_daily_platform_buys = self.streams.arrivals.poisson(
+                                                lam=self.params.lambda_entries,
+                                                size=self.params.model_days)
+        self.base_daily_platform_sales = self.streams.arrivals.poisson(
+                                                lam=self.params.lambda_exits,
+                                                size=self.params.model_days)
+
+        # pre-drawn streams of lognormal ETH sizes of sales and buys
+        self.sale_sizes = LognormalStream(shape=self.params.exit_shape,
+                                          loc=self.params.exit_loc,
+                                          scale=self.params.exit_scale,
+                                          rng=self.streams.sizes)
+        self.buy_sizes = LognormalStream(shape=self.params.entry_shape,
+                                         loc=self.params.entry_loc,
+                                         scale=self.params.entry_scale,
+                                         rng=self.streams.sizes)
 
     def nxm_sale_size(self):
         # lognormal distribution of nxm sales
-        return lognorm.rvs(s=model_params.exit_shape,
-                           loc=model_params.exit_loc,
-                           scale=model_params.exit_scale) / self.sell_nxm_price()
+        return self.sale_sizes.draw() / self.sell_nxm_price()
 
     def nxm_buy_size(self):
         # lognormal distribution of nxm buys
-        return lognorm.rvs(s=model_params.entry_shape,
-                           loc=model_params.entry_loc,
-                           scale=model_params.entry_scale) / self.buy_nxm_price()
+        return self.buy_sizes.draw() / self.buy_nxm_price()
 
     def wnxm_shift(self):
         # set percentage changes in wnxm price using a normal distribution
-        self.wnxm_price *=  (1 + np.random.normal(loc=model_params.wnxm_drift,
-                                                 scale=model_params.wnxm_diffusion)
+        self.wnxm_price *=  (1 + self.streams.wnxm.normal(loc=self.params.wnxm_drift,
+                                                         scale=self.params.wnxm_diffusion)
                             )
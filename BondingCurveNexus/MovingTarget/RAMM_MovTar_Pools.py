@@ -16,29 +16,36 @@ Buying and selling mechanisms are virtual Uni v2 pools with the following featur
 '''
 
 import numpy as np
-from random import shuffle
 
-from BondingCurveNexus import sys_params, model_params
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.trajectory import Trajectory, TrajectoryViews
+from BondingCurveNexus.streams import RandomStreams
+from BondingCurveNexus.schedule import EventSchedule, EVENT_NAMES, RATCHET, PLATFORM_BUY, PLATFORM_SALE
 
-class RAMMMovTarPools:
+class RAMMMovTarPools(TrajectoryViews):
 
-    def __init__(self, daily_printout_day=0):
+    def __init__(self, daily_printout_day=0, params=None, schedule=None, seed=None):
+        # set simulation parameters - defaults to the current sys_params & model_params values
+        self.params = params if params is not None else SimParams.from_modules()
+        # independent random streams of this simulation - pass the same seed to replay it exactly
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
         # OPENING STATE of system upon initializing a projection instance
         # start at day 0
         self.current_day = 0
         # set daily printout parameter. If not specified, it defaults to 0 and no printouts happen
         self.daily_printout_day = daily_printout_day
         # set current state of system
-        self.act_cover = sys_params.act_cover_now
-        self.cap_pool = sys_params.cap_pool_now
-        self.nxm_supply = sys_params.nxm_supply_now
-        self.wnxm_price = sys_params.wnxm_price_now
+        self.act_cover = self.params.act_cover_now
+        self.cap_pool = self.params.cap_pool_now
+        self.nxm_supply = self.params.nxm_supply_now
+        self.wnxm_price = self.params.wnxm_price_now
 
         # OPENING STATE of RAMM pools
 
         # BELOW BOOK
         # set initial ETH liquidity as initial parameter
-        self.sell_liquidity_eth = sys_params.open_liq_sell
+        self.sell_liquidity_eth = self.params.open_liq_sell
         # set initial NXM liquidity based on opening wnxm price
         # in practice we can start much lower than wnxm price
         # but for simulation purposes this is the first interesting point
@@ -46,25 +53,32 @@ class RAMMMovTarPools:
         # set initial invariant
         self.sell_invariant = self.sell_liquidity_eth * self.sell_liquidity_nxm
         # set target liquidity for the below book pool in ETH
-        self.sell_target_liq = sys_params.target_liq_sell
+        self.sell_target_liq = self.params.target_liq_sell
 
         # ABOVE BOOK
         # set initial ETH liquidity as initial parameter
-        self.buy_liquidity_eth = sys_params.open_liq_buy
+        self.buy_liquidity_eth = self.params.open_liq_buy
         # set initial NXM liquidity based on opening wnxm price
         # in practice we can start much lower than wnxm price
         # but for simulation purposes this is the first interesting point
         self.buy_liquidity_nxm = self.buy_liquidity_eth /\
-                                (self.book_value() * (1 + sys_params.oracle_buffer))
+                                (self.book_value() * self.params.buffer_above)
         # set initial invariant
         self.buy_invariant = self.buy_liquidity_eth * self.buy_liquidity_nxm
         # set target liquidity for the below book pool in ETH
-        self.buy_target_liq = sys_params.target_liq_buy
+        self.buy_target_liq = self.params.target_liq_buy
 
         # base entries and exits - set to zero here
         # set stochasically or deterministically in subclasses
-        self.base_daily_platform_buys = np.zeros(shape=model_params.model_days, dtype=int)
-        self.base_daily_platform_sales = np.zeros(shape=model_params.model_days, dtype=int)
+        self.base_daily_platform_buys = np.zeros(shape=self.params.model_days, dtype=int)
+        self.base_daily_platform_sales = np.zeros(shape=self.params.model_days, dtype=int)
+
+        # precompiled event schedule - generated from the base entries and exits on the first day if not given
+        self.schedule = schedule
+        # jump table from event code to the method handling it
+        self.event_handlers = {RATCHET: self.ratchet_event,
+                               PLATFORM_BUY: self.platform_buy_event,
+                               PLATFORM_SALE: self.platform_sale_event}
 
         # initiate and set cumulative counters to zero
         self.eth_sold = 0
@@ -72,20 +86,13 @@ class RAMMMovTarPools:
         self.nxm_burned = 0
         self.nxm_minted = 0
 
-        # set tracking lists for individual instance
-        self.cap_pool_prediction = [self.cap_pool]
-        self.sell_nxm_price_prediction = [self.sell_nxm_price()]
-        self.buy_nxm_price_prediction = [self.buy_nxm_price()]
-        self.nxm_supply_prediction = [self.nxm_supply]
-        self.book_value_prediction = [self.book_value()]
-        self.sell_liquidity_nxm_prediction = [self.sell_liquidity_nxm]
-        self.sell_liquidity_eth_prediction = [self.sell_liquidity_eth]
-        self.buy_liquidity_nxm_prediction = [self.buy_liquidity_nxm]
-        self.buy_liquidity_eth_prediction = [self.buy_liquidity_eth]
-        self.eth_sold_prediction = [self.eth_sold]
-        self.eth_acquired_prediction = [self.eth_acquired]
-        self.nxm_burned_prediction = [self.nxm_burned]
-        self.nxm_minted_prediction = [self.nxm_minted]
+        # set tracking trajectory for individual instance and record opening state
+        self.trajectory = Trajectory(metrics=['cap_pool', 'sell_nxm_price', 'buy_nxm_price', 'nxm_supply',
+                                              'book_value', 'sell_liquidity_nxm', 'sell_liquidity_eth',
+                                              'buy_liquidity_nxm', 'buy_liquidity_eth', 'eth_sold',
+                                              'eth_acquired', 'nxm_burned', 'nxm_minted'],
+                                     length=self.params.model_days + 1)
+        self.trajectory.record(self)
 
     # INSTANCE FUNCTIONS
     # to calculate a variety of ongoing metrics & parameters
@@ -120,7 +127,7 @@ class RAMMMovTarPools:
 
         # without wNXM in place, don't do sells if buy price is above book value
         # if round(self.buy_nxm_price(), 4) >\
-        #     round(self.book_value() * (1 + sys_params.oracle_buffer), 4):
+        #     round(self.book_value() * self.params.buffer_above, 4):
         #     pass
 
         # else:
@@ -149,11 +156,11 @@ class RAMMMovTarPools:
 
         # without wNXM in place, don't do buys if sell price is below book value
         # if round(self.sell_nxm_price(), 4) <\
-        #     round(self.book_value() * (1 - sys_params.oracle_buffer), 4):
+        #     round(self.book_value() * self.params.buffer_below, 4):
         #     pass
 
         # assume noone buys NXM above 3x book
-        if self.buy_nxm_price() > self.book_value() * model_params.nxm_book_value_multiple:
+        if self.buy_nxm_price() > self.book_value() * self.params.nxm_book_value_multiple:
             pass
 
         else:
@@ -182,17 +189,17 @@ class RAMMMovTarPools:
         Function used to ratchet price downwards and remove liquidity for the above BV/buy pool.
         '''
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.book_value() * sys_params.ratchet_down_perc / model_params.ratchets_per_day
+        price_movement = self.book_value() * self.params.ratchet_down_step
 
         # establish target price and cap at sell price + 2 * oracle buffer
         target_price = max(self.buy_nxm_price() - price_movement,
-                           self.sell_nxm_price() * (1 + 2 * sys_params.oracle_buffer))
+                           self.sell_nxm_price() * self.params.spread_above)
 
         # change target liquidity to be lower when dilutive
         # if self.buy_nxm_price() < self.book_value():
-        #     self.buy_target_liq = 0.25 * sys_params.target_liq_buy
+        #     self.buy_target_liq = 0.25 * self.params.target_liq_buy
         # else:
-        self.buy_target_liq = sys_params.target_liq_buy
+        self.buy_target_liq = self.params.target_liq_buy
 
         # find new liquidity by moving down to target at daily percentage rate
         # divided by number of times we're ratcheting per day
@@ -200,7 +207,7 @@ class RAMMMovTarPools:
 
 
         if self.buy_liquidity_eth > self.buy_target_liq:
-            self.buy_liquidity_eth = max(self.buy_liquidity_eth - self.buy_target_liq * sys_params.liq_out_perc / model_params.ratchets_per_day,
+            self.buy_liquidity_eth = max(self.buy_liquidity_eth - self.buy_target_liq * self.params.liq_out_step,
                                     self.buy_target_liq)
 
         # update NXM liquidity to reflect new price & new liquidity
@@ -215,23 +222,23 @@ class RAMMMovTarPools:
         Function used to ratchet price upwards and add liquidity for the below BV/sell pool.
         '''
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.book_value() * sys_params.ratchet_up_perc / model_params.ratchets_per_day
+        price_movement = self.book_value() * self.params.ratchet_up_step
 
         # change target liquidity to be lower when dilutive
         # if self.sell_nxm_price() > self.book_value():
-        #     self.sell_target_liq = 0.25 * sys_params.target_liq_sell
+        #     self.sell_target_liq = 0.25 * self.params.target_liq_sell
         # else:
-        self.sell_target_liq = sys_params.target_liq_sell
+        self.sell_target_liq = self.params.target_liq_sell
 
         # establish target price and cap at book value - oracle buffer
         target_price = max(self.sell_nxm_price(), min(self.sell_nxm_price() + price_movement,
-                           self.buy_nxm_price() * (1 - 2 * sys_params.oracle_buffer)))
+                           self.buy_nxm_price() * self.params.spread_below))
 
         # find new liquidity by moving up to target at daily percentage rate
         # divided by number of times we're moving liquidity per day
         # limit at target
         if self.sell_liquidity_eth < self.sell_target_liq:
-            self.sell_liquidity_eth = min(self.sell_liquidity_eth + self.sell_target_liq * sys_params.liq_in_perc / model_params.ratchets_per_day,
+            self.sell_liquidity_eth = min(self.sell_liquidity_eth + self.sell_target_liq * self.params.liq_in_step,
                                     self.sell_target_liq)
 
         # update NXM liquidity to reflect new price
@@ -240,14 +247,37 @@ class RAMMMovTarPools:
         # update invariant
         self.sell_invariant = self.sell_liquidity_eth * self.sell_liquidity_nxm
 
+    # EVENTS
+    # ratchet both pools towards book value
+    def ratchet_event(self):
+        # up for below BV/sell pool
+        self.sell_ratchet()
+        # down for above BV/buy pool
+        self.buy_ratchet()
+
+    # platform buy - not arbitrage-driven
+    def platform_buy_event(self):
+        self.platform_nxm_buy(n_nxm=self.nxm_buy_size())
+
+    # platform sale - not arbitrage-driven
+    def platform_sale_event(self):
+        self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+
+    # generate the event schedule for the whole projection, shuffled within each day
+    def event_schedule(self):
+        if self.schedule is None:
+            self.schedule = EventSchedule.build(
+                                counts={RATCHET: self.params.ratchets_per_day,
+                                        PLATFORM_BUY: self.base_daily_platform_buys,
+                                        PLATFORM_SALE: self.base_daily_platform_sales},
+                                days=self.params.model_days,
+                                rng=self.streams.shuffle)
+        return self.schedule
+
     # create DAY LOOP
     def one_day_passes(self):
-        # create list of events and shuffle it
-        events_today = []
-        events_today.extend(['ratchet'] * model_params.ratchets_per_day)
-        events_today.extend(['platform_buy'] * self.base_daily_platform_buys[self.current_day])
-        events_today.extend(['platform_sale'] * self.base_daily_platform_sales[self.current_day])
-        shuffle(events_today)
+        # today's events from the precompiled schedule
+        events_today = self.event_schedule().day(self.current_day).tolist()
 
         # LOOP THROUGH EVENTS OF DAY
         for event in events_today:
@@ -255,7 +285,7 @@ class RAMMMovTarPools:
            # optional daily printout
         #    # if daily_printout_day parameter is non-zero, print pre-arbitrage params
         #     if self.daily_printout_day and self.current_day == self.daily_printout_day:
-        #         print(f'''Day {self.daily_printout_day} - {event} - pre-arbitrage:
+        #         print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - pre-arbitrage:
         #                 sell_nxm_price = {self.sell_nxm_price()}, buy_nxm_price = {self.buy_nxm_price()}
         #                 book_value = {self.book_value()},
         #                 cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
@@ -264,52 +294,26 @@ class RAMMMovTarPools:
         #    # optional daily printout
         #    # if daily_printout_day parameter is non-zero, print post-arbitrage params
         #     if self.daily_printout_day and self.current_day == self.daily_printout_day:
-        #         print(f'''Day {self.daily_printout_day} - {event} - post-arbitrage:
+        #         print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-arbitrage:
         #                 sell_nxm_price = {self.sell_nxm_price()}, buy_nxm_price = {self.buy_nxm_price()}
         #                 book_value = {self.book_value()},
         #                 cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
         #         ''')
 
-            #-----RATCHET-----#
-            if event == 'ratchet':
-                # up for below BV/sell pool
-                self.sell_ratchet()
-                # down for above BV/buy pool
-                self.buy_ratchet()
-
-            #-----PLATFORM BUY-----#
-            # not arbitrage-driven
-            if event == 'platform_buy':
-                self.platform_nxm_buy(n_nxm=self.nxm_buy_size())
-
-            #-----PLATFORM SALE-----#
-            # not arbitrage-driven
-            if event == 'platform_sale':
-                self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+            #-----EVENT-----#
+            self.event_handlers[event]()
 
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-event:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-event:
                         sell_nxm_price = {self.sell_nxm_price()}, buy_nxm_price = {self.buy_nxm_price()}
                         book_value = {self.book_value()},
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
                 ''')
 
-        # append values to tracking metrics
-        self.cap_pool_prediction.append(self.cap_pool)
-        self.sell_nxm_price_prediction.append(self.sell_nxm_price())
-        self.buy_nxm_price_prediction.append(self.buy_nxm_price())
-        self.nxm_supply_prediction.append(self.nxm_supply)
-        self.book_value_prediction.append(self.book_value())
-        self.sell_liquidity_nxm_prediction.append(self.sell_liquidity_nxm)
-        self.sell_liquidity_eth_prediction.append(self.sell_liquidity_eth)
-        self.buy_liquidity_nxm_prediction.append(self.buy_liquidity_nxm)
-        self.buy_liquidity_eth_prediction.append(self.buy_liquidity_eth)
-        self.eth_sold_prediction.append(self.eth_sold)
-        self.eth_acquired_prediction.append(self.eth_acquired)
-        self.nxm_burned_prediction.append(self.nxm_burned)
-        self.nxm_minted_prediction.append(self.nxm_minted)
+        # record values in tracking trajectory
+        self.trajectory.record(self)
 
         # increment day
         self.current_day += 1
@@ -13,36 +13,69 @@ Buying and selling mechanisms are virtual Uni v2 pools with the following featur
 
  The daily_printout parameter can print out some the pre-arbitrage, pre-event and post-event information for a specific day
  If these printouts are desired, set the parameter to a specific day (defaults to 0)
-'''
 
-import numpy as np
-from random import shuffle
+ The arb_mode parameter sets how wNXM-NXM arbitrage is carried out:
+  - 'analytic' (default) solves for the exact trade size that equalises prices and applies it in one step
+  - 'chunked' trades randomly-sized lots until prices cross, as the original loop did
 
-from BondingCurveNexus import sys_params, model_params
+ The clock parameter sets how the ratchets are modelled:
+  - 'discrete' (default) runs ratchets_per_day ratchet events a day, shuffled in with the trades
+  - 'continuous' gives every trade a timestamp and brings the pools forward to it in closed form,
+    as the RAMM contract does when its reserves are read - prices move towards book value and
+    liquidity towards target linearly in the elapsed time, capped at their targets.
+    Quiet periods cost nothing and the result doesn't depend on how often the pools are brought forward,
+    so advance_to() can be called at any resolution (e.g. hourly) between trades.
 
-class RAMMMarkets:
+ Runs can be checkpointed to disk and resumed or extended past model_days - see checkpoint.py.
+'''
+
+import numpy as np
 
-    def __init__(self, daily_printout_day=0):
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.trajectory import Trajectory, TrajectoryViews
+from BondingCurveNexus.streams import RandomStreams
+from BondingCurveNexus.checkpoint import Checkpointable
+from BondingCurveNexus.arbitrage import arb_sale_size, arb_buy_size, wnxm_price_after
+from BondingCurveNexus.schedule import EventSchedule, EVENT_NAMES, SECONDS_PER_DAY, \
+                                       RATCHET, WNXM_SHIFT, PLATFORM_BUY, PLATFORM_SALE
+
+class RAMMMarkets(Checkpointable, TrajectoryViews):
+
+    def __init__(self, daily_printout_day=0, arb_mode='analytic', params=None, schedule=None, seed=None,
+                 clock='discrete'):
+        # set simulation parameters - defaults to the current sys_params & model_params values
+        self.params = params if params is not None else SimParams.from_modules()
+        # independent random streams of this simulation - pass the same seed to replay it exactly
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
         # OPENING STATE of system upon initializing a projection instance
         # start at day 0
         self.current_day = 0
         # set daily printout parameter. If not specified, it defaults to 0 and no printouts happen
         self.daily_printout_day = daily_printout_day
+        # set arbitrage mode - 'analytic' or 'chunked'
+        self.arb_mode = arb_mode
+        # set ratchet clock - 'discrete' or 'continuous'
+        if clock == 'continuous' and schedule is not None and schedule.times is None:
+            raise ValueError("clock='continuous' needs a timed schedule")
+        self.clock = clock
+        # time in seconds from the start of the projection the pools were last brought forward to
+        self.timestamp = 0
         # set current state of system
-        self.act_cover = sys_params.act_cover_now
-        self.cap_pool = sys_params.cap_pool_now
-        self.nxm_supply = sys_params.nxm_supply_now
-        self.wnxm_supply = sys_params.wnxm_supply_now
-        self.wnxm_price = sys_params.wnxm_price_now
+        self.act_cover = self.params.act_cover_now
+        self.cap_pool = self.params.cap_pool_now
+        self.nxm_supply = self.params.nxm_supply_now
+        self.wnxm_supply = self.params.wnxm_supply_now
+        self.wnxm_price = self.params.wnxm_price_now
 
         # set ETH value for wNXM price shift as a result of 1 ETH of buy/sell
-        self.wnxm_move_size = model_params.wnxm_move_size
+        self.wnxm_move_size = self.params.wnxm_move_size
 
         # OPENING STATE of RAMM pools
 
         # BELOW BOOK
         # set initial ETH liquidity as initial parameter
-        self.sell_liquidity_eth = sys_params.open_liq_sell
+        self.sell_liquidity_eth = self.params.open_liq_sell
         # set initial NXM liquidity based on opening wnxm price
         # in practice we can start much lower than wnxm price
         # but for simulation purposes this is the first interesting point
@@ -50,25 +83,33 @@ class RAMMMarkets:
         # set initial invariant
         self.sell_invariant = self.sell_liquidity_eth * self.sell_liquidity_nxm
         # set target liquidity for the below book pool in ETH
-        self.sell_target_liq = sys_params.target_liq_sell
+        self.sell_target_liq = self.params.target_liq_sell
 
         # ABOVE BOOK
         # set initial ETH liquidity as initial parameter
-        self.buy_liquidity_eth = sys_params.open_liq_buy
+        self.buy_liquidity_eth = self.params.open_liq_buy
         # set initial NXM liquidity based on opening wnxm price
         # in practice we can start much lower than wnxm price
         # but for simulation purposes this is the first interesting point
         self.buy_liquidity_nxm = self.buy_liquidity_eth /\
-                                (self.book_value() * (1 + sys_params.oracle_buffer))
+                                (self.book_value() * self.params.buffer_above)
         # set initial invariant
         self.buy_invariant = self.buy_liquidity_eth * self.buy_liquidity_nxm
         # set target liquidity for the below book pool in ETH
-        self.buy_target_liq = sys_params.target_liq_buy
+        self.buy_target_liq = self.params.target_liq_buy
 
         # base entries and exits - set to zero here
         # set stochasically or deterministically in subclasses
-        self.base_daily_platform_buys = np.zeros(shape=model_params.model_days, dtype=int)
-        self.base_daily_platform_sales = np.zeros(shape=model_params.model_days, dtype=int)
+        self.base_daily_platform_buys = np.zeros(shape=self.params.model_days, dtype=int)
+        self.base_daily_platform_sales = np.zeros(shape=self.params.model_days, dtype=int)
+
+        # precompiled event schedule - generated from the base entries and exits on the first day if not given
+        self.schedule = schedule
+        # jump table from event code to the method handling it
+        self.event_handlers = {RATCHET: self.ratchet_event,
+                               WNXM_SHIFT: self.wnxm_shift,
+                               PLATFORM_BUY: self.platform_buy_event,
+                               PLATFORM_SALE: self.platform_sale_event}
 
         # initiate and set cumulative counters to zero
         self.eth_sold = 0
@@ -78,24 +119,14 @@ class RAMMMarkets:
         self.wnxm_removed = 0
         self.wnxm_created = 0
 
-        # set tracking lists for individual instance
-        self.cap_pool_prediction = [self.cap_pool]
-        self.sell_nxm_price_prediction = [self.sell_nxm_price()]
-        self.buy_nxm_price_prediction = [self.buy_nxm_price()]
-        self.wnxm_price_prediction = [self.wnxm_price]
-        self.nxm_supply_prediction = [self.nxm_supply]
-        self.wnxm_supply_prediction = [self.wnxm_supply]
-        self.book_value_prediction = [self.book_value()]
-        self.sell_liquidity_nxm_prediction = [self.sell_liquidity_nxm]
-        self.sell_liquidity_eth_prediction = [self.sell_liquidity_eth]
-        self.buy_liquidity_nxm_prediction = [self.buy_liquidity_nxm]
-        self.buy_liquidity_eth_prediction = [self.buy_liquidity_eth]
-        self.eth_sold_prediction = [self.eth_sold]
-        self.eth_acquired_prediction = [self.eth_acquired]
-        self.nxm_burned_prediction = [self.nxm_burned]
-        self.nxm_minted_prediction = [self.nxm_minted]
-        self.wnxm_removed_prediction = [self.wnxm_removed]
-        self.wnxm_created_prediction = [self.wnxm_created]
+        # set tracking trajectory for individual instance and record opening state
+        self.trajectory = Trajectory(metrics=['cap_pool', 'sell_nxm_price', 'buy_nxm_price', 'wnxm_price',
+                                              'nxm_supply', 'wnxm_supply', 'book_value', 'sell_liquidity_nxm',
+                                              'sell_liquidity_eth', 'buy_liquidity_nxm', 'buy_liquidity_eth',
+                                              'eth_sold', 'eth_acquired', 'nxm_burned', 'nxm_minted',
+                                              'wnxm_removed', 'wnxm_created'],
+                                     length=self.params.model_days + 1)
+        self.trajectory.record(self)
 
     # INSTANCE FUNCTIONS
     # to calculate a variety of ongoing metrics & parameters
@@ -152,7 +183,7 @@ class RAMMMarkets:
     def platform_nxm_buy(self, n_nxm):
 
         # assume noone buys NXM above a multiple of book
-        if self.buy_nxm_price() > self.book_value() * model_params.nxm_book_value_multiple:
+        if self.buy_nxm_price() > self.book_value() * self.params.nxm_book_value_multiple:
             pass
 
         else:
@@ -231,6 +262,12 @@ class RAMMMarkets:
         self.wnxm_market_sell(n_wnxm=num, create=True)
 
     def arbitrage(self):
+        if self.arb_mode == 'chunked':
+            self.chunked_arbitrage()
+        else:
+            self.analytic_arbitrage()
+
+    def chunked_arbitrage(self):
         # system price > wnxm_price arb
             # platform sale price has to be higher than wnxm price for arbitrage
             # nxm supply has to be greater than zero
@@ -246,23 +283,63 @@ class RAMMMarkets:
                 self.nxm_supply > 0:
             self.arb_buy_transaction()
 
+    def analytic_arbitrage(self):
+        # system price > wnxm_price arb
+            # solve for the NXM sale that brings the platform sale price down to the wnxm price
+            # limit to number of nxm supply and wnxm supply
+        if self.sell_nxm_price() > self.wnxm_price and \
+            self.nxm_supply > 0 and self.wnxm_supply > 0:
+            num = min(arb_sale_size(self.sell_liquidity_eth, self.sell_liquidity_nxm,
+                                    self.wnxm_price, self.wnxm_move_size),
+                      self.wnxm_supply, self.nxm_supply)
+            # buy from open market with the price impact compounded over the whole trade
+            self.wnxm_price = wnxm_price_after(self.wnxm_price, num, self.wnxm_move_size)
+            self.wnxm_supply -= num
+            self.wnxm_removed += num
+            # sell to platform
+            self.platform_nxm_sale(n_nxm=num)
+
+        # system price < wnxm_price arb
+            # no closed form if noone buys from the platform, so fall back to the chunked loop
+        if self.buy_nxm_price() < self.wnxm_price and self.nxm_supply > 0:
+            if self.buy_nxm_price() > self.book_value() * self.params.nxm_book_value_multiple:
+                self.chunked_arbitrage()
+                return
+            # solve for the NXM buy that brings the platform buy price up to the wnxm price
+            num = arb_buy_size(self.buy_liquidity_eth, self.buy_liquidity_nxm,
+                               self.wnxm_price, self.wnxm_move_size)
+            # buy from platform
+            self.buy_liquidity_nxm -= num
+            self.nxm_supply += num
+            new_eth = self.buy_invariant / self.buy_liquidity_nxm
+            self.eth_acquired += new_eth - self.buy_liquidity_eth
+            self.cap_pool += new_eth - self.buy_liquidity_eth
+            self.nxm_minted += num
+            self.buy_liquidity_eth = new_eth
+            # sell to open market with the price impact compounded over the whole trade
+            # and add to wnxm supply (limited by nxm supply)
+            self.wnxm_price = wnxm_price_after(self.wnxm_price, -num, self.wnxm_move_size)
+            old_supply = self.wnxm_supply
+            self.wnxm_supply = min(self.wnxm_supply + num, self.nxm_supply)
+            self.wnxm_created += self.wnxm_supply - old_supply
+
     # RATCHET & LIQUIDITY FUNCTIONS
     def buy_ratchet(self):
         '''
         Function used to ratchet price downwards and remove liquidity for the above BV/buy pool.
         '''
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.book_value() * sys_params.ratchet_down_perc / model_params.ratchets_per_day
+        price_movement = self.book_value() * self.params.ratchet_down_step
 
         # establish target price and cap at book value + oracle buffer
         target_price = max(self.buy_nxm_price() - price_movement,
-                           self.book_value() * (1 + sys_params.oracle_buffer))
+                           self.book_value() * self.params.buffer_above)
 
         # find new liquidity by moving down to target at daily percentage rate
         # divided by number of times we're ratcheting per day
         # limit at target
         if self.buy_liquidity_eth > self.buy_target_liq:
-            self.buy_liquidity_eth = max(self.buy_liquidity_eth - self.buy_target_liq * sys_params.liq_out_perc / model_params.ratchets_per_day,
+            self.buy_liquidity_eth = max(self.buy_liquidity_eth - self.buy_target_liq * self.params.liq_out_step,
                                     self.buy_target_liq)
 
         # update NXM liquidity to reflect new price & new liquidity
@@ -277,17 +354,17 @@ class RAMMMarkets:
         Function used to ratchet price upwards and add liquidity for the below BV/sell pool.
         '''
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.book_value() * sys_params.ratchet_up_perc / model_params.ratchets_per_day
+        price_movement = self.book_value() * self.params.ratchet_up_step
 
         # establish target price and cap at book value - oracle buffer
         target_price = max(self.sell_nxm_price(), min(self.sell_nxm_price() + price_movement,
-                           self.book_value() * (1 - sys_params.oracle_buffer)))
+                           self.book_value() * self.params.buffer_below))
 
         # find new liquidity by moving up to target at daily percentage rate
         # divided by number of times we're moving liquidity per day
         # limit at target
         if self.sell_liquidity_eth < self.sell_target_liq:
-            self.sell_liquidity_eth = min(self.sell_liquidity_eth + self.sell_target_liq * sys_params.liq_in_perc / model_params.ratchets_per_day,
+            self.sell_liquidity_eth = min(self.sell_liquidity_eth + self.sell_target_liq * self.params.liq_in_step,
                                     self.sell_target_liq)
 
         # update NXM liquidity to reflect new price
@@ -296,23 +373,125 @@ class RAMMMarkets:
         # update invariant
         self.sell_invariant = self.sell_liquidity_eth * self.sell_liquidity_nxm
 
+    # CONTINUOUS TIME
+    def elapse(self, elapsed):
+        '''
+        Function used to bring both pools forward by elapsed seconds in one step.
+        Equivalent to the sell and buy ratchets run continuously over the period.
+        '''
+        days = elapsed / SECONDS_PER_DAY
+
+        # BELOW BOOK
+        # move price up by the daily percentage of BV over the elapsed time, capped at book value - oracle buffer
+        sell_price = max(self.sell_nxm_price(), min(self.sell_nxm_price() +
+                                                    self.book_value() * self.params.ratchet_up_perc * days,
+                                                    self.book_value() * self.params.buffer_below))
+
+        # move liquidity up to target at daily percentage rate over the elapsed time, limit at target
+        if self.sell_liquidity_eth < self.sell_target_liq:
+            self.sell_liquidity_eth = min(self.sell_liquidity_eth +
+                                          self.sell_target_liq * self.params.liq_in_perc * days,
+                                          self.sell_target_liq)
+
+        # update NXM liquidity and invariant
+        self.sell_liquidity_nxm = self.sell_liquidity_eth / sell_price
+        self.sell_invariant = self.sell_liquidity_eth * self.sell_liquidity_nxm
+
+        # ABOVE BOOK
+        # move price down by the daily percentage of BV over the elapsed time, capped at book value + oracle buffer
+        buy_price = max(self.buy_nxm_price() - self.book_value() * self.params.ratchet_down_perc * days,
+                        self.book_value() * self.params.buffer_above)
+
+        # move liquidity down to target at daily percentage rate over the elapsed time, limit at target
+        if self.buy_liquidity_eth > self.buy_target_liq:
+            self.buy_liquidity_eth = max(self.buy_liquidity_eth -
+                                         self.buy_target_liq * self.params.liq_out_perc * days,
+                                         self.buy_target_liq)
+
+        # update NXM liquidity and invariant
+        self.buy_liquidity_nxm = self.buy_liquidity_eth / buy_price
+        self.buy_invariant = self.buy_liquidity_eth * self.buy_liquidity_nxm
+
+    # bring the pools forward to a time in seconds from the start of the projection
+    def advance_to(self, timestamp):
+        if timestamp > self.timestamp:
+            self.elapse(timestamp - self.timestamp)
+            self.timestamp = timestamp
+
+    # EVENTS
+    # ratchet both pools towards book value
+    def ratchet_event(self):
+        # up for below BV/sell pool
+        self.sell_ratchet()
+        # down for above BV/buy pool
+        self.buy_ratchet()
+
+    # platform buy - not arbitrage-driven
+    def platform_buy_event(self):
+        # with wNXM in place, don't do buys if buy price is above wNXM price
+        # assume someone would buy wNXM on open market instead
+        # need wnxm supply to exist
+        if round(self.buy_nxm_price(), 8) > round(self.wnxm_price, 8) and \
+            self.wnxm_supply > 0:
+            self.wnxm_market_buy(n_wnxm=self.nxm_buy_size(), remove=False)
+        else:
+            self.platform_nxm_buy(n_nxm=self.nxm_buy_size())
+
+    # platform sale - not arbitrage-driven
+    def platform_sale_event(self):
+        # with wNXM in place, don't do sells if wNXM price is above platform
+        # assume someone would sell wNXM on open market instead
+        if round(self.sell_nxm_price(), 8) < round(self.wnxm_price, 8):
+            self.wnxm_market_sell(n_wnxm=self.nxm_sale_size(), create=False)
+        else:
+            self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+
+    # number of each event per day the schedule is generated from
+    def schedule_counts(self):
+        # the continuous clock brings the pools forward to each event instead of scheduling ratchets
+        counts = {RATCHET: self.params.ratchets_per_day} if self.clock == 'discrete' else {}
+        counts.update({WNXM_SHIFT: self.params.wnxm_shifts_per_day,
+                       PLATFORM_BUY: self.base_daily_platform_buys,
+                       PLATFORM_SALE: self.base_daily_platform_sales})
+        return counts
+
+    # generate the event schedule for the whole projection, shuffled within each day
+    def event_schedule(self):
+        if self.schedule is None:
+            self.schedule = EventSchedule.build(counts=self.schedule_counts(),
+                                                days=self.params.model_days,
+                                                rng=self.streams.shuffle,
+                                                timed=self.clock == 'continuous')
+        return self.schedule
+
+    # add extra days of base entries and exits when extending a run - none here, set in subclasses
+    def extend_arrivals(self, extra_days):
+        self.base_daily_platform_buys = np.concatenate((self.base_daily_platform_buys,
+                                                        np.zeros(extra_days, dtype=int)))
+        self.base_daily_platform_sales = np.concatenate((self.base_daily_platform_sales,
+                                                         np.zeros(extra_days, dtype=int)))
+
     # create DAY LOOP
     def one_day_passes(self):
-        # create list of events and shuffle it
-        events_today = []
-        events_today.extend(['ratchet'] * model_params.ratchets_per_day)
-        events_today.extend(['wnxm_shift'] * model_params.wnxm_shifts_per_day)
-        events_today.extend(['platform_buy'] * self.base_daily_platform_buys[self.current_day])
-        events_today.extend(['platform_sale'] * self.base_daily_platform_sales[self.current_day])
-        shuffle(events_today)
+        # today's events from the precompiled schedule
+        events_today = self.event_schedule().day(self.current_day).tolist()
+        # and their timestamps on the continuous clock
+        if self.clock == 'continuous':
+            times_today = self.schedule.day_times(self.current_day).tolist()
+        else:
+            times_today = [None] * len(events_today)
 
         # LOOP THROUGH EVENTS OF DAY
-        for event in events_today:
+        for event, timestamp in zip(events_today, times_today):
+
+            # bring the pools forward to the time of the event
+            if self.clock == 'continuous':
+                self.advance_to(timestamp)
 
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print pre-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - pre-arbitrage:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - pre-arbitrage:
                         sell_nxm_price = {self.sell_nxm_price()}, buy_nxm_price = {self.buy_nxm_price()}
                         book_value = {self.book_value()},
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
@@ -325,72 +504,30 @@ class RAMMMarkets:
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-arbitrage:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-arbitrage:
                         sell_nxm_price = {self.sell_nxm_price()}, buy_nxm_price = {self.buy_nxm_price()}
                         book_value = {self.book_value()},
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
                 ''')
 
-            #-----RATCHET-----#
-            if event == 'ratchet':
-                # up for below BV/sell pool
-                self.sell_ratchet()
-                # down for above BV/buy pool
-                self.buy_ratchet()
-
-            #-----WNXM SHIFT-----#
-            if event == 'wnxm_shift':
-                self.wnxm_shift()
-
-            #-----PLATFORM BUY-----#
-            # not arbitrage-driven
-            if event == 'platform_buy':
-                # with wNXM in place, don't do buys if buy price is above wNXM price
-                # assume someone would buy wNXM on open market instead
-                # need wnxm supply to exist
-                if round(self.buy_nxm_price(), 8) > round(self.wnxm_price, 8) and \
-                    self.wnxm_supply > 0:
-                    self.wnxm_market_buy(n_wnxm=self.nxm_buy_size(), remove=False)
-                else:
-                    self.platform_nxm_buy(n_nxm=self.nxm_buy_size())
-
-            #-----PLATFORM SALE-----#
-            # not arbitrage-driven
-            if event == 'platform_sale':
-                # with wNXM in place, don't do sells if wNXM price is above platform
-                # assume someone would sell wNXM on open market instead
-                if round(self.sell_nxm_price(), 8) < round(self.wnxm_price, 8):
-                    self.wnxm_market_sell(n_wnxm=self.nxm_sale_size(), create=False)
-                else:
-                    self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+            #-----EVENT-----#
+            self.event_handlers[event]()
 
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-event:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-event:
                         sell_nxm_price = {self.sell_nxm_price()}, buy_nxm_price = {self.buy_nxm_price()}
                         book_value = {self.book_value()},
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
                 ''')
 
-        # append values to tracking metrics
-        self.cap_pool_prediction.append(self.cap_pool)
-        self.sell_nxm_price_prediction.append(self.sell_nxm_price())
-        self.buy_nxm_price_prediction.append(self.buy_nxm_price())
-        self.wnxm_price_prediction.append(self.wnxm_price)
-        self.nxm_supply_prediction.append(self.nxm_supply)
-        self.wnxm_supply_prediction.append(self.wnxm_supply)
-        self.book_value_prediction.append(self.book_value())
-        self.sell_liquidity_nxm_prediction.append(self.sell_liquidity_nxm)
-        self.sell_liquidity_eth_prediction.append(self.sell_liquidity_eth)
-        self.buy_liquidity_nxm_prediction.append(self.buy_liquidity_nxm)
-        self.buy_liquidity_eth_prediction.append(self.buy_liquidity_eth)
-        self.eth_sold_prediction.append(self.eth_sold)
-        self.eth_acquired_prediction.append(self.eth_acquired)
-        self.nxm_burned_prediction.append(self.nxm_burned)
-        self.nxm_minted_prediction.append(self.nxm_minted)
-        self.wnxm_removed_prediction.append(self.wnxm_removed)
-        self.wnxm_created_prediction.append(self.wnxm_created)
+        # bring the pools forward to the end of the day
+        if self.clock == 'continuous':
+            self.advance_to((self.current_day + 1) * SECONDS_PER_DAY)
+
+        # record values in tracking trajectory
+        self.trajectory.record(self)
 
         # increment day
         self.current_day += 1
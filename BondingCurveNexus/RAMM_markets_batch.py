@@ -0,0 +1,522 @@
+'''
+Define a batch version of the stochastic RAMM markets model.
+Instead of simulating one path at a time with scalar attributes, every piece of
+pool state is held as a NumPy array of shape (n_paths,) and all paths are stepped
+through each day together.
+
+The mechanics are the same as RAMMMarkets/RAMMMarketsStoch:
+ - Price decreases upon sells and increases upon buys from the system
+ - Ratchet mechanism operates to bring the price towards book value from below and above for the two pools
+ - Liquidity mechanism to bring the pool liquidity towards a target liquidity
+ - wNXM-NXM arbitrage happens in between all events
+
+ The arb_mode parameter matches RAMMMarkets:
+  - 'analytic' (default) solves for the exact trade size on every arbitraging path at once (see arbitrage.py)
+  - 'chunked' trades randomly-sized lots until prices cross
+
+ The engine parameter sets how the day's events are applied:
+  - 'numpy' (default) lays out the events of every path in a (n_paths, n_slots) array of event codes,
+    padded with no-op events for paths with fewer events and shuffled independently per path.
+    Each slot is then applied as masked array operations across all paths.
+  - 'numba' draws the day's random numbers up front and shuffles and walks every path through its own events
+    in the compiled kernel of RAMM_markets_batch_kernel (analytic arbitrage only).
+    If numba isn't installed the kernel runs as plain python.
+ Both engines give the same distributions, but not the same paths for a seed, as they draw in a different order.
+
+ Tracking metrics are arrays of shape (days run + 1, n_paths), so that
+ sim.cap_pool_prediction[-1] gives the final capital pool of every path.
+'''
+
+import numpy as np
+
+from BondingCurveNexus import RAMM_markets_batch_kernel as kernel
+from BondingCurveNexus.arbitrage import arb_sale_size, arb_buy_size, wnxm_price_after
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.trajectory import Trajectory, TrajectoryViews
+from BondingCurveNexus.schedule import NO_EVENT, RATCHET, WNXM_SHIFT, PLATFORM_BUY, PLATFORM_SALE
+
+class RAMMMarketsBatch(TrajectoryViews):
+
+    def __init__(self, n_paths, seed=None, params=None, arb_mode='analytic', engine='numpy'):
+        # set simulation parameters - defaults to the current sys_params & model_params values
+        self.params = params if params is not None else SimParams.from_modules()
+        # number of paths simulated at once and random generator used for all draws
+        # the seed is drawn from fresh OS entropy if not given and kept so that the batch can be replayed
+        self.n_paths = n_paths
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self.rng = np.random.default_rng(self.seed)
+        # set arbitrage mode - 'analytic' or 'chunked'
+        self.arb_mode = arb_mode
+        # set day loop engine - 'numpy' or 'numba'
+        if engine == 'numba' and arb_mode != 'analytic':
+            raise ValueError("engine='numba' only supports arb_mode='analytic'")
+        self.engine = engine
+
+        # OPENING STATE of system upon initializing a projection instance
+        # start at day 0
+        self.current_day = 0
+        # set current state of system
+        self.act_cover = np.full(n_paths, self.params.act_cover_now, dtype=float)
+        self.cap_pool = np.full(n_paths, self.params.cap_pool_now, dtype=float)
+        self.nxm_supply = np.full(n_paths, self.params.nxm_supply_now, dtype=float)
+        self.wnxm_supply = np.full(n_paths, self.params.wnxm_supply_now, dtype=float)
+        self.wnxm_price = np.full(n_paths, self.params.wnxm_price_now, dtype=float)
+
+        # set ETH value for wNXM price shift as a result of 1 ETH of buy/sell
+        self.wnxm_move_size = self.params.wnxm_move_size
+
+        # OPENING STATE of RAMM pools
+
+        # BELOW BOOK
+        self.sell_liquidity_eth = np.full(n_paths, self.params.open_liq_sell, dtype=float)
+        self.sell_liquidity_nxm = self.sell_liquidity_eth / self.wnxm_price
+        self.sell_invariant = self.sell_liquidity_eth * self.sell_liquidity_nxm
+        self.sell_target_liq = self.params.target_liq_sell
+
+        # ABOVE BOOK
+        self.buy_liquidity_eth = np.full(n_paths, self.params.open_liq_buy, dtype=float)
+        self.buy_liquidity_nxm = self.buy_liquidity_eth /\
+                                (self.book_value() * self.params.buffer_above)
+        self.buy_invariant = self.buy_liquidity_eth * self.buy_liquidity_nxm
+        self.buy_target_liq = self.params.target_liq_buy
+
+        # base entries and exits using a poisson distribution, one row per path
+        self.base_daily_platform_buys = self.rng.poisson(lam=self.params.lambda_entries,
+                                                         size=(n_paths, self.params.model_days))
+        self.base_daily_platform_sales = self.rng.poisson(lam=self.params.lambda_exits,
+                                                          size=(n_paths, self.params.model_days))
+
+        # initiate and set cumulative counters to zero
+        self.eth_sold = np.zeros(n_paths)
+        self.eth_acquired = np.zeros(n_paths)
+        self.nxm_burned = np.zeros(n_paths)
+        self.nxm_minted = np.zeros(n_paths)
+        self.wnxm_removed = np.zeros(n_paths)
+        self.wnxm_created = np.zeros(n_paths)
+
+        # preallocate tracking trajectory for all paths and record opening state
+        self.trajectory = Trajectory(metrics=['cap_pool', 'sell_nxm_price', 'buy_nxm_price', 'wnxm_price',
+                                              'nxm_supply', 'wnxm_supply', 'book_value',
+                                              'sell_liquidity_nxm', 'sell_liquidity_eth',
+                                              'buy_liquidity_nxm', 'buy_liquidity_eth',
+                                              'eth_sold', 'eth_acquired', 'nxm_burned', 'nxm_minted',
+                                              'wnxm_removed', 'wnxm_created'],
+                                     length=self.params.model_days + 1, width=n_paths)
+        self.trajectory.record(self)
+
+    # INSTANCE FUNCTIONS
+    # all act on the paths in an index array, metrics default to every path
+
+    # calculate book value from current assets & nxm supply.
+    def book_value(self, idx=slice(None)):
+        supply = self.nxm_supply[idx]
+        return np.divide(self.cap_pool[idx], supply,
+                         out=np.zeros(supply.shape), where=supply != 0)
+
+    # calculate nxm price for sells in ETH from virtual RAMM pool
+    def sell_nxm_price(self, idx=slice(None)):
+        return self.sell_liquidity_eth[idx] / self.sell_liquidity_nxm[idx]
+
+    # calculate nxm price for buys in ETH from virtual RAMM pool
+    def buy_nxm_price(self, idx=slice(None)):
+        return self.buy_liquidity_eth[idx] / self.buy_liquidity_nxm[idx]
+
+    # lognormal sizing of buys/sells in NXM, same parameterisation as scipy's lognorm
+    def nxm_sale_size(self, idx):
+        eth = self.params.exit_loc + self.rng.lognormal(mean=np.log(self.params.exit_scale),
+                                                         sigma=self.params.exit_shape,
+                                                         size=len(idx))
+        return eth / self.sell_nxm_price(idx)
+
+    def nxm_buy_size(self, idx):
+        eth = self.params.entry_loc + self.rng.lognormal(mean=np.log(self.params.entry_scale),
+                                                          sigma=self.params.entry_shape,
+                                                          size=len(idx))
+        return eth / self.buy_nxm_price(idx)
+
+    # platform sale of n_nxm NXM on the paths in idx
+    def platform_nxm_sale(self, idx, n_nxm):
+
+        # limit number to total NXM
+        n_nxm = np.minimum(n_nxm, self.nxm_supply[idx])
+
+        # add sold NXM to pool
+        self.sell_liquidity_nxm[idx] += n_nxm
+        self.nxm_supply[idx] -= n_nxm
+
+        # establish new value of eth in pool
+        new_eth = self.sell_invariant[idx] / self.sell_liquidity_nxm[idx]
+        delta_eth = self.sell_liquidity_eth[idx] - new_eth
+
+        # add ETH removed and nxm burned to cumulative total, update capital pool
+        self.eth_sold[idx] += delta_eth
+        self.cap_pool[idx] -= delta_eth
+        self.nxm_burned[idx] += n_nxm
+
+        # update ETH liquidity & invariant
+        self.sell_liquidity_eth[idx] = new_eth
+        self.sell_invariant[idx] = new_eth * self.sell_liquidity_nxm[idx]
+
+    # platform buy of n_nxm NXM on the paths in idx
+    def platform_nxm_buy(self, idx, n_nxm):
+
+        # assume noone buys NXM above a multiple of book
+        buying = self.buy_nxm_price(idx) <= self.book_value(idx) * self.params.nxm_book_value_multiple
+        idx, n_nxm = idx[buying], n_nxm[buying]
+
+        # limit number of single buy to 50% of NXM liquidity to avoid silly results
+        n_nxm = np.minimum(n_nxm, 0.5 * self.buy_liquidity_nxm[idx])
+
+        # remove bought NXM from pool and add actual mint to supply
+        self.buy_liquidity_nxm[idx] -= n_nxm
+        self.nxm_supply[idx] += n_nxm
+
+        # establish new value of eth in pool
+        new_eth = self.buy_invariant[idx] / self.buy_liquidity_nxm[idx]
+        delta_eth = new_eth - self.buy_liquidity_eth[idx]
+
+        # add ETH acquired and nxm minted to cumulative total, update capital pool
+        self.eth_acquired[idx] += delta_eth
+        self.cap_pool[idx] += delta_eth
+        self.nxm_minted[idx] += n_nxm
+
+        # update ETH liquidity
+        self.buy_liquidity_eth[idx] = new_eth
+
+    # WNXM MARKET FUNCTIONS
+    def wnxm_market_buy(self, idx, n_wnxm, remove=True):
+        # limit number of wnxm bought to total supply
+        n_wnxm = np.minimum(n_wnxm, self.wnxm_supply[idx])
+
+        # crude calc for ETH amount (assuming whole buy happens on opening price)
+        # and increase price depending on defined liquidity parameters
+        self.wnxm_price[idx] += n_wnxm * self.wnxm_price[idx] * self.wnxm_move_size
+
+        # if used for arb, remove from supply
+        if remove:
+            self.wnxm_supply[idx] -= n_wnxm
+            self.wnxm_removed[idx] += n_wnxm
+
+    def wnxm_market_sell(self, idx, n_wnxm, create=True):
+        # limit number of wnxm sold to total supply unless new wnxm is created
+        if not create:
+            n_wnxm = np.minimum(n_wnxm, self.wnxm_supply[idx])
+
+        # crude calc for ETH amount (assuming whole sell happens on opening price)
+        # and decrease price depending on defined liquidity parameters
+        self.wnxm_price[idx] -= n_wnxm * self.wnxm_price[idx] * self.wnxm_move_size
+
+        # if used for arb, add to supply (& limit by nxm supply)
+        if create:
+            old_supply = self.wnxm_supply[idx]
+            self.wnxm_supply[idx] = np.minimum(old_supply + n_wnxm, self.nxm_supply[idx])
+            self.wnxm_created[idx] += self.wnxm_supply[idx] - old_supply
+
+    # percentage change in wNXM price using a normal distribution
+    def wnxm_shift(self, idx):
+        self.wnxm_price[idx] *= (1 + self.rng.normal(loc=self.params.wnxm_drift,
+                                                     scale=self.params.wnxm_diffusion,
+                                                     size=len(idx)))
+
+    # WNXM-NXM ARBITRAGE
+    # analytic arbitrage sizes the trade of every arbitraging path in one array operation.
+    # In chunked mode, chunks are applied as array operations while many paths are arbitraging.
+    # The last few paths with large price gaps can need hundreds of chunks,
+    # so once fewer than tail_paths are left they are finished one path at a time
+    tail_paths = 64
+    arb_sale_state = ['wnxm_price', 'wnxm_supply', 'nxm_supply',
+                      'sell_liquidity_eth', 'sell_liquidity_nxm', 'sell_invariant',
+                      'cap_pool', 'eth_sold', 'nxm_burned', 'wnxm_removed']
+    arb_buy_state = ['wnxm_price', 'wnxm_supply', 'nxm_supply',
+                     'buy_liquidity_eth', 'buy_liquidity_nxm', 'buy_invariant',
+                     'cap_pool', 'eth_acquired', 'nxm_minted', 'wnxm_created']
+
+    # active is a boolean mask of the paths taking part
+    def arbitrage(self, active):
+        if self.arb_mode == 'chunked':
+            self.chunked_arb_sales(np.flatnonzero(active))
+            self.chunked_arb_buys(np.flatnonzero(active))
+        else:
+            self.analytic_arbitrage(active)
+
+    def chunked_arb_sales(self, active):
+        # system price > wnxm_price arb
+            # platform sale price has to be higher than wnxm price for arbitrage
+            # nxm supply and wnxm supply have to be greater than zero
+        idx = active[(self.sell_nxm_price(active) > self.wnxm_price[active]) &
+                     (self.nxm_supply[active] > 0) & (self.wnxm_supply[active] > 0)]
+        while len(idx) > self.tail_paths:
+            num = np.minimum(np.minimum(self.nxm_sale_size(idx), self.wnxm_supply[idx]),
+                             self.nxm_supply[idx])
+            self.wnxm_market_buy(idx, num, remove=True)
+            self.platform_nxm_sale(idx, num)
+            idx = idx[(self.sell_nxm_price(idx) > self.wnxm_price[idx]) &
+                      (self.nxm_supply[idx] > 0) & (self.wnxm_supply[idx] > 0)]
+        for i in idx:
+            self.path_arb_sales(i)
+
+    def chunked_arb_buys(self, active):
+        # system price < wnxm_price arb
+            # platform price has to be lower than wnxm price for arbitrage
+            # nxm supply has to be greater than zero
+        idx = active[(self.buy_nxm_price(active) < self.wnxm_price[active]) & (self.nxm_supply[active] > 0)]
+        while len(idx) > self.tail_paths:
+            num = np.minimum(self.nxm_buy_size(idx), self.buy_liquidity_nxm[idx] * 0.5)
+            self.platform_nxm_buy(idx, num)
+            self.wnxm_market_sell(idx, num, create=True)
+            idx = idx[(self.buy_nxm_price(idx) < self.wnxm_price[idx]) & (self.nxm_supply[idx] > 0)]
+        for i in idx:
+            self.path_arb_buys(i)
+
+    def analytic_arbitrage(self, active):
+        # system price > wnxm_price arb
+            # solve for the NXM sale that brings the platform sale price down to the wnxm price on every path
+            # limit to nxm supply and wnxm supply
+        # conditions are taken on whole arrays, cheaper than gathering the active paths first
+        idx = np.flatnonzero(active & (self.sell_nxm_price() > self.wnxm_price) &
+                             (self.nxm_supply > 0) & (self.wnxm_supply > 0))
+        if len(idx):
+            num = np.minimum(np.minimum(arb_sale_size(self.sell_liquidity_eth[idx], self.sell_liquidity_nxm[idx],
+                                                      self.wnxm_price[idx], self.wnxm_move_size),
+                                        self.wnxm_supply[idx]),
+                             self.nxm_supply[idx])
+            # buy from open market with the price impact compounded over the whole trade
+            self.wnxm_price[idx] = wnxm_price_after(self.wnxm_price[idx], num, self.wnxm_move_size)
+            self.wnxm_supply[idx] -= num
+            self.wnxm_removed[idx] += num
+            # sell to platform
+            self.platform_nxm_sale(idx, num)
+
+        # system price < wnxm_price arb
+            # no closed form on paths where noone buys from the platform, so those fall back to the chunked loop
+        idx = np.flatnonzero(active & (self.buy_nxm_price() < self.wnxm_price) & (self.nxm_supply > 0))
+        if len(idx):
+            buying = self.buy_nxm_price(idx) <= self.book_value(idx) * self.params.nxm_book_value_multiple
+            if not buying.all():
+                self.chunked_arb_buys(idx[~buying])
+                idx = idx[buying]
+            # solve for the NXM buy that brings the platform buy price up to the wnxm price
+            num = arb_buy_size(self.buy_liquidity_eth[idx], self.buy_liquidity_nxm[idx],
+                               self.wnxm_price[idx], self.wnxm_move_size)
+            # buy from platform
+            self.buy_liquidity_nxm[idx] -= num
+            self.nxm_supply[idx] += num
+            new_eth = self.buy_invariant[idx] / self.buy_liquidity_nxm[idx]
+            self.eth_acquired[idx] += new_eth - self.buy_liquidity_eth[idx]
+            self.cap_pool[idx] += new_eth - self.buy_liquidity_eth[idx]
+            self.nxm_minted[idx] += num
+            self.buy_liquidity_eth[idx] = new_eth
+            # sell to open market with the price impact compounded over the whole trade
+            # and add to wnxm supply (limited by nxm supply)
+            self.wnxm_price[idx] = wnxm_price_after(self.wnxm_price[idx], -num, self.wnxm_move_size)
+            old_supply = self.wnxm_supply[idx]
+            self.wnxm_supply[idx] = np.minimum(old_supply + num, self.nxm_supply[idx])
+            self.wnxm_created[idx] += self.wnxm_supply[idx] - old_supply
+
+    # draw a block of lognormal ETH sizes for the single-path arbitrage loops
+    def eth_size_block(self, shape, loc, scale):
+        return (loc + self.rng.lognormal(mean=np.log(scale), sigma=shape, size=64)).tolist()
+
+    def path_arb_sales(self, i):
+        # same chunked sale arbitrage as above, on python floats for path i
+        wnxm_price, wnxm_supply, nxm_supply, liq_eth, liq_nxm, invariant, cap_pool, eth_sold, nxm_burned, wnxm_removed =\
+            [float(getattr(self, name)[i]) for name in self.arb_sale_state]
+        sizes = []
+
+        while liq_eth / liq_nxm > wnxm_price and nxm_supply > 0 and wnxm_supply > 0:
+            if not sizes:
+                sizes = self.eth_size_block(self.params.exit_shape, self.params.exit_loc, self.params.exit_scale)
+            num = min(sizes.pop() * liq_nxm / liq_eth, wnxm_supply, nxm_supply)
+            # buy from open market
+            wnxm_price += num * wnxm_price * self.wnxm_move_size
+            wnxm_supply -= num
+            wnxm_removed += num
+            # sell to platform
+            liq_nxm += num
+            nxm_supply -= num
+            new_eth = invariant / liq_nxm
+            eth_sold += liq_eth - new_eth
+            cap_pool -= liq_eth - new_eth
+            nxm_burned += num
+            liq_eth = new_eth
+            invariant = liq_eth * liq_nxm
+
+        for name, value in zip(self.arb_sale_state, [wnxm_price, wnxm_supply, nxm_supply, liq_eth, liq_nxm, invariant,
+                                                     cap_pool, eth_sold, nxm_burned, wnxm_removed]):
+            getattr(self, name)[i] = value
+
+    def path_arb_buys(self, i):
+        # same chunked buy arbitrage as above, on python floats for path i
+        wnxm_price, wnxm_supply, nxm_supply, liq_eth, liq_nxm, invariant, cap_pool, eth_acquired, nxm_minted, wnxm_created =\
+            [float(getattr(self, name)[i]) for name in self.arb_buy_state]
+        sizes = []
+
+        while liq_eth / liq_nxm < wnxm_price and nxm_supply > 0:
+            if not sizes:
+                sizes = self.eth_size_block(self.params.entry_shape, self.params.entry_loc, self.params.entry_scale)
+            num = min(sizes.pop() * liq_nxm / liq_eth, liq_nxm * 0.5)
+            # buy from platform, unless the price is above a multiple of book
+            if liq_eth / liq_nxm <= cap_pool / nxm_supply * self.params.nxm_book_value_multiple:
+                liq_nxm -= num
+                nxm_supply += num
+                new_eth = invariant / liq_nxm
+                eth_acquired += new_eth - liq_eth
+                cap_pool += new_eth - liq_eth
+                nxm_minted += num
+                liq_eth = new_eth
+            # sell to open market, creating wnxm (limited by nxm supply)
+            wnxm_price -= num * wnxm_price * self.wnxm_move_size
+            old_supply = wnxm_supply
+            wnxm_supply = min(wnxm_supply + num, nxm_supply)
+            wnxm_created += wnxm_supply - old_supply
+
+        for name, value in zip(self.arb_buy_state, [wnxm_price, wnxm_supply, nxm_supply, liq_eth, liq_nxm, invariant,
+                                                    cap_pool, eth_acquired, nxm_minted, wnxm_created]):
+            getattr(self, name)[i] = value
+
+    # RATCHET & LIQUIDITY FUNCTIONS
+    def buy_ratchet(self, idx):
+        '''
+        Ratchet price downwards and remove liquidity for the above BV/buy pool on the paths in idx.
+        '''
+        book_value = self.book_value(idx)
+        price_movement = book_value * self.params.ratchet_down_step
+        target_price = np.maximum(self.buy_nxm_price(idx) - price_movement,
+                                  book_value * self.params.buffer_above)
+
+        liq = self.buy_liquidity_eth[idx]
+        liq = np.where(liq > self.buy_target_liq,
+                       np.maximum(liq - self.buy_target_liq * self.params.liq_out_step,
+                                  self.buy_target_liq),
+                       liq)
+
+        self.buy_liquidity_eth[idx] = liq
+        self.buy_liquidity_nxm[idx] = liq / target_price
+        self.buy_invariant[idx] = liq * self.buy_liquidity_nxm[idx]
+
+    def sell_ratchet(self, idx):
+        '''
+        Ratchet price upwards and add liquidity for the below BV/sell pool on the paths in idx.
+        '''
+        book_value = self.book_value(idx)
+        sell_price = self.sell_nxm_price(idx)
+        price_movement = book_value * self.params.ratchet_up_step
+        target_price = np.maximum(sell_price, np.minimum(sell_price + price_movement,
+                                  book_value * self.params.buffer_below))
+
+        liq = self.sell_liquidity_eth[idx]
+        liq = np.where(liq < self.sell_target_liq,
+                       np.minimum(liq + self.sell_target_liq * self.params.liq_in_step,
+                                  self.sell_target_liq),
+                       liq)
+
+        self.sell_liquidity_eth[idx] = liq
+        self.sell_liquidity_nxm[idx] = liq / target_price
+        self.sell_invariant[idx] = liq * self.sell_liquidity_nxm[idx]
+
+    # build the shuffled (n_paths, n_slots) array of event codes for the current day
+    def events_today(self):
+        ratchets = self.params.ratchets_per_day
+        shifts = ratchets + self.params.wnxm_shifts_per_day
+        buys = shifts + self.base_daily_platform_buys[:, self.current_day]
+        events = buys + self.base_daily_platform_sales[:, self.current_day]
+
+        slots = np.arange(events.max())
+        codes = np.full((self.n_paths, len(slots)), NO_EVENT, dtype=np.int64)
+        codes[:, :ratchets] = RATCHET
+        codes[:, ratchets:shifts] = WNXM_SHIFT
+        codes[(slots >= shifts) & (slots < buys[:, None])] = PLATFORM_BUY
+        codes[(slots >= buys[:, None]) & (slots < events[:, None])] = PLATFORM_SALE
+
+        # shuffle each row independently by sorting random keys with the event code in their lowest 3 bits
+        # the no-op padding is shuffled in too, which leaves the order of each path's own events uniformly random
+        keys = self.rng.integers(1 << 59, size=codes.shape) << 3 | codes
+        keys.sort(axis=1)
+        return (keys & 7).astype(np.int8)
+
+    # COMPILED ENGINE
+    # constant vector of the kernel
+    def kernel_constants(self):
+        return np.array([self.wnxm_move_size, self.sell_target_liq, self.buy_target_liq,
+                         self.params.ratchet_up_step, self.params.ratchet_down_step,
+                         self.params.buffer_above, self.params.buffer_below,
+                         self.params.liq_in_step, self.params.liq_out_step,
+                         self.params.nxm_book_value_multiple], dtype=float)
+
+    # run one day in the compiled kernel, reading and writing back the state arrays
+    # the day's random draws are made here, path after path: a shuffle key for every event,
+    # the ETH size of every platform buy and sale and the factor of every wNXM shift
+    def kernel_day_passes(self):
+        ratchets = self.params.ratchets_per_day
+        shifts = self.params.wnxm_shifts_per_day
+        buys = self.base_daily_platform_buys[:, self.current_day]
+        sales = self.base_daily_platform_sales[:, self.current_day]
+        keys = self.rng.random(self.n_paths * (ratchets + shifts) + buys.sum() + sales.sum())
+        buy_eth = self.params.entry_loc + self.rng.lognormal(mean=np.log(self.params.entry_scale),
+                                                             sigma=self.params.entry_shape, size=buys.sum())
+        sale_eth = self.params.exit_loc + self.rng.lognormal(mean=np.log(self.params.exit_scale),
+                                                             sigma=self.params.exit_shape, size=sales.sum())
+        wnxm_shifts = 1 + self.rng.normal(loc=self.params.wnxm_drift, scale=self.params.wnxm_diffusion,
+                                          size=self.n_paths * shifts)
+
+        state = np.column_stack([getattr(self, name) for name in kernel.STATE_ATTRIBUTES])
+        kernel.step_day(state, self.kernel_constants(), ratchets, shifts, np.ascontiguousarray(buys),
+                        np.ascontiguousarray(sales), keys, buy_eth, sale_eth, wnxm_shifts)
+        for column, name in enumerate(kernel.STATE_ATTRIBUTES):
+            getattr(self, name)[:] = state[:, column]
+
+        # increment day and record values in tracking trajectory
+        self.current_day += 1
+        self.trajectory.record(self)
+
+    # create DAY LOOP
+    def one_day_passes(self):
+        # run the whole day in the compiled kernel if selected
+        if self.engine == 'numba':
+            self.kernel_day_passes()
+            return
+
+        codes = self.events_today()
+
+        # LOOP THROUGH EVENT SLOTS OF DAY
+        for slot in codes.T:
+
+            #-----WNXM ARBITRAGE-----#
+            # happens in between all events
+            self.arbitrage(slot != NO_EVENT)
+
+            #-----RATCHET-----#
+            idx = np.flatnonzero(slot == RATCHET)
+            if len(idx):
+                self.sell_ratchet(idx)
+                self.buy_ratchet(idx)
+
+            #-----WNXM SHIFT-----#
+            idx = np.flatnonzero(slot == WNXM_SHIFT)
+            if len(idx):
+                self.wnxm_shift(idx)
+
+            #-----PLATFORM BUY-----#
+            # with wNXM in place, don't do buys if buy price is above wNXM price
+            # assume someone would buy wNXM on open market instead
+            idx = np.flatnonzero(slot == PLATFORM_BUY)
+            if len(idx):
+                to_market = (np.round(self.buy_nxm_price(idx), 8) > np.round(self.wnxm_price[idx], 8)) &\
+                            (self.wnxm_supply[idx] > 0)
+                market_idx, platform_idx = idx[to_market], idx[~to_market]
+                self.wnxm_market_buy(market_idx, self.nxm_buy_size(market_idx), remove=False)
+                self.platform_nxm_buy(platform_idx, self.nxm_buy_size(platform_idx))
+
+            #-----PLATFORM SALE-----#
+            # with wNXM in place, don't do sells if wNXM price is above platform
+            # assume someone would sell wNXM on open market instead
+            idx = np.flatnonzero(slot == PLATFORM_SALE)
+            if len(idx):
+                to_market = np.round(self.sell_nxm_price(idx), 8) < np.round(self.wnxm_price[idx], 8)
+                market_idx, platform_idx = idx[to_market], idx[~to_market]
+                self.wnxm_market_sell(market_idx, self.nxm_sale_size(market_idx), create=False)
+                self.platform_nxm_sale(platform_idx, self.nxm_sale_size(platform_idx))
+
+        # increment day and record values in tracking trajectory
+        self.current_day += 1
+        self.trajectory.record(self)
@@ -0,0 +1,253 @@
+'''
+Compiled day loop for the batch RAMM markets engine (RAMMMarketsBatch with engine='numba').
+
+The state of every path is packed into a (n_paths, n_state) float64 array (columns indexed by the constants below)
+and the parameters it depends on into a constant vector. step_day then shuffles each path's events of the day
+and walks the path through them inside one @njit function,
+instead of applying every event slot as array operations across all paths.
+
+All random draws are made by RAMMMarketsBatch in NumPy before the kernel runs - a uniform shuffle key per event,
+the ETH size of every platform buy and sale and the factor of every wNXM shift - so the kernel itself is deterministic.
+
+The functions mirror the RAMMMarketsBatch methods for a single path.
+Arbitrage is the analytic mode: the Lambert W solution of arbitrage.py.
+Where noone buys from the platform (buy price above nxm_book_value_multiple * book value) there is no closed form
+for the platform trade and the NumPy engine falls back to random chunked lots; the kernel instead sells wNXM
+on the open market until its price meets the platform buy price, with the price impact compounded over the trade.
+
+If numba isn't installed the same functions run as plain Python.
+'''
+
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    # run the kernel as plain python if numba isn't installed
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+from BondingCurveNexus.schedule import RATCHET, WNXM_SHIFT, PLATFORM_BUY, PLATFORM_SALE
+
+# STATE ARRAY - batch attributes in the order of the columns
+STATE_ATTRIBUTES = ['cap_pool', 'nxm_supply', 'wnxm_supply', 'wnxm_price',
+                    'sell_liquidity_eth', 'sell_liquidity_nxm', 'sell_invariant',
+                    'buy_liquidity_eth', 'buy_liquidity_nxm', 'buy_invariant',
+                    'eth_sold', 'eth_acquired', 'nxm_burned', 'nxm_minted', 'wnxm_removed', 'wnxm_created']
+(CAP_POOL, NXM_SUPPLY, WNXM_SUPPLY, WNXM_PRICE, SELL_ETH, SELL_NXM, SELL_K, BUY_ETH, BUY_NXM, BUY_K,
+ ETH_SOLD, ETH_ACQUIRED, NXM_BURNED, NXM_MINTED, WNXM_REMOVED, WNXM_CREATED) = range(len(STATE_ATTRIBUTES))
+
+# CONSTANT VECTOR - batch attributes and parameters used by the state transition
+CONSTANT_NAMES = ['wnxm_move_size', 'sell_target_liq', 'buy_target_liq', 'ratchet_up_step', 'ratchet_down_step',
+                  'buffer_above', 'buffer_below', 'liq_in_step', 'liq_out_step', 'nxm_book_value_multiple']
+(WNXM_MOVE_SIZE, SELL_TARGET_LIQ, BUY_TARGET_LIQ, RATCHET_UP_STEP, RATCHET_DOWN_STEP, BUFFER_ABOVE, BUFFER_BELOW,
+ LIQ_IN_STEP, LIQ_OUT_STEP, NXM_BOOK_VALUE_MULTIPLE) = range(len(CONSTANT_NAMES))
+
+# np.round(x, 8) of the NumPy engine
+@njit(cache=True)
+def round_8(x):
+    return np.rint(x * 1e8) / 1e8
+
+# METRICS
+@njit(cache=True)
+def book_value(s):
+    if s[NXM_SUPPLY] == 0:
+        return 0.0
+    return s[CAP_POOL] / s[NXM_SUPPLY]
+
+@njit(cache=True)
+def sell_nxm_price(s):
+    return s[SELL_ETH] / s[SELL_NXM]
+
+@njit(cache=True)
+def buy_nxm_price(s):
+    return s[BUY_ETH] / s[BUY_NXM]
+
+# PLATFORM TRADES
+@njit(cache=True)
+def platform_nxm_sale(s, n_nxm):
+    n_nxm = min(n_nxm, s[NXM_SUPPLY])
+    s[SELL_NXM] += n_nxm
+    s[NXM_SUPPLY] -= n_nxm
+    new_eth = s[SELL_K] / s[SELL_NXM]
+    delta_eth = s[SELL_ETH] - new_eth
+    s[ETH_SOLD] += delta_eth
+    s[CAP_POOL] -= delta_eth
+    s[NXM_BURNED] += n_nxm
+    s[SELL_ETH] = new_eth
+    s[SELL_K] = new_eth * s[SELL_NXM]
+
+@njit(cache=True)
+def platform_nxm_buy(s, c, n_nxm):
+    # assume noone buys NXM above a multiple of book
+    if buy_nxm_price(s) > book_value(s) * c[NXM_BOOK_VALUE_MULTIPLE]:
+        return
+    n_nxm = min(n_nxm, 0.5 * s[BUY_NXM])
+    s[BUY_NXM] -= n_nxm
+    s[NXM_SUPPLY] += n_nxm
+    new_eth = s[BUY_K] / s[BUY_NXM]
+    delta_eth = new_eth - s[BUY_ETH]
+    s[ETH_ACQUIRED] += delta_eth
+    s[CAP_POOL] += delta_eth
+    s[NXM_MINTED] += n_nxm
+    s[BUY_ETH] = new_eth
+
+# WNXM MARKET TRADES
+@njit(cache=True)
+def wnxm_market_buy(s, c, n_wnxm, remove):
+    n_wnxm = min(n_wnxm, s[WNXM_SUPPLY])
+    s[WNXM_PRICE] += n_wnxm * s[WNXM_PRICE] * c[WNXM_MOVE_SIZE]
+    if remove:
+        s[WNXM_SUPPLY] -= n_wnxm
+        s[WNXM_REMOVED] += n_wnxm
+
+@njit(cache=True)
+def wnxm_market_sell(s, c, n_wnxm, create):
+    if not create:
+        n_wnxm = min(n_wnxm, s[WNXM_SUPPLY])
+    s[WNXM_PRICE] -= n_wnxm * s[WNXM_PRICE] * c[WNXM_MOVE_SIZE]
+    if create:
+        old_supply = s[WNXM_SUPPLY]
+        s[WNXM_SUPPLY] = min(s[WNXM_SUPPLY] + n_wnxm, s[NXM_SUPPLY])
+        s[WNXM_CREATED] += s[WNXM_SUPPLY] - old_supply
+
+# ARBITRAGE
+# principal branch of the Lambert W function for z >= 0, with the same start and Halley steps as arbitrage.py
+@njit(cache=True)
+def lambert_w(z):
+    if z > 3:
+        w = math.log(z) - math.log(math.log(z))
+    else:
+        w = math.log1p(z)
+    for i in range(3):
+        g = w - z * math.exp(-w)
+        w = w - g / ((w + 1) - (w + 2) * g / (2 * w + 2))
+    return w
+
+# NXM reserve at which the pool price equals the (moving) wNXM price - see arbitrage.py
+@njit(cache=True)
+def equilibrium_nxm_reserve(liq_eth, liq_nxm, wnxm_price, wnxm_move_size):
+    invariant = liq_eth * liq_nxm
+    if wnxm_move_size == 0:
+        return math.sqrt(invariant / wnxm_price)
+    z = wnxm_move_size / 2 * math.sqrt(invariant / wnxm_price) * math.exp(wnxm_move_size * liq_nxm / 2)
+    return 2 / wnxm_move_size * lambert_w(z)
+
+@njit(cache=True)
+def analytic_arbitrage(s, c):
+    move = c[WNXM_MOVE_SIZE]
+    if sell_nxm_price(s) > s[WNXM_PRICE] and s[NXM_SUPPLY] > 0 and s[WNXM_SUPPLY] > 0:
+        num = max(equilibrium_nxm_reserve(s[SELL_ETH], s[SELL_NXM], s[WNXM_PRICE], move) - s[SELL_NXM], 0.0)
+        num = min(num, s[WNXM_SUPPLY], s[NXM_SUPPLY])
+        s[WNXM_PRICE] *= math.exp(move * num)
+        s[WNXM_SUPPLY] -= num
+        s[WNXM_REMOVED] += num
+        platform_nxm_sale(s, num)
+
+    if buy_nxm_price(s) < s[WNXM_PRICE] and s[NXM_SUPPLY] > 0:
+        if buy_nxm_price(s) > book_value(s) * c[NXM_BOOK_VALUE_MULTIPLE]:
+            # noone buys from the platform, so only the wNXM sale moves the wNXM price down to the buy price
+            num = math.log(s[WNXM_PRICE] / buy_nxm_price(s)) / move if move > 0 else 0.0
+            s[WNXM_PRICE] *= math.exp(-move * num)
+        else:
+            num = max(s[BUY_NXM] - equilibrium_nxm_reserve(s[BUY_ETH], s[BUY_NXM], s[WNXM_PRICE], move), 0.0)
+            s[BUY_NXM] -= num
+            s[NXM_SUPPLY] += num
+            new_eth = s[BUY_K] / s[BUY_NXM]
+            s[ETH_ACQUIRED] += new_eth - s[BUY_ETH]
+            s[CAP_POOL] += new_eth - s[BUY_ETH]
+            s[NXM_MINTED] += num
+            s[BUY_ETH] = new_eth
+            s[WNXM_PRICE] *= math.exp(-move * num)
+        old_supply = s[WNXM_SUPPLY]
+        s[WNXM_SUPPLY] = min(s[WNXM_SUPPLY] + num, s[NXM_SUPPLY])
+        s[WNXM_CREATED] += s[WNXM_SUPPLY] - old_supply
+
+# RATCHETS
+@njit(cache=True)
+def buy_ratchet(s, c):
+    value = book_value(s)
+    target_price = max(buy_nxm_price(s) - value * c[RATCHET_DOWN_STEP], value * c[BUFFER_ABOVE])
+    liq = s[BUY_ETH]
+    if liq > c[BUY_TARGET_LIQ]:
+        liq = max(liq - c[BUY_TARGET_LIQ] * c[LIQ_OUT_STEP], c[BUY_TARGET_LIQ])
+    s[BUY_ETH] = liq
+    s[BUY_NXM] = liq / target_price
+    s[BUY_K] = liq * s[BUY_NXM]
+
+@njit(cache=True)
+def sell_ratchet(s, c):
+    value = book_value(s)
+    sell_price = sell_nxm_price(s)
+    target_price = max(sell_price, min(sell_price + value * c[RATCHET_UP_STEP], value * c[BUFFER_BELOW]))
+    liq = s[SELL_ETH]
+    if liq < c[SELL_TARGET_LIQ]:
+        liq = min(liq + c[SELL_TARGET_LIQ] * c[LIQ_IN_STEP], c[SELL_TARGET_LIQ])
+    s[SELL_ETH] = liq
+    s[SELL_NXM] = liq / target_price
+    s[SELL_K] = liq * s[SELL_NXM]
+
+# DAY LOOP
+# lay out one path's events of the day in code order, then shuffle them with a Fisher-Yates pass
+# drawing on the uniform keys from keys[key], one per event; returns the number of events
+@njit(cache=True)
+def shuffle_events(events, n_ratchets, n_shifts, n_buys, n_sales, keys, key):
+    n_events = n_ratchets + n_shifts + n_buys + n_sales
+    events[:n_ratchets] = RATCHET
+    events[n_ratchets:n_ratchets + n_shifts] = WNXM_SHIFT
+    events[n_ratchets + n_shifts:n_events - n_sales] = PLATFORM_BUY
+    events[n_events - n_sales:n_events] = PLATFORM_SALE
+    for i in range(n_events - 1, 0, -1):
+        j = int(keys[key + i] * (i + 1))
+        events[i], events[j] = events[j], events[i]
+    return n_events
+
+# apply one day of events to every path of the state array
+# buys and sales are each path's number of platform buys and sales of the day
+# keys (one per event), buy_eth and sale_eth (one per buy and sale) and wnxm_shifts (one per shift)
+# hold the day's random draws path after path
+@njit(cache=True)
+def step_day(state, c, n_ratchets, n_shifts, buys, sales, keys, buy_eth, sale_eth, wnxm_shifts):
+    events = np.empty(n_ratchets + n_shifts + buys.max() + sales.max(), dtype=np.int64)
+    key = buy = sale = shift = 0
+    for path in range(state.shape[0]):
+        s = state[path]
+        n_events = shuffle_events(events, n_ratchets, n_shifts, buys[path], sales[path], keys, key)
+        key += n_events
+
+        for event in events[:n_events]:
+            # wNXM arbitrage happens in between all events
+            analytic_arbitrage(s, c)
+
+            if event == RATCHET:
+                sell_ratchet(s, c)
+                buy_ratchet(s, c)
+
+            elif event == WNXM_SHIFT:
+                s[WNXM_PRICE] *= wnxm_shifts[shift]
+                shift += 1
+
+            # with wNXM in place, don't do buys if buy price is above wNXM price
+            elif event == PLATFORM_BUY:
+                n_nxm = buy_eth[buy] / buy_nxm_price(s)
+                buy += 1
+                if round_8(buy_nxm_price(s)) > round_8(s[WNXM_PRICE]) and s[WNXM_SUPPLY] > 0:
+                    wnxm_market_buy(s, c, n_nxm, False)
+                else:
+                    platform_nxm_buy(s, c, n_nxm)
+
+            # with wNXM in place, don't do sells if wNXM price is above platform
+            elif event == PLATFORM_SALE:
+                n_nxm = sale_eth[sale] / sell_nxm_price(s)
+                sale += 1
+                if round_8(sell_nxm_price(s)) < round_8(s[WNXM_PRICE]):
+                    wnxm_market_sell(s, c, n_nxm, False)
+                else:
+                    platform_nxm_sale(s, n_nxm)
@@ -1,25 +1,31 @@
 import numpy as np
 
 from BondingCurveNexus.RAMM_markets import RAMMMarkets
-from BondingCurveNexus import model_params
+from BondingCurveNexus.checkpoint import repeat_last_day
 
 class RAMMMarketsDet(RAMMMarkets):
-    def __init__(self, daily_printout_day=0):
+    def __init__(self, daily_printout_day=0, arb_mode='analytic', params=None, schedule=None, seed=None,
+                 clock='discrete'):
 
         # initialise all the same stuff as RAMMMarkets
-        super().__init__(daily_printout_day)
+        super().__init__(daily_printout_day, arb_mode, params=params, schedule=schedule, seed=seed, clock=clock)
 
         # base entries and exits using a fixed pre-defined array
-        self.base_daily_platform_buys = model_params.det_entry_array
-        self.base_daily_platform_sales = model_params.det_exit_array
+        self.base_daily_platform_buys = np.array(self.params.det_entry_array)
+        self.base_daily_platform_sales = np.array(self.params.det_exit_array)
+
+    def extend_arrivals(self, extra_days):
+        # carry on with the last day's entries and exits
+        self.base_daily_platform_buys = repeat_last_day(self.base_daily_platform_buys, extra_days)
+        self.base_daily_platform_sales = repeat_last_day(self.base_daily_platform_sales, extra_days)
 
     def nxm_sale_size(self):
         # standard deterministic size of nxm sales
-        return model_params.det_exit_size / self.sell_nxm_price()
+        return self.params.det_exit_size / self.sell_nxm_price()
 
     def nxm_buy_size(self):
         # standard deterministic size of nxm buys
-        return model_params.det_exit_size / self.buy_nxm_price()
+        return self.params.det_exit_size / self.buy_nxm_price()
 
     def wnxm_shift(self):
         # no random changes in wNXM price
@@ -12,32 +12,45 @@ Buying and selling mechanisms are virtual Uni v2 pools with the following featur
 
  The daily_printout parameter can print out some the pre-arbitrage, pre-event and post-event information for a specific day
  If these printouts are desired, set the parameter to a specific day (defaults to 0)
-'''
 
-import numpy as np
-from random import shuffle
+ Deterministic runs that settle on a fixed point are fast-forwarded to the last day by run_model - see steady_state.py
 
-from BondingCurveNexus import sys_params, model_params
+ quote_sale / quote_buy price whole arrays of trade sizes against the current pools without changing them - see quotes.py
+'''
 
-class RAMMPools:
+import numpy as np
 
-    def __init__(self, daily_printout_day=0):
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.trajectory import Trajectory, TrajectoryViews
+from BondingCurveNexus.streams import RandomStreams
+from BondingCurveNexus.steady_state import SteadyState
+from BondingCurveNexus.quotes import sale_quote, buy_quote, no_trade
+from BondingCurveNexus.schedule import EventSchedule, EVENT_NAMES, RATCHET, PLATFORM_BUY, PLATFORM_SALE
+
+class RAMMPools(SteadyState, TrajectoryViews):
+
+    def __init__(self, daily_printout_day=0, params=None, schedule=None, seed=None):
+        # set simulation parameters - defaults to the current sys_params & model_params values
+        self.params = params if params is not None else SimParams.from_modules()
+        # independent random streams of this simulation - pass the same seed to replay it exactly
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
         # OPENING STATE of system upon initializing a projection instance
         # start at day 0
         self.current_day = 0
         # set daily printout parameter. If not specified, it defaults to 0 and no printouts happen
         self.daily_printout_day = daily_printout_day
         # set current state of system
-        self.act_cover = sys_params.act_cover_now
-        self.cap_pool = sys_params.cap_pool_now
-        self.nxm_supply = sys_params.nxm_supply_now
-        self.wnxm_price = sys_params.wnxm_price_now
+        self.act_cover = self.params.act_cover_now
+        self.cap_pool = self.params.cap_pool_now
+        self.nxm_supply = self.params.nxm_supply_now
+        self.wnxm_price = self.params.wnxm_price_now
 
         # OPENING STATE of RAMM pools
 
         # BELOW BOOK
         # set initial ETH liquidity as initial parameter
-        self.sell_liquidity_eth = sys_params.open_liq_sell
+        self.sell_liquidity_eth = self.params.open_liq_sell
         # set initial NXM liquidity based on opening wnxm price
         # in practice we can start much lower than wnxm price
         # but for simulation purposes this is the first interesting point
@@ -45,25 +58,32 @@ class RAMMPools:
         # set initial invariant
         self.sell_invariant = self.sell_liquidity_eth * self.sell_liquidity_nxm
         # set target liquidity for the below book pool in ETH
-        self.sell_target_liq = sys_params.target_liq_sell
+        self.sell_target_liq = self.params.target_liq_sell
 
         # ABOVE BOOK
         # set initial ETH liquidity as initial parameter
-        self.buy_liquidity_eth = sys_params.open_liq_buy
+        self.buy_liquidity_eth = self.params.open_liq_buy
         # set initial NXM liquidity based on opening wnxm price
         # in practice we can start much lower than wnxm price
         # but for simulation purposes this is the first interesting point
         self.buy_liquidity_nxm = self.buy_liquidity_eth /\
-                                (self.book_value() * (1 + sys_params.oracle_buffer))
+                                (self.book_value() * self.params.buffer_above)
         # set initial invariant
         self.buy_invariant = self.buy_liquidity_eth * self.buy_liquidity_nxm
         # set target liquidity for the below book pool in ETH
-        self.buy_target_liq = sys_params.target_liq_buy
+        self.buy_target_liq = self.params.target_liq_buy
 
         # base entries and exits - set to zero here
         # set stochasically or deterministically in subclasses
-        self.base_daily_platform_buys = np.zeros(shape=model_params.model_days, dtype=int)
-        self.base_daily_platform_sales = np.zeros(shape=model_params.model_days, dtype=int)
+        self.base_daily_platform_buys = np.zeros(shape=self.params.model_days, dtype=int)
+        self.base_daily_platform_sales = np.zeros(shape=self.params.model_days, dtype=int)
+
+        # precompiled event schedule - generated from the base entries and exits on the first day if not given
+        self.schedule = schedule
+        # jump table from event code to the method handling it
+        self.event_handlers = {RATCHET: self.ratchet_event,
+                               PLATFORM_BUY: self.platform_buy_event,
+                               PLATFORM_SALE: self.platform_sale_event}
 
         # initiate and set cumulative counters to zero
         self.eth_sold = 0
@@ -71,20 +91,13 @@ class RAMMPools:
         self.nxm_burned = 0
         self.nxm_minted = 0
 
-        # set tracking lists for individual instance
-        self.cap_pool_prediction = [self.cap_pool]
-        self.sell_nxm_price_prediction = [self.sell_nxm_price()]
-        self.buy_nxm_price_prediction = [self.buy_nxm_price()]
-        self.nxm_supply_prediction = [self.nxm_supply]
-        self.book_value_prediction = [self.book_value()]
-        self.sell_liquidity_nxm_prediction = [self.sell_liquidity_nxm]
-        self.sell_liquidity_eth_prediction = [self.sell_liquidity_eth]
-        self.buy_liquidity_nxm_prediction = [self.buy_liquidity_nxm]
-        self.buy_liquidity_eth_prediction = [self.buy_liquidity_eth]
-        self.eth_sold_prediction = [self.eth_sold]
-        self.eth_acquired_prediction = [self.eth_acquired]
-        self.nxm_burned_prediction = [self.nxm_burned]
-        self.nxm_minted_prediction = [self.nxm_minted]
+        # set tracking trajectory for individual instance and record opening state
+        self.trajectory = Trajectory(metrics=['cap_pool', 'sell_nxm_price', 'buy_nxm_price', 'nxm_supply',
+                                              'book_value', 'sell_liquidity_nxm', 'sell_liquidity_eth',
+                                              'buy_liquidity_nxm', 'buy_liquidity_eth', 'eth_sold',
+                                              'eth_acquired', 'nxm_burned', 'nxm_minted'],
+                                     length=self.params.model_days + 1)
+        self.trajectory.record(self)
 
     # INSTANCE FUNCTIONS
     # to calculate a variety of ongoing metrics & parameters
@@ -119,7 +132,7 @@ class RAMMPools:
 
         # without wNXM in place, don't do sells if buy price is above book value
         if round(self.buy_nxm_price(), 4) >\
-            round(self.book_value() * (1 + sys_params.oracle_buffer), 4):
+            round(self.book_value() * self.params.buffer_above, 4):
             pass
 
         else:
@@ -148,11 +161,11 @@ class RAMMPools:
 
         # without wNXM in place, don't do buys if sell price is below book value
         if round(self.sell_nxm_price(), 4) <\
-            round(self.book_value() * (1 - sys_params.oracle_buffer), 4):
+            round(self.book_value() * self.params.buffer_below, 4):
             pass
 
         # assume noone buys NXM above 3x book
-        elif self.buy_nxm_price() > self.book_value() * model_params.nxm_book_value_multiple:
+        elif self.buy_nxm_price() > self.book_value() * self.params.nxm_book_value_multiple:
             pass
 
         else:
@@ -175,23 +188,43 @@ class RAMMPools:
             # update ETH liquidity & invariant
             self.buy_liquidity_eth = new_eth
 
+    # QUOTES
+    # platform sales of an array of NXM sizes, without changing the pools
+    def quote_sale(self, n_nxm):
+        # sells disabled if buy price is above book value
+        if round(self.buy_nxm_price(), 4) >\
+            round(self.book_value() * self.params.buffer_above, 4):
+            return no_trade(n_nxm, self.sell_nxm_price(), self.book_value())
+        return sale_quote(self.sell_liquidity_eth, self.sell_liquidity_nxm, self.sell_invariant,
+                          self.cap_pool, self.nxm_supply, n_nxm)
+
+    # platform buys of an array of NXM sizes or exact ETH amounts in, without changing the pools
+    def quote_buy(self, n_nxm=None, eth_in=None):
+        # buys disabled if sell price is below book value or buy price is above a multiple of book
+        if round(self.sell_nxm_price(), 4) <\
+            round(self.book_value() * self.params.buffer_below, 4) or\
+            self.buy_nxm_price() > self.book_value() * self.params.nxm_book_value_multiple:
+            return no_trade(n_nxm if n_nxm is not None else eth_in, self.buy_nxm_price(), self.book_value())
+        return buy_quote(self.buy_liquidity_eth, self.buy_liquidity_nxm, self.buy_invariant,
+                         self.cap_pool, self.nxm_supply, n_nxm=n_nxm, eth_in=eth_in)
+
     # RATCHET & LIQUIDITY FUNCTIONS
     def buy_ratchet(self):
         '''
         Function used to ratchet price downwards and remove liquidity for the above BV/buy pool.
         '''
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.book_value() * sys_params.ratchet_down_perc / model_params.ratchets_per_day
+        price_movement = self.book_value() * self.params.ratchet_down_step
 
         # establish target price and cap at book value + oracle buffer
         target_price = max(self.buy_nxm_price() - price_movement,
-                           self.book_value() * (1 + sys_params.oracle_buffer))
+                           self.book_value() * self.params.buffer_above)
 
         # find new liquidity by moving down to target at daily percentage rate
         # divided by number of times we're ratcheting per day
         # limit at target
         if self.buy_liquidity_eth > self.buy_target_liq:
-            self.buy_liquidity_eth = max(self.buy_liquidity_eth - self.buy_target_liq * sys_params.liq_out_perc / model_params.ratchets_per_day,
+            self.buy_liquidity_eth = max(self.buy_liquidity_eth - self.buy_target_liq * self.params.liq_out_step,
                                     self.buy_target_liq)
 
         # update NXM liquidity to reflect new price & new liquidity
@@ -206,17 +239,17 @@ class RAMMPools:
         Function used to ratchet price upwards and add liquidity for the below BV/sell pool.
         '''
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.book_value() * sys_params.ratchet_up_perc / model_params.ratchets_per_day
+        price_movement = self.book_value() * self.params.ratchet_up_step
 
         # establish target price and cap at book value - oracle buffer
         target_price = max(self.sell_nxm_price(), min(self.sell_nxm_price() + price_movement,
-                           self.book_value() * (1 - sys_params.oracle_buffer)))
+                           self.book_value() * self.params.buffer_below))
 
         # find new liquidity by moving up to target at daily percentage rate
         # divided by number of times we're moving liquidity per day
         # limit at target
         if self.sell_liquidity_eth < self.sell_target_liq:
-            self.sell_liquidity_eth = min(self.sell_liquidity_eth + self.sell_target_liq * sys_params.liq_in_perc / model_params.ratchets_per_day,
+            self.sell_liquidity_eth = min(self.sell_liquidity_eth + self.sell_target_liq * self.params.liq_in_step,
                                     self.sell_target_liq)
 
         # update NXM liquidity to reflect new price
@@ -225,14 +258,37 @@ class RAMMPools:
         # update invariant
         self.sell_invariant = self.sell_liquidity_eth * self.sell_liquidity_nxm
 
+    # EVENTS
+    # ratchet both pools towards book value
+    def ratchet_event(self):
+        # up for below BV/sell pool
+        self.sell_ratchet()
+        # down for above BV/buy pool
+        self.buy_ratchet()
+
+    # platform buy - not arbitrage-driven
+    def platform_buy_event(self):
+        self.platform_nxm_buy(n_nxm=self.nxm_buy_size())
+
+    # platform sale - not arbitrage-driven
+    def platform_sale_event(self):
+        self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+
+    # generate the event schedule for the whole projection, shuffled within each day
+    def event_schedule(self):
+        if self.schedule is None:
+            self.schedule = EventSchedule.build(
+                                counts={RATCHET: self.params.ratchets_per_day,
+                                        PLATFORM_BUY: self.base_daily_platform_buys,
+                                        PLATFORM_SALE: self.base_daily_platform_sales},
+                                days=self.params.model_days,
+                                rng=self.streams.shuffle)
+        return self.schedule
+
     # create DAY LOOP
     def one_day_passes(self):
-        # create list of events and shuffle it
-        events_today = []
-        events_today.extend(['ratchet'] * model_params.ratchets_per_day)
-        events_today.extend(['platform_buy'] * self.base_daily_platform_buys[self.current_day])
-        events_today.extend(['platform_sale'] * self.base_daily_platform_sales[self.current_day])
-        shuffle(events_today)
+        # today's events from the precompiled schedule
+        events_today = self.event_schedule().day(self.current_day).tolist()
 
         # LOOP THROUGH EVENTS OF DAY
         for event in events_today:
@@ -240,7 +296,7 @@ class RAMMPools:
            # optional daily printout
         #    # if daily_printout_day parameter is non-zero, print pre-arbitrage params
         #     if self.daily_printout_day and self.current_day == self.daily_printout_day:
-        #         print(f'''Day {self.daily_printout_day} - {event} - pre-arbitrage:
+        #         print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - pre-arbitrage:
         #                 sell_nxm_price = {self.sell_nxm_price()}, buy_nxm_price = {self.buy_nxm_price()}
         #                 book_value = {self.book_value()},
         #                 cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
@@ -249,52 +305,26 @@ class RAMMPools:
         #    # optional daily printout
         #    # if daily_printout_day parameter is non-zero, print post-arbitrage params
         #     if self.daily_printout_day and self.current_day == self.daily_printout_day:
-        #         print(f'''Day {self.daily_printout_day} - {event} - post-arbitrage:
+        #         print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-arbitrage:
         #                 sell_nxm_price = {self.sell_nxm_price()}, buy_nxm_price = {self.buy_nxm_price()}
         #                 book_value = {self.book_value()},
         #                 cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
         #         ''')
 
-            #-----RATCHET-----#
-            if event == 'ratchet':
-                # up for below BV/sell pool
-                self.sell_ratchet()
-                # down for above BV/buy pool
-                self.buy_ratchet()
-
-            #-----PLATFORM BUY-----#
-            # not arbitrage-driven
-            if event == 'platform_buy':
-                self.platform_nxm_buy(n_nxm=self.nxm_buy_size())
-
-            #-----PLATFORM SALE-----#
-            # not arbitrage-driven
-            if event == 'platform_sale':
-                self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+            #-----EVENT-----#
+            self.event_handlers[event]()
 
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-event:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-event:
                         sell_nxm_price = {self.sell_nxm_price()}, buy_nxm_price = {self.buy_nxm_price()}
                         book_value = {self.book_value()},
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
                 ''')
 
-        # append values to tracking metrics
-        self.cap_pool_prediction.append(self.cap_pool)
-        self.sell_nxm_price_prediction.append(self.sell_nxm_price())
-        self.buy_nxm_price_prediction.append(self.buy_nxm_price())
-        self.nxm_supply_prediction.append(self.nxm_supply)
-        self.book_value_prediction.append(self.book_value())
-        self.sell_liquidity_nxm_prediction.append(self.sell_liquidity_nxm)
-        self.sell_liquidity_eth_prediction.append(self.sell_liquidity_eth)
-        self.buy_liquidity_nxm_prediction.append(self.buy_liquidity_nxm)
-        self.buy_liquidity_eth_prediction.append(self.buy_liquidity_eth)
-        self.eth_sold_prediction.append(self.eth_sold)
-        self.eth_acquired_prediction.append(self.eth_acquired)
-        self.nxm_burned_prediction.append(self.nxm_burned)
-        self.nxm_minted_prediction.append(self.nxm_minted)
+        # record values in tracking trajectory
+        self.trajectory.record(self)
 
         # increment day
         self.current_day += 1
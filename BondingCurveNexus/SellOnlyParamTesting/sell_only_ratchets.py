@@ -11,6 +11,7 @@ from tqdm import tqdm
 
 from BondingCurveNexus.uni_protocol_det import UniProtocolDet
 from BondingCurveNexus import model_params, sys_params
+from BondingCurveNexus.sim_params import SimParams
 from BondingCurveNexus.model_params import model_days
 
 #-----GRAPHS-----#
@@ -88,13 +89,12 @@ if __name__ == "__main__":
     days = []
 
     for speed in ratchet_range:
-        sims.append(UniProtocolDet())
+        sims.append(UniProtocolDet(params=SimParams.from_modules(ratchet_up_perc=speed)))
         label_names.append(f'Ratchet = {speed * 100}%/day')
 
     for n, sim in enumerate(sims):
 
         days_run = 0
-        sys_params.ratchet_up_perc = ratchet_range[n]
 
         for i in tqdm(range(model_days)):
             try:
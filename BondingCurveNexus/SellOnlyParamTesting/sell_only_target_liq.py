@@ -11,6 +11,7 @@ from tqdm import tqdm
 
 from BondingCurveNexus.uni_protocol_det import UniProtocolDet
 from BondingCurveNexus import model_params, sys_params
+from BondingCurveNexus.sim_params import SimParams
 from BondingCurveNexus.model_params import model_days
 
 #-----GRAPHS-----#
@@ -88,15 +89,13 @@ if __name__ == "__main__":
     label_names = []
     days = []
 
-    for liq in target_liq_range:
+    for n, liq in enumerate(target_liq_range):
         # sys_params.open_liq = liq
         sys_params.target_liq = liq
-        sims.append(UniProtocolDet())
+        sims.append(UniProtocolDet(params=SimParams.from_modules(liq_in_perc=liq_in_range[n])))
         label_names.append(f'Target ETH Liquidity = {liq}')
 
     for n, sim in enumerate(sims):
-
-        sys_params.liq_in_perc = liq_in_range[n]
         days_run = 0
 
         for i in tqdm(range(model_days)):
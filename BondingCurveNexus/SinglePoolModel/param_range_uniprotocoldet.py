@@ -11,6 +11,7 @@ from tqdm import tqdm
 
 from BondingCurveNexus.uni_protocol_det import UniProtocolDet
 from BondingCurveNexus import model_params, sys_params
+from BondingCurveNexus.sim_params import SimParams
 from BondingCurveNexus.model_params import model_days
 
 #-----GRAPHS-----#
@@ -92,14 +93,13 @@ if __name__ == "__main__":
 
     # create sim & label list
     for speed in ratchet_range:
-        sims.append(UniProtocolDet())
+        sims.append(UniProtocolDet(params=SimParams.from_modules(ratchet_down_perc=speed)))
         label_names.append(f'{speed*100}% of BV/day')
 
     # loop through sim list while changing variables
     for n, sim in enumerate(sims):
 
         days_run = 0
-        sys_params.ratchet_down_perc = ratchet_range[n]
 
         for i in tqdm(range(model_days)):
             try:
@@ -15,31 +15,39 @@ Buying and selling mechanism is a virtual Uni v2 pool with the following feature
 '''
 
 import numpy as np
-from random import shuffle, choice
+from random import choice
 
-from BondingCurveNexus import sys_params, model_params
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.trajectory import Trajectory, TrajectoryViews
+from BondingCurveNexus.streams import RandomStreams
+from BondingCurveNexus.schedule import EventSchedule, EVENT_NAMES, RATCHET, LIQ_MOVE, WNXM_SHIFT, PLATFORM_BUY, PLATFORM_SALE
 
-class UniPoolMarkets:
+class UniPoolMarkets(TrajectoryViews):
 
-    def __init__(self, daily_printout_day=0):
+    def __init__(self, daily_printout_day=0, params=None, schedule=None, seed=None):
+        # set simulation parameters - defaults to the current sys_params & model_params values
+        self.params = params if params is not None else SimParams.from_modules()
+        # independent random streams of this simulation - pass the same seed to replay it exactly
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
         # OPENING STATE of system upon initializing a projection instance
         # start at day 0
         self.current_day = 0
         # set daily printout parameter. If not specified, it defaults to 0 and no printouts happen
         self.daily_printout_day = daily_printout_day
         # set current state of system
-        self.act_cover = sys_params.act_cover_now
-        self.cap_pool = sys_params.cap_pool_now
-        self.nxm_supply = sys_params.nxm_supply_now
-        self.wnxm_supply = sys_params.wnxm_supply_now
-        self.wnxm_price = sys_params.wnxm_price_now
+        self.act_cover = self.params.act_cover_now
+        self.cap_pool = self.params.cap_pool_now
+        self.nxm_supply = self.params.nxm_supply_now
+        self.wnxm_supply = self.params.wnxm_supply_now
+        self.wnxm_price = self.params.wnxm_price_now
 
         # set ETH value for wNXM price shift as a result of 1 ETH of buy/sell
-        self.wnxm_move_size = model_params.wnxm_move_size
+        self.wnxm_move_size = self.params.wnxm_move_size
 
         # OPENING STATE of virtual uni pool
         # set initial ETH liquidity as initial parameter
-        self.liquidity_eth = sys_params.open_liq_sell
+        self.liquidity_eth = self.params.open_liq_sell
         # set initial NXM liquidity based on opening wnxm price
         # in practice we can start much lower than wnxm price
         # but for simulation purposes this is the first interesting point
@@ -48,12 +56,21 @@ class UniPoolMarkets:
         self.invariant = self.liquidity_eth * self.liquidity_nxm
 
         # set target liquidity for the virtual pool in ETH
-        self.target_liq = sys_params.target_liq_sell
+        self.target_liq = self.params.target_liq_sell
 
         # base entries and exits - set to zero here
         # set stochasically or deterministically in subclasses
-        self.base_daily_platform_buys = np.zeros(shape=model_params.model_days, dtype=int)
-        self.base_daily_platform_sales = np.zeros(shape=model_params.model_days, dtype=int)
+        self.base_daily_platform_buys = np.zeros(shape=self.params.model_days, dtype=int)
+        self.base_daily_platform_sales = np.zeros(shape=self.params.model_days, dtype=int)
+
+        # precompiled event schedule - generated from the base entries and exits on the first day if not given
+        self.schedule = schedule
+        # jump table from event code to the method handling it
+        self.event_handlers = {RATCHET: self.ratchet_event,
+                               LIQ_MOVE: self.liq_move_event,
+                               WNXM_SHIFT: self.wnxm_shift,
+                               PLATFORM_BUY: self.platform_buy_event,
+                               PLATFORM_SALE: self.platform_sale_event}
 
         # initiate and set cumulative counters to zero
         self.eth_sold = 0
@@ -63,21 +80,13 @@ class UniPoolMarkets:
         self.wnxm_removed = 0
         self.wnxm_created = 0
 
-        # set tracking lists for individual instance
-        self.cap_pool_prediction = [self.cap_pool]
-        self.nxm_price_prediction = [self.nxm_price()]
-        self.wnxm_price_prediction = [self.wnxm_price]
-        self.nxm_supply_prediction = [self.nxm_supply]
-        self.wnxm_supply_prediction = [self.wnxm_supply]
-        self.book_value_prediction = [self.book_value()]
-        self.liquidity_nxm_prediction = [self.liquidity_nxm]
-        self.liquidity_eth_prediction = [self.liquidity_eth]
-        self.eth_sold_prediction = [self.eth_sold]
-        self.eth_acquired_prediction = [self.eth_acquired]
-        self.nxm_burned_prediction = [self.nxm_burned]
-        self.nxm_minted_prediction = [self.nxm_minted]
-        self.wnxm_removed_prediction = [self.wnxm_removed]
-        self.wnxm_created_prediction = [self.wnxm_created]
+        # set tracking trajectory for individual instance and record opening state
+        self.trajectory = Trajectory(metrics=['cap_pool', 'nxm_price', 'wnxm_price', 'nxm_supply',
+                                              'wnxm_supply', 'book_value', 'liquidity_nxm', 'liquidity_eth',
+                                              'eth_sold', 'eth_acquired', 'nxm_burned', 'nxm_minted',
+                                              'wnxm_removed', 'wnxm_created'],
+                                     length=self.params.model_days + 1)
+        self.trajectory.record(self)
 
     # INSTANCE FUNCTIONS
     # to calculate a variety of ongoing metrics & parameters
@@ -135,7 +144,7 @@ class UniPoolMarkets:
             self.wnxm_market_buy(n_wnxm=n_nxm, remove=False)
 
         # assume noone buys NXM above a multiple of book
-        elif self.nxm_price() > self.book_value() * model_params.nxm_book_value_multiple:
+        elif self.nxm_price() > self.book_value() * self.params.nxm_book_value_multiple:
             pass
 
         else:
@@ -235,7 +244,7 @@ class UniPoolMarkets:
     # RATCHET FUNCTIONS
     def ratchet_down(self):
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.book_value() * sys_params.ratchet_down_perc / model_params.ratchets_per_day
+        price_movement = self.book_value() * self.params.ratchet_down_step
 
         # establish target price and cap at book value
         target_price = max(self.nxm_price() - price_movement, self.book_value())
@@ -248,7 +257,7 @@ class UniPoolMarkets:
 
     def ratchet_up(self):
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.book_value() * sys_params.ratchet_up_perc / model_params.ratchets_per_day
+        price_movement = self.book_value() * self.params.ratchet_up_step
 
         # establish target price and cap at book value
         target_price = min(self.nxm_price() + price_movement, self.book_value())
@@ -281,25 +290,74 @@ class UniPoolMarkets:
 
         # if above book & above target liq, down to target at daily percentage rate (limit at target)
         # divided by number of times we're moving liquidity per day
-            return max(self.liquidity_eth - self.target_liq * sys_params.liq_out_perc / model_params.ratchets_per_day,
+            return max(self.liquidity_eth - self.target_liq * self.params.liq_out_step,
                        self.target_liq)
 
         # if below target liq, up to target at daily percentage rate (limit at target)
         # divided by number of times we're moving liquidity per day
         if kind == 'up':
-            return min(self.liquidity_eth + self.target_liq * sys_params.liq_in_perc / model_params.ratchets_per_day,
+            return min(self.liquidity_eth + self.target_liq * self.params.liq_in_step,
                        self.target_liq)
 
+    # EVENTS
+    # ratchet price towards book value
+    def ratchet_event(self):
+        # up if below BV
+        if self.book_value() > self.nxm_price():
+            self.ratchet_up()
+        # down if above BV (but ratchet_down method only enabled in one-sided subclass)
+        if self.book_value() < self.nxm_price():
+            self.ratchet_down()
+
+    # move liquidity towards target
+    def liq_move_event(self):
+        # liquidity down towards target if liquidity above target
+        if self.liquidity_eth > self.target_liq:
+            self.liq_move(new_liq=self.new_liq(kind='down'))
+
+        # liquidity up towards target if liquidity below target
+        if self.liquidity_eth < self.target_liq:
+            self.liq_move(new_liq=self.new_liq(kind='up'))
+
+    # platform buy - not arbitrage-driven
+    def platform_buy_event(self):
+        # doesn't happen if wnxm price is below platform price
+        # instead a buy happens of wNXM on open market, assuming there are wnxm to buy
+        if self.nxm_price() > self.wnxm_price and self.wnxm_supply > 0:
+            self.wnxm_market_buy(n_wnxm=self.nxm_sale_size(), remove=False)
+
+        # otherwise execute the buy (subject to constraints within instance method)
+        else:
+            self.platform_nxm_buy(n_nxm=self.nxm_sale_size())
+
+    # platform sale - not arbitrage-driven
+    def platform_sale_event(self):
+        # doesn't happen if wnxm price is above platform price
+        # instead a sell happens of wNXM on open market
+        if self.nxm_price() < self.wnxm_price:
+            self.wnxm_market_sell(n_wnxm=self.nxm_sale_size(), create=False)
+
+        # otherwise execute the sell (subject to constraints within instance method)
+        else:
+            self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+
+    # generate the event schedule for the whole projection, shuffled within each day
+    def event_schedule(self):
+        if self.schedule is None:
+            self.schedule = EventSchedule.build(
+                                counts={RATCHET: self.params.ratchets_per_day,
+                                        LIQ_MOVE: self.params.ratchets_per_day,
+                                        WNXM_SHIFT: self.params.wnxm_shifts_per_day,
+                                        PLATFORM_BUY: self.base_daily_platform_buys,
+                                        PLATFORM_SALE: self.base_daily_platform_sales},
+                                days=self.params.model_days,
+                                rng=self.streams.shuffle)
+        return self.schedule
+
     # create DAY LOOP
     def one_day_passes(self):
-        # create list of events and shuffle it
-        events_today = []
-        events_today.extend(['ratchet'] * model_params.ratchets_per_day)
-        events_today.extend(['liq_move'] * model_params.ratchets_per_day)
-        events_today.extend(['wnxm_shift'] * model_params.wnxm_shifts_per_day)
-        events_today.extend(['platform_buy'] * self.base_daily_platform_buys[self.current_day])
-        events_today.extend(['platform_sale'] * self.base_daily_platform_sales[self.current_day])
-        shuffle(events_today)
+        # today's events from the precompiled schedule
+        events_today = self.event_schedule().day(self.current_day).tolist()
 
         # LOOP THROUGH EVENTS OF DAY
         for event in events_today:
@@ -307,7 +365,7 @@ class UniPoolMarkets:
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print pre-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - pre-arbitrage:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - pre-arbitrage:
                         nxm_price = {self.nxm_price()}, wnxm_price = {self.wnxm_price}
                         book_value = {self.book_value()}, cap_pool = {self.cap_pool},
                         nxm_supply = {self.nxm_supply}, wnxm_supply = {self.wnxm_supply}
@@ -321,85 +379,28 @@ class UniPoolMarkets:
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-arbitrage:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-arbitrage:
                         nxm_price = {self.nxm_price()}, wnxm_price = {self.wnxm_price}
                         book_value = {self.book_value()}, cap_pool = {self.cap_pool},
                         nxm_supply = {self.nxm_supply}, wnxm_supply = {self.wnxm_supply}
                         liquidity_nxm = {self.liquidity_nxm},liquidity_eth = {self.liquidity_eth}
                 ''')
 
-            #-----RATCHET-----#
-            if event == 'ratchet':
-                # up if below BV
-                if self.book_value() > self.nxm_price():
-                    self.ratchet_up()
-                # down if above BV (but ratchet_down method only enabled in one-sided subclass)
-                if self.book_value() < self.nxm_price():
-                    self.ratchet_down()
-
-            #-----LIQUIDITY MOVE-----#
-            if event == 'liq_move':
-                # liquidity down towards target if liquidity above target
-                if self.liquidity_eth > self.target_liq:
-                    self.liq_move(new_liq=self.new_liq(kind='down'))
-
-                # liquidity up towards target if liquidity below target
-                if self.liquidity_eth < self.target_liq:
-                    self.liq_move(new_liq=self.new_liq(kind='up'))
-
-            #-----WNXM SHIFT-----#
-            if event == 'wnxm_shift':
-                self.wnxm_shift()
-
-            #-----PLATFORM BUY-----#
-            # not arbitrage-driven
-            if event == 'platform_buy':
-                # doesn't happen if wnxm price is below platform price
-                # instead a buy happens of wNXM on open market, assuming there are wnxm to buy
-                if self.nxm_price() > self.wnxm_price and self.wnxm_supply > 0:
-                    self.wnxm_market_buy(n_wnxm=self.nxm_sale_size(), remove=False)
-
-                # otherwise execute the buy (subject to constraints within instance method)
-                else:
-                    self.platform_nxm_buy(n_nxm=self.nxm_sale_size())
-
-            #-----PLATFORM SALE-----#
-            # not arbitrage-driven
-            if event == 'platform_sale':
-                # doesn't happen if wnxm price is above platform price
-                # instead a sell happens of wNXM on open market
-                if self.nxm_price() < self.wnxm_price:
-                    self.wnxm_market_sell(n_wnxm=self.nxm_sale_size(), create=False)
-
-                # otherwise execute the sell (subject to constraints within instance method)
-                else:
-                    self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+            #-----EVENT-----#
+            self.event_handlers[event]()
 
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-event:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-event:
                         nxm_price = {self.nxm_price()}, wnxm_price = {self.wnxm_price}
                         book_value = {self.book_value()}, cap_pool = {self.cap_pool},
                         nxm_supply = {self.nxm_supply}, wnxm_supply = {self.wnxm_supply}
                         liquidity_nxm = {self.liquidity_nxm},liquidity_eth = {self.liquidity_eth}
                 ''')
 
-        # append values to tracking metrics
-        self.cap_pool_prediction.append(self.cap_pool)
-        self.nxm_price_prediction.append(self.nxm_price())
-        self.wnxm_price_prediction.append(self.wnxm_price)
-        self.nxm_supply_prediction.append(self.nxm_supply)
-        self.wnxm_supply_prediction.append(self.wnxm_supply)
-        self.book_value_prediction.append(self.book_value())
-        self.liquidity_nxm_prediction.append(self.liquidity_nxm)
-        self.liquidity_eth_prediction.append(self.liquidity_eth)
-        self.eth_sold_prediction.append(self.eth_sold)
-        self.eth_acquired_prediction.append(self.eth_acquired)
-        self.nxm_burned_prediction.append(self.nxm_burned)
-        self.nxm_minted_prediction.append(self.nxm_minted)
-        self.wnxm_removed_prediction.append(self.wnxm_removed)
-        self.wnxm_created_prediction.append(self.wnxm_created)
+        # record values in tracking trajectory
+        self.trajectory.record(self)
 
         # increment day
         self.current_day += 1
@@ -12,30 +12,43 @@ Buying and selling mechanisms are virtual Uni v2 pools with the following featur
 
  The daily_printout parameter can print out some the pre-arbitrage, pre-event and post-event information for a specific day
  If these printouts are desired, set the parameter to a specific day (defaults to 0)
-'''
 
-import numpy as np
-from random import shuffle
+ Deterministic runs that settle on a fixed point are fast-forwarded to the last day by run_model - see steady_state.py
 
-from BondingCurveNexus import sys_params, model_params
+ quote_sale / quote_buy price whole arrays of trade sizes against the current pool without changing it - see quotes.py
+'''
 
-class UniPoolProtocol:
+import numpy as np
 
-    def __init__(self, daily_printout_day=0):
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.trajectory import Trajectory, TrajectoryViews
+from BondingCurveNexus.streams import RandomStreams
+from BondingCurveNexus.steady_state import SteadyState
+from BondingCurveNexus.quotes import sale_quote, buy_quote, no_trade
+from BondingCurveNexus.schedule import EventSchedule, EVENT_NAMES, RATCHET, LIQ_MOVE, PLATFORM_BUY, PLATFORM_SALE
+
+class UniPoolProtocol(SteadyState, TrajectoryViews):
+
+    def __init__(self, daily_printout_day=0, params=None, schedule=None, seed=None):
+        # set simulation parameters - defaults to the current sys_params & model_params values
+        self.params = params if params is not None else SimParams.from_modules()
+        # independent random streams of this simulation - pass the same seed to replay it exactly
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
         # OPENING STATE of system upon initializing a projection instance
         # start at day 0
         self.current_day = 0
         # set daily printout parameter. If not specified, it defaults to 0 and no printouts happen
         self.daily_printout_day = daily_printout_day
         # set current state of system
-        self.act_cover = sys_params.act_cover_now
-        self.cap_pool = sys_params.cap_pool_now
-        self.nxm_supply = sys_params.nxm_supply_now
-        self.wnxm_price = sys_params.wnxm_price_now
+        self.act_cover = self.params.act_cover_now
+        self.cap_pool = self.params.cap_pool_now
+        self.nxm_supply = self.params.nxm_supply_now
+        self.wnxm_price = self.params.wnxm_price_now
 
         # OPENING STATE of virtual uni pool
         # set initial ETH liquidity as initial parameter
-        self.liquidity_eth = sys_params.open_liq_sell
+        self.liquidity_eth = self.params.open_liq_sell
         # set initial NXM liquidity based on opening wnxm price
         # in practice we can start much lower than wnxm price
         # but for simulation purposes this is the first interesting point
@@ -44,12 +57,20 @@ class UniPoolProtocol:
         self.invariant = self.liquidity_eth * self.liquidity_nxm
 
         # set target liquidity for the virtual pool in ETH
-        self.target_liq = sys_params.target_liq_sell
+        self.target_liq = self.params.target_liq_sell
 
         # base entries and exits - set to zero here
         # set stochasically or deterministically in subclasses
-        self.base_daily_platform_buys = np.zeros(shape=model_params.model_days, dtype=int)
-        self.base_daily_platform_sales = np.zeros(shape=model_params.model_days, dtype=int)
+        self.base_daily_platform_buys = np.zeros(shape=self.params.model_days, dtype=int)
+        self.base_daily_platform_sales = np.zeros(shape=self.params.model_days, dtype=int)
+
+        # precompiled event schedule - generated from the base entries and exits on the first day if not given
+        self.schedule = schedule
+        # jump table from event code to the method handling it
+        self.event_handlers = {RATCHET: self.ratchet_event,
+                               LIQ_MOVE: self.liq_move_event,
+                               PLATFORM_BUY: self.platform_buy_event,
+                               PLATFORM_SALE: self.platform_sale_event}
 
         # initiate and set cumulative counters to zero
         self.eth_sold = 0
@@ -57,17 +78,12 @@ class UniPoolProtocol:
         self.nxm_burned = 0
         self.nxm_minted = 0
 
-        # set tracking lists for individual instance
-        self.cap_pool_prediction = [self.cap_pool]
-        self.nxm_price_prediction = [self.nxm_price()]
-        self.nxm_supply_prediction = [self.nxm_supply]
-        self.book_value_prediction = [self.book_value()]
-        self.liquidity_nxm_prediction = [self.liquidity_nxm]
-        self.liquidity_eth_prediction = [self.liquidity_eth]
-        self.eth_sold_prediction = [self.eth_sold]
-        self.eth_acquired_prediction = [self.eth_acquired]
-        self.nxm_burned_prediction = [self.nxm_burned]
-        self.nxm_minted_prediction = [self.nxm_minted]
+        # set tracking trajectory for individual instance and record opening state
+        self.trajectory = Trajectory(metrics=['cap_pool', 'nxm_price', 'nxm_supply', 'book_value',
+                                              'liquidity_nxm', 'liquidity_eth', 'eth_sold', 'eth_acquired',
+                                              'nxm_burned', 'nxm_minted'],
+                                     length=self.params.model_days + 1)
+        self.trajectory.record(self)
 
     # INSTANCE FUNCTIONS
     # to calculate a variety of ongoing metrics & parameters
@@ -125,7 +141,7 @@ class UniPoolProtocol:
             pass
 
         # assume noone buys NXM above 3x book
-        # elif self.nxm_price() > self.book_value() * model_params.nxm_book_value_multiple:
+        # elif self.nxm_price() > self.book_value() * self.params.nxm_book_value_multiple:
         #     pass
 
         else:
@@ -149,10 +165,27 @@ class UniPoolProtocol:
             self.liquidity_eth = new_eth
             self.invariant = self.liquidity_eth * self.liquidity_nxm
 
+    # QUOTES
+    # platform sales of an array of NXM sizes, without changing the pool
+    def quote_sale(self, n_nxm):
+        # sells disabled above book
+        if round(self.nxm_price(), 6) > round(self.book_value(), 6):
+            return no_trade(n_nxm, self.nxm_price(), self.book_value())
+        return sale_quote(self.liquidity_eth, self.liquidity_nxm, self.invariant,
+                          self.cap_pool, self.nxm_supply, n_nxm)
+
+    # platform buys of an array of NXM sizes or exact ETH amounts in, without changing the pool
+    def quote_buy(self, n_nxm=None, eth_in=None):
+        # buys disabled below book
+        if round(self.nxm_price(), 6) < round(self.book_value(), 6):
+            return no_trade(n_nxm if n_nxm is not None else eth_in, self.nxm_price(), self.book_value())
+        return buy_quote(self.liquidity_eth, self.liquidity_nxm, self.invariant,
+                         self.cap_pool, self.nxm_supply, n_nxm=n_nxm, eth_in=eth_in)
+
     # RATCHET FUNCTIONS
     def ratchet_down(self):
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.book_value() * sys_params.ratchet_down_perc / model_params.ratchets_per_day
+        price_movement = self.book_value() * self.params.ratchet_down_step
 
         # establish target price and cap at book value
         target_price = max(self.nxm_price() - price_movement, self.book_value())
@@ -165,7 +198,7 @@ class UniPoolProtocol:
 
     def ratchet_up(self):
         # establish price movement required to be relevant percentage of BV
-        price_movement = self.book_value() * sys_params.ratchet_up_perc / model_params.ratchets_per_day
+        price_movement = self.book_value() * self.params.ratchet_up_step
 
         # establish target price and cap at book value
         target_price = min(self.nxm_price() + price_movement, self.book_value())
@@ -198,24 +231,59 @@ class UniPoolProtocol:
 
         # if above book & above target liq, down to target at daily percentage rate (limit at target)
         # divided by number of times we're moving liquidity per day
-            return max(self.liquidity_eth - self.target_liq * sys_params.liq_out_perc / model_params.ratchets_per_day,
+            return max(self.liquidity_eth - self.target_liq * self.params.liq_out_step,
                        self.target_liq)
 
         # if below target liq, up to target at daily percentage rate (limit at target)
         # divided by number of times we're moving liquidity per day
         if kind == 'up':
-            return min(self.liquidity_eth + self.target_liq * sys_params.liq_in_perc / model_params.ratchets_per_day,
+            return min(self.liquidity_eth + self.target_liq * self.params.liq_in_step,
                        self.target_liq)
 
+    # EVENTS
+    # ratchet price towards book value
+    def ratchet_event(self):
+        # up if below BV
+        if self.book_value() > self.nxm_price():
+            self.ratchet_up()
+        # down if above BV (but ratchet_down method only enabled in one-sided subclass)
+        if self.book_value() < self.nxm_price():
+            self.ratchet_down()
+
+    # move liquidity towards target
+    def liq_move_event(self):
+        # liquidity down towards target if liquidity above target
+        if self.liquidity_eth > self.target_liq:
+            self.liq_move(new_liq=self.new_liq(kind='down'))
+
+        # liquidity up towards target if liquidity below target
+        if self.liquidity_eth < self.target_liq:
+            self.liq_move(new_liq=self.new_liq(kind='up'))
+
+    # platform buy - not arbitrage-driven
+    def platform_buy_event(self):
+        self.platform_nxm_buy(n_nxm=self.nxm_sale_size())
+
+    # platform sale - not arbitrage-driven
+    def platform_sale_event(self):
+        self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+
+    # generate the event schedule for the whole projection, shuffled within each day
+    def event_schedule(self):
+        if self.schedule is None:
+            self.schedule = EventSchedule.build(
+                                counts={RATCHET: self.params.ratchets_per_day,
+                                        LIQ_MOVE: self.params.ratchets_per_day,
+                                        PLATFORM_BUY: self.base_daily_platform_buys,
+                                        PLATFORM_SALE: self.base_daily_platform_sales},
+                                days=self.params.model_days,
+                                rng=self.streams.shuffle)
+        return self.schedule
+
     # create DAY LOOP
     def one_day_passes(self):
-        # create list of events and shuffle it
-        events_today = []
-        events_today.extend(['ratchet'] * model_params.ratchets_per_day)
-        events_today.extend(['liq_move'] * model_params.ratchets_per_day)
-        events_today.extend(['platform_buy'] * self.base_daily_platform_buys[self.current_day])
-        events_today.extend(['platform_sale'] * self.base_daily_platform_sales[self.current_day])
-        shuffle(events_today)
+        # today's events from the precompiled schedule
+        events_today = self.event_schedule().day(self.current_day).tolist()
 
         # LOOP THROUGH EVENTS OF DAY
         for event in events_today:
@@ -223,7 +291,7 @@ class UniPoolProtocol:
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print pre-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - pre-arbitrage:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - pre-arbitrage:
                         nxm_price = {self.nxm_price()}, book_value = {self.book_value()},
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
                 ''')
@@ -231,59 +299,24 @@ class UniPoolProtocol:
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-arbitrage:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-arbitrage:
                         nxm_price = {self.nxm_price()}, book_value = {self.book_value()},
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
                 ''')
 
-            #-----RATCHET-----#
-            if event == 'ratchet':
-                # up if below BV
-                if self.book_value() > self.nxm_price():
-                    self.ratchet_up()
-                # down if above BV (but ratchet_down method only enabled in one-sided subclass)
-                if self.book_value() < self.nxm_price():
-                    self.ratchet_down()
-
-            #-----LIQUIDITY MOVE-----#
-            if event == 'liq_move':
-                # liquidity down towards target if liquidity above target
-                if self.liquidity_eth > self.target_liq:
-                    self.liq_move(new_liq=self.new_liq(kind='down'))
-
-                # liquidity up towards target if liquidity below target
-                if self.liquidity_eth < self.target_liq:
-                    self.liq_move(new_liq=self.new_liq(kind='up'))
-
-            #-----PLATFORM BUY-----#
-            # not arbitrage-driven
-            if event == 'platform_buy':
-                self.platform_nxm_buy(n_nxm=self.nxm_sale_size())
-
-            #-----PLATFORM SALE-----#
-            # not arbitrage-driven
-            if event == 'platform_sale':
-                self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+            #-----EVENT-----#
+            self.event_handlers[event]()
 
            # optional daily printout
            # if daily_printout_day parameter is non-zero, print post-arbitrage params
             if self.daily_printout_day and self.current_day == self.daily_printout_day:
-                print(f'''Day {self.daily_printout_day} - {event} - post-event:
+                print(f'''Day {self.daily_printout_day} - {EVENT_NAMES[event]} - post-event:
                         nxm_price = {self.nxm_price()}, book_value = {self.book_value()},
                         cap_pool = {self.cap_pool}, nxm_supply = {self.nxm_supply}
                 ''')
 
-        # append values to tracking metrics
-        self.cap_pool_prediction.append(self.cap_pool)
-        self.nxm_price_prediction.append(self.nxm_price())
-        self.nxm_supply_prediction.append(self.nxm_supply)
-        self.book_value_prediction.append(self.book_value())
-        self.liquidity_nxm_prediction.append(self.liquidity_nxm)
-        self.liquidity_eth_prediction.append(self.liquidity_eth)
-        self.eth_sold_prediction.append(self.eth_sold)
-        self.eth_acquired_prediction.append(self.eth_acquired)
-        self.nxm_burned_prediction.append(self.nxm_burned)
-        self.nxm_minted_prediction.append(self.nxm_minted)
+        # record values in tracking trajectory
+        self.trajectory.record(self)
 
         # increment day
         self.current_day += 1
@@ -3,26 +3,43 @@ Define the whole Nexus Mutual system as a class
 This allows us to track the different variables as they change over time
 in a consistent manner.
 Buying and selling mechanism is a virtual Uni v2 pool
-'''
 
-from scipy.stats import lognorm
-import numpy as np
-from random import shuffle
+The arb_mode parameter sets how wNXM-NXM arbitrage is carried out:
+ - 'analytic' (default) solves for the exact trade size that closes the price gap and applies it in one step
+ - 'chunked' trades randomly-sized lots until prices cross, as the original loop did
 
-from BondingCurveNexus import sys_params, model_params
+Runs can be checkpointed to disk and resumed or extended past model_days - see checkpoint.py.
+'''
 
-class NexusSystem:
+import numpy as np
 
-    def __init__(self, liquidity_eth, wnxm_move_size):
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.trajectory import Trajectory, TrajectoryViews
+from BondingCurveNexus.streams import RandomStreams, LognormalStream
+from BondingCurveNexus.schedule import (EventSchedule, RATCHET, WNXM_SHIFT, PLATFORM_BUY, PLATFORM_SALE,
+                                        PREMIUM_INCOME, CLAIM_OUTGO, COVER_AMOUNT_CHANGE, INVESTMENT_RETURN)
+from BondingCurveNexus.checkpoint import Checkpointable
+from BondingCurveNexus.arbitrage import arb_sale_size, arb_buy_size, wnxm_price_after, decreasing_root
+
+class NexusSystem(Checkpointable, TrajectoryViews):
+
+    def __init__(self, liquidity_eth, wnxm_move_size, arb_mode='analytic', params=None, schedule=None, seed=None):
+        # set simulation parameters - defaults to the current sys_params & model_params values
+        self.params = params if params is not None else SimParams.from_modules()
+        # independent random streams of this simulation - pass the same seed to replay it exactly
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
         # OPENING STATE of system upon initializing a projection instance
         # start at day 0
         self.current_day = 0
+        # set arbitrage mode - 'analytic' or 'chunked'
+        self.arb_mode = arb_mode
         # set current state of system
-        self.act_cover = sys_params.act_cover_now
-        self.nxm_supply = sys_params.nxm_supply_now
-        self.wnxm_supply = sys_params.wnxm_supply_now
-        self.cap_pool = sys_params.cap_pool_now
-        self.wnxm_price = sys_params.wnxm_price_now
+        self.act_cover = self.params.act_cover_now
+        self.nxm_supply = self.params.nxm_supply_now
+        self.wnxm_supply = self.params.wnxm_supply_now
+        self.cap_pool = self.params.cap_pool_now
+        self.wnxm_price = self.params.wnxm_price_now
 
         # set ETH value for wNXM price shift as a result of 1 ETH of buy/sell
         self.wnxm_move_size = wnxm_move_size
@@ -39,30 +56,52 @@ class NexusSystem:
 
         # create RANDOM VARIABLE ARRAYS for individual projection
         # base non-arb entries and exits using a poisson distribution
-        self.base_daily_platform_buys = np.random.poisson(
-                                                lam=model_params.lambda_entries,
-                                                size=model_params.model_days)
-        self.base_daily_platform_sales = np.random.poisson(
-                                                lam=model_params.lambda_exits,
-                                                size=model_params.model_days)
+        self.base_daily_platform_buys = self.streams.arrivals.poisson(
+                                                lam=self.params.lambda_entries,
+                                                size=self.params.model_days)
+        self.base_daily_platform_sales = self.streams.arrivals.poisson(
+                                                lam=self.params.lambda_exits,
+                                                size=self.params.model_days)
 
 
 
         # base premium daily incomes using a lognormal distribution
-        self.base_daily_premiums = lognorm.rvs(s=model_params.premium_shape,
-                                          loc=model_params.premium_loc,
-                                          scale=model_params.premium_scale,
-                                          size=model_params.model_days)
+        self.base_daily_premiums = self.params.premium_loc +\
+                                   self.streams.cover.lognormal(mean=np.log(self.params.premium_scale),
+                                                                sigma=self.params.premium_shape,
+                                                                size=self.params.model_days)
 
         # daily percentage changes in cover amount and wnxm price using a normal distribution
-        self.base_daily_cover_change = np.random.normal(
-                                            loc=model_params.cover_amount_mean,
-                                            scale=model_params.cover_amount_stdev,
-                                            size = model_params.model_days
+        self.base_daily_cover_change = self.streams.cover.normal(
+                                            loc=self.params.cover_amount_mean,
+                                            scale=self.params.cover_amount_stdev,
+                                            size = self.params.model_days
                                             )
 
         # daily randomised values between 0 and 1 to check vs claim occurence probability
-        self.claim_rolls = np.random.random(size = model_params.model_days)
+        self.claim_rolls = self.streams.claims.random(size = self.params.model_days)
+
+        # pre-drawn streams of lognormal ETH sizes of buys/sells and claims
+        self.sale_sizes = LognormalStream(shape=self.params.exit_shape,
+                                          loc=self.params.exit_loc,
+                                          scale=self.params.exit_scale,
+                                          rng=self.streams.sizes)
+        self.claim_sizes = LognormalStream(shape=self.params.claim_shape,
+                                           loc=self.params.claim_loc,
+                                           scale=self.params.claim_scale,
+                                           rng=self.streams.claims)
+
+        # precompiled event schedule - generated from the base entries and exits on the first day if not given
+        self.schedule = schedule
+        # jump table from event code to the method handling it
+        self.event_handlers = {RATCHET: self.ratchet_event,
+                               PLATFORM_BUY: self.platform_buy_event,
+                               PLATFORM_SALE: self.platform_sale_event,
+                               WNXM_SHIFT: self.wnxm_shift,
+                               PREMIUM_INCOME: self.premium_income,
+                               COVER_AMOUNT_CHANGE: self.cover_amount_shift,
+                               CLAIM_OUTGO: self.claim_payout,
+                               INVESTMENT_RETURN: self.investment_return}
 
         # set cumulative counters to zero
         self.cum_premiums = 0
@@ -75,27 +114,14 @@ class NexusSystem:
         self.wnxm_removed = 0
         self.wnxm_created = 0
 
-        # create tracking lists for individual instance
-        self.mcr_prediction = [self.mcr()] #1
-        self.act_cover_prediction = [self.act_cover] #2
-        self.cap_pool_prediction = [self.cap_pool] #3
-        self.mcrp_prediction = [self.mcrp()] #4
-        self.nxm_price_prediction = [self.nxm_price()] #5
-        self.wnxm_price_prediction = [self.wnxm_price] #6
-        self.liquidity_nxm_prediction = [self.liquidity_nxm] #7
-        self.liquidity_eth_prediction = [self.liquidity_eth]  #8
-        self.nxm_supply_prediction = [self.nxm_supply] #9
-        self.wnxm_supply_prediction = [self.wnxm_supply] #10
-        self.book_value_prediction = [self.book_value()] #11
-        self.cum_premiums_prediction = [self.cum_premiums] #12
-        self.cum_claims_prediction = [self.cum_claims] #13
-        self.cum_investment_prediction = [self.cum_investment] #14
-        self.eth_sold_prediction = [self.eth_sold] #15
-        self.eth_acquired_prediction = [self.eth_acquired] #16
-        self.nxm_burned_prediction = [self.nxm_burned] #17
-        self.nxm_minted_prediction = [self.nxm_minted] #18
-        self.wnxm_removed_prediction = [self.wnxm_removed] #19
-        self.wnxm_created_prediction = [self.wnxm_created] #20
+        # set tracking trajectory for individual instance and record opening state
+        self.trajectory = Trajectory(metrics=['mcr', 'act_cover', 'cap_pool', 'mcrp', 'nxm_price',
+                                              'wnxm_price', 'liquidity_nxm', 'liquidity_eth', 'nxm_supply',
+                                              'wnxm_supply', 'book_value', 'cum_premiums', 'cum_claims',
+                                              'cum_investment', 'eth_sold', 'eth_acquired', 'nxm_burned',
+                                              'nxm_minted', 'wnxm_removed', 'wnxm_created'],
+                                     length=self.params.model_days + 1)
+        self.trajectory.record(self)
 
     # INSTANCE FUNCTIONS
     # to calculate a variety of ongoing metrics & parameters
@@ -104,7 +130,7 @@ class NexusSystem:
     # calculate mcr from current cover amount
     # minimum of 0.01 ETH to avoid division by zero
     def mcr(self):
-        return max(0.01, self.act_cover / sys_params.capital_factor)
+        return max(0.01, self.act_cover / self.params.capital_factor)
 
     # calculate mcr% from current assets and mcr size.
     def mcrp(self):
@@ -124,13 +150,9 @@ class NexusSystem:
     # either with platform or wNXM market
     def nxm_sale_size(self, denom='nxm'):
         if denom == 'nxm':
-            return lognorm.rvs(s=model_params.exit_shape,
-                               loc=model_params.exit_loc,
-                               scale=model_params.exit_scale) / self.nxm_price()
+            return self.sale_sizes.draw() / self.nxm_price()
         elif denom == 'eth':
-            return lognorm.rvs(s=model_params.exit_shape,
-                               loc=model_params.exit_loc,
-                               scale=model_params.exit_scale)
+            return self.sale_sizes.draw()
 
     # one sale of n_nxm NXM
     def platform_nxm_sale(self, n_nxm):
@@ -216,6 +238,56 @@ class NexusSystem:
         # sell to open market
         self.wnxm_market_sell(n_wnxm=num, arb=True)
 
+    def arbitrage(self):
+        if self.arb_mode == 'chunked':
+            self.chunked_arbitrage()
+        else:
+            self.analytic_arbitrage()
+
+    def chunked_arbitrage(self):
+        while min(self.nxm_price(), self.book_value()) > self.wnxm_price:
+            self.arb_sale_transaction()
+        while max(self.nxm_price(), self.book_value()) < self.wnxm_price:
+            self.arb_buy_transaction()
+
+    # book value after a platform sale (+n_nxm) or buy (-n_nxm) without changing state
+    def book_value_after(self, n_nxm):
+        new_eth = self.invariant / (self.liquidity_nxm + n_nxm)
+        return (self.cap_pool - self.liquidity_eth + new_eth) / (self.nxm_supply - n_nxm)
+
+    def analytic_arbitrage(self):
+        # system price > wnxm_price arb
+            # sale stops once either the pool price or book value meets the wnxm price
+            # pool price has a closed form, book value is found within it by bisection
+            # limit to number of nxm supply and wnxm supply
+        if min(self.nxm_price(), self.book_value()) > self.wnxm_price and \
+                self.nxm_supply > 0 and self.wnxm_supply > 0:
+            num = arb_sale_size(self.liquidity_eth, self.liquidity_nxm, self.wnxm_price, self.wnxm_move_size)
+            num = min(num, self.wnxm_supply, self.nxm_supply)
+            gap = lambda n: self.book_value_after(n) - wnxm_price_after(self.wnxm_price, n, self.wnxm_move_size)
+            if gap(num) < 0:
+                num = decreasing_root(gap, 0, num)
+            # buy from open market with the price impact compounded over the whole trade
+            self.wnxm_price = wnxm_price_after(self.wnxm_price, num, self.wnxm_move_size)
+            self.wnxm_supply -= num
+            self.wnxm_removed += num
+            # sell to platform
+            self.platform_nxm_sale(n_nxm=num)
+
+        # system price < wnxm_price arb
+            # buy stops once either the pool price or book value meets the wnxm price
+        if max(self.nxm_price(), self.book_value()) < self.wnxm_price:
+            num = arb_buy_size(self.liquidity_eth, self.liquidity_nxm, self.wnxm_price, self.wnxm_move_size)
+            gap = lambda n: wnxm_price_after(self.wnxm_price, -n, self.wnxm_move_size) - self.book_value_after(-n)
+            if gap(num) < 0:
+                num = decreasing_root(gap, 0, num)
+            # buy from platform
+            self.platform_nxm_buy(n_nxm=num)
+            # sell to open market with the price impact compounded over the whole trade
+            self.wnxm_price = wnxm_price_after(self.wnxm_price, -num, self.wnxm_move_size)
+            self.wnxm_supply += num
+            self.wnxm_created += num
+
     def ratchet_up(self, num, kind='nxm'):
         if kind == 'nxm':
             self.liquidity_nxm -= num
@@ -234,8 +306,8 @@ class NexusSystem:
 
     # daily percentage change in wNXM price
     def wnxm_shift(self):
-        self.wnxm_price *= (1 + np.random.normal(loc=model_params.wnxm_drift,
-                                                 scale=model_params.wnxm_diffusion)
+        self.wnxm_price *= (1 + self.streams.wnxm.normal(loc=self.params.wnxm_drift,
+                                                         scale=self.params.wnxm_diffusion)
                             )
 
     # daily percentage change in active cover amount
@@ -244,7 +316,7 @@ class NexusSystem:
 
     # premium & claim scaling based on active cover vs opening active cover
     def act_cover_scaler(self):
-        return self.act_cover / sys_params.act_cover_now
+        return self.act_cover / self.params.act_cover_now
 
     # daily premium income and additions to nxm supply & cap pool
     # (scaled relative to active cover amount)
@@ -261,115 +333,105 @@ class NexusSystem:
     # claim amount is removed from pool and 50% of corresponding staking nxm burnt
     # logged in cumulative claims
     def claim_payout(self):
-        if self.claim_rolls[self.current_day] < model_params.claim_prob:
-            claim_size = lognorm.rvs(s=model_params.claim_shape,
-                                     loc=model_params.claim_loc,
-                                     scale=model_params.claim_scale) *\
-                            self.act_cover_scaler()
+        if self.claim_rolls[self.current_day] < self.params.claim_prob:
+            claim_size = self.claim_sizes.draw() * self.act_cover_scaler()
 
             self.nxm_supply = max(0, self.nxm_supply - 0.5 * claim_size/self.wnxm_price)
-            self.nxm_supply += model_params.claim_ass_reward * claim_size/self.wnxm_price
+            self.nxm_supply += self.params.claim_ass_reward * claim_size/self.wnxm_price
             self.cap_pool = max(0, self.cap_pool - claim_size)
             self.cum_claims += claim_size
 
     # work out daily return on capital pool and add to cap pool and cumulative
     def investment_return(self):
-        inv_return = model_params.daily_investment_return * self.cap_pool
+        inv_return = self.params.daily_investment_return * self.cap_pool
         self.cap_pool += inv_return
         self.cum_investment += inv_return
 
+    # EVENTS
+    # ratchet price towards book value
+    def ratchet_event(self):
+        # up if below BV
+        if self.book_value() > self.nxm_price():
+            self.ratchet_up(num=self.params.ratchet_up_perc*self.liquidity_nxm, kind='nxm')
+        # down if above BV
+        elif self.book_value() < self.nxm_price():
+            self.ratchet_down(num=self.params.ratchet_down_perc*self.liquidity_nxm, kind='nxm')
+
+    # platform buy - not arbitrage-driven
+    def platform_buy_event(self):
+        # doesn't happen if wnxm price is below platform price or book value
+        if max(self.nxm_price(), self.book_value()) > self.wnxm_price:
+            return
+        # otherwise execute the buy
+        self.platform_nxm_buy(n_nxm=self.nxm_sale_size())
+
+    # platform sale - not arbitrage-driven
+    def platform_sale_event(self):
+        # doesn't happen if wnxm price is above platform price or book value
+        if min(self.nxm_price(), self.book_value()) < self.wnxm_price:
+            return
+        # otherwise execute the sell
+        self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
+
+    # number of each event per day the schedule is generated from
+    def schedule_counts(self):
+        return {RATCHET: 1,
+                PLATFORM_BUY: self.base_daily_platform_buys,
+                PLATFORM_SALE: self.base_daily_platform_sales,
+                WNXM_SHIFT: 1,
+                PREMIUM_INCOME: 1,
+                CLAIM_OUTGO: 1,
+                COVER_AMOUNT_CHANGE: 1,
+                INVESTMENT_RETURN: 1}
+
+    # generate the event schedule for the whole projection, shuffled within each day
+    def event_schedule(self):
+        if self.schedule is None:
+            self.schedule = EventSchedule.build(counts=self.schedule_counts(),
+                                                days=self.params.model_days,
+                                                rng=self.streams.shuffle)
+        return self.schedule
+
+    # draw extra days of the random variable arrays when extending a run, from the same streams
+    def extend_arrivals(self, extra_days):
+        self.base_daily_platform_buys = np.concatenate((self.base_daily_platform_buys,
+                                                        self.streams.arrivals.poisson(
+                                                            lam=self.params.lambda_entries,
+                                                            size=extra_days)))
+        self.base_daily_platform_sales = np.concatenate((self.base_daily_platform_sales,
+                                                         self.streams.arrivals.poisson(
+                                                             lam=self.params.lambda_exits,
+                                                             size=extra_days)))
+        self.base_daily_premiums = np.concatenate((self.base_daily_premiums,
+                                                   self.params.premium_loc +
+                                                   self.streams.cover.lognormal(
+                                                       mean=np.log(self.params.premium_scale),
+                                                       sigma=self.params.premium_shape,
+                                                       size=extra_days)))
+        self.base_daily_cover_change = np.concatenate((self.base_daily_cover_change,
+                                                       self.streams.cover.normal(
+                                                           loc=self.params.cover_amount_mean,
+                                                           scale=self.params.cover_amount_stdev,
+                                                           size=extra_days)))
+        self.claim_rolls = np.concatenate((self.claim_rolls, self.streams.claims.random(size=extra_days)))
+
     # create DAY LOOP
     def one_day_passes(self):
-        # create list of events that happen today and shuffle them to be random
-        events_today = []
-        events_today.extend(['ratchet'])
-        events_today.extend(['platform_buy'] * self.base_daily_platform_buys[self.current_day])
-        events_today.extend(['platform_sale'] * self.base_daily_platform_sales[self.current_day])
-        events_today.extend(['wnxm_shift'])
-        events_today.extend(['premium_income'])
-        events_today.extend(['claim_outgo'])
-        events_today.extend(['cover_amount_change'])
-        events_today.extend(['investment_return'])
-        shuffle(events_today)
+        # today's events from the precompiled schedule
+        events_today = self.event_schedule().day(self.current_day).tolist()
 
         # LOOP THROUGH EVENTS OF DAY
         for event in events_today:
 
             #-----WNXM ARBITRAGE-----#
             # happens in between all events
-            while min(self.nxm_price(), self.book_value()) > self.wnxm_price:
-                self.arb_sale_transaction()
-            while max(self.nxm_price(), self.book_value()) < self.wnxm_price:
-                self.arb_buy_transaction()
-
-            #-----RATCHET-----#
-            if event == 'ratchet':
-                # up if below BV
-                if self.book_value() > self.nxm_price():
-                    self.ratchet_up(num=sys_params.ratchet_up_perc*self.liquidity_nxm, kind='nxm')
-                # down if above BV
-                elif self.book_value() < self.nxm_price():
-                    self.ratchet_down(num=sys_params.ratchet_down_perc*self.liquidity_nxm, kind='nxm')
-
-            #-----PLATFORM BUY-----#
-            # not arbitrage-driven
-            elif event == 'platform_buy':
-                # doesn't happen if wnxm price is below platform price or book value
-                if max(self.nxm_price(), self.book_value()) > self.wnxm_price:
-                    continue
-                # otherwise execute the buy
-                self.platform_nxm_buy(n_nxm=self.nxm_sale_size())
-
-            #-----PLATFORM SALE-----#
-            # not arbitrage-driven
-            elif event == 'platform_sale':
-                # doesn't happen if wnxm price is above platform price or book value
-                if min(self.nxm_price(), self.book_value()) < self.wnxm_price:
-                    continue
-                # otherwise execute the sell
-                self.platform_nxm_sale(n_nxm=self.nxm_sale_size())
-
-            #-----WNXM RANDOM MARKET MOVEMENT-----#
-            elif event == 'wnxm_shift':
-                self.wnxm_shift()
-
-            #-----PREMIUM INCOME TO POOL-----#
-            elif event == 'premium_income':
-                self.premium_income()
-
-            #-----DAILY CHANGE IN COVER AMOUNT-----#
-            elif event == 'cover_amount_change':
-                self.cover_amount_shift()
-
-            #-----CLAIM EVENT-----#
-            elif event == 'claim_outgo':
-                self.claim_payout()
-
-            #-----INVESTMENT RETURN-----#
-            elif event == 'investment_return':
-                self.investment_return()
-
-        # append values to tracking metrics
-        self.mcr_prediction.append(self.mcr()) #1
-        self.act_cover_prediction.append(self.act_cover) #2
-        self.cap_pool_prediction.append(self.cap_pool) #3
-        self.mcrp_prediction.append(self.mcrp()) #4
-        self.nxm_price_prediction.append(self.nxm_price()) #5
-        self.wnxm_price_prediction.append(self.wnxm_price) #6
-        self.liquidity_nxm_prediction.append(self.liquidity_nxm) #7
-        self.liquidity_eth_prediction.append(self.liquidity_eth) #8
-        self.nxm_supply_prediction.append(self.nxm_supply) #9
-        self.wnxm_supply_prediction.append(self.wnxm_supply) #10
-        self.book_value_prediction.append(self.book_value()) #11
-        self.cum_premiums_prediction.append(self.cum_premiums) #12
-        self.cum_claims_prediction.append(self.cum_claims) #13
-        self.cum_investment_prediction.append(self.cum_investment) #14
-        self.eth_sold_prediction.append(self.eth_sold) #15
-        self.eth_acquired_prediction.append(self.eth_acquired) #16
-        self.nxm_burned_prediction.append(self.nxm_burned) #17
-        self.nxm_minted_prediction.append(self.nxm_minted) #18
-        self.wnxm_removed_prediction.append(self.wnxm_removed) #19
-        self.wnxm_created_prediction.append(self.wnxm_created) #20
+            self.arbitrage()
+
+            #-----EVENT-----#
+            self.event_handlers[event]()
+
+        # record values in tracking trajectory
+        self.trajectory.record(self)
 
         # increment day
         self.current_day += 1
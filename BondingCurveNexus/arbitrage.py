@@ -0,0 +1,97 @@
+'''
+Closed-form sizing of wNXM-NXM arbitrage against a virtual Uni v2-style RAMM pool.
+
+The chunked arbitrage loops in the markets models trade small lots until the pool price
+and the wNXM price meet. Each lot of n_i NXM moves the wNXM price by a factor of
+(1 +/- wnxm_move_size * n_i), so over the whole trade of n NXM the wNXM price compounds to
+    wnxm_price * exp(+/- wnxm_move_size * n)
+while the pool price after the trade is k / u^2, with u the NXM reserve after the trade.
+
+Setting the two equal gives, for both directions of the arb,
+    2 * log(u) + m * u = log(k / wnxm_price) + m * y
+with y the NXM reserve before the trade and m the wNXM move size.
+This is solved exactly with the Lambert W function:
+    u = (2 / m) * W((m / 2) * sqrt(k / wnxm_price) * exp(m * y / 2))
+Only the real branch for positive arguments is needed, so W is computed in lambertw_real with a few
+Halley iterations on real arrays - to machine precision, and much faster than scipy's complex lambertw
+on the whole-batch arrays of RAMMMarketsBatch.
+
+Arbitrage sales into the pool then trade n = u - y NXM, and arbitrage buys from the pool n = y - u.
+
+When the whole arb is instead executed as one trade against wNxmMarket's linear impact model,
+the wNXM price moves once by a factor of (1 +/- wnxm_move_size * n), and the equilibrium is the root of the cubic
+    k / u^2 = wnxm_price * (1 + m * (u - y))
+which lies between y and sqrt(k / wnxm_price) and is found by bisection in linear_equilibrium_nxm_reserve.
+All functions work on floats as well as NumPy arrays.
+'''
+
+import math
+
+import numpy as np
+
+# principal branch of the Lambert W function (w * exp(w) = z) for z >= 0
+def lambertw_real(z, iterations=3):
+    # starting point from the asymptotic expansion for large z, log(1 + z) otherwise
+    # single values are worked on as python floats, where numpy's per-call overhead would dominate
+    if np.ndim(z) == 0:
+        z = float(z)
+        w = math.log(z) - math.log(math.log(z)) if z > 3 else math.log1p(z)
+        exp = math.exp
+    else:
+        z = np.asarray(z, dtype=float)
+        log_z = np.log(np.maximum(z, 3))
+        w = np.where(z > 3, log_z - np.log(log_z), np.log1p(z))
+        exp = np.exp
+    # Halley's method, with w * exp(w) - z scaled by exp(-w) so that large z can't overflow
+    for i in range(iterations):
+        g = w - z * exp(-w)
+        w = w - g / ((w + 1) - (w + 2) * g / (2 * w + 2))
+    return w
+
+# find the NXM reserve at which the pool price equals the (moving) wNXM price
+def equilibrium_nxm_reserve(liq_eth, liq_nxm, wnxm_price, wnxm_move_size):
+    invariant = liq_eth * liq_nxm
+
+    # without any wNXM price impact, the pool simply moves to the wNXM price
+    if wnxm_move_size == 0:
+        return np.sqrt(invariant / wnxm_price)
+
+    z = wnxm_move_size / 2 * np.sqrt(invariant / wnxm_price) * np.exp(wnxm_move_size * liq_nxm / 2)
+    return 2 / wnxm_move_size * lambertw_real(z)
+
+# number of NXM an arbitrageur sells into the pool (buying wNXM) until prices equalise
+def arb_sale_size(liq_eth, liq_nxm, wnxm_price, wnxm_move_size):
+    return np.maximum(equilibrium_nxm_reserve(liq_eth, liq_nxm, wnxm_price, wnxm_move_size) - liq_nxm, 0)
+
+# number of NXM an arbitrageur buys from the pool (selling wNXM) until prices equalise
+def arb_buy_size(liq_eth, liq_nxm, wnxm_price, wnxm_move_size):
+    return np.maximum(liq_nxm - equilibrium_nxm_reserve(liq_eth, liq_nxm, wnxm_price, wnxm_move_size), 0)
+
+# find the NXM reserve at which the pool price equals the wNXM price moved linearly by a single trade
+def linear_equilibrium_nxm_reserve(liq_eth, liq_nxm, wnxm_price, wnxm_move_size, iterations=100):
+    invariant = liq_eth * liq_nxm
+    no_impact = np.sqrt(invariant / wnxm_price)
+    # pool price minus moved wNXM price is decreasing in u and changes sign between the two bounds
+    low = np.minimum(liq_nxm, no_impact)
+    high = np.maximum(liq_nxm, no_impact)
+    for i in range(iterations):
+        mid = (low + high) / 2
+        above = invariant / mid ** 2 > wnxm_price * (1 + wnxm_move_size * (mid - liq_nxm))
+        low = np.where(above, mid, low)
+        high = np.where(above, high, mid)
+    return (low + high) / 2
+
+# wNXM price after buying (+n) or selling (-n) NXM worth of wNXM in infinitesimal lots
+def wnxm_price_after(wnxm_price, n_wnxm, wnxm_move_size):
+    return wnxm_price * np.exp(wnxm_move_size * n_wnxm)
+
+# bisection for the root of a decreasing function on [low, high]
+# used where the arb is stopped by a condition without a closed form (e.g. book value)
+def decreasing_root(func, low, high, iterations=100):
+    for i in range(iterations):
+        mid = (low + high) / 2
+        if func(mid) > 0:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
@@ -0,0 +1,46 @@
+'''
+Check of the closed-form arbitrage against the original chunked loop:
+ - shocks the wNXM price away from the RAMM pool prices by a range of factors
+ - runs one arbitrage in each mode from the same starting state
+ - reports the relative difference in post-arb state and the time taken per arbitrage
+
+The chunked loop overshoots by up to one random lot, so small differences remain in the spot prices;
+state variables (capital pool, supplies, wNXM price) should agree within the tolerance.
+The same agreement is asserted in tests/test_arbitrage.py.
+'''
+
+import time
+
+import numpy as np
+
+from BondingCurveNexus.RAMM_markets_stoch import RAMMMarketsStoch
+
+
+if __name__ == "__main__":
+
+    # wNXM price shocks relative to the pool price on the relevant side
+    shocks = [0.5, 0.7, 0.9, 1.1, 1.3, 2.0]
+    # relative tolerance for post-arb state variables
+    tolerance = 5e-3
+    # state compared after arbitrage
+    metrics = ['cap_pool', 'nxm_supply', 'wnxm_supply', 'wnxm_price']
+
+    print(f'{"shock":>6}{"max rel diff":>14}{"chunked ms":>12}{"analytic ms":>13}{"ok":>5}')
+    for shock in shocks:
+        results = {}
+        timings = {}
+        for mode in ['chunked', 'analytic']:
+            sim = RAMMMarketsStoch(arb_mode=mode, seed=0)
+            if shock < 1:
+                sim.wnxm_price = sim.sell_nxm_price() * shock
+            else:
+                sim.wnxm_price = sim.buy_nxm_price() * shock
+
+            start = time.perf_counter()
+            sim.arbitrage()
+            timings[mode] = (time.perf_counter() - start) * 1e3
+            results[mode] = np.array([getattr(sim, metric) for metric in metrics])
+
+        max_diff = np.max(np.abs(results['chunked'] / results['analytic'] - 1))
+        print(f'{shock:>6}{max_diff:>14.2e}{timings["chunked"]:>12.3f}{timings["analytic"]:>13.3f}'
+              f'{"yes" if max_diff < tolerance else "no":>5}')
@@ -0,0 +1,56 @@
+'''
+Benchmark of the batch RAMM markets engine against the scalar stochastic class:
+ - times a number of scalar RAMMMarketsStoch paths and extrapolates to the batch size
+ - times RAMMMarketsBatch stepping all paths at once, with the numpy engine and the compiled numba engine
+ - all with the analytic arb_mode, the only mode of the numba engine
+The final-day distributions of the engines are compared with a two-sample KS test in tests/test_batch.py.
+
+At 10,000 paths over 180 days the numba engine runs about 60-80x faster per path than the scalar class
+and the numpy engine about 40-50x.
+Without numba installed the numba engine runs its kernel as plain python and is slower than the scalar class.
+'''
+
+import time
+
+from tqdm import tqdm
+
+from BondingCurveNexus.RAMM_markets_stoch import RAMMMarketsStoch
+from BondingCurveNexus.RAMM_markets_batch import RAMMMarketsBatch
+from BondingCurveNexus.RAMM_markets_batch_kernel import NUMBA_AVAILABLE
+from BondingCurveNexus.model_params import model_days
+
+
+if __name__ == "__main__":
+
+    # number of paths for each engine
+    num_scalar_sims = 200
+    num_batch_sims = 10_000
+    # arbitrage mode of all engines
+    arb_mode = 'analytic'
+
+    # SCALAR ENGINE
+    start = time.perf_counter()
+    sims = [RAMMMarketsStoch(arb_mode=arb_mode) for x in range(num_scalar_sims)]
+    for sim in tqdm(sims):
+        for i in range(model_days):
+            sim.one_day_passes()
+    scalar_time = time.perf_counter() - start
+    scalar_per_path = scalar_time / num_scalar_sims
+    print(f'scalar: {scalar_time:.1f}s for {num_scalar_sims} paths ({scalar_per_path * 1e3:.2f} ms/path)')
+
+    # BATCH ENGINES
+    # compile the numba kernel on a small batch first, so that compilation isn't timed
+    if NUMBA_AVAILABLE:
+        RAMMMarketsBatch(n_paths=10, arb_mode=arb_mode, engine='numba').one_day_passes()
+
+    for engine in ['numpy', 'numba']:
+        start = time.perf_counter()
+        batch = RAMMMarketsBatch(n_paths=num_batch_sims, arb_mode=arb_mode, engine=engine)
+        for i in tqdm(range(model_days)):
+            batch.one_day_passes()
+        batch_time = time.perf_counter() - start
+
+        batch_per_path = batch_time / num_batch_sims
+        print(f'batch ({engine}): {batch_time:.1f}s for {num_batch_sims} paths '
+              f'({batch_per_path * 1e3:.2f} ms/path)')
+        print(f'speedup at {num_batch_sims} paths: {scalar_per_path / batch_per_path:.0f}x')
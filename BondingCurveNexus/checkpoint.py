@@ -0,0 +1,91 @@
+'''
+Checkpoint and resume for long simulations.
+
+The model classes hold all of their state in instance attributes - pools, counters, random streams
+(including the position within pre-drawn blocks), the event schedule and the trajectory recorded so far.
+Checkpointable.checkpoint(path) writes all of it to one compressed binary file,
+and load_checkpoint(path) gives back a model that continues exactly where the original stopped:
+    sim.checkpoint('sim.ckpt')
+    ...
+    sim = load_checkpoint('sim.ckpt').resume()
+
+resume(extra_days=n) runs on past the original model_days. The daily arrival arrays and the event schedule
+are sized to model_days when a model is created, so extending first draws n more days of arrivals
+(from the model's own random streams, or by repeating the last day for the deterministic models)
+and appends n more days to the schedule. A resumed run is fully determined by its checkpoint,
+and resuming from a checkpoint taken part way through gives the same trajectory as never stopping.
+
+Only the recorded rows of the trajectory are written, so a checkpoint is tens of kB rather than the full preallocated buffers.
+Models using it define schedule_counts() (the per-day event counts their schedule is built from)
+and extend_arrivals(extra_days).
+'''
+
+import os
+import pickle
+import zlib
+
+import numpy as np
+
+from BondingCurveNexus.schedule import EventSchedule
+
+# format of the checkpoint files - bumped if it ever changes
+CHECKPOINT_VERSION = 1
+
+def load_checkpoint(path):
+    '''
+    Model instance saved to path with checkpoint().
+    '''
+    with open(path, 'rb') as file:
+        version, sim = pickle.loads(zlib.decompress(file.read()))
+    if version != CHECKPOINT_VERSION:
+        raise ValueError(f'checkpoint {path} has version {version}, expected {CHECKPOINT_VERSION}')
+    return sim
+
+# append values for extra days to a daily array, repeating its last day
+def repeat_last_day(array, extra_days):
+    array = np.asarray(array)
+    last = array[-1] if len(array) else 0
+    return np.concatenate((array, np.full(extra_days, last, dtype=array.dtype)))
+
+class Checkpointable:
+
+    # write the whole model state to path, through a temporary file so a crash never leaves half a checkpoint
+    def checkpoint(self, path):
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(zlib.compress(pickle.dumps((CHECKPOINT_VERSION, self), protocol=pickle.HIGHEST_PROTOCOL)))
+        os.replace(temporary, path)
+
+    # add extra_days to the projection - more daily arrivals, a longer schedule and model_days
+    def extend(self, extra_days):
+        days = self.params.model_days
+        self.params = self.params.replace(model_days=days + extra_days)
+        self.extend_arrivals(extra_days)
+
+        # a schedule not generated yet is generated for the new model_days on the first day
+        if self.schedule is not None:
+            counts = {code: count[days:] if np.ndim(count) else count
+                      for code, count in self.schedule_counts().items()}
+            self.schedule = self.schedule.append(EventSchedule.build(counts=counts,
+                                                                     days=extra_days,
+                                                                     rng=self.streams.shuffle,
+                                                                     timed=self.schedule.times is not None))
+
+    def resume(self, extra_days=0, checkpoint_path=None, checkpoint_every=None, progress=False):
+        '''
+        Run on to model_days (plus extra_days if given) from the current day and return the model.
+        If checkpoint_path is given, a checkpoint is written there every checkpoint_every days.
+        '''
+        from tqdm import tqdm
+
+        if extra_days:
+            self.extend(extra_days)
+
+        for i in tqdm(range(self.current_day, self.params.model_days), disable=not progress):
+            try:
+                self.one_day_passes()
+            except ZeroDivisionError:
+                break
+            if checkpoint_path is not None and checkpoint_every and self.current_day % checkpoint_every == 0:
+                self.checkpoint(checkpoint_path)
+        return self
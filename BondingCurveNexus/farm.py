@@ -0,0 +1,150 @@
+'''
+Parallel farm of local hardhat nodes for running on-chain scenarios.
+
+Each on-chain scenario otherwise runs serially against one node, reverting to a snapshot between runs.
+farm() instead starts num_nodes local hardhat nodes from the same deployment state
+(forking the same url at the same block if given, otherwise as configured in hardhat.config),
+and runs one worker process per node that takes scenarios off a shared work queue.
+
+Each worker connects ape to its own node and calls connect(provider) once to set up the contracts
+(e.g. approvals and circuit breaker limits), then snapshots that state.
+Every scenario runs from the snapshot and the node is reverted after it, independently of the other nodes.
+
+A scenario is a function taking the object returned by connect and returning a Trajectory
+or a dictionary of equal-length metric arrays. Scenarios are given as a dictionary of {name: function},
+and their results are collected into one tidy DataFrame with a row per scenario and step:
+    results = farm({f'exit_{n}': partial(exit_scenario, nxm_exiting=n) for n in NXM_exit_values},
+                   connect, num_nodes=8, fork_url=fork_url, fork_block=fork_block)
+
+Workers are forked, so scenarios and connect can be any functions, including closures defined in a script.
+'''
+
+import json
+import multiprocessing
+import os
+import queue
+import subprocess
+import time
+import urllib.error
+import urllib.request
+
+import pandas as pd
+from tqdm import tqdm
+
+# start a local hardhat node on a port, forking url at block if given
+def start_node(port, fork_url=None, fork_block=None, command=('npx', 'hardhat', 'node')):
+    args = list(command) + ['--port', str(port)]
+    if fork_url is not None:
+        args += ['--fork', fork_url]
+    if fork_block is not None:
+        args += ['--fork-block-number', str(fork_block)]
+    return subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+# wait until the node on a port answers JSON-RPC requests
+def wait_for_node(port, process, timeout=300):
+    request = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'eth_chainId', 'params': []}).encode()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'hardhat node on port {port} exited with code {process.returncode}')
+        try:
+            urllib.request.urlopen(urllib.request.Request(f'http://127.0.0.1:{port}', data=request,
+                                                          headers={'Content-Type': 'application/json'}),
+                                   timeout=5)
+            return
+        except urllib.error.HTTPError:
+            # answering at all means the node is up
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f'hardhat node on port {port} did not start within {timeout}s')
+
+# metric columns of a scenario result
+def result_columns(result):
+    return result.to_dict() if hasattr(result, 'to_dict') else dict(result)
+
+# worker process - runs scenarios from the queue on the node at port
+def work(port, scenarios, connect, tasks, results):
+    from ape import networks
+
+    with networks.parse_network_choice(f'http://127.0.0.1:{port}') as provider:
+        node = connect(provider)
+        snapshot = provider.snapshot()
+        while True:
+            name = tasks.get()
+            if name is None:
+                break
+            try:
+                results.put((name, result_columns(scenarios[name](node)), None))
+            except Exception as error:
+                results.put((name, None, repr(error)))
+            # reverting uses up a hardhat snapshot, so take a new one from the same state
+            provider.revert(snapshot)
+            snapshot = provider.snapshot()
+
+def farm(scenarios, connect, num_nodes=None, fork_url=None, fork_block=None, base_port=8546,
+         node_command=('npx', 'hardhat', 'node'), progress=True):
+    '''
+    Run on-chain scenarios in parallel across num_nodes local hardhat nodes (defaults to all cores).
+
+    Returns a tidy DataFrame with the scenario name, step and metrics of every scenario that completed.
+    Errors of scenarios that failed are kept in results.attrs['errors'] as {name: error}.
+    '''
+    num_nodes = min(num_nodes or os.cpu_count(), len(scenarios))
+    ports = [base_port + i for i in range(num_nodes)]
+    nodes = [start_node(port, fork_url, fork_block, node_command) for port in ports]
+
+    columns = {}
+    errors = {}
+    try:
+        for port, process in zip(ports, nodes):
+            wait_for_node(port, process)
+
+        context = multiprocessing.get_context('fork')
+        tasks = context.Queue()
+        results = context.Queue()
+        for name in scenarios:
+            tasks.put(name)
+        # one stop signal per worker
+        for port in ports:
+            tasks.put(None)
+
+        workers = [context.Process(target=work, args=(port, scenarios, connect, tasks, results))
+                   for port in ports]
+        for worker in workers:
+            worker.start()
+
+        with tqdm(total=len(scenarios), disable=not progress) as bar:
+            while len(columns) + len(errors) < len(scenarios):
+                try:
+                    name, result, error = results.get(timeout=5)
+                except queue.Empty:
+                    # stop waiting if every worker has died
+                    if not any(worker.is_alive() for worker in workers):
+                        break
+                    continue
+                if error is None:
+                    columns[name] = result
+                else:
+                    errors[name] = error
+                    print(f'scenario {name} failed: {error}')
+                bar.update()
+
+        for worker in workers:
+            worker.join()
+    finally:
+        for process in nodes:
+            process.terminate()
+        for process in nodes:
+            process.wait()
+
+    frames = []
+    for name in scenarios:
+        if name in columns:
+            frame = pd.DataFrame(columns[name])
+            frame.insert(0, 'step', range(len(frame)))
+            frame.insert(0, 'scenario', name)
+            frames.append(frame)
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    table.attrs['errors'] = errors
+    return table
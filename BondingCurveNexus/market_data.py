@@ -0,0 +1,149 @@
+'''
+Lazy, offline-capable loader for the live market values used in sys_params.
+
+The current NXM and wNXM supplies are pulled from market data rather than fixed.
+Instead of requesting them at import, a MarketSnapshot loads them on first access from a pluggable source:
+ - live_source() - CoinGecko HTTP api (requires network access)
+ - file_source(path) - a JSON or CSV snapshot file, e.g. one written by MarketSnapshot.save()
+ - fixture_source(values) - an in-memory dictionary, e.g. for tests
+
+Live values are kept in an on-disk cache for a time-to-live (a day by default),
+so every process started within that window (including sweep workers) reads the same cached snapshot
+instead of hitting the network. If the live request fails, a stale cache is used if one exists.
+
+The default snapshot is used by sys_params and can be pinned to a file for reproducible runs,
+either with set_source(file_source(path)) or with the NEXUS_MARKET_SNAPSHOT environment variable.
+
+Can be run from the command line to save the current snapshot:
+    python -m BondingCurveNexus.market_data snapshot.json
+'''
+
+import argparse
+import csv
+import json
+import os
+import time
+
+# market values provided by a snapshot
+SNAPSHOT_FIELDS = ['wnxm_supply_now', 'nxm_supply_now']
+
+# coingecko api endpoints
+wnxm_supply_url = 'https://api.coingecko.com/api/v3/coins/wrapped-nxm'
+nxm_supply_url = 'https://api.coingecko.com/api/v3/coins/nxm'
+
+# default on-disk cache location and time-to-live in seconds
+default_cache_path = os.path.join(os.path.expanduser('~'), '.cache', 'BondingCurveNexus', 'market_snapshot.json')
+default_ttl = 24 * 60 * 60
+
+# SOURCES
+# each source is a function returning a dictionary of the snapshot fields
+def live_source(timeout=10):
+    def load():
+        import requests
+        return {
+            'wnxm_supply_now': requests.get(wnxm_supply_url, timeout=timeout).json()['market_data']['total_supply'],
+            'nxm_supply_now': requests.get(nxm_supply_url, timeout=timeout).json()['market_data']['total_supply'],
+            }
+    load.live = True
+    return load
+
+def file_source(path):
+    def load():
+        if path.endswith('.csv'):
+            # two columns - field, value
+            with open(path, newline='') as file:
+                return {row[0]: float(row[1]) for row in csv.reader(file) if row and row[0] in SNAPSHOT_FIELDS}
+        with open(path) as file:
+            return json.load(file)
+    return load
+
+def fixture_source(values):
+    def load():
+        return dict(values)
+    return load
+
+class MarketSnapshot:
+
+    def __init__(self, source=None, cache_path=default_cache_path, ttl=default_ttl):
+        self.source = source if source is not None else live_source()
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.values = None
+
+    def __getitem__(self, name):
+        return self.load()[name]
+
+    # load values on first access - only live sources use the on-disk cache
+    def load(self):
+        if self.values is None:
+            if getattr(self.source, 'live', False) and self.cache_path:
+                self.values = self.load_cached()
+            else:
+                self.values = self.source()
+            missing = set(SNAPSHOT_FIELDS) - set(self.values)
+            if missing:
+                raise KeyError(f'Market snapshot is missing {sorted(missing)}')
+        return self.values
+
+    # read the cache if it is fresh, otherwise refresh it from the source
+    # falling back to a stale cache if the source fails (e.g. offline)
+    def load_cached(self):
+        cached = self.read_cache()
+        if cached is not None and time.time() - cached['timestamp'] < self.ttl:
+            return cached['values']
+        try:
+            values = self.source()
+        except Exception:
+            if cached is not None:
+                return cached['values']
+            raise
+        self.write_cache(values)
+        return values
+
+    def read_cache(self):
+        try:
+            with open(self.cache_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def write_cache(self, values):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            # write to a temporary file and rename so concurrent processes never read a partial cache
+            temp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w') as file:
+                json.dump({'timestamp': time.time(), 'values': values}, file)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
+
+    # save the loaded values to a JSON snapshot file, to be pinned with file_source
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.load(), file, indent=4)
+
+# DEFAULT SNAPSHOT used by sys_params, created on first use
+_snapshot = None
+
+def snapshot():
+    global _snapshot
+    if _snapshot is None:
+        pinned_path = os.environ.get('NEXUS_MARKET_SNAPSHOT')
+        _snapshot = MarketSnapshot(file_source(pinned_path) if pinned_path else None)
+    return _snapshot
+
+# replace the source of the default snapshot, e.g. set_source(file_source('snapshot.json'))
+def set_source(source, **kwargs):
+    global _snapshot
+    _snapshot = MarketSnapshot(source, **kwargs)
+    return _snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Save the current market snapshot to a JSON file.')
+    parser.add_argument('path', help='JSON file to write')
+    args = parser.parse_args()
+
+    snapshot().save(args.path)
+    print(f'Market snapshot saved to {args.path}: {snapshot().load()}')
@@ -41,7 +41,8 @@ det_exit_array = np.full(shape=model_days, fill_value=lambda_exits, dtype=int)
 wnxm_shifts_per_day = 1
 # wnxm price movements (normal distribution of % change per shift)
 wnxm_drift = 0
-wnxm_diffusion = (1+0.065)**(1/wnxm_shifts_per_day) - 1
+wnxm_daily_diffusion = 0.065
+wnxm_diffusion = (1+wnxm_daily_diffusion)**(1/wnxm_shifts_per_day) - 1
 
 # wnxm price movement per eth of buy/sell pressure
 # size based on 500,000 USD moving the price by 2% when wNXM price is 0.01 ETH
@@ -1,5 +1,11 @@
 '''
 WIP
+Running a number of stochastic simulations of the whole system and plotting the distribution of final values.
+
+Each simulation is streamed to a Parquet dataset in dataset_dir as soon as it completes and then dropped,
+so memory doesn't grow with the number of simulations (see trajectory_sink.py).
+The final day of each path is then read back from the dataset for the histograms.
+Day-by-day fan charts come from a PathAggregator the paths are also added to (see path_quantiles.py).
 '''
 
 import matplotlib.pyplot as plt
@@ -7,83 +13,52 @@ import numpy as np
 
 from tqdm import tqdm
 
-from BondingCurveNexus.sys_class import NexusSystem
-from BondingCurveNexus.model_params import model_days
+from BondingCurveNexus import sys_params, model_params
+from BondingCurveNexus.WholeSystem.nexus_system import NexusSystem
+from BondingCurveNexus.path_quantiles import PathAggregator, plot_fans
+from BondingCurveNexus.result_cache import run_model
+from BondingCurveNexus.streams import child_seed
+from BondingCurveNexus.trajectory_sink import TrajectorySink, final_rows
 
 if __name__ == "__main__":
 
-    # define number of sims and initialise number of instances
+    # define number of sims, the seed they are derived from and where their trajectories are written
     num_sims = 100
-    sims = [NexusSystem() for x in range(num_sims)]
+    seed = 1
+    dataset_dir = './multi_sim_paths'
+
+    model_kwargs = {'liquidity_eth': sys_params.open_liq_sell,
+                    'wnxm_move_size': model_params.wnxm_move_size}
 
-    # loop through individual instances and number of days for each simulation
-    for sim in tqdm(sims):
-        for i in range(model_days):
-            sim.one_day_passes()
+    # run the individual instances one at a time, streaming each trajectory to disk
+    # and adding it to the day-by-day statistics
+    metrics = NexusSystem(**model_kwargs).trajectory.metrics
+    stats = PathAggregator(metrics, days=model_params.model_days + 1)
+    with TrajectorySink(dataset_dir, metrics=metrics, overwrite=True) as sink:
+        for x in tqdm(range(num_sims)):
+            sim_seed = child_seed(seed, x)
+            sim = run_model(NexusSystem, seed=sim_seed, model_kwargs=model_kwargs, cache=None)
+            sink.write(sim.trajectory, sim=x, seed=np.uint64(sim_seed))
+            stats.add(sim.trajectory)
 
     #-----RESULT VISUALISATION-----#
     # Final outcome arrays
-    final_mcr_list = [sim.mcr_prediction[-1] for sim in sims]
-    final_cap_pool_list = [sim.cap_pool_prediction[-1] for sim in sims]
-    final_eth_exit_list = [sim.exit_queue_eth_prediction[-1] for sim in sims]
-    final_nxm_exit_list = [sim.exit_queue_nxm_prediction[-1] for sim in sims]
-    final_dca_list = [sim.dca_prediction[-1] for sim in sims]
-    final_book_value_list = [sim.book_value_prediction[-1] for sim in sims]
-    final_mcrp_list = [sim.mcrp_prediction[-1] for sim in sims]
-    final_wnxm_list = [sim.wnxm_prediction[-1] for sim in sims]
-    final_nxm_supply_list = [sim.nxm_supply_prediction[-1] for sim in sims]
-    final_premium_list = [sim.premium_prediction[-1] for sim in sims]
-    final_claim_list = [sim.claim_prediction[-1] for sim in sims]
-    final_act_cover_list = [sim.act_cover_prediction[-1] for sim in sims]
-    final_num_exits_list = [sim.num_exits_prediction[-1] for sim in sims]
-    final_investment_list = [sim.investment_return_prediction[-1] for sim in sims]
+    final = final_rows(dataset_dir, keys=('sim',))
 
     #-----HISTOGRAMS-----#
+    metrics = ['mcr', 'cap_pool', 'act_cover', 'mcrp', 'book_value', 'nxm_price', 'wnxm_price',
+               'nxm_supply', 'wnxm_supply', 'liquidity_eth', 'cum_premiums', 'cum_claims',
+               'cum_investment', 'eth_sold']
+
     # Destructuring initialization
     fig, axs = plt.subplots(7, 2, figsize=(15,27)) # axs is a (7,2) nd-array
 
-    # Subplot
-    axs[0, 0].hist(final_mcr_list, bins=100)
-    axs[0, 0].set_title('mcr')
-    # Subplot
-    axs[0, 1].hist(final_cap_pool_list, bins=100)
-    axs[0, 1].set_title('cap_pool')
-    # Subplot
-    axs[1, 0].hist(final_act_cover_list, bins=100)
-    axs[1, 0].set_title('active_cover')
-    # Subplot
-    axs[1, 1].hist(final_dca_list, bins=100)
-    axs[1, 1].set_title('dca')
-    # Subplot
-    axs[2, 0].hist(final_book_value_list, bins=100)
-    axs[2, 0].set_title('book_value')
-    # Subplot
-    axs[2, 1].hist(final_mcrp_list, bins=100)
-    axs[2, 1].set_xbound(lower=0.0, upper=10.0)
-    axs[2, 1].set_title('mcrp')
-    # Subplot
-    axs[3, 0].hist(final_wnxm_list, bins=100)
-    axs[3, 0].set_title('wnxm_price')
-    # Subplot
-    axs[3, 1].hist(final_nxm_supply_list, bins=100)
-    axs[3, 1].set_title('nxm_supply')
-    # Subplot
-    axs[4, 0].hist(final_premium_list, bins=100)
-    axs[4, 0].set_title('premium_income')
-    # Subplot
-    axs[4, 1].hist(final_claim_list, bins=100)
-    axs[4, 1].set_title('claim_outgo')
-    # Subplot
-    axs[5, 0].hist(final_eth_exit_list, bins=100)
-    axs[5, 0].set_title('exit_queue_eth')
-    # Subplot
-    axs[5, 1].hist(final_nxm_exit_list, bins=100)
-    axs[5, 1].set_title('exit_queue_nxm')
-    # Subplot
-    axs[6, 0].hist(final_num_exits_list, bins=100)
-    axs[6, 0].set_title('num_exits_in_queue')
-    # Subplot
-    axs[6, 1].hist(final_investment_list, bins=100)
-    axs[6, 1].set_title('investment_return')
+    for ax, metric in zip(axs.flat, metrics):
+        ax.hist(final[metric], bins=100)
+        ax.set_title(metric)
+    axs[1, 1].set_xbound(lower=0.0, upper=10.0)
+
+    #-----FAN CHARTS-----#
+    plot_fans(stats, ['book_value', 'nxm_price', 'wnxm_price', 'cap_pool', 'nxm_supply', 'mcrp'])
 
     plt.show()
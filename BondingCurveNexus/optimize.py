@@ -0,0 +1,343 @@
+'''
+Search for the RAMM design parameters minimising an objective of the simulated trajectories,
+by Bayesian optimisation with successive halving on the number of paths.
+
+Choosing ratchet speeds, liquidity targets and buffers from hand-picked grids runs every cell of the grid
+for the full number of paths. optimize() instead searches ranges of the parameters, e.g.
+    space = {'ratchet_up_perc': (0.005, 0.1), 'ratchet_down_perc': (0.005, 0.1),
+             'target_liq_sell': (1000, 50000, 'log'), 'price_transition_buffer': (0, 10000)}
+    results = optimize(RAMMMarketsStoch, space, objective='eth_drained', rounds=6, batch_size=8,
+                       max_paths=16, fixed={'lambda_exits': 20}, seed=1)
+    results.attrs['best']
+
+Ranges are (low, high) with an optional scale - 'linear' (the default), 'log' or 'int'.
+fixed holds any other parameter overrides for every run, e.g. the exit shock the design is tested against.
+
+Candidates are run in rounds of batch_size:
+ - the first round is a Latin hypercube sample of the ranges. Later rounds are picked by expected improvement
+   on a Gaussian process fitted to the mean objective of every candidate so far, one candidate at a time with each
+   pick added to the process at the best value seen so far, so a batch spreads out instead of piling onto one point
+ - a round is run by successive halving - every candidate on min_paths paths, then the best 1/eta of them
+   on eta times as many paths, and so on up to max_paths - so most simulations go to the candidates still in the running
+The Gaussian process treats each candidate's mean as noisy, with the standard error of the paths it ran.
+It is written with numpy and scipy, and results come back in pandas - all three are listed in requirements.txt -
+so the optimiser needs no optimisation library.
+
+Path p of every candidate runs with the same seed, so candidates are compared on the same market paths
+and differences between them aren't lost in the path noise. A promoted candidate keeps the paths it has already run,
+and every simulation goes through the result cache (see result_cache.py).
+Deterministic models only need max_paths=1, which leaves plain Bayesian optimisation.
+
+An objective is a function of one simulation's Trajectory giving a number to minimise - a name from OBJECTIVES,
+or a function defined at module level so that the worker processes can load it.
+Simulations run in a ProcessPoolExecutor, using all cores by default.
+
+Returns a DataFrame with a row per candidate - its round, parameters, paths run, mean objective and standard error -
+and the parameters of the best candidate run on max_paths paths in attrs['best'].
+
+Can also be run from the command line, e.g.
+    python -m BondingCurveNexus.optimize BondingCurveNexus.RAMM_markets_stoch:RAMMMarketsStoch \\
+        --space ratchet_up_perc=0.005:0.1 --space target_liq_sell=1000:50000:log \\
+        --objective eth_drained --rounds 6 --batch-size 8 --max-paths 16 --set lambda_exits=20 --seed 1
+'''
+
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+from scipy.stats import norm
+from tqdm import tqdm
+
+from BondingCurveNexus.result_cache import resolve_cache, run_model
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.streams import child_seed
+from BondingCurveNexus.sweep import load_model, parse_value
+
+SCALES = ('linear', 'log', 'int')
+
+# NXM price metrics tracked by the different model classes
+PRICE_METRICS = ('sell_nxm_price', 'buy_nxm_price', 'spot_price_b', 'spot_price_a', 'nxm_price')
+
+# OBJECTIVES
+# ETH taken out of the capital pool over the projection
+def eth_drained(trajectory):
+    cap_pool = trajectory['cap_pool']
+    return cap_pool[0] - cap_pool[-1]
+
+# mean absolute deviation of the NXM prices from book value, as a proportion of book value
+def book_value_deviation(trajectory):
+    prices = [trajectory[metric] for metric in PRICE_METRICS if metric in trajectory]
+    if not prices:
+        raise ValueError('book_value_deviation needs an NXM price metric in the trajectory')
+    book_value = trajectory['book_value']
+    return float(np.mean([np.abs(price / book_value - 1) for price in prices]))
+
+OBJECTIVES = {'eth_drained': eth_drained, 'book_value_deviation': book_value_deviation}
+
+# objective function from a name in OBJECTIVES or a function
+def resolve_objective(objective):
+    if callable(objective):
+        return objective
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective must be a function or one of {', '.join(OBJECTIVES)}, not {objective!r}")
+    return OBJECTIVES[objective]
+
+# SEARCH SPACE
+# {parameter: (low, high, scale)} from ranges given as (low, high) or (low, high, scale)
+def parse_space(space):
+    if not space:
+        raise ValueError('the search space needs at least one parameter range')
+    bounds = {}
+    for name, spec in space.items():
+        low, high, scale = (tuple(spec) + ('linear',))[:3]
+        if scale not in SCALES:
+            raise ValueError(f"scale of {name} must be one of {', '.join(SCALES)}, not {scale!r}")
+        if not low < high:
+            raise ValueError(f'range of {name} must have low < high, not ({low}, {high})')
+        if scale == 'log' and low <= 0:
+            raise ValueError(f'log range of {name} must be positive')
+        bounds[name] = (low, high, scale)
+    return bounds
+
+# space from command line entries PARAM=LOW:HIGH[:SCALE], e.g. target_liq_sell=1000:50000:log
+def parse_space_args(entries):
+    space = {}
+    for entry in entries:
+        name, _, spec = entry.partition('=')
+        low, high, *scale = spec.split(':')
+        space[name] = (parse_value(low), parse_value(high), *scale)
+    return space
+
+# parameter overrides from command line entries PARAM=VALUE, e.g. lambda_exits=20
+def parse_overrides(entries):
+    fixed = {}
+    for entry in entries:
+        name, _, value = entry.partition('=')
+        fixed[name] = parse_value(value)
+    return fixed
+
+# parameter values of a point of the unit cube
+def from_unit(bounds, unit):
+    values = {}
+    for (name, (low, high, scale)), u in zip(bounds.items(), unit):
+        if scale == 'log':
+            values[name] = float(math.exp(math.log(low) + u * (math.log(high) - math.log(low))))
+        elif scale == 'int':
+            values[name] = int(round(low + u * (high - low)))
+        else:
+            values[name] = float(low + u * (high - low))
+    return values
+
+# Latin hypercube sample of n points of the d-dimensional unit cube
+def latin_hypercube(n, d, rng):
+    return (np.argsort(rng.random((n, d)), axis=0) + rng.random((n, d))) / n
+
+# SURROGATE MODEL
+# Matern 5/2 kernel between two sets of points
+def matern52(a, b, length_scale):
+    r = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)) / length_scale
+    return (1 + math.sqrt(5) * r + 5 / 3 * r ** 2) * np.exp(-math.sqrt(5) * r)
+
+class GaussianProcess:
+
+    # length scales tried, in units of the unit cube
+    LENGTH_SCALES = np.geomspace(0.05, 2, 20)
+    # added to the noise variance to keep the kernel matrix well conditioned
+    JITTER = 1e-6
+
+    def __init__(self, x, y, noise):
+        # points in the unit cube, objective values and their noise variances, standardised
+        self.x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean = y.mean()
+        self.y_scale = y.std() or 1.0
+        self.y = (y - self.y_mean) / self.y_scale
+        self.noise = np.asarray(noise, dtype=float) / self.y_scale ** 2 + self.JITTER
+        # length scale with the highest marginal likelihood
+        self.length_scale = max(self.LENGTH_SCALES, key=self.log_likelihood)
+        self.factor = cho_factor(self.covariance(self.length_scale), lower=True)
+        self.alpha = cho_solve(self.factor, self.y)
+
+    def covariance(self, length_scale):
+        return matern52(self.x, self.x, length_scale) + np.diag(self.noise)
+
+    # log marginal likelihood of the standardised values, up to a constant
+    def log_likelihood(self, length_scale):
+        factor = cho_factor(self.covariance(length_scale), lower=True)
+        return -0.5 * self.y @ cho_solve(factor, self.y) - np.log(np.diag(factor[0])).sum()
+
+    # posterior mean and standard deviation of the objective at points of the unit cube
+    def predict(self, x):
+        k = matern52(np.asarray(x, dtype=float), self.x, self.length_scale)
+        mean = k @ self.alpha
+        variance = 1 - (k * cho_solve(self.factor, k.T).T).sum(axis=1)
+        std = np.sqrt(np.maximum(variance, 1e-12))
+        return self.y_mean + self.y_scale * mean, self.y_scale * std
+
+# expected improvement on the best value for a minimisation
+def expected_improvement(mean, std, best):
+    improvement = best - mean
+    z = improvement / std
+    return improvement * norm.cdf(z) + std * norm.pdf(z)
+
+# n new points of the unit cube by expected improvement, given the points run so far with their
+# mean objective and noise variance - each pick is added at the best value so far before the next
+def propose(x, y, noise, n, rng, pool_size=2048):
+    x, y, noise = np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(noise, dtype=float)
+    best = y.min()
+    picks = []
+    for _ in range(n):
+        process = GaussianProcess(x, y, noise)
+        # random points of the whole cube, and points around the best candidates so far
+        around = x[np.argsort(y)[:5]]
+        local = around[rng.integers(len(around), size=pool_size // 4)] + rng.normal(0, 0.05, (pool_size // 4, x.shape[1]))
+        pool = np.vstack((rng.random((pool_size, x.shape[1])), np.clip(local, 0, 1)))
+        pick = pool[np.argmax(expected_improvement(*process.predict(pool), best))]
+        picks.append(pick)
+        x = np.vstack((x, pick))
+        y = np.append(y, best)
+        noise = np.append(noise, 0.0)
+    return np.array(picks)
+
+# EVALUATION
+# objective value of one simulation - executed in a worker process
+def evaluate_path(model, params, seed, model_kwargs, objective, cache):
+    sim = run_model(model, params, seed, model_kwargs, cache=cache)
+    return float(resolve_objective(objective)(sim.trajectory))
+
+# mean objective of a candidate over the paths it has run
+def candidate_mean(candidate):
+    return np.mean(list(candidate['values'].values()))
+
+# noise variance of every candidate's mean, from the variance across paths pooled over the candidates
+def mean_noise(candidates):
+    variances = [np.var(list(c['values'].values()), ddof=1) for c in candidates if len(c['values']) > 1]
+    path_variance = np.mean(variances) if variances else 0.0
+    return np.array([path_variance / len(c['values']) for c in candidates])
+
+def optimize(model, space, objective='eth_drained', rounds=5, batch_size=8, min_paths=1, max_paths=16, eta=2,
+             fixed=None, seed=None, model_kwargs=None, max_workers=None, cache=True, progress=True):
+    '''
+    Search ranges of parameters for the values minimising the mean objective of a model's simulations.
+
+    model is a model class (or a 'package.module:ClassName' string) and space a dictionary of
+    {parameter: (low, high)} or {parameter: (low, high, scale)} with scale 'linear', 'log' or 'int'.
+    objective is a name from OBJECTIVES or a module-level function of a Trajectory to minimise.
+    Every round proposes batch_size candidates and runs them by successive halving from min_paths to max_paths paths,
+    keeping the best 1/eta of them each time. fixed are parameter overrides for every run.
+    Returns a DataFrame with a row per candidate, with the best parameters in attrs['best'].
+    '''
+    if isinstance(model, str):
+        model = load_model(model)
+    bounds = parse_space(space)
+    resolve_objective(objective)
+    if not 1 <= min_paths <= max_paths:
+        raise ValueError(f'paths must satisfy 1 <= min_paths <= max_paths, not {min_paths} and {max_paths}')
+    if eta < 2:
+        raise ValueError(f'eta must be at least 2, not {eta}')
+    cache = resolve_cache(cache)
+    base_params = SimParams.from_modules(**(fixed or {}))
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    rng = np.random.default_rng(child_seed(seed, 1))
+    # the same seed for path p of every candidate
+    path_seeds = [child_seed(seed, 0, path) for path in range(max_paths)]
+
+    candidates = []
+    simulations = 0
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor, \
+         tqdm(total=0, disable=not progress, unit='sim') as bar:
+
+        # run every candidate given up to paths paths
+        def run_paths(batch, paths):
+            nonlocal simulations
+            futures = {}
+            for candidate in batch:
+                for path in range(len(candidate['values']), paths):
+                    future = executor.submit(evaluate_path, model, candidate['params'], path_seeds[path],
+                                             model_kwargs, objective, cache)
+                    futures[future] = (candidate, path)
+            bar.total += len(futures)
+            bar.refresh()
+            for future in as_completed(futures):
+                candidate, path = futures[future]
+                candidate['values'][path] = future.result()
+                simulations += 1
+                bar.update()
+
+        for round_number in range(rounds):
+            if not candidates:
+                units = latin_hypercube(batch_size, len(bounds), rng)
+            else:
+                units = propose([c['unit'] for c in candidates], [candidate_mean(c) for c in candidates],
+                                mean_noise(candidates), batch_size, rng)
+            batch = []
+            for unit in units:
+                overrides = from_unit(bounds, unit)
+                batch.append({'round': round_number, 'unit': unit, 'overrides': overrides,
+                              'params': base_params.replace(**overrides), 'values': {}})
+            candidates += batch
+
+            # SUCCESSIVE HALVING
+            paths = min_paths
+            while True:
+                run_paths(batch, paths)
+                if paths == max_paths:
+                    break
+                batch = sorted(batch, key=candidate_mean)[:math.ceil(len(batch) / eta)]
+                paths = min(paths * eta, max_paths)
+
+    rows = []
+    for number, candidate in enumerate(candidates):
+        values = np.array(list(candidate['values'].values()))
+        rows.append({'candidate': number, 'round': candidate['round'], **candidate['overrides'],
+                     'paths': len(values), 'objective': values.mean(),
+                     'stderr': values.std(ddof=1) / math.sqrt(len(values)) if len(values) > 1 else np.nan})
+    results = pd.DataFrame(rows)
+    best = min((c for c in candidates if len(c['values']) == max_paths), key=candidate_mean)
+    results.attrs['best'] = best['overrides']
+    results.attrs['best_objective'] = float(candidate_mean(best))
+    results.attrs['simulations'] = simulations
+    results.attrs['seed'] = seed
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search parameter ranges of a model class for the best objective.')
+    parser.add_argument('model', help="model class as 'package.module:ClassName'")
+    parser.add_argument('--space', action='append', default=[], metavar='PARAM=LOW:HIGH[:SCALE]',
+                        help='parameter range to search, e.g. target_liq_sell=1000:50000:log')
+    parser.add_argument('--objective', default='eth_drained', choices=list(OBJECTIVES), help='objective to minimise')
+    parser.add_argument('--rounds', type=int, default=5, help='rounds of candidates')
+    parser.add_argument('--batch-size', type=int, default=8, help='candidates per round')
+    parser.add_argument('--min-paths', type=int, default=1, help='paths every candidate is run on')
+    parser.add_argument('--max-paths', type=int, default=16, help='paths the best candidates are run on')
+    parser.add_argument('--eta', type=int, default=2, help='1/eta of the candidates is kept at each halving')
+    parser.add_argument('--set', action='append', default=[], metavar='PARAM=VALUE',
+                        help='parameter override for every run, e.g. lambda_exits=20')
+    parser.add_argument('--seed', type=int, default=None, help='search seed')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (defaults to all cores)')
+    parser.add_argument('--no-cache', action='store_true', help='rerun every simulation instead of using the result cache')
+    parser.add_argument('--out', default=None, help='csv file the candidates are written to')
+    args = parser.parse_args(argv)
+    if not args.space:
+        parser.error('at least one --space is required')
+
+    space = parse_space_args(args.space)
+    fixed = parse_overrides(args.set)
+    results = optimize(args.model, space, objective=args.objective, rounds=args.rounds, batch_size=args.batch_size,
+                       min_paths=args.min_paths, max_paths=args.max_paths, eta=args.eta, fixed=fixed,
+                       seed=args.seed, max_workers=args.workers, cache=None if args.no_cache else True)
+    if args.out is not None:
+        results.to_csv(args.out, index=False)
+    print(f"best {args.objective} {results.attrs['best_objective']:.6g} "
+          f"from {results.attrs['simulations']} simulations (seed {results.attrs['seed']}):")
+    for name, value in results.attrs['best'].items():
+        print(f'    {name} = {value}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+'''
+Streaming cross-path statistics of the tracked metrics, day by day, for fan charts.
+
+A PathAggregator takes simulated paths one at a time or in batches - a Trajectory, or a dictionary of
+metric arrays of shape (days,) for one path or (days, paths) for a batch, as recorded by RAMMMarketsBatch -
+and keeps, for every metric and every day:
+ - a quantile sketch - counts of values in logarithmically sized buckets (as in DDSketch),
+   so every quantile is within relative_accuracy of the exact value whatever the distribution
+ - count, mean and variance (Welford, batched with Chan's parallel update)
+ - exact min and max
+Paths are dropped once added, so memory depends on the days, metrics and the spread of values,
+never on the number of paths. Paths that stopped early (e.g. went to zero) only count on the days they ran.
+
+Aggregators built in separate processes merge exactly with merge(), as bucket counts just add up.
+aggregate_paths() runs chunks of paths in a ProcessPoolExecutor, each worker returning its own aggregator:
+    stats = aggregate_paths(RAMMMarketsBatch, n_paths=1_000_000, batch_size=10_000, seed=1)
+    stats.fan('book_value')
+    plot_fans(stats, ['book_value', 'sell_nxm_price', 'buy_nxm_price', 'cap_pool', 'nxm_supply'])
+
+Models that take n_paths (batch engines) run a whole chunk at once, other models one path at a time.
+Other models run every path on its own seed, derived from the sweep seed and the path number, so their results
+don't depend on batch_size. A batch engine draws a whole chunk from one generator, seeded from the chunk's
+first path number - its results are the same however the chunks are scheduled across workers,
+but change with batch_size.
+
+Can also be run from the command line, e.g.
+    python -m BondingCurveNexus.path_quantiles BondingCurveNexus.RAMM_markets_batch:RAMMMarketsBatch \\
+        --paths 100000 --batch-size 10000 --seed 1 --metrics book_value cap_pool nxm_supply --out fan.png
+'''
+
+import argparse
+import inspect
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from tqdm import tqdm
+
+from BondingCurveNexus.result_cache import run_model
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.streams import child_seed
+
+# default quantiles of a fan chart
+FAN_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+class QuantileSketch:
+
+    def __init__(self, days, relative_accuracy=0.002):
+        self.days = days
+        self.relative_accuracy = relative_accuracy
+        # ratio between the bounds of a bucket - bucket i holds values in (gamma^(i-1), gamma^i]
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        # bucket counts per day for positive and negative values (by absolute value), and counts of zeros
+        # offset is the bucket index of the first column of each store
+        self.positive = np.zeros((days, 0), dtype=np.int64)
+        self.negative = np.zeros((days, 0), dtype=np.int64)
+        self.positive_offset = 0
+        self.negative_offset = 0
+        self.zeros = np.zeros(days, dtype=np.int64)
+
+    # bucket index of each absolute value
+    def bucket(self, values):
+        return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+    # store widened to cover the buckets low to high (exclusive), with its new offset
+    def widen(self, store, offset, low, high):
+        if store.shape[1]:
+            low, high = min(low, offset), max(high, offset + store.shape[1])
+        if low == offset and high - low == store.shape[1]:
+            return store, offset
+        widened = np.zeros((self.days, high - low), dtype=np.int64)
+        widened[:, offset - low:offset - low + store.shape[1]] = store
+        return widened, low
+
+    # add counts of buckets on days to a store, widening it to cover the buckets if needed
+    def add_to_store(self, store, offset, days, buckets):
+        if len(buckets) == 0:
+            return store, offset
+        store, offset = self.widen(store, offset, buckets.min(), buckets.max() + 1)
+        width = store.shape[1]
+        store += np.bincount(days * width + (buckets - offset), minlength=self.days * width).reshape(self.days, width)
+        return store, offset
+
+    # add values on days (flat arrays of the same length, NaNs already removed)
+    def add(self, days, values):
+        positive = values > 0
+        negative = values < 0
+        self.positive, self.positive_offset = self.add_to_store(self.positive, self.positive_offset,
+                                                                days[positive], self.bucket(values[positive]))
+        self.negative, self.negative_offset = self.add_to_store(self.negative, self.negative_offset,
+                                                                days[negative], self.bucket(-values[negative]))
+        self.zeros += np.bincount(days[values == 0], minlength=self.days)
+
+    def merge(self, other):
+        if other.gamma != self.gamma or other.days != self.days:
+            raise ValueError('can only merge sketches with the same relative accuracy and days')
+        for sign in ('positive', 'negative'):
+            store, offset = getattr(other, sign), getattr(other, f'{sign}_offset')
+            if store.shape[1] == 0:
+                continue
+            merged, merged_offset = self.widen(getattr(self, sign), getattr(self, f'{sign}_offset'),
+                                               offset, offset + store.shape[1])
+            merged[:, offset - merged_offset:offset - merged_offset + store.shape[1]] += store
+            setattr(self, sign, merged)
+            setattr(self, f'{sign}_offset', merged_offset)
+        self.zeros += other.zeros
+        return self
+
+    # (days, len(q)) array of quantiles q of each day, NaN on days without values
+    def quantiles(self, q):
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        # all buckets in increasing order of value - most negative first, then zero, then positives
+        counts = np.concatenate((self.negative[:, ::-1], self.zeros[:, None], self.positive), axis=1)
+        # representative value of each bucket, within relative_accuracy of every value in it
+        positive_values = 2 * self.gamma ** np.arange(self.positive_offset,
+                                                      self.positive_offset + self.positive.shape[1]) / (self.gamma + 1)
+        negative_values = 2 * self.gamma ** np.arange(self.negative_offset,
+                                                      self.negative_offset + self.negative.shape[1]) / (self.gamma + 1)
+        values = np.concatenate((-negative_values[::-1], [0.0], positive_values))
+
+        cumulative = np.cumsum(counts, axis=1)
+        total = cumulative[:, -1]
+        result = np.full((self.days, len(q)), np.nan)
+        for column, quantile in enumerate(q):
+            rank = quantile * (total - 1)
+            index = np.argmax(cumulative > rank[:, None], axis=1)
+            result[:, column] = np.where(total > 0, values[index], np.nan)
+        return result
+
+class MetricStats:
+
+    def __init__(self, days, relative_accuracy=0.002):
+        self.days = days
+        self.sketch = QuantileSketch(days, relative_accuracy)
+        # running count, mean and sum of squared deviations of each day
+        self.count = np.zeros(days, dtype=np.int64)
+        self.mean = np.zeros(days)
+        self.m2 = np.zeros(days)
+        self.min = np.full(days, np.inf)
+        self.max = np.full(days, -np.inf)
+
+    # add a (days run, paths) array of values - NaNs are ignored
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[:, None]
+        values = values[:self.days]
+        rows = len(values)
+        valid = ~np.isnan(values)
+
+        # batch count, mean and sum of squared deviations, then Chan's update of the running values
+        count = valid.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, np.nansum(values, axis=1) / count, 0)
+        m2 = np.nansum((values - mean[:, None]) ** 2, axis=1)
+        self.combine(np.arange(rows), count, mean, m2)
+        if valid.any():
+            self.min[:rows] = np.fmin(self.min[:rows], np.nanmin(np.where(valid, values, np.inf), axis=1))
+            self.max[:rows] = np.fmax(self.max[:rows], np.nanmax(np.where(valid, values, -np.inf), axis=1))
+
+        day_index = np.broadcast_to(np.arange(rows)[:, None], values.shape)
+        self.sketch.add(day_index[valid], values[valid])
+
+    # combine count, mean and m2 of a batch of values on days with the running values
+    def combine(self, days, count, mean, m2):
+        total = self.count[days] + count
+        delta = mean - self.mean[days]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(total > 0, count / total, 0)
+        self.mean[days] += delta * share
+        self.m2[days] += m2 + delta ** 2 * self.count[days] * share
+        self.count[days] = total
+
+    def merge(self, other):
+        days = np.arange(self.days)
+        self.combine(days, other.count, other.mean, other.m2)
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    # sample variance of each day
+    def variance(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+class PathAggregator:
+
+    def __init__(self, metrics, days, relative_accuracy=0.002):
+        self.metrics = list(metrics)
+        # number of days tracked, including the opening state - model_days + 1 for a full projection
+        self.days = days
+        self.relative_accuracy = relative_accuracy
+        self.stats = {metric: MetricStats(days, relative_accuracy) for metric in self.metrics}
+        # number of paths added
+        self.paths = 0
+
+    # add one path or a batch of paths - a Trajectory, or a dictionary of metric arrays
+    # of shape (days run,) for one path or (days run, paths) for a batch
+    def add(self, trajectory):
+        columns = trajectory.to_dict() if hasattr(trajectory, 'to_dict') else trajectory
+        for metric in self.metrics:
+            self.stats[metric].add(columns[metric])
+        first = np.asarray(columns[self.metrics[0]])
+        self.paths += 1 if first.ndim == 1 else first.shape[1]
+
+    # merge the paths of another aggregator (e.g. from another worker process) into this one
+    def merge(self, other):
+        if other.metrics != self.metrics or other.days != self.days:
+            raise ValueError('can only merge aggregators with the same metrics and days')
+        for metric in self.metrics:
+            self.stats[metric].merge(other.stats[metric])
+        self.paths += other.paths
+        return self
+
+    # number of paths that ran to each day
+    def count(self, metric):
+        return self.stats[metric].count
+
+    def mean(self, metric):
+        stats = self.stats[metric]
+        return np.where(stats.count > 0, stats.mean, np.nan)
+
+    def variance(self, metric):
+        return self.stats[metric].variance()
+
+    def std(self, metric):
+        return np.sqrt(self.variance(metric))
+
+    def min(self, metric):
+        return np.where(self.stats[metric].count > 0, self.stats[metric].min, np.nan)
+
+    def max(self, metric):
+        return np.where(self.stats[metric].count > 0, self.stats[metric].max, np.nan)
+
+    # (days, len(q)) array of quantiles of a metric, within relative_accuracy of the exact values
+    def quantiles(self, metric, q=FAN_QUANTILES):
+        return self.stats[metric].sketch.quantiles(q)
+
+    def fan(self, metric, q=FAN_QUANTILES):
+        '''
+        DataFrame indexed by day of the quantiles q of a metric, with its mean, std and path count.
+        '''
+        import pandas as pd
+
+        frame = pd.DataFrame(self.quantiles(metric, q), columns=[f'q{quantile:g}' for quantile in q])
+        frame['mean'] = self.mean(metric)
+        frame['std'] = self.std(metric)
+        frame['count'] = self.count(metric)
+        frame.index.name = 'day'
+        return frame
+
+# shade the bands between symmetric quantiles of a metric on an axis, with the median as a line
+def plot_fan(ax, stats, metric, q=FAN_QUANTILES):
+    q = sorted(q)
+    values = stats.quantiles(metric, q)
+    days = np.arange(stats.days)
+    for band in range(len(q) // 2):
+        ax.fill_between(days, values[:, band], values[:, -1 - band], alpha=0.2, color='C0',
+                        label=f'{q[band]:g}-{q[-1 - band]:g}')
+    if len(q) % 2:
+        ax.plot(days, values[:, len(q) // 2], color='C0', label=f'q{q[len(q) // 2]:g}')
+    ax.set_title(metric)
+
+def plot_fans(stats, metrics, q=FAN_QUANTILES):
+    import matplotlib.pyplot as plt
+
+    rows = (len(metrics) + 1) // 2
+    fig, axs = plt.subplots(rows, 2, figsize=(15, 4 * rows), squeeze=False)
+    fig.suptitle(f'{stats.paths} paths', fontsize=16)
+    for ax, metric in zip(axs.flat, metrics):
+        plot_fan(ax, stats, metric, q)
+        ax.legend()
+    for ax in axs.flat[len(metrics):]:
+        ax.set_visible(False)
+    fig.tight_layout()
+    return fig
+
+# aggregate a chunk of paths - executed in a worker process
+def aggregate_chunk(model, params, seeds, model_kwargs, metrics, days, relative_accuracy):
+    stats = PathAggregator(metrics, days + 1, relative_accuracy)
+
+    # batch engines step the whole chunk at once, from one generator seeded by the chunk's first path
+    if 'n_paths' in inspect.signature(model).parameters:
+        sim = model(n_paths=len(seeds), seed=seeds[0], params=params, **(model_kwargs or {}))
+        for i in range(days):
+            sim.one_day_passes()
+        stats.add(sim.trajectory)
+        return stats
+
+    for seed in seeds:
+        sim = run_model(model, params, seed, model_kwargs, days=days, cache=None)
+        stats.add(sim.trajectory)
+    return stats
+
+def aggregate_paths(model, n_paths, batch_size=1000, seed=None, params=None, model_kwargs=None, metrics=None,
+                    days=None, relative_accuracy=0.002, max_workers=None, progress=True):
+    '''
+    Run n_paths simulations of a model class in parallel chunks of batch_size and return their merged PathAggregator.
+
+    Paths are seeded from seed, so the result is the same however the chunks are scheduled.
+    Batch engines run each chunk from a single seed, so with those the result also depends on batch_size.
+    metrics defaults to all the metrics the model tracks and days to params.model_days.
+    '''
+    params = params if params is not None else SimParams.from_modules()
+    days = days if days is not None else params.model_days
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    if metrics is None:
+        probe = model(n_paths=1, params=params, **(model_kwargs or {})) \
+                if 'n_paths' in inspect.signature(model).parameters \
+                else model(params=params, **(model_kwargs or {}))
+        metrics = probe.trajectory.metrics
+
+    stats = PathAggregator(metrics, days + 1, relative_accuracy)
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = []
+        for chunk, start in enumerate(range(0, n_paths, batch_size)):
+            seeds = [child_seed(seed, path) for path in range(start, min(start + batch_size, n_paths))]
+            futures.append(executor.submit(aggregate_chunk, model, params, seeds, model_kwargs, metrics,
+                                           days, relative_accuracy))
+        for future in tqdm(as_completed(futures), total=len(futures), disable=not progress):
+            stats.merge(future.result())
+    return stats
+
+def main(argv=None):
+    from BondingCurveNexus.sweep import load_model
+
+    parser = argparse.ArgumentParser(description='Fan charts of the tracked metrics over many simulated paths.')
+    parser.add_argument('model', help="model class as 'package.module:ClassName'")
+    parser.add_argument('--paths', type=int, default=10_000, help='number of paths')
+    parser.add_argument('--batch-size', type=int, default=1000, help='paths per worker task')
+    parser.add_argument('--seed', type=int, default=None, help='seed the paths are derived from')
+    parser.add_argument('--metrics', nargs='*', default=None, help='metrics to aggregate (defaults to all)')
+    parser.add_argument('--accuracy', type=float, default=0.002, help='relative accuracy of the quantiles')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (defaults to all cores)')
+    parser.add_argument('--out', required=True, help='image file the fan charts are saved to')
+    args = parser.parse_args(argv)
+
+    stats = aggregate_paths(load_model(args.model), args.paths, batch_size=args.batch_size, seed=args.seed,
+                            metrics=args.metrics, relative_accuracy=args.accuracy, max_workers=args.workers)
+    plot_fans(stats, stats.metrics).savefig(args.out)
+    print(f'fan charts of {stats.paths} paths saved to {args.out}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+'''
+Vectorized quotes of trades against the virtual Uni v2-style RAMM pools, without changing any state.
+
+The protocol classes (RAMMPools, RAMMHighLowCapProtocol, UniPoolProtocol) can only trade by mutating themselves,
+so a price impact curve used to need a fresh instance per trade size. Their quote_sale / quote_buy methods
+instead work out the same trades for whole arrays of sizes at once:
+    quote = RAMMProtocolDet().quote_sale(np.linspace(100, 3_000_000, 1000))
+    quote.eth, quote.spot_price, quote.book_value
+
+Each quote is a Quote of arrays shaped like the sizes given:
+ - nxm: NXM actually traded, after the same limits as the trade functions (total supply, 50% of pool liquidity)
+ - eth: ETH out of the capital pool for sales, ETH in for buys
+ - spot_price: spot price of the pool traded against after the trade
+ - book_value: book value after the trade
+Buys are sized either in NXM out (n_nxm) or in exact ETH in (eth_in).
+If a pool is disabled for the current state, every quote is a zero trade at the current price and book value.
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+Quote = namedtuple('Quote', ['nxm', 'eth', 'spot_price', 'book_value'])
+
+# book value from capital pool and supply arrays, zero without supply
+def book_value_after(cap_pool, nxm_supply):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(nxm_supply == 0, 0.0, cap_pool / nxm_supply)
+
+# sale of n_nxm NXM into a pool, limited to the NXM supply
+def sale_quote(liq_eth, liq_nxm, invariant, cap_pool, nxm_supply, n_nxm):
+    n_nxm = np.minimum(np.asarray(n_nxm, dtype=float), nxm_supply)
+    new_nxm = liq_nxm + n_nxm
+    new_eth = invariant / new_nxm
+    eth = liq_eth - new_eth
+    return Quote(n_nxm, eth, new_eth / new_nxm, book_value_after(cap_pool - eth, nxm_supply - n_nxm))
+
+# buy from a pool of n_nxm NXM or for eth_in ETH, limited to max_share of the pool's NXM liquidity
+def buy_quote(liq_eth, liq_nxm, invariant, cap_pool, nxm_supply, n_nxm=None, eth_in=None, max_share=0.5):
+    if (n_nxm is None) == (eth_in is None):
+        raise ValueError('quote a buy with exactly one of n_nxm or eth_in')
+    if eth_in is not None:
+        n_nxm = liq_nxm - invariant / (liq_eth + np.asarray(eth_in, dtype=float))
+    n_nxm = np.minimum(np.asarray(n_nxm, dtype=float), max_share * liq_nxm)
+    new_nxm = liq_nxm - n_nxm
+    new_eth = invariant / new_nxm
+    eth = new_eth - liq_eth
+    return Quote(n_nxm, eth, new_eth / new_nxm, book_value_after(cap_pool + eth, nxm_supply + n_nxm))
+
+# zero trades of the shape of sizes, at the current spot price and book value
+def no_trade(sizes, spot_price, book_value):
+    shape = np.shape(sizes)
+    return Quote(np.zeros(shape), np.zeros(shape), np.full(shape, float(spot_price)), np.full(shape, float(book_value)))
@@ -0,0 +1,469 @@
+'''
+In-process emulator of the on-chain RAMM, so that wNxmMarket and the ape scripts can run without a hardhat node.
+
+RammEmulator reimplements the Ramm contract's swap, ratchet, liquidity injection/extraction and budget logic
+in exact integer arithmetic, with every amount as a 1e18 fixed-point integer (wei / NXM units) as on-chain.
+It exposes the same method names and return shapes as the ape Contract objects the scripts call:
+    ramm.swap(nxm_in, min_amount_out, deadline, value=eth_in, sender=dev)
+    ramm.getReserves()      -> (eth, nxm_a, nxm_b, budget)
+    ramm.getSpotPrices()    -> (spot_price_a, spot_price_b)
+    ramm.getSpotPriceA(), ramm.getSpotPriceB(), ramm.getBookValue(), ramm.getInternalPrice()
+    pool.getPoolValueInEth(), nxm.balanceOf(account), nxm.totalSupply()
+and a provider with set_timestamp/mine/get_block/snapshot/revert in place of networks.provider, e.g.
+    ramm = RammEmulator(holder=dev)
+    nxm, pool, provider = ramm.nxm, ramm.pool, ramm.provider
+    market = wNxmMarket(nxm, ramm, pool, dev)
+
+Reads are brought forward to the latest block timestamp and every swap mines a new block, as on a hardhat node.
+The internal price follows the contract's TWAP over GRANULARITY observations, with cumulative prices
+integrated between observations, so it is close to but not bit-exact with the chain.
+
+differential_check replays the same time moves and swaps on a live node and on an emulator
+(see scripts/emulator_check.py) and reports any reserves or spot prices that differ.
+'''
+
+import copy
+
+from BondingCurveNexus import sys_params
+
+# 1e18 fixed-point unit
+WAD = 10 ** 18
+
+# RAMM CONTRACT CONSTANTS
+LIQ_SPEED_PERIOD = 86_400
+RATCHET_PERIOD = 86_400
+RATCHET_DENOMINATOR = 10_000
+PRICE_BUFFER = 100
+PRICE_BUFFER_DENOMINATOR = 10_000
+GRANULARITY = 3
+PERIOD_SIZE = 3 * 86_400
+FAST_LIQUIDITY_SPEED = 1_500 * WAD
+TARGET_LIQUIDITY = 5_000 * WAD
+LIQ_SPEED_A = 100 * WAD
+LIQ_SPEED_B = 100 * WAD
+FAST_RATCHET_SPEED = 5_000
+NORMAL_RATCHET_SPEED = 400
+INITIAL_BUDGET = 43_835 * WAD
+
+# opening spot prices of the deployed RAMM in ETH
+OPEN_PRICE_A = 0.03566
+OPEN_PRICE_B = 0.01418
+
+# circuit breaker limits in whole ETH/NXM - off until set
+NO_LIMIT = 2 ** 32 - 1
+
+# error raised where the contract reverts, named after the contract's custom error
+class EmulatorRevert(Exception):
+
+    def __init__(self, error, *args):
+        super().__init__(error, *args)
+        self.error = error
+
+# key of an account in the balances - ape accounts by address, anything else as itself
+def account_key(account):
+    return getattr(account, 'address', account)
+
+class Block:
+
+    def __init__(self, number, timestamp):
+        self.number = number
+        self.timestamp = timestamp
+
+
+class EmulatedProvider:
+    '''
+    Stand-in for networks.provider - block timestamps, mining and state snapshots.
+    '''
+    def __init__(self, emulator, timestamp):
+        self.emulator = emulator
+        self.block = Block(0, timestamp)
+        # timestamp of the next block if set
+        self.next_timestamp = None
+        self.snapshots = {}
+
+    # set the timestamp of the next block
+    def set_timestamp(self, timestamp):
+        self.next_timestamp = timestamp
+
+    # mine blocks, the first at the timestamp set if any and the rest a second apart
+    def mine(self, num_blocks=1):
+        for i in range(num_blocks):
+            timestamp = self.next_timestamp if self.next_timestamp is not None else self.block.timestamp + 1
+            self.block = Block(self.block.number + 1, timestamp)
+            self.next_timestamp = None
+
+    def get_block(self, block_id='latest'):
+        return self.block
+
+    # snapshot the whole emulated state and return its id
+    def snapshot(self):
+        snapshot_id = len(self.snapshots)
+        self.snapshots[snapshot_id] = (copy.deepcopy(self.emulator.state_dict()), self.block, self.next_timestamp)
+        return snapshot_id
+
+    # revert to a snapshot taken earlier
+    def revert(self, snapshot_id):
+        state, self.block, self.next_timestamp = self.snapshots[snapshot_id]
+        self.emulator.load_state_dict(copy.deepcopy(state))
+
+
+class EmulatedNXMToken:
+    '''
+    Stand-in for the NXMToken contract, reading the emulator's balances.
+    '''
+    address = 'NXMToken'
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+
+    def balanceOf(self, account):
+        return self.emulator.balances.get(account_key(account), 0)
+
+    def totalSupply(self):
+        return self.emulator.supply
+
+    # allowances aren't modelled - the RAMM burns from any holder
+    def approve(self, spender, amount, sender=None):
+        return True
+
+
+class EmulatedPool:
+    '''
+    Stand-in for the Pool contract, reading the emulator's capital.
+    '''
+    address = 'Pool'
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+
+    def getPoolValueInEth(self):
+        return self.emulator.capital
+
+
+class RammEmulator:
+
+    address = 'Ramm'
+
+    def __init__(self, capital=None, supply=None, mcr=None, eth=None, nxm_a=None, nxm_b=None,
+                 budget=INITIAL_BUDGET, ratchet_speed_b=FAST_RATCHET_SPEED, timestamp=0, holder=None,
+                 target_liquidity=TARGET_LIQUIDITY, liq_speed_a=LIQ_SPEED_A, liq_speed_b=LIQ_SPEED_B,
+                 fast_liquidity_speed=FAST_LIQUIDITY_SPEED, ratchet_speed_a=NORMAL_RATCHET_SPEED):
+        # all amounts are 1e18 fixed-point integers
+        # opening capital pool, NXM supply and MCR default to the current sys_params values
+        self.capital = capital if capital is not None else int(sys_params.cap_pool_now * WAD)
+        self.supply = supply if supply is not None else int(sys_params.nxm_supply_now * WAD)
+        self.mcr = mcr if mcr is not None else int(sys_params.mcr_now * WAD)
+
+        # RAMM state - reserves default to the opening liquidity at the deployed contract's opening prices
+        self.eth = eth if eth is not None else int(sys_params.open_liq_sell * WAD)
+        self.nxm_a = nxm_a if nxm_a is not None else int(self.eth / OPEN_PRICE_A)
+        self.nxm_b = nxm_b if nxm_b is not None else int(self.eth / OPEN_PRICE_B)
+        self.budget = budget
+        self.ratchet_speed_b = ratchet_speed_b
+        # timestamp the state was last updated at
+        self.timestamp = timestamp
+
+        # liquidity and ratchet speeds - contract constants by default
+        self.target_liquidity = target_liquidity
+        self.liq_speed_a = liq_speed_a
+        self.liq_speed_b = liq_speed_b
+        self.fast_liquidity_speed = fast_liquidity_speed
+        self.ratchet_speed_a = ratchet_speed_a
+
+        # circuit breakers - cumulative ETH released and NXM minted against limits in whole units
+        self.eth_limit = NO_LIMIT
+        self.nxm_limit = NO_LIMIT
+        self.eth_released = 0
+        self.nxm_released = 0
+
+        # NXM balances - the whole supply is held by holder if given
+        self.balances = {account_key(holder): self.supply} if holder is not None else {}
+
+        # TWAP observations of (timestamp, cumulative price above, cumulative price below),
+        # back-filled as if the opening spot prices had held over the last period
+        spot_a, spot_b = WAD * self.eth // self.nxm_a, WAD * self.eth // self.nxm_b
+        self.observations = [None] * GRANULARITY
+        for i in range(GRANULARITY):
+            observed = timestamp - (GRANULARITY - 1 - i) * self.observation_period()
+            self.observations[self.observation_index(observed)] = (observed,
+                                                                   spot_a * (observed - timestamp),
+                                                                   spot_b * (observed - timestamp))
+
+        # stand-ins for the other contracts and the provider
+        self.nxm = EmulatedNXMToken(self)
+        self.pool = EmulatedPool(self)
+        self.provider = EmulatedProvider(self, timestamp)
+
+    # emulator in the current state of a deployment on a node, e.g. a hardhat fork
+    @classmethod
+    def from_contracts(cls, ramm, pool, nxm, mcr, timestamp, holder=None, ratchet_speed_b=FAST_RATCHET_SPEED):
+        eth, nxm_a, nxm_b, budget = ramm.getReserves()
+        emulator = cls(capital=pool.getPoolValueInEth(), supply=nxm.totalSupply(), mcr=mcr,
+                       eth=eth, nxm_a=nxm_a, nxm_b=nxm_b, budget=budget,
+                       ratchet_speed_b=ratchet_speed_b, timestamp=timestamp)
+        if holder is not None:
+            emulator.balances = {account_key(holder): nxm.balanceOf(holder)}
+        return emulator
+
+    # all mutable state, for provider snapshots
+    def state_dict(self):
+        return {name: value for name, value in vars(self).items()
+                if name not in ('nxm', 'pool', 'provider')}
+
+    def load_state_dict(self, state):
+        vars(self).update(state)
+
+    # timestamp of the latest block - reads are brought forward to it
+    def now(self):
+        return self.provider.block.timestamp
+
+    # RESERVES
+    def reserves_at(self, timestamp):
+        '''
+        Function used to bring the stored state forward to a timestamp, as the contract's _getReserves.
+        Liquidity is injected or extracted first, then both NXM reserves are ratcheted towards book value.
+        '''
+        eth, budget = self.eth, self.budget
+        elapsed = timestamp - self.timestamp
+
+        if eth < self.target_liquidity:
+            # inject ETH - at the fast speed while there is budget left, then the slow speed
+            # up to target liquidity and limited to the capital above MCR + target liquidity
+            time_left_on_budget = budget * LIQ_SPEED_PERIOD // self.fast_liquidity_speed
+            if self.capital > self.mcr + self.target_liquidity:
+                max_to_inject = min(self.target_liquidity - eth, self.capital - self.mcr - self.target_liquidity)
+            else:
+                max_to_inject = 0
+            if elapsed <= time_left_on_budget:
+                injected = min(elapsed * self.fast_liquidity_speed // LIQ_SPEED_PERIOD, max_to_inject)
+            else:
+                injected_fast = time_left_on_budget * self.fast_liquidity_speed // LIQ_SPEED_PERIOD
+                injected_slow = (elapsed - time_left_on_budget) * self.liq_speed_b // LIQ_SPEED_PERIOD
+                injected = min(injected_fast + injected_slow, max_to_inject)
+            budget = budget - injected if budget > injected else 0
+            eth += injected
+        else:
+            # extract ETH down to target liquidity
+            eth -= min(elapsed * self.liq_speed_a // LIQ_SPEED_PERIOD, eth - self.target_liquidity)
+
+        # keep prices constant over the liquidity change
+        nxm_a = self.nxm_a * eth // self.eth
+        nxm_b = self.nxm_b * eth // self.eth
+
+        # ratchet above - price moves down by ratchet_speed_a of book value per period
+        # until it reaches book value + price buffer
+        r = elapsed * self.ratchet_speed_a
+        buffered_capital_a = self.capital * (PRICE_BUFFER_DENOMINATOR + PRICE_BUFFER) // PRICE_BUFFER_DENOMINATOR
+        if buffered_capital_a * nxm_a + buffered_capital_a * nxm_a * r // RATCHET_PERIOD // RATCHET_DENOMINATOR \
+                > eth * self.supply:
+            nxm_a = eth * self.supply // buffered_capital_a
+        else:
+            nxm_a = eth * nxm_a // (eth - r * self.capital * nxm_a // self.supply // RATCHET_PERIOD // RATCHET_DENOMINATOR)
+
+        # ratchet below - price moves up by ratchet_speed_b of book value per period
+        # until it reaches book value - price buffer
+        r = elapsed * self.ratchet_speed_b
+        buffered_capital_b = self.capital * (PRICE_BUFFER_DENOMINATOR - PRICE_BUFFER) // PRICE_BUFFER_DENOMINATOR
+        if buffered_capital_b * nxm_b < eth * self.supply + nxm_b * self.capital * r // RATCHET_PERIOD // RATCHET_DENOMINATOR:
+            nxm_b = eth * self.supply // buffered_capital_b
+        else:
+            nxm_b = eth * nxm_b // (eth + r * self.capital * nxm_b // self.supply // RATCHET_PERIOD // RATCHET_DENOMINATOR)
+
+        return eth, nxm_a, nxm_b, budget
+
+    # bring the stored state forward to a timestamp, updating the TWAP observations on the way
+    def update_state(self, timestamp):
+        self.update_twap(timestamp)
+        self.eth, self.nxm_a, self.nxm_b, self.budget = self.reserves_at(timestamp)
+        self.timestamp = timestamp
+
+    # TWAP
+    # length of one observation period and the index of the observation a timestamp falls in
+    def observation_period(self):
+        return PERIOD_SIZE // GRANULARITY
+
+    def observation_index(self, timestamp):
+        return timestamp // self.observation_period() % GRANULARITY
+
+    # latest observation and observations up to timestamp, integrating the spot prices in between
+    def observe(self, timestamp):
+        last = max(self.observations, key=lambda observation: observation[0])
+        period = self.observation_period()
+        # observation boundaries after the latest observation, then the timestamp itself
+        points = list(range((last[0] // period + 1) * period, timestamp, period)) + [timestamp]
+
+        observed = []
+        previous = last
+        eth, nxm_a, nxm_b, budget = self.reserves_at(previous[0])
+        price_a, price_b = WAD * eth // nxm_a, WAD * eth // nxm_b
+        for point in points:
+            if point <= previous[0]:
+                continue
+            eth, nxm_a, nxm_b, budget = self.reserves_at(point)
+            new_price_a, new_price_b = WAD * eth // nxm_a, WAD * eth // nxm_b
+            elapsed = point - previous[0]
+            previous = (point,
+                        previous[1] + (price_a + new_price_a) * elapsed // 2,
+                        previous[2] + (price_b + new_price_b) * elapsed // 2)
+            price_a, price_b = new_price_a, new_price_b
+            observed.append(previous)
+        return observed
+
+    def update_twap(self, timestamp):
+        for observation in self.observe(timestamp):
+            self.observations[self.observation_index(observation[0])] = observation
+
+    # SWAPS
+    def swap(self, nxm_in, min_amount_out=0, deadline=2 ** 256 - 1, value=0, sender=None):
+        '''
+        Swap ETH (sent as value) for NXM or NXM for ETH, mining a new block.
+        Returns the amount out.
+        '''
+        if value > 0 and nxm_in > 0:
+            raise EmulatorRevert('OneInputOnly')
+        if value == 0 and nxm_in == 0:
+            raise EmulatorRevert('OneInputRequired')
+
+        self.provider.mine()
+        timestamp = self.now()
+        if timestamp > deadline:
+            raise EmulatorRevert('SwapExpired', deadline, timestamp)
+
+        # the state is all integers and tuples, so copying the two containers is enough to roll back
+        snapshot = self.state_dict()
+        snapshot.update(balances=dict(self.balances), observations=list(self.observations))
+        try:
+            self.update_state(timestamp)
+            if value > 0:
+                return self.swap_eth_for_nxm(value, min_amount_out, sender)
+            return self.swap_nxm_for_eth(nxm_in, min_amount_out, sender)
+        except EmulatorRevert:
+            # reverted transactions leave no trace
+            self.load_state_dict(snapshot)
+            raise
+
+    def swap_eth_for_nxm(self, eth_in, min_amount_out, sender):
+        k = self.eth * self.nxm_a
+        new_eth = self.eth + eth_in
+        new_nxm_a = k // new_eth
+        new_nxm_b = self.nxm_b * new_eth // self.eth
+        nxm_out = self.nxm_a - new_nxm_a
+
+        if nxm_out < min_amount_out:
+            raise EmulatorRevert('InsufficientAmountOut', nxm_out, min_amount_out)
+        if (self.nxm_released + nxm_out) // WAD >= self.nxm_limit:
+            raise EmulatorRevert('NxmCircuitBreakerHit')
+
+        self.eth, self.nxm_a, self.nxm_b = new_eth, new_nxm_a, new_nxm_b
+        self.nxm_released += nxm_out
+
+        # ETH to the pool and NXM minted to the sender
+        self.capital += eth_in
+        self.supply += nxm_out
+        key = account_key(sender)
+        self.balances[key] = self.balances.get(key, 0) + nxm_out
+        return nxm_out
+
+    def swap_nxm_for_eth(self, nxm_in, min_amount_out, sender):
+        key = account_key(sender)
+        if self.balances.get(key, 0) < nxm_in:
+            raise EmulatorRevert('InsufficientBalance', self.balances.get(key, 0), nxm_in)
+
+        k = self.eth * self.nxm_b
+        new_nxm_b = self.nxm_b + nxm_in
+        new_eth = k // new_nxm_b
+        new_nxm_a = self.nxm_a * new_eth // self.eth
+        eth_out = self.eth - new_eth
+
+        if eth_out < min_amount_out:
+            raise EmulatorRevert('InsufficientAmountOut', eth_out, min_amount_out)
+        if self.capital - eth_out < self.mcr:
+            raise EmulatorRevert('NoSwapsInBufferZone')
+        if (self.eth_released + eth_out) // WAD >= self.eth_limit:
+            raise EmulatorRevert('EthCircuitBreakerHit')
+
+        self.eth, self.nxm_a, self.nxm_b = new_eth, new_nxm_a, new_nxm_b
+        self.eth_released += eth_out
+
+        # NXM burned from the sender and ETH out of the pool
+        self.balances[key] -= nxm_in
+        self.supply -= nxm_in
+        self.capital -= eth_out
+        return eth_out
+
+    # GOVERNANCE
+    def setCircuitBreakerLimits(self, eth_limit, nxm_limit, sender=None):
+        self.eth_limit = eth_limit
+        self.nxm_limit = nxm_limit
+
+    # stop the fast injection and use the normal ratchet speed below book
+    def removeBudget(self, sender=None):
+        self.update_state(self.now())
+        self.budget = 0
+        self.ratchet_speed_b = NORMAL_RATCHET_SPEED
+
+    # VIEWS
+    def getReserves(self):
+        return self.reserves_at(self.now())
+
+    def getSpotPrices(self):
+        eth, nxm_a, nxm_b, budget = self.getReserves()
+        return WAD * eth // nxm_a, WAD * eth // nxm_b
+
+    def getSpotPriceA(self):
+        return self.getSpotPrices()[0]
+
+    def getSpotPriceB(self):
+        return self.getSpotPrices()[1]
+
+    def getBookValue(self):
+        return WAD * self.capital // self.supply
+
+    def getInternalPrice(self):
+        timestamp = self.now()
+        observations = list(self.observations)
+        for observation in self.observe(timestamp):
+            observations[self.observation_index(observation[0])] = observation
+        current = observations[self.observation_index(timestamp)]
+        first = observations[(self.observation_index(timestamp) + 1) % GRANULARITY]
+
+        spot_a, spot_b = self.getSpotPrices()
+        if current[0] > first[0]:
+            average_a = (current[1] - first[1]) // (current[0] - first[0])
+            average_b = (current[2] - first[2]) // (current[0] - first[0])
+        else:
+            average_a, average_b = spot_a, spot_b
+
+        # the lower of the average and spot price above and the higher of the two below, relative to book value
+        return max(0, min(average_a, spot_a) + max(average_b, spot_b) - self.getBookValue())
+
+
+def differential_check(chain, emulator, dev, actions):
+    '''
+    Replay the same actions on a node and an emulator and compare them.
+
+    chain is a (ramm, provider) pair for the node and emulator an emulator in the same starting state,
+    e.g. from RammEmulator.from_contracts. Each action is a (seconds, nxm_in, eth_in) tuple:
+    time moves on by seconds, then NXM or ETH is swapped if non-zero.
+    Returns a list of (action number, view, node value, emulator value) for every view that differs.
+    '''
+    ramm, provider = chain
+    mismatches = []
+    for number, (seconds, nxm_in, eth_in) in enumerate(actions):
+        timestamp = provider.get_block('latest').timestamp + seconds
+        for node in (provider, emulator.provider):
+            node.set_timestamp(timestamp)
+            node.mine()
+
+        if nxm_in or eth_in:
+            for node, contract in ((provider, ramm), (emulator.provider, emulator)):
+                # pin the swap's block to the same timestamp on both
+                node.set_timestamp(timestamp + 1)
+                contract.swap(nxm_in, 0, 2 ** 32, value=eth_in, sender=dev)
+
+        for view in ('getReserves', 'getSpotPrices', 'getBookValue'):
+            node_value = tuple(getattr(ramm, view)()) if view != 'getBookValue' else getattr(ramm, view)()
+            emulator_value = getattr(emulator, view)()
+            if node_value != emulator_value:
+                mismatches.append((number, view, node_value, emulator_value))
+    return mismatches
@@ -0,0 +1,96 @@
+'''
+Per-block cached reader of the RAMM contract state for the ape simulation scripts.
+
+Reading the tracked views one by one costs a JSON-RPC round trip each, several times over for the same block.
+RammStateReader instead fetches every tracked view once per block -
+in a single Multicall3 aggregate call when ape's multicall is available, otherwise one call per view -
+and caches the result by block number, so repeated reads within a block are free.
+Each read returns a RammState snapshot in ETH/NXM units (the 1e18 fixed-point values divided by 1e18).
+
+RammState has the same attribute names as the model classes' metrics, so it can be recorded straight into a
+preallocated Trajectory instead of growing arrays with np.append every step:
+    reader = RammStateReader(ramm, pool, nxm, holder=dev, provider=networks.provider)
+    trajectory = reader.trajectory(length=hours + 1)
+    trajectory.record(reader.read())
+
+The reader works the same on the contracts of a hardhat node and on a RammEmulator (with batched=False,
+as a multicall aggregates contract calls only). If the node has no Multicall3 contract, the reader warns
+and falls back to one call per view; any other error of the aggregate call propagates.
+'''
+
+import warnings
+from collections import namedtuple
+
+from BondingCurveNexus.trajectory import Trajectory
+
+# snapshot of the tracked contract state at one block
+RAMM_STATE_FIELDS = ['block_number', 'timestamp', 'cap_pool', 'nxm_supply', 'nxm_balance', 'book_value',
+                     'liq', 'liq_NXM_a', 'liq_NXM_b', 'budget', 'spot_price_a', 'spot_price_b', 'internal_price']
+RammState = namedtuple('RammState', RAMM_STATE_FIELDS)
+
+# ape's Multicall3 aggregate call, if installed
+try:
+    from ape_ethereum import multicall
+    from ape_ethereum.multicall.exceptions import UnsupportedChainError
+except ImportError:
+    multicall = None
+
+class RammStateReader:
+
+    def __init__(self, ramm, pool, nxm, holder, provider, batched=True, cache_size=1024):
+        self.ramm = ramm
+        self.pool = pool
+        self.nxm = nxm
+        self.holder = holder
+        self.provider = provider
+        # use a multicall aggregate if available - switched off if the node has no Multicall3 contract
+        self.batched = batched and multicall is not None
+        # snapshots by block number, keeping the latest cache_size blocks
+        self.cache = {}
+        self.cache_size = cache_size
+        # number of times the views were fetched from the node
+        self.fetches = 0
+
+    # every tracked view as a (method, args) pair, in the order they are unpacked
+    def views(self):
+        return [(self.pool.getPoolValueInEth, ()),
+                (self.nxm.totalSupply, ()),
+                (self.nxm.balanceOf, (self.holder,)),
+                (self.ramm.getBookValue, ()),
+                (self.ramm.getReserves, ()),
+                (self.ramm.getSpotPrices, ()),
+                (self.ramm.getInternalPrice, ())]
+
+    # raw results of every view at the latest block
+    def fetch(self):
+        self.fetches += 1
+        if self.batched:
+            try:
+                call = multicall.Call()
+                for method, args in self.views():
+                    call.add(method, *args)
+                return list(call())
+            except UnsupportedChainError as error:
+                warnings.warn(f'no Multicall3 on the node ({error!r}), reading the RAMM views one call at a time')
+                self.batched = False
+        return [method(*args) for method, args in self.views()]
+
+    # snapshot of the latest block, fetched once per block
+    def read(self):
+        block = self.provider.get_block('latest')
+        if block.number not in self.cache:
+            capital, supply, balance, book_value, reserves, spot_prices, internal_price = self.fetch()
+            eth, nxm_a, nxm_b, budget = reserves
+            spot_price_a, spot_price_b = spot_prices
+            state = RammState(block.number, block.timestamp,
+                              *(value / 1e18 for value in (capital, supply, balance, book_value,
+                                                           eth, nxm_a, nxm_b, budget,
+                                                           spot_price_a, spot_price_b, internal_price)))
+            if len(self.cache) >= self.cache_size:
+                del self.cache[min(self.cache)]
+            self.cache[block.number] = state
+        return self.cache[block.number]
+
+    # preallocated trajectory of every snapshot field
+    def trajectory(self, length):
+        return Trajectory(metrics=RAMM_STATE_FIELDS, length=length)
@@ -0,0 +1,236 @@
+'''
+Content-addressed on-disk cache of simulation trajectories.
+
+A simulation is fully determined by its model class, the source code it runs,
+its full SimParams parameter set, its seed and any extra model arguments,
+so its recorded trajectory is stored under a hash of all of these:
+    key = cache_key(RAMMMarketsStoch, params, seed=1)
+
+Trajectories are stored as one .npz file of metric arrays per key in the cache directory
+(~/.cache/BondingCurveNexus by default, or $BONDINGCURVENEXUS_CACHE).
+Files are touched on every hit, and once the directory grows past max_bytes the least recently used
+files are removed until it fits again. Writes go through a temporary file, so parallel workers can share a cache.
+
+run_model runs a single simulation through the cache, returning a model instance whose trajectory is
+either freshly recorded or loaded from disk - on a hit the model is constructed but never stepped,
+so only the trajectory (and the <metric>_prediction views onto it) reflects the run:
+    sim = run_model(RAMMMarketsStoch, seed=1)
+    sim.sell_nxm_price_prediction
+
+The source version covers every .py file of the BondingCurveNexus package, plus the files defining the model class
+and its base classes if they live outside it, so a change to any helper module (arbitrage, streams, ...) misses
+the cache. The package is hashed once per process - restart after editing the package in a running session.
+Unseeded runs are random, so are never cached, and neither are runs with model arguments that aren't plain values.
+
+With checkpoint_dir, a run of a Checkpointable model (see checkpoint.py) also writes a checkpoint there every
+checkpoint_every days, named by its key. If the run is interrupted, running it again picks up from the last checkpoint
+instead of day 0, and the checkpoint is removed once the run completes.
+
+Runs of SteadyState models (see steady_state.py) are fast-forwarded to the last day once they reach a fixed point,
+with the day they converged in sim.converged_day.
+'''
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+from tqdm import tqdm
+
+from BondingCurveNexus.checkpoint import Checkpointable, load_checkpoint
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.steady_state import SteadyState
+from BondingCurveNexus.trajectory import Trajectory
+
+DEFAULT_CACHE_DIR = os.environ.get('BONDINGCURVENEXUS_CACHE',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'BondingCurveNexus'))
+
+# 1 GiB by default
+DEFAULT_MAX_BYTES = 2 ** 30
+
+# days between checkpoints of a run with a checkpoint_dir
+DEFAULT_CHECKPOINT_EVERY = 30
+
+# directory of the BondingCurveNexus package
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# hash of every source file of the package, by path relative to the package - worked out once per process
+@functools.lru_cache(maxsize=None)
+def package_version():
+    digest = hashlib.sha256()
+    for root, dirs, names in os.walk(PACKAGE_DIR):
+        dirs[:] = sorted(name for name in dirs if name != '__pycache__')
+        for name in sorted(names):
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, PACKAGE_DIR).encode())
+                with open(path, 'rb') as file:
+                    digest.update(file.read())
+    return digest.hexdigest()
+
+# hash of the package source and of the source files of a model class and its base classes outside the package
+def model_version(model):
+    digest = hashlib.sha256(package_version().encode())
+    files = []
+    for cls in model.__mro__:
+        if cls is object:
+            continue
+        try:
+            path = inspect.getsourcefile(cls)
+        except TypeError:
+            continue
+        if path is not None and path not in files and \
+           os.path.commonpath([os.path.abspath(path), PACKAGE_DIR]) != PACKAGE_DIR:
+            files.append(path)
+    for path in files:
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def cache_key(model, params, seed, model_kwargs=None):
+    '''
+    Key of a simulation in the cache, or None if it can't be cached (unseeded or non-plain model arguments).
+    '''
+    if seed is None:
+        return None
+    try:
+        content = json.dumps({'model': f'{model.__module__}:{model.__qualname__}',
+                              'version': model_version(model),
+                              'params': params.to_dict(),
+                              'seed': int(seed),
+                              'model_kwargs': model_kwargs or {}}, sort_keys=True)
+    except TypeError:
+        return None
+    return hashlib.sha256(content.encode()).hexdigest()
+
+class ResultCache:
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    # metric arrays stored under a key, or None on a miss
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with np.load(path) as stored:
+                columns = {metric: stored[metric] for metric in stored.files}
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        # mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return columns
+
+    # store metric arrays under a key, then evict down to max_bytes
+    def put(self, key, columns):
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = os.path.join(self.directory, f'{key}.{os.getpid()}.tmp.npz')
+        np.savez(temporary, **columns)
+        os.replace(temporary, self.path(key))
+        self.evict()
+
+    # stored files as (last used, size, path), least recently used first
+    def entries(self):
+        entries = []
+        try:
+            scan = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return entries
+        for entry in scan:
+            if entry.name.endswith('.npz') and '.tmp.' not in entry.name:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    # total size of the stored files in bytes
+    def size(self):
+        return sum(size for used, size, path in self.entries())
+
+    # remove least recently used files until the cache fits in max_bytes
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for used, size, path in entries)
+        for used, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for used, size, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+# the default cache for cache=True, or the cache given
+def resolve_cache(cache):
+    if cache is True:
+        return ResultCache()
+    return cache or None
+
+def run_model(model, params=None, seed=None, model_kwargs=None, days=None, cache=True, progress=False,
+              checkpoint_dir=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY, fast_forward=True):
+    '''
+    Run one simulation of a model class for days (defaults to params.model_days), through the result cache.
+
+    cache is True for the default cache, a ResultCache, or None/False to always run.
+    If checkpoint_dir is given, seeded runs of Checkpointable models are checkpointed there every checkpoint_every days
+    and resumed from their last checkpoint if one exists.
+    With fast_forward, SteadyState models skip the remaining days once a day of events changes nothing.
+    Returns the model instance, with its trajectory loaded from the cache on a hit.
+    '''
+    params = params if params is not None else SimParams.from_modules()
+    days = days if days is not None else params.model_days
+    cache = resolve_cache(cache)
+    key = cache_key(model, params, seed, dict(model_kwargs or {}, days=days)) \
+          if cache is not None or checkpoint_dir is not None else None
+
+    sim = model(params=params, seed=seed, **(model_kwargs or {}))
+    if key is not None and cache is not None:
+        columns = cache.get(key)
+        if columns is not None:
+            sim.trajectory = Trajectory.from_dict(columns)
+            return sim
+
+    checkpoint_path = None
+    if key is not None and checkpoint_dir is not None and isinstance(sim, Checkpointable):
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        checkpoint_path = os.path.join(checkpoint_dir, f'{key}.ckpt')
+        if os.path.exists(checkpoint_path):
+            sim = load_checkpoint(checkpoint_path)
+
+    steady = fast_forward and isinstance(sim, SteadyState)
+    for i in tqdm(range(sim.current_day, days), disable=not progress):
+        try:
+            sim.one_day_passes()
+        except ZeroDivisionError:
+            break
+        if steady and sim.is_steady():
+            sim.fast_forward(days)
+            break
+        if checkpoint_path is not None and sim.current_day % checkpoint_every == 0:
+            sim.checkpoint(checkpoint_path)
+
+    if key is not None and cache is not None:
+        cache.put(key, sim.trajectory.to_dict())
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return sim
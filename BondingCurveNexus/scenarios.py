@@ -0,0 +1,423 @@
+'''
+Declarative scenario specs and a batch runner for them.
+
+Each archived simulation script differs from its neighbours only in a few constants.
+A scenario spec records just those constants in a TOML (or YAML, if PyYAML is installed) file, e.g.
+    name = "08_5,000OpenLiq_100LiqRemoved_200ETHEnteringAfterDay8_4%RatchetSpeed_NoPriceThreshold"
+    group = "implementation_minting"
+    description = "Testing 200 ETH entering every quarter day after Day 9"
+    horizon_days = 30
+    step_hours = 6
+
+    [[swaps]]
+    kind = "buy"
+    per_step = 200
+    start_step = 37
+
+Specs without a model run against the RAMM contracts, stepping time forward step_hours at a time
+for horizon_days and recording the contract state after every step. Each [[swaps]] table is a flow of swaps:
+ - kind - "buy" (ETH in) or "sell" (NXM in)
+ - size - per_step, per_day (spread evenly over the steps of a day) or total over over_days
+ - total - optional cap on the whole amount swapped; the flow stops once it has all been swapped
+ - timing - every step from start_step (0-based) up to end_step, or only at the listed steps
+ - price_threshold - optional multiple of book value - buys only happen while the price above is below
+   price_threshold * BV, sells only while the price below is above it
+On-chain specs run either on local hardhat nodes through farm() (backend='chain'),
+or in-process on a RammEmulator (backend='emulator').
+
+The chain backend runs the contracts as deployed (see deployment/addresses.json), so the opening liquidity
+and the ratchet and liquidity speeds are those of the deployment. On the emulator backend, a [ramm] table
+overrides them - amounts in ETH (NXM for the reserves) and ratchet speeds in basis points per day, e.g.
+    [ramm]
+    eth = 2500
+    ratchet_speed_b = 400
+with keys eth, nxm_a, nxm_b (defaulting to eth at the deployed opening prices), budget, target_liquidity,
+liq_speed_a, liq_speed_b, fast_liquidity_speed, ratchet_speed_a and ratchet_speed_b.
+Specs with a [ramm] table are refused on the chain backend rather than run on the wrong opening state.
+
+Specs with a model ('package.module:ClassName') run that Python model instead,
+with the [params] table as SimParams overrides (by bare name), horizon_days as model_days, sims simulations and a seed.
+
+run_specs runs any set of specs in parallel and caches every result by a hash of the spec, the backend and
+the package source (see result_cache.model_version), so changing only a name, group, title or description
+never reruns a scenario, while editing the emulator or a model does.
+The archived graphs can be regenerated in one command, e.g.
+    python -m BondingCurveNexus.scenarios scenarios --backend emulator --graphs graphs
+which writes graphs/<group>/<name>.png for every spec file in scenarios/.
+'''
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from BondingCurveNexus.farm import farm
+from BondingCurveNexus.ramm_state import RammStateReader
+from BondingCurveNexus.result_cache import model_version, package_version
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.sweep import load_model, run_sim, sim_seed
+
+# TOML parser from the standard library (python 3.11+) and PyYAML, if available
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+SPEC_SUFFIXES = ('.toml', '.yaml', '.yml')
+
+# spec keys that only change how results are presented, so are left out of the cache key
+PRESENTATION_KEYS = ('name', 'group', 'title', 'description')
+
+SWAP_KINDS = ('buy', 'sell')
+
+# [ramm] keys - RammEmulator arguments given in whole ETH/NXM, and ratchet speeds in basis points per day
+RAMM_AMOUNT_KEYS = ('eth', 'nxm_a', 'nxm_b', 'budget', 'target_liquidity', 'liq_speed_a', 'liq_speed_b',
+                    'fast_liquidity_speed')
+RAMM_SPEED_KEYS = ('ratchet_speed_a', 'ratchet_speed_b')
+
+# swap deadline far in the future
+DEADLINE = 32503680000
+
+# SPECS
+def load_spec(path):
+    '''
+    Read a scenario spec from a TOML or YAML file, named after the file unless it has a name.
+    '''
+    suffix = os.path.splitext(path)[1]
+    if suffix == '.toml':
+        if tomllib is None:
+            raise ValueError('reading TOML specs needs python 3.11+')
+        with open(path, 'rb') as file:
+            spec = tomllib.load(file)
+    elif suffix in ('.yaml', '.yml'):
+        if yaml is None:
+            raise ValueError('reading YAML specs needs PyYAML')
+        with open(path, 'r') as file:
+            spec = yaml.safe_load(file)
+    else:
+        raise ValueError(f'unknown spec format: {path}')
+
+    spec.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+    validate_spec(spec)
+    return spec
+
+# every spec in a list of files and directories, directories in file name order
+def load_specs(paths):
+    specs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in sorted(os.walk(path)):
+                dirs.sort()
+                specs += [load_spec(os.path.join(root, file)) for file in sorted(files)
+                          if file.endswith(SPEC_SUFFIXES)]
+        else:
+            specs.append(load_spec(path))
+    return specs
+
+def validate_spec(spec):
+    if 'horizon_days' not in spec:
+        raise ValueError(f"spec {spec.get('name')} has no horizon_days")
+    if 'model' in spec:
+        if 'ramm' in spec:
+            raise ValueError(f"spec {spec['name']}: [ramm] overrides only apply to on-chain specs")
+        return
+    for key in spec.get('ramm', {}):
+        if key not in RAMM_AMOUNT_KEYS + RAMM_SPEED_KEYS:
+            raise ValueError(f"spec {spec['name']}: unknown [ramm] key {key!r}")
+    for swap in spec.get('swaps', []):
+        if swap.get('kind') not in SWAP_KINDS:
+            raise ValueError(f"spec {spec['name']}: swap kind must be 'buy' or 'sell', not {swap.get('kind')!r}")
+        if not any(key in swap for key in ('per_step', 'per_day', 'over_days')):
+            raise ValueError(f"spec {spec['name']}: swaps need per_step, per_day or total and over_days")
+        if 'over_days' in swap and 'total' not in swap:
+            raise ValueError(f"spec {spec['name']}: over_days needs a total")
+
+# backend a spec runs on - Python model specs always run on their model
+def spec_backend(spec, backend):
+    return 'model' if 'model' in spec else backend
+
+# cache key of a spec's results on a backend
+def spec_hash(spec, backend):
+    content = {key: value for key, value in spec.items() if key not in PRESENTATION_KEYS}
+    content['backend'] = spec_backend(spec, backend)
+    # source the results come from - the package, and the model's own files if outside it
+    content['version'] = model_version(load_model(spec['model'])) if 'model' in spec else package_version()
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+# RammEmulator arguments of a spec's [ramm] table, as 1e18 fixed-point amounts and integer speeds
+def ramm_overrides(spec):
+    overrides = {}
+    for key, value in spec.get('ramm', {}).items():
+        overrides[key] = int(value * 1e18) if key in RAMM_AMOUNT_KEYS else int(value)
+    return overrides
+
+# number of time steps of an on-chain spec
+def spec_steps(spec):
+    return int(round(spec['horizon_days'] * 24 / spec.get('step_hours', 6)))
+
+# size of one swap of a flow, in ETH for buys and NXM for sells
+def swap_amount(swap, step_hours):
+    if 'per_step' in swap:
+        return swap['per_step']
+    per_day = swap['per_day'] if 'per_day' in swap else swap['total'] / swap['over_days']
+    return per_day * step_hours / 24
+
+# whether a flow swaps at a step
+def swap_due(swap, step):
+    if 'steps' in swap:
+        return step in swap['steps']
+    return swap.get('start_step', 0) <= step < swap.get('end_step', np.inf)
+
+# whether the price is on the right side of the flow's book value threshold
+def within_threshold(swap, state):
+    if 'price_threshold' not in swap:
+        return True
+    if swap['kind'] == 'buy':
+        return state.spot_price_a < state.book_value * swap['price_threshold']
+    return state.spot_price_b > state.book_value * swap['price_threshold']
+
+# ON-CHAIN SCENARIOS
+def run_swaps(node, spec):
+    '''
+    Run an on-chain spec on a node set up by connect_deployment or emulator_node and return its trajectory.
+    '''
+    provider, ramm, dev, reader = node['provider'], node['ramm'], node['dev'], node['reader']
+    step_hours = spec.get('step_hours', 6)
+    steps = spec_steps(spec)
+    swaps = spec.get('swaps', [])
+    remaining = [swap.get('total', np.inf) for swap in swaps]
+
+    trajectory = reader.trajectory(length=steps + 1)
+    trajectory.record(reader.read())
+    block = provider.get_block('latest')
+
+    # main time loop
+    for i in range(steps):
+
+        # MOVE TIME
+        provider.set_timestamp(block.timestamp + int(step_hours * 3_600))
+        provider.mine()
+        block = provider.get_block('latest')
+
+        # SWAPS due this step, as long as the price is within threshold
+        for n, swap in enumerate(swaps):
+            if remaining[n] <= 0 or not swap_due(swap, i) or not within_threshold(swap, reader.read()):
+                continue
+            amount = min(swap_amount(swap, step_hours), remaining[n])
+            if swap['kind'] == 'buy':
+                ramm.swap(0, 0, DEADLINE, value=int(amount * 1e18), sender=dev)
+            else:
+                ramm.swap(int(amount * 1e18), 0, DEADLINE, sender=dev)
+            remaining[n] -= amount
+
+        # RECORD METRICS
+        trajectory.record(reader.read())
+
+    return trajectory
+
+# set up the deployed contracts on one hardhat node - called once per node by farm()
+def connect_deployment(provider, addresses_file='./deployment/addresses.json'):
+    from ape import accounts, Contract
+
+    with open(addresses_file, 'r') as file:
+        addresses = json.load(file)
+
+    # dev account loaded up with lots of ETH
+    dev = accounts.test_accounts[0]
+    dev.balance = int(1e27)
+
+    nxm = Contract(addresses.get('NXMToken'), abi="./deployment/abis/NXMToken.json")
+    pool = Contract(addresses.get('Pool'), abi="./deployment/abis/Pool.json")
+    ramm = Contract(addresses.get('Ramm'), abi="./deployment/abis/Ramm.json")
+
+    # dev gives permission to TokenController to use NXM and circuit breakers are turned off
+    nxm.approve(addresses.get('TokenController'), 2 ** 256 - 1, sender=dev)
+    ramm.setCircuitBreakerLimits(2 ** 32 - 1, 2 ** 32 - 1, sender=dev)
+
+    reader = RammStateReader(ramm, pool, nxm, holder=dev, provider=provider)
+    return {'provider': provider, 'ramm': ramm, 'dev': dev, 'reader': reader}
+
+# a fresh RammEmulator in the deployed contract's opening state, set up like connect_deployment
+# overrides are further RammEmulator arguments, e.g. from ramm_overrides
+def emulator_node(dev='dev', **overrides):
+    from BondingCurveNexus.ramm_emulator import RammEmulator
+
+    ramm = RammEmulator(holder=dev, **overrides)
+    reader = RammStateReader(ramm, ramm.pool, ramm.nxm, holder=dev, provider=ramm.provider, batched=False)
+    return {'provider': ramm.provider, 'ramm': ramm, 'dev': dev, 'reader': reader}
+
+# RUNNING - executed in worker processes
+def run_emulated(spec):
+    frame = pd.DataFrame(run_swaps(emulator_node(**ramm_overrides(spec)), spec).to_dict())
+    frame.insert(0, 'step', range(len(frame)))
+    return frame
+
+def run_model(spec):
+    model = load_model(spec['model'])
+    # lists in the spec file are tuples in SimParams
+    overrides = {name: tuple(value) if isinstance(value, list) else value
+                 for name, value in spec.get('params', {}).items()}
+    params = SimParams.from_modules().replace(model_days=int(spec['horizon_days']), **overrides)
+    frames = []
+    for sim in range(spec.get('sims', 1)):
+        frame = pd.DataFrame(run_sim(model, params, sim_seed(spec.get('seed', 0), 0, sim),
+                                     model_kwargs=spec.get('model_kwargs')))
+        frame.insert(0, 'sim', sim)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+def run_specs(specs, backend='chain', cache_dir='./scenario_cache', max_workers=None, progress=True,
+              **farm_kwargs):
+    '''
+    Run scenario specs in parallel and return their results as {name: DataFrame}.
+
+    On-chain specs run on backend 'chain' (local hardhat nodes through farm(), with farm_kwargs passed on)
+    or 'emulator' (RammEmulator in worker processes); Python model specs run on their model.
+    Results are cached in cache_dir by spec hash - pass cache_dir=None to always rerun.
+    Specs with [ramm] overrides of the opening state run on the emulator backend only.
+    '''
+    if backend not in ('chain', 'emulator'):
+        raise ValueError(f"backend must be 'chain' or 'emulator', not {backend!r}")
+    for spec in specs:
+        if 'ramm' in spec and spec_backend(spec, backend) == 'chain':
+            raise ValueError(f"spec {spec['name']}: [ramm] overrides need the emulator backend")
+
+    results = {}
+    to_run = []
+    for spec in specs:
+        path = os.path.join(cache_dir, f'{spec_hash(spec, backend)}.csv') if cache_dir is not None else None
+        if path is not None and os.path.exists(path):
+            results[spec['name']] = pd.read_csv(path)
+        else:
+            to_run.append((spec, path))
+
+    # on-chain specs on hardhat nodes, everything else in a process pool
+    chain = [(spec, path) for spec, path in to_run if spec_backend(spec, backend) == 'chain']
+    local = [(spec, path) for spec, path in to_run if spec_backend(spec, backend) != 'chain']
+
+    if chain:
+        table = farm({spec['name']: partial(run_swaps, spec=spec) for spec, path in chain},
+                     connect_deployment, progress=progress, **farm_kwargs)
+        for name, error in table.attrs['errors'].items():
+            print(f'spec {name} failed: {error}')
+        for spec, path in chain:
+            if spec['name'] in table.attrs['errors']:
+                continue
+            frame = table[table['scenario'] == spec['name']].drop(columns='scenario').reset_index(drop=True)
+            results[spec['name']] = frame
+            if path is not None:
+                save_result(frame, path)
+
+    if local:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            futures = {executor.submit(run_model if 'model' in spec else run_emulated, spec): (spec, path)
+                       for spec, path in local}
+            for future in tqdm(as_completed(futures), total=len(futures), disable=not progress):
+                spec, path = futures[future]
+                results[spec['name']] = future.result()
+                if path is not None:
+                    save_result(results[spec['name']], path)
+
+    # in the order the specs were given
+    return {spec['name']: results[spec['name']] for spec in specs if spec['name'] in results}
+
+def save_result(frame, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    frame.to_csv(path, index=False)
+
+# GRAPHS
+# panels of the archived graphs as (title, [(column, label)]) - only the columns in a result are plotted
+PANELS = [('nxm_price', [('spot_price_b', 'price below'), ('spot_price_a', 'price above'),
+                         ('sell_nxm_price', 'price below'), ('buy_nxm_price', 'price above'),
+                         ('nxm_price', 'nxm price'), ('book_value', 'book value'),
+                         ('internal_price', 'internal price'), ('wnxm_price', 'wnxm price')]),
+          ('cap_pool', [('cap_pool', 'cap_pool')]),
+          ('nxm_supply', [('nxm_supply', 'nxm supply'), ('wnxm_supply', 'wnxm supply')]),
+          ('liquidity_nxm', [('liq_NXM_b', 'NXM reserve below'), ('liq_NXM_a', 'NXM reserve above'),
+                             ('sell_liquidity_nxm', 'NXM reserve below'), ('buy_liquidity_nxm', 'NXM reserve above'),
+                             ('liquidity_nxm', 'NXM reserve')]),
+          ('liquidity_eth', [('liq', 'ETH liquidity'), ('sell_liquidity_eth', 'ETH liquidity below'),
+                             ('buy_liquidity_eth', 'ETH liquidity above'), ('liquidity_eth', 'ETH liquidity')]),
+          ('nxm_minted', [('nxm_minted', 'nxm_minted')])]
+
+def plot_spec(spec, results, path):
+    '''
+    Save the archived 3x2 graph of a spec's results to path.
+    '''
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    results = results.copy()
+    if 'timestamp' in results:
+        # on-chain results - days since the start, and NXM minted from the supply
+        x = (results['timestamp'] - results['timestamp'].iloc[0]) / 86_400
+        results['nxm_minted'] = results['nxm_supply'] - results['nxm_supply'].iloc[0]
+    else:
+        # model results - mean over simulations by day
+        results = results.groupby('day').mean(numeric_only=True).reset_index()
+        x = results['day']
+
+    fig, axs = plt.subplots(3, 2, figsize=(15, 18))
+    fig.suptitle('\n'.join(line for line in (spec.get('title', spec['name']), spec.get('description')) if line),
+                 fontsize=16)
+    fig.subplots_adjust(top=0.9)
+
+    for ax, (title, columns) in zip(axs.flat, PANELS):
+        for column, label in columns:
+            if column in results:
+                ax.plot(x, results[column], label=label)
+        if title == 'liquidity_eth' and 'liq' in results:
+            ax.plot(x, np.full(len(x), results['liq'].iloc[0]), label='target')
+        ax.set_title(title)
+        ax.legend()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fig.savefig(path)
+    plt.close(fig)
+
+def regenerate(paths, backend='chain', graph_dir='graphs', cache_dir='./scenario_cache', **run_kwargs):
+    '''
+    Run every spec in paths (files or directories) and save its graph to graph_dir/<group>/<name>.png.
+    '''
+    specs = load_specs(paths)
+    results = run_specs(specs, backend=backend, cache_dir=cache_dir, **run_kwargs)
+    for spec in specs:
+        if spec['name'] in results:
+            path = os.path.join(graph_dir, spec.get('group', ''), f"{spec['name']}.png")
+            plot_spec(spec, results[spec['name']], path)
+            print(f'graph saved to {path}')
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Run scenario specs and regenerate their graphs.')
+    parser.add_argument('paths', nargs='+', help='spec files or directories of spec files')
+    parser.add_argument('--backend', default='chain', choices=['chain', 'emulator'],
+                        help='where on-chain specs run - local hardhat nodes or the RAMM emulator')
+    parser.add_argument('--graphs', default='graphs', help='directory to save graphs to')
+    parser.add_argument('--cache', default='./scenario_cache', help="result cache directory, or 'none'")
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--nodes', type=int, default=None, help='number of hardhat nodes for the chain backend')
+    parser.add_argument('--fork-url', default=None, help='url for the hardhat nodes to fork')
+    parser.add_argument('--fork-block', default=None, help='block for the hardhat nodes to fork at')
+    args = parser.parse_args()
+
+    farm_kwargs = {}
+    if args.backend == 'chain':
+        farm_kwargs = dict(num_nodes=args.nodes, fork_url=args.fork_url, fork_block=args.fork_block)
+    regenerate(args.paths, backend=args.backend, graph_dir=args.graphs,
+               cache_dir=None if args.cache == 'none' else args.cache,
+               max_workers=args.workers, **farm_kwargs)
+
+if __name__ == '__main__':
+    main()
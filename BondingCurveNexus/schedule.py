@@ -0,0 +1,111 @@
+'''
+Precompiled event schedules for the model day loops.
+
+Rather than building and shuffling a list of event name strings every day,
+the events of a whole projection are generated up front as one compact array of integer event codes,
+grouped by day and shuffled within each day using a seeded numpy Generator.
+day_starts gives the offset of each day's events, so day(d) is a slice of the events array.
+
+The models dispatch each code through a jump table of handler methods, e.g.
+    {RATCHET: self.ratchet_event, WNXM_SHIFT: self.wnxm_shift, ...}
+
+A schedule is exactly replayable and can be shared by several model instances for paired comparisons:
+    schedule = RAMMMarketsStoch().event_schedule()
+    a = RAMMMarketsStoch(arb_mode='analytic', schedule=schedule)
+    b = RAMMMarketsStoch(arb_mode='chunked', schedule=schedule)
+
+For the continuous-time engines a schedule can also be timed: every event gets a timestamp in seconds
+from the start of the projection, drawn uniformly within its day, and the events of each day are in time order.
+day_times(d) gives the timestamps of a day's events alongside day(d).
+
+append() adds the days of another schedule to the end of one, e.g. when a checkpointed model is extended.
+'''
+
+import numpy as np
+
+# integer codes for the events of a day
+NO_EVENT = 0
+RATCHET = 1
+WNXM_SHIFT = 2
+PLATFORM_BUY = 3
+PLATFORM_SALE = 4
+LIQ_MOVE = 5
+PREMIUM_INCOME = 6
+CLAIM_OUTGO = 7
+COVER_AMOUNT_CHANGE = 8
+INVESTMENT_RETURN = 9
+
+# length of a day in seconds, the unit of event timestamps
+SECONDS_PER_DAY = 86_400
+
+# the HighLowCap models trade directly with the protocol rather than a platform
+PROTOCOL_BUY = PLATFORM_BUY
+PROTOCOL_SALE = PLATFORM_SALE
+
+# event names by code, used for printouts
+EVENT_NAMES = ['no_event', 'ratchet', 'wnxm_shift', 'platform_buy', 'platform_sale', 'liq_move',
+               'premium_income', 'claim_outgo', 'cover_amount_change', 'investment_return']
+
+class EventSchedule:
+
+    def __init__(self, events, day_starts, times=None):
+        # event codes of the whole projection, grouped by day
+        self.events = np.asarray(events, dtype=np.int8)
+        # offset of the first event of each day, with the total number of events at the end
+        self.day_starts = np.asarray(day_starts, dtype=np.int64)
+        # optional timestamp of each event in seconds from the start of the projection
+        self.times = None if times is None else np.asarray(times, dtype=np.float64)
+
+    # generate a schedule from the number of each event per day
+    # counts is a dictionary of {event code: count}, where a count is a single number for every day
+    # or an array with one entry per day
+    # if timed, each event is also given a uniformly random time within its day
+    @classmethod
+    def build(cls, counts, days, rng=None, timed=False):
+        rng = rng if rng is not None else np.random.default_rng()
+        codes = np.array(list(counts), dtype=np.int8)
+        daily_counts = np.zeros((days, len(codes)), dtype=np.int64)
+        for column, count in enumerate(counts.values()):
+            count = np.asarray(count)
+            daily_counts[:, column] = count[:days] if count.ndim else count
+
+        # unshuffled events, in code order within each day
+        events = np.repeat(np.tile(codes, days), daily_counts.ravel())
+        events_per_day = daily_counts.sum(axis=1)
+        event_days = np.repeat(np.arange(days), events_per_day)
+
+        # shuffle within each day by sorting on day, then a random key
+        # the key doubles as the time of day of a timed event, so timed events are in time order
+        keys = rng.random(len(events))
+        order = np.lexsort((keys, event_days))
+        day_starts = np.concatenate(([0], np.cumsum(events_per_day)))
+        times = (event_days + keys)[order] * SECONDS_PER_DAY if timed else None
+        return cls(events[order], day_starts, times)
+
+    # number of days in the schedule
+    def __len__(self):
+        return len(self.day_starts) - 1
+
+    # event codes of a single day
+    def day(self, day):
+        return self.events[self.day_starts[day]:self.day_starts[day + 1]]
+
+    # timestamps of the events of a single day
+    def day_times(self, day):
+        return self.times[self.day_starts[day]:self.day_starts[day + 1]]
+
+    # schedule with the days of other following the days of this one
+    # both schedules must be timed or untimed alike, and the times of other are moved on by the days of this one
+    def append(self, other):
+        if (self.times is None) != (other.times is None):
+            raise ValueError('cannot append a timed and an untimed schedule')
+        events = np.concatenate((self.events, other.events))
+        day_starts = np.concatenate((self.day_starts, self.day_starts[-1] + other.day_starts[1:]))
+        times = None if self.times is None else \
+                np.concatenate((self.times, other.times + len(self) * SECONDS_PER_DAY))
+        return EventSchedule(events, day_starts, times)
+
+    # number of events of one type on each day
+    def counts(self, code):
+        event_days = np.repeat(np.arange(len(self)), np.diff(self.day_starts))
+        return np.bincount(event_days[self.events == code], minlength=len(self))
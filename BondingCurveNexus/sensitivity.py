@@ -0,0 +1,220 @@
+'''
+Global sensitivity analysis of model outputs to the sys_params / model_params, with Sobol indices.
+
+The parameter testing scripts (SellOnlyParamTesting, BuyOnlyParamTesting, DeterministicMarketTesting) move one
+parameter at a time from a base case, which misses interactions and needs a grid per parameter.
+sensitivity() instead varies every parameter of a space at once, e.g.
+    space = {'ratchet_up_perc': (0.005, 0.1), 'liq_out_perc': (0.005, 0.1),
+             'target_liq_sell': (1000, 50000, 'log'), 'price_transition_buffer': (0, 10000)}
+    indices = sensitivity(RAMMMarketsStoch, space, outputs=['eth_drained', 'book_value'], n=512, seed=1)
+    plot_indices(indices, 'eth_drained')
+
+Ranges are given as in optimize.py - (low, high) with an optional 'linear', 'log' or 'int' scale -
+and fixed holds any other parameter overrides for every run.
+An output is a name from optimize.OBJECTIVES, the name of a tracked metric (its value on the last day),
+or a function of a Trajectory defined at module level.
+
+For d parameters, n rows of two sample matrices A and B are drawn from a 2d-dimensional scrambled Sobol sequence
+(method='sobol', n a power of 2) or Latin hypercube (method='lhs'). The model is run on A, on B, and on every
+AB_i - A with column i taken from B - so each run serves every index, and d parameters cost n * (d + 2) runs.
+From the outputs f:
+ - first order index S_i = mean(f(B) * (f(AB_i) - f(A))) / Var(f) (Saltelli 2010) - the share of the variance
+   of an output due to parameter i alone
+ - total index ST_i = mean((f(A) - f(AB_i)) ** 2) / 2Var(f) (Jansen) - its share including all interactions
+Confidence intervals come from bootstrap resamples of the n rows.
+
+Row j of A, B and every AB_i runs with the same seed, so the indices compare parameter values on the same paths,
+and the variation between paths is left as the share of the variance no parameter explains.
+Runs go through a ProcessPoolExecutor (all cores by default) and the result cache (see result_cache.py).
+
+Returns a DataFrame with a row per output and parameter, of first_order and total indices and their
+confidence intervals (first_order_low, first_order_high, total_low, total_high).
+
+Can also be run from the command line, e.g.
+    python -m BondingCurveNexus.sensitivity BondingCurveNexus.RAMM_markets_stoch:RAMMMarketsStoch \\
+        --space ratchet_up_perc=0.005:0.1 --space target_liq_sell=1000:50000:log \\
+        --output eth_drained --output book_value --n 512 --seed 1 --out indices.csv
+'''
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+from tqdm import tqdm
+
+from BondingCurveNexus.optimize import (OBJECTIVES, from_unit, latin_hypercube, parse_overrides, parse_space,
+                                        parse_space_args)
+from BondingCurveNexus.result_cache import resolve_cache, run_model
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.streams import child_seed
+from BondingCurveNexus.sweep import load_model
+
+METHODS = ('sobol', 'lhs')
+
+# name of an output in the results
+def output_name(output):
+    return output if isinstance(output, str) else output.__name__
+
+# value of an output for one trajectory - an objective, the last value of a metric or a function
+def output_value(trajectory, output):
+    if callable(output):
+        return float(output(trajectory))
+    if output in OBJECTIVES:
+        return float(OBJECTIVES[output](trajectory))
+    if output in trajectory:
+        return float(trajectory[output][-1])
+    raise ValueError(f'output {output!r} is neither an objective nor a tracked metric')
+
+# values of the outputs for one simulation - executed in a worker process
+def evaluate_outputs(model, params, seed, model_kwargs, outputs, cache):
+    sim = run_model(model, params, seed, model_kwargs, cache=cache)
+    return [output_value(sim.trajectory, output) for output in outputs]
+
+# sample matrices A and B of n points of the d-dimensional unit cube
+def sample_matrices(n, d, method, rng):
+    if method == 'sobol':
+        if n & (n - 1):
+            raise ValueError(f'n must be a power of 2 for sobol samples, not {n}')
+        base = qmc.Sobol(2 * d, scramble=True, seed=rng).random_base2(int(np.log2(n)))
+    elif method == 'lhs':
+        base = latin_hypercube(n, 2 * d, rng)
+    else:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}, not {method!r}")
+    return base[:, :d], base[:, d:]
+
+# first order and total indices of every parameter from the outputs on A, B and AB (shape (d, n))
+# rows selects the rows the indices are estimated from, with a leading axis for bootstrap resamples
+def sobol_indices(f_a, f_b, f_ab, rows=None):
+    if rows is not None:
+        f_a, f_b, f_ab = f_a[rows], f_b[rows], f_ab[:, rows]
+        # resamples as the middle axis of f_ab, to broadcast against the parameters
+        f_ab = np.moveaxis(f_ab, 0, -2)
+    variance = np.var(np.concatenate((f_a, f_b), axis=-1), axis=-1)[..., None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        first_order = np.mean(f_b[..., None, :] * (f_ab - f_a[..., None, :]), axis=-1) / variance
+        total = 0.5 * np.mean((f_a[..., None, :] - f_ab) ** 2, axis=-1) / variance
+    return first_order, total
+
+def sensitivity(model, space, outputs=('eth_drained',), n=256, method='sobol', fixed=None, seed=None,
+                model_kwargs=None, n_bootstrap=1000, confidence=0.95, max_workers=None, cache=True, progress=True):
+    '''
+    First order and total Sobol indices of model outputs over ranges of parameters.
+
+    model is a model class (or a 'package.module:ClassName' string) and space a dictionary of
+    {parameter: (low, high)} or {parameter: (low, high, scale)}, as for optimize().
+    outputs are objective names, tracked metrics (taking their final value) or module-level functions of a Trajectory.
+    n rows of 'sobol' or 'lhs' samples are run n * (len(space) + 2) times in all; fixed are parameter overrides for every run.
+    Returns a DataFrame with a row per output and parameter, with confidence intervals from n_bootstrap resamples.
+    '''
+    if isinstance(model, str):
+        model = load_model(model)
+    bounds = parse_space(space)
+    names = list(bounds)
+    d = len(names)
+    outputs = list(outputs)
+    cache = resolve_cache(cache)
+    base_params = SimParams.from_modules(**(fixed or {}))
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    rng = np.random.default_rng(child_seed(seed, 1))
+    a, b = sample_matrices(n, d, method, rng)
+
+    # every run - matrix A, B, then AB_i for each parameter i - with its row
+    units = [a, b]
+    for i in range(d):
+        ab = a.copy()
+        ab[:, i] = b[:, i]
+        units.append(ab)
+    # outputs of every run, by matrix, row and output
+    values = np.empty((d + 2, n, len(outputs)))
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {}
+        for matrix, unit in enumerate(units):
+            for row in range(n):
+                params = base_params.replace(**from_unit(bounds, unit[row]))
+                future = executor.submit(evaluate_outputs, model, params, child_seed(seed, 0, row), model_kwargs,
+                                         outputs, cache)
+                futures[future] = (matrix, row)
+
+        for future in tqdm(as_completed(futures), total=len(futures), disable=not progress):
+            matrix, row = futures[future]
+            values[matrix, row] = future.result()
+
+    # bootstrap resamples of the rows, shared by every output
+    resamples = rng.integers(n, size=(n_bootstrap, n))
+    tail = (1 - confidence) / 2
+    frames = []
+    for column, output in enumerate(outputs):
+        f_a, f_b, f_ab = values[0, :, column], values[1, :, column], values[2:, :, column]
+        first_order, total = sobol_indices(f_a, f_b, f_ab)
+        boot_first, boot_total = sobol_indices(f_a, f_b, f_ab, resamples)
+        frames.append(pd.DataFrame({'output': output_name(output), 'parameter': names,
+                                    'first_order': first_order,
+                                    'first_order_low': np.nanquantile(boot_first, tail, axis=0),
+                                    'first_order_high': np.nanquantile(boot_first, 1 - tail, axis=0),
+                                    'total': total,
+                                    'total_low': np.nanquantile(boot_total, tail, axis=0),
+                                    'total_high': np.nanquantile(boot_total, 1 - tail, axis=0)}))
+    results = pd.concat(frames, ignore_index=True)
+    results.attrs['simulations'] = n * (d + 2)
+    results.attrs['seed'] = seed
+    return results
+
+# bar chart of the first order and total indices of one output, with their confidence intervals
+def plot_indices(results, output, ax=None):
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(10, 5))
+    rows = results[results['output'] == output]
+    positions = np.arange(len(rows))
+    for offset, index in ((-0.2, 'first_order'), (0.2, 'total')):
+        errors = [rows[index] - rows[f'{index}_low'], rows[f'{index}_high'] - rows[index]]
+        ax.bar(positions + offset, rows[index], width=0.4, yerr=errors, capsize=3, label=index.replace('_', ' '))
+    ax.set_xticks(positions)
+    ax.set_xticklabels(rows['parameter'], rotation=30, ha='right')
+    ax.set_title(f'Sobol indices of {output}')
+    ax.legend()
+    ax.figure.tight_layout()
+    return ax
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sobol sensitivity indices of model outputs over parameter ranges.')
+    parser.add_argument('model', help="model class as 'package.module:ClassName'")
+    parser.add_argument('--space', action='append', default=[], metavar='PARAM=LOW:HIGH[:SCALE]',
+                        help='parameter range to vary, e.g. target_liq_sell=1000:50000:log')
+    parser.add_argument('--output', action='append', default=[],
+                        help='objective or tracked metric to analyse (defaults to eth_drained)')
+    parser.add_argument('--n', type=int, default=256, help='rows of each sample matrix')
+    parser.add_argument('--method', default='sobol', choices=list(METHODS), help='sampling method')
+    parser.add_argument('--set', action='append', default=[], metavar='PARAM=VALUE',
+                        help='parameter override for every run, e.g. lambda_exits=20')
+    parser.add_argument('--bootstrap', type=int, default=1000, help='bootstrap resamples for confidence intervals')
+    parser.add_argument('--seed', type=int, default=None, help='sample seed')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (defaults to all cores)')
+    parser.add_argument('--no-cache', action='store_true', help='rerun every simulation instead of using the result cache')
+    parser.add_argument('--out', default=None, help='csv file the indices are written to')
+    parser.add_argument('--plot', default=None, help='image file the indices of the first output are plotted to')
+    args = parser.parse_args(argv)
+    if not args.space:
+        parser.error('at least one --space is required')
+
+    space = parse_space_args(args.space)
+    fixed = parse_overrides(args.set)
+    results = sensitivity(args.model, space, outputs=args.output or ['eth_drained'], n=args.n, method=args.method,
+                          fixed=fixed, seed=args.seed, n_bootstrap=args.bootstrap, max_workers=args.workers,
+                          cache=None if args.no_cache else True)
+    if args.out is not None:
+        results.to_csv(args.out, index=False)
+    if args.plot is not None:
+        plot_indices(results, results['output'].iloc[0]).figure.savefig(args.plot)
+    print(f"{results.attrs['simulations']} simulations (seed {results.attrs['seed']})")
+    print(results.to_string(index=False, float_format='{:.3f}'.format))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+'''
+Define an immutable set of simulation parameters to be passed into the model classes
+
+SimParams holds every value from sys_params and model_params that the models use,
+so that each model instance reads its own copy rather than the module-level globals.
+Instances are frozen, so many configurations can run side by side in threads or processes.
+
+Constants derived from the parameters (per-ratchet price and liquidity steps, oracle buffer multipliers,
+daily investment return etc.) are precomputed once when the instance is created
+and are recomputed whenever a changed copy is made with replace().
+
+Build from the current module values with SimParams.from_modules(), optionally with overrides:
+    params = SimParams.from_modules(ratchet_up_perc=0.02, wnxm_move_size=1e-6)
+
+The deterministic entry/exit arrays always cover model_days - if model_days is raised past their length
+they carry on with their last day's count - and the per-shift wNXM diffusion follows wnxm_shifts_per_day,
+so any horizon or shift frequency can be set on its own.
+'''
+
+from dataclasses import dataclass, field, fields
+import dataclasses
+
+from BondingCurveNexus import sys_params, model_params
+
+# daily event counts as a tuple covering at least days days,
+# carrying on with the last day's count (or fill if there are none)
+def daily_counts(counts, days, fill):
+    counts = tuple(int(n) for n in counts)
+    last = counts[-1] if counts else int(fill)
+    return counts + (last,) * max(days - len(counts), 0)
+
+@dataclass(frozen=True, slots=True)
+class SimParams:
+
+    #### ---- OPENING STATE (sys_params) ---- ####
+    act_cover_now: float
+    cap_pool_now: float
+    eth_price_usd: float
+    pool_dai: float
+    wnxm_price_now: float
+    wnxm_supply_now: float
+    nxm_supply_now: float
+
+    #### ---- SYSTEM & TOKENOMIC PARAMETERS (sys_params) ---- ####
+    capital_factor: float
+    open_liq_sell: float
+    target_liq_sell: float
+    open_liq_buy: float
+    target_liq_buy: float
+    ratchet_up_perc: float
+    ratchet_down_perc: float
+    liq_in_perc: float
+    liq_out_perc: float
+    oracle_buffer: float
+    price_transition_buffer: float
+    transition_gap: float
+    liq_transition_buffer: float
+
+    #### ---- MARKET PARAMETERS (model_params) ---- ####
+    model_days: int
+    nxm_book_value_multiple: float
+    lambda_entries: float
+    lambda_exits: float
+    entry_shape: float
+    entry_loc: float
+    entry_scale: float
+    exit_shape: float
+    exit_loc: float
+    exit_scale: float
+    det_entry_size: float
+    det_exit_size: float
+    det_NXM_exit: float
+    det_entry_array: tuple
+    det_exit_array: tuple
+    wnxm_shifts_per_day: int
+    wnxm_drift: float
+    wnxm_daily_diffusion: float
+    wnxm_move_size: float
+    ratchets_per_day: int
+
+    #### ---- NON-MARKET SYSTEM PARAMETERS (model_params) ---- ####
+    cover_amount_mean: float
+    cover_amount_stdev: float
+    premium_shape: float
+    premium_loc: float
+    premium_scale: float
+    investment_apy: float
+    claim_prob: float
+    claim_shape: float
+    claim_loc: float
+    claim_scale: float
+    claim_ass_reward: float
+
+    #### ---- DERIVED CONSTANTS ---- ####
+    mcr_now: float = field(init=False)
+    pool_eth: float = field(init=False)
+    daily_investment_return: float = field(init=False)
+    # wNXM price diffusion per shift
+    wnxm_diffusion: float = field(init=False)
+    # price movement per ratchet as a proportion of book value
+    ratchet_up_step: float = field(init=False)
+    ratchet_down_step: float = field(init=False)
+    # liquidity movement per ratchet as a proportion of target liquidity
+    liq_in_step: float = field(init=False)
+    liq_out_step: float = field(init=False)
+    # oracle buffer multipliers, e.g. book value * buffer_above
+    buffer_above: float = field(init=False)
+    buffer_below: float = field(init=False)
+    spread_above: float = field(init=False)
+    spread_below: float = field(init=False)
+
+    def __post_init__(self):
+        # store deterministic entry/exit arrays as tuples so that instances stay immutable and hashable
+        # and extend them to the full projection
+        object.__setattr__(self, 'det_entry_array',
+                           daily_counts(self.det_entry_array, self.model_days, self.lambda_entries))
+        object.__setattr__(self, 'det_exit_array',
+                           daily_counts(self.det_exit_array, self.model_days, self.lambda_exits))
+
+        derived = {
+            'mcr_now': self.act_cover_now / self.capital_factor,
+            'pool_eth': self.cap_pool_now - self.pool_dai / self.eth_price_usd,
+            'daily_investment_return': (1 + self.investment_apy) ** (1 / 365) - 1,
+            'wnxm_diffusion': (1 + self.wnxm_daily_diffusion) ** (1 / self.wnxm_shifts_per_day) - 1,
+            'ratchet_up_step': self.ratchet_up_perc / self.ratchets_per_day,
+            'ratchet_down_step': self.ratchet_down_perc / self.ratchets_per_day,
+            'liq_in_step': self.liq_in_perc / self.ratchets_per_day,
+            'liq_out_step': self.liq_out_perc / self.ratchets_per_day,
+            'buffer_above': 1 + self.oracle_buffer,
+            'buffer_below': 1 - self.oracle_buffer,
+            'spread_above': 1 + 2 * self.oracle_buffer,
+            'spread_below': 1 - 2 * self.oracle_buffer,
+        }
+        for name, value in derived.items():
+            object.__setattr__(self, name, value)
+
+    # names of the parameters that can be set (i.e. excluding derived constants)
+    @classmethod
+    def names(cls):
+        return [f.name for f in fields(cls) if f.init]
+
+    # build from the current values in the sys_params and model_params modules
+    # overrides can be given as plain names or prefixed with their module, e.g. 'sys_params.ratchet_up_perc'
+    @classmethod
+    def from_modules(cls, **overrides):
+        values = {}
+        for name in cls.names():
+            module = sys_params if hasattr(sys_params, name) else model_params
+            values[name] = getattr(module, name)
+        return cls(**values).replace(**overrides)
+
+    # copy with some parameters changed, recomputing derived constants
+    def replace(self, **changes):
+        if not changes:
+            return self
+        changes = {name.rpartition('.')[2]: value for name, value in changes.items()}
+        unknown = set(changes) - set(self.names())
+        if unknown:
+            raise ValueError(f'Unknown parameters: {sorted(unknown)}')
+        return dataclasses.replace(self, **changes)
+
+    # dictionary of the settable parameters
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.names()}
@@ -6,11 +6,11 @@ Running a single deterministic simulation of the protocol buy/sell mechanism onl
 
 import matplotlib.pyplot as plt
 import numpy as np
-from tqdm import tqdm
 
 from BondingCurveNexus import sys_params, model_params
 from BondingCurveNexus.RAMM_markets_det import RAMMMarketsDet
 from BondingCurveNexus.model_params import model_days
+from BondingCurveNexus.result_cache import run_model
 
 
 #-----GRAPHS-----#
@@ -86,13 +86,11 @@ if __name__ == "__main__":
     model_params.det_entry_array[:initial_days] = initial_daily_entries
     model_params.det_entry_array[initial_days:] = model_params.lambda_entries
 
-    sim = RAMMMarketsDet()
-    days_run = 0
+    # fixed seed, so that reruns with unchanged parameters are loaded from the result cache
+    # set to None for a fresh random run
+    seed = 1
 
-    for i in tqdm(range(model_days)):
-        try:
-            sim.one_day_passes()
-            days_run += 1
-        except ZeroDivisionError:
-            print('Something went to Zero!')
-            break
+    sim = run_model(RAMMMarketsDet, seed=seed, progress=True)
+    days_run = len(sim.trajectory) - 1
+    if days_run < model_days:
+        print('Something went to Zero!')
@@ -6,11 +6,11 @@ Running a single deterministic simulation of the protocol buy/sell mechanism onl
 
 import matplotlib.pyplot as plt
 import numpy as np
-from tqdm import tqdm
 
 from BondingCurveNexus import sys_params, model_params
 from BondingCurveNexus.RAMM_markets_stoch import RAMMMarketsStoch
 from BondingCurveNexus.model_params import model_days
+from BondingCurveNexus.result_cache import run_model
 
 
 #-----GRAPHS-----#
@@ -78,13 +78,11 @@ def show_graphs():
 
 if __name__ == "__main__":
 
-    sim = RAMMMarketsStoch()
-    days_run = 0
+    # None for a fresh random run - set a fixed seed to replay a run, or load it from the result cache
+    seed = None
 
-    for i in tqdm(range(model_days)):
-        try:
-            sim.one_day_passes()
-            days_run += 1
-        except ZeroDivisionError:
-            print('Something went to Zero!')
-            break
+    sim = run_model(RAMMMarketsStoch, seed=seed, progress=True)
+    print(f'seed {sim.seed}')
+    days_run = len(sim.trajectory) - 1
+    if days_run < model_days:
+        print('Something went to Zero!')
@@ -0,0 +1,77 @@
+'''
+Steady-state detection and fast-forward for the deterministic protocol models.
+
+Under constant daily entries and exits the deterministic models often settle on a fixed point - prices pinned
+at book value +/- the buffer, liquidity at target and every trade disabled - and then spend the rest of
+model_days working through ratchets that change nothing.
+
+A model is at a steady state once a whole day of events leaves every scalar attribute of the model
+(pools, capital pool, supply, cumulative counters, ...) unchanged within a relative tolerance, and the schedule
+has the same number of each event on every remaining day. As no trade went through and the ratchets are
+at their targets, every event of that day was a no-op, and the same events in any order will be again,
+so the rest of the trajectory is the current state repeated.
+fast_forward() fills it in that way and records the day the model converged in converged_day:
+    sim.one_day_passes()
+    if sim.is_steady():
+        sim.fast_forward(days)
+
+The full state is only compared once the last two recorded trajectory rows are equal, so checking costs next to
+nothing on the days the system is still moving, and a steady state is found one day after the state stops changing.
+
+result_cache.run_model does this for every model using it, unless fast_forward=False is given.
+'''
+
+import math
+
+import numpy as np
+
+class SteadyState:
+
+    # scalar attributes that move on every day whether or not the system does
+    STEADY_STATE_IGNORE = ('current_day', 'steps', 'timestamp', 'seed', 'daily_printout_day',
+                           'converged_day', 'constant_events_day')
+
+    # first day (trajectory row) of the steady state once fast-forwarded, None otherwise
+    converged_day = None
+    # first day from which the schedule has the same events every day, worked out on the first check
+    constant_events_day = None
+    # state at the end of the last day that didn't change the trajectory
+    steady_snapshot = None
+
+    # scalar state of the model
+    def state_snapshot(self):
+        return {name: value for name, value in vars(self).items()
+                if isinstance(value, (int, float, np.number)) and name not in self.STEADY_STATE_IGNORE}
+
+    # first day from which the schedule has the same number of each event on every day
+    def constant_events_from(self):
+        if self.constant_events_day is None:
+            schedule = self.event_schedule()
+            daily = np.stack([schedule.counts(code) for code in np.unique(schedule.events)], axis=1)
+            changes = np.flatnonzero((daily[1:] != daily[:-1]).any(axis=1))
+            self.constant_events_day = int(changes[-1]) + 1 if len(changes) else 0
+        return self.constant_events_day
+
+    # whether the day just run left the whole state unchanged, with the same events on all remaining days
+    # called after every day - the state at the end of a day whose trajectory row didn't change is kept to compare with
+    def is_steady(self, tolerance=1e-12):
+        trajectory = self.trajectory
+        if len(trajectory) < 2 or self.current_day - 1 < self.constant_events_from() or \
+           not all(math.isclose(trajectory.columns[metric][trajectory.rows - 1],
+                                trajectory.columns[metric][trajectory.rows - 2], rel_tol=tolerance, abs_tol=0)
+                   for metric in trajectory.metrics):
+            # only written when set, as a new instance attribute slows attribute lookups on the model
+            if self.steady_snapshot is not None:
+                self.steady_snapshot = None
+            return False
+
+        current = self.state_snapshot()
+        previous, self.steady_snapshot = self.steady_snapshot, current
+        return previous is not None and current.keys() == previous.keys() and \
+               all(math.isclose(current[name], previous[name], rel_tol=tolerance, abs_tol=0) for name in current)
+
+    # fill the trajectory up to days with the current state and move on to the last day
+    def fast_forward(self, days):
+        self.converged_day = self.current_day - 1
+        self.trajectory.repeat_last(days - self.current_day)
+        self.current_day = days
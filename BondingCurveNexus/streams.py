@@ -0,0 +1,80 @@
+'''
+Random streams for the stochastic models.
+
+RandomStreams gives every simulation its own independent numpy Generators - one each for
+arrivals, trade sizes, wNXM shocks, claims, cover changes and event shuffles -
+spawned from a single numpy.random.SeedSequence. The integer seed is kept on the model as sim.seed,
+so any simulation (e.g. an outlier path from a large sweep) can be replayed exactly by passing it back in:
+    sim = RAMMMarketsStoch(seed=outlier_seed)
+child_seed derives independent seeds for many paths from one sweep seed.
+
+Drawing one value at a time with scipy.stats.lognorm.rvs goes through scipy's argument checking
+and dispatch on every call, which dominates the cost of the trade and arbitrage loops.
+A LognormalStream instead draws sizes in large blocks from numpy.random.Generator.lognormal
+and hands them out one at a time, refilling lazily when a block runs out.
+
+The parameterisation is the same as scipy's lognorm(s=shape, loc=loc, scale=scale):
+    value = loc + exp(N(log(scale), shape))
+
+The models pass their RandomStreams sizes Generator into their LognormalStreams.
+A LognormalStream created without a Generator gets its own, seeded from fresh OS entropy.
+'''
+
+import numpy as np
+
+# names of the independent random streams of a simulation
+STREAM_NAMES = ['arrivals', 'sizes', 'wnxm', 'claims', 'cover', 'shuffle']
+
+# 64-bit seed for one path, derived from a parent seed and a key (e.g. cell and simulation number)
+def child_seed(seed, *key):
+    return int(np.random.SeedSequence(seed, spawn_key=key).generate_state(1, dtype=np.uint64)[0])
+
+class RandomStreams:
+
+    def __init__(self, seed=None):
+        # integer seed - drawn from fresh OS entropy if not given, so that every run can be replayed
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        # one child Generator per stream, e.g. self.arrivals, self.wnxm
+        children = np.random.SeedSequence(self.seed).spawn(len(STREAM_NAMES))
+        for name, child in zip(STREAM_NAMES, children):
+            setattr(self, name, np.random.default_rng(child))
+
+
+class LognormalStream:
+
+    def __init__(self, shape, loc, scale, rng=None, block_size=4096):
+        self.shape = shape
+        self.loc = loc
+        self.scale = scale
+        # numpy Generator, or anything np.random.default_rng accepts as a seed
+        self.rng = np.random.default_rng(rng)
+        self.block_size = block_size
+        # current block of pre-drawn values and position of the next value in it
+        self.block = []
+        self.position = 0
+
+    # draw a new block of values
+    def refill(self):
+        self.block = (self.loc + self.rng.lognormal(mean=np.log(self.scale),
+                                                    sigma=self.shape,
+                                                    size=self.block_size)).tolist()
+        self.position = 0
+
+    # next single value as a python float
+    def draw(self):
+        if self.position == len(self.block):
+            self.refill()
+        value = self.block[self.position]
+        self.position += 1
+        return value
+
+    # next n values as an array
+    def draws(self, n):
+        values = []
+        while len(values) < n:
+            if self.position == len(self.block):
+                self.refill()
+            take = self.block[self.position:self.position + n - len(values)]
+            self.position += len(take)
+            values.extend(take)
+        return np.array(values)
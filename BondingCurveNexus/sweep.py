@@ -0,0 +1,222 @@
+'''
+Parallel parameter sweeps over any of the model classes.
+
+A sweep takes a model class and a grid of parameter overrides, e.g.
+    {'sys_params.ratchet_up_perc': [0.01, 0.02, 0.04],
+     'model_params.wnxm_move_size': [2.5e-7, 5e-7, 1e-6]}
+and runs every cell of the grid (every combination of values) a number of times.
+
+Each simulation runs in a ProcessPoolExecutor worker, using all cores by default.
+Overrides are applied to a SimParams instance that is passed into the model,
+so the parameter modules are never mutated and cells never see each other's parameters.
+Parameters can be named with or without their module prefix.
+The market snapshot is loaded once in the parent process and shipped to workers inside SimParams.
+Every simulation is seeded from the sweep seed, its cell and its simulation number,
+so a sweep gives the same results however the work is scheduled across workers.
+Each simulation's own seed is recorded in the results, so any single row can be replayed in isolation:
+    run_sim(model, SimParams.from_modules(**overrides), int(results.loc[row, 'seed']))
+
+Results are streamed into one tidy table as simulations complete, with a row per
+cell, simulation and day and a column per tracked metric (optionally also to a csv file).
+For sweeps too large to hold in memory, dataset=<directory> streams each completed simulation
+to a Parquet/Arrow dataset partitioned by cell instead (see trajectory_sink.py) and returns the lazy dataset.
+The directory must be empty unless dataset_overwrite or dataset_append is given, which is checked,
+along with pyarrow being installed, before any simulation runs.
+
+Simulations go through the result cache (see result_cache.py) unless cache=None is given,
+so rerunning a sweep, or adding a grid point to it, only runs the simulations that haven't been run before.
+With a checkpoint_dir, simulations in progress are also checkpointed every checkpoint_every days,
+so a seeded sweep that is interrupted and run again picks up each unfinished simulation where it stopped.
+
+Can also be run from the command line, e.g.
+    python -m BondingCurveNexus.sweep BondingCurveNexus.RAMM_markets_stoch:RAMMMarketsStoch \\
+        --grid sys_params.ratchet_up_perc=0.01,0.02,0.04 --sims 10 --seed 1 --out ratchets.csv \\
+        --checkpoint-dir ./sweep_checkpoints
+'''
+
+import argparse
+import importlib
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from BondingCurveNexus import market_data
+from BondingCurveNexus.result_cache import resolve_cache, run_model, DEFAULT_CHECKPOINT_EVERY
+from BondingCurveNexus.sim_params import SimParams
+from BondingCurveNexus.streams import child_seed
+from BondingCurveNexus.trajectory_sink import TrajectorySink, open_dataset, prepare_directory, require_pyarrow
+
+# every combination of parameter values in a grid, as a list of override dictionaries
+def grid_cells(grid):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+# load a model class from a 'package.module:ClassName' string
+def load_model(path):
+    module_name, _, class_name = path.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+# seed for one simulation, derived from the sweep seed, its cell and its simulation number
+def sim_seed(seed, cell, sim):
+    return child_seed(seed, cell, sim)
+
+# run a single simulation of one cell - executed in a worker process
+def run_sim(model, params, seed, model_kwargs=None, metrics=None, final_only=False, cache=None,
+            checkpoint_dir=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+    sim = run_model(model, params, seed, model_kwargs, cache=cache,
+                    checkpoint_dir=checkpoint_dir, checkpoint_every=checkpoint_every)
+
+    columns = sim.trajectory.to_dict()
+    if metrics is not None:
+        columns = {metric: columns[metric] for metric in metrics}
+    days = np.arange(len(sim.trajectory))
+    if final_only:
+        columns = {metric: column[-1:] for metric, column in columns.items()}
+        days = days[-1:]
+    return {'day': days, **columns}
+
+def sweep(model, grid=None, cells=None, n_sims=1, seed=None, model_kwargs=None,
+          metrics=None, final_only=False, max_workers=None, out=None, progress=True, cache=True,
+          checkpoint_dir=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY, dataset=None, dataset_format='parquet',
+          dataset_overwrite=False, dataset_append=False):
+    '''
+    Run n_sims simulations of every cell of a parameter grid in parallel.
+
+    model is a model class (or a 'package.module:ClassName' string).
+    Either a grid of {parameter: [values]} or an explicit list of cells ({parameter: value}) is given.
+    Returns a tidy DataFrame with the cell number, overridden parameters, simulation number, day
+    and tracked metrics; if out is given the same rows are written to that csv file as they complete.
+    If dataset is given, simulations are instead written to a dataset in that directory as they complete
+    ('parquet' or 'arrow' files, partitioned by cell) without being kept, and the opened dataset is returned.
+    A dataset directory with files in it is an error unless dataset_overwrite (clear it) or dataset_append is given.
+    cache is True for the default result cache, a ResultCache, or None to always run every simulation.
+    If checkpoint_dir is given, simulations are checkpointed there every checkpoint_every days
+    and resumed from their checkpoints when the sweep is run again with the same seed.
+    '''
+    if isinstance(model, str):
+        model = load_model(model)
+    if cells is None:
+        cells = grid_cells(grid or {})
+    cache = resolve_cache(cache)
+    base_params = SimParams.from_modules()
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    # fail before running anything if the dataset can't be written
+    if dataset is not None:
+        require_pyarrow()
+        prepare_directory(dataset, overwrite=dataset_overwrite, append=dataset_append)
+
+    frames = []
+    sink = None
+    # number of simulations written to the csv file
+    written = 0
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {}
+        for cell, overrides in enumerate(cells):
+            params = base_params.replace(**overrides)
+            for sim in range(n_sims):
+                seed_value = sim_seed(seed, cell, sim)
+                future = executor.submit(run_sim, model, params, seed_value, model_kwargs, metrics, final_only, cache,
+                                         checkpoint_dir, checkpoint_every)
+                futures[future] = (cell, overrides, sim, seed_value)
+
+        for future in tqdm(as_completed(futures), total=len(futures), disable=not progress):
+            cell, overrides, sim, seed_value = futures[future]
+            columns = future.result()
+
+            if dataset is not None:
+                if sink is None:
+                    sink = TrajectorySink(dataset, metrics=[name for name in columns if name != 'day'],
+                                          format=dataset_format, partition='cell', append=dataset_append)
+                sink.write(columns, cell=cell, **overrides, sim=sim, seed=np.uint64(seed_value))
+                if out is None:
+                    continue
+
+            frame = pd.DataFrame(columns)
+            frame.insert(0, 'seed', np.uint64(seed_value))
+            frame.insert(0, 'sim', sim)
+            for position, (name, value) in enumerate(overrides.items()):
+                frame.insert(position, name, value)
+            frame.insert(0, 'cell', cell)
+
+            if out is not None:
+                first = written == 0
+                frame.to_csv(out, mode='w' if first else 'a', header=first, index=False)
+                written += 1
+            if dataset is None:
+                frames.append(frame)
+
+    if dataset is not None:
+        if sink is None:
+            return None
+        sink.close()
+        return open_dataset(dataset)
+
+    if not frames:
+        return pd.DataFrame()
+    results = pd.concat(frames, ignore_index=True)
+    results = results.sort_values(['cell', 'sim', 'day'], kind='stable', ignore_index=True)
+    results.attrs['seed'] = seed
+    return results
+
+# parse a command line value into int/float where possible
+def parse_value(text):
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a parallel parameter sweep over a model class.')
+    parser.add_argument('model', help="model class as 'package.module:ClassName'")
+    parser.add_argument('--grid', action='append', default=[], metavar='PARAM=V1,V2,...',
+                        help='parameter values to sweep, e.g. sys_params.ratchet_up_perc=0.01,0.02')
+    parser.add_argument('--sims', type=int, default=1, help='simulations per cell')
+    parser.add_argument('--seed', type=int, default=None, help='sweep seed')
+    parser.add_argument('--metrics', nargs='*', default=None, help='metrics to keep (defaults to all)')
+    parser.add_argument('--final-only', action='store_true', help='only keep the final day of each simulation')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (defaults to all cores)')
+    parser.add_argument('--out', default=None, help='csv file the results are streamed to')
+    parser.add_argument('--dataset', default=None, help='directory the results are streamed to as a partitioned dataset')
+    parser.add_argument('--format', default='parquet', choices=['parquet', 'arrow'], help='file format of --dataset')
+    parser.add_argument('--overwrite', action='store_true', help='clear a --dataset directory that already has files')
+    parser.add_argument('--append', action='store_true', help='add to a --dataset directory that already has files')
+    parser.add_argument('--snapshot', default=None, help='market snapshot file to pin the opening state to')
+    parser.add_argument('--no-cache', action='store_true', help='rerun every simulation instead of using the result cache')
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help='directory simulations in progress are checkpointed to, so an interrupted sweep can resume')
+    parser.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                        help='days between checkpoints')
+    args = parser.parse_args(argv)
+    if args.out is None and args.dataset is None:
+        parser.error('one of --out or --dataset is required')
+
+    if args.snapshot:
+        market_data.set_source(market_data.file_source(args.snapshot))
+
+    grid = {}
+    for entry in args.grid:
+        name, _, values = entry.partition('=')
+        grid[name] = [parse_value(value) for value in values.split(',')]
+
+    results = sweep(args.model, grid=grid, n_sims=args.sims, seed=args.seed, metrics=args.metrics,
+                    final_only=args.final_only, max_workers=args.workers, out=args.out,
+                    cache=None if args.no_cache else True,
+                    checkpoint_dir=args.checkpoint_dir, checkpoint_every=args.checkpoint_every,
+                    dataset=args.dataset, dataset_format=args.format,
+                    dataset_overwrite=args.overwrite, dataset_append=args.append)
+    if args.dataset is not None:
+        rows = results.count_rows() if results is not None else 0
+        print(f'{rows} rows written to {args.dataset}')
+    else:
+        print(f'{len(results)} rows written to {args.out} (seed {results.attrs.get("seed")})')
+
+
+if __name__ == "__main__":
+    main()
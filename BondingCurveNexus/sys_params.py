@@ -1,7 +1,7 @@
 '''
 Define opening & fixed system parameters for simulation
 '''
-import requests
+from BondingCurveNexus import market_data
 
 # DUNE VALUES TODAY - UPDATES REQUIRED REGULARLY #
 # TODO: pull these in automatically
@@ -28,13 +28,12 @@ wnxm_price_params = {
         }
 wnxm_price_now = 0.021 #requests.get(price_url, params=wnxm_price_params).json()['wrapped-nxm']['eth']
 
-# wnxm supply from coingecko api
-wnxm_supply_url = 'https://api.coingecko.com/api/v3/coins/wrapped-nxm'
-wnxm_supply_now = requests.get(wnxm_supply_url).json()['market_data']['total_supply']
-
-# nxm supply from coingecko api
-nxm_supply_url = 'https://api.coingecko.com/api/v3/coins/nxm'
-nxm_supply_now = requests.get(nxm_supply_url).json()['market_data']['total_supply']
+# wnxm supply & nxm supply from the market snapshot (coingecko api by default)
+# loaded lazily on first access - see market_data
+def __getattr__(name):
+    if name in market_data.SNAPSHOT_FIELDS:
+        return market_data.snapshot()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # SYSTEM PARAMETERS - CURRENTLY FIXED BUT MAY BE SUBJECT TO CHANGE #
 capital_factor = 4.8
@@ -0,0 +1,170 @@
+'''
+Time-warp scheduler for on-chain runs of the ape simulation scripts.
+
+Rather than stepping time forward one interval at a time with set_timestamp, mine and get_block,
+a run is declared up front as a list of timed actions, in seconds from the start of the run:
+    actions = [buy(hour * 3_600, eth_in) for hour in range(194, 721)] + \
+              [observe(hour * 3_600) for hour in range(1, 721)]
+    trajectory = TimeWarp(ramm, networks.provider, dev, reader).run(actions)
+
+TimeWarp sorts the actions by time and jumps straight to the time of the next one.
+The RAMM brings its reserves forward from the timestamp of its last update, so a gap needs no blocks in between:
+ - an idle stretch costs nothing and a gap before a read-only observe is a single evm_mine at that timestamp
+ - all swaps at the same time are sent with automine off and mined together in one block at that timestamp
+ - an observe reads the state once through a RammStateReader and records it into a preallocated trajectory
+
+Swaps are sent as raw eth_sendTransaction requests so that they don't wait for a receipt while automine is off.
+Once their block is mined, the receipts of the swaps in it are read, and a SwapReverted is raised
+if any of them reverted (e.g. on a circuit breaker), as ramm.swap would have raised.
+Providers without raw requests (e.g. a RammEmulator's) fall back to set_timestamp/mine and sending swaps one by one.
+'''
+
+from collections import namedtuple
+
+# a timed action - kind is BUY (ETH in), SELL (NXM in) or OBSERVE, amount in ETH/NXM units
+Action = namedtuple('Action', ['time', 'kind', 'amount'])
+
+BUY = 'buy'
+SELL = 'sell'
+OBSERVE = 'observe'
+
+# swap eth ETH for NXM
+def buy(time, eth):
+    return Action(time, BUY, eth)
+
+# swap nxm NXM for ETH
+def sell(time, nxm):
+    return Action(time, SELL, nxm)
+
+# read-only checkpoint - read and record the contract state
+def observe(time):
+    return Action(time, OBSERVE, 0)
+
+# error raised where a raw swap transaction reverted or wasn't mined, with its hash and receipt
+class SwapReverted(Exception):
+
+    def __init__(self, transaction, receipt):
+        super().__init__(f'swap {transaction} ' + ('was not mined' if receipt is None else 'reverted'))
+        self.transaction = transaction
+        self.receipt = receipt
+
+# status of a transaction receipt - 1 for success, 0 for a revert - given as a hex string over JSON-RPC
+def receipt_status(receipt):
+    status = receipt['status']
+    return int(status, 16) if isinstance(status, str) else int(status)
+
+class TimeWarp:
+
+    def __init__(self, ramm, provider, sender, reader, deadline=32503680000):
+        self.ramm = ramm
+        self.provider = provider
+        self.sender = sender
+        self.reader = reader
+        # swap deadline as a timestamp
+        self.deadline = deadline
+        # raw JSON-RPC requests to the node if the provider supports them
+        self.raw = hasattr(provider, '_make_request')
+        # hashes of the transactions sent and number of RPC requests made by the scheduler
+        self.transactions = []
+        self.requests = 0
+
+    def request(self, method, params):
+        self.requests += 1
+        return self.provider._make_request(method, params)
+
+    # mine one block at a timestamp
+    def warp(self, timestamp):
+        if self.raw:
+            self.request('evm_mine', [timestamp])
+        else:
+            self.provider.set_timestamp(timestamp)
+            self.provider.mine()
+
+    # send swaps and mine them together in one block at a timestamp
+    def send_swaps(self, swaps, timestamp):
+        if not self.raw:
+            for action in swaps:
+                self.provider.set_timestamp(timestamp)
+                self.swap(action)
+            return
+
+        self.request('evm_setNextBlockTimestamp', [timestamp])
+        sent = []
+        for action in swaps:
+            nxm_in, eth_in = self.swap_amounts(action)
+            data = self.ramm.swap.encode_input(nxm_in, 0, self.deadline)
+            sent.append(self.request('eth_sendTransaction', [{
+                            'from': self.sender.address,
+                            'to': self.ramm.address,
+                            'value': hex(eth_in),
+                            'data': data if isinstance(data, str) else '0x' + bytes(data).hex()}]))
+        self.transactions += sent
+        self.request('evm_mine', [])
+        self.check_receipts(sent)
+
+    # raise a SwapReverted if any of the transactions reverted or wasn't mined
+    def check_receipts(self, transactions):
+        for transaction in transactions:
+            receipt = self.request('eth_getTransactionReceipt', [transaction])
+            if receipt is None or receipt_status(receipt) == 0:
+                raise SwapReverted(transaction, receipt)
+
+    # swap through the contract object
+    def swap(self, action):
+        nxm_in, eth_in = self.swap_amounts(action)
+        self.ramm.swap(nxm_in, 0, self.deadline, value=eth_in, sender=self.sender)
+
+    # NXM in and ETH in of a swap in 1e18 units
+    def swap_amounts(self, action):
+        if action.kind == BUY:
+            return 0, int(action.amount * 1e18)
+        return int(action.amount * 1e18), 0
+
+    def run(self, actions):
+        '''
+        Carry out timed actions from the latest block and return the trajectory of observed states.
+        '''
+        actions = sorted(actions, key=lambda action: action.time)
+        start = self.provider.get_block('latest').timestamp
+        trajectory = self.reader.trajectory(length=max(1, sum(action.kind == OBSERVE for action in actions)))
+        # timestamp of the latest block
+        self.last_mined = start
+
+        if self.raw:
+            self.request('evm_setAutomine', [False])
+        try:
+            # swaps waiting to be mined together and their time
+            swaps = []
+            swaps_time = None
+            for action in actions:
+                timestamp = start + action.time
+                if swaps and timestamp != swaps_time:
+                    self.flush(swaps, swaps_time)
+                    swaps = []
+
+                if action.kind == OBSERVE:
+                    # mine the swaps at this time, or a single block to bring the chain to it
+                    if swaps:
+                        self.flush(swaps, swaps_time)
+                        swaps = []
+                    elif self.last_mined < timestamp:
+                        self.warp(timestamp)
+                        self.last_mined = timestamp
+                    trajectory.record(self.reader.read())
+                else:
+                    swaps.append(action)
+                    swaps_time = timestamp
+
+            if swaps:
+                self.flush(swaps, swaps_time)
+        finally:
+            if self.raw:
+                self.request('evm_setAutomine', [True])
+
+        return trajectory
+
+    # mine swaps in one block at their time, or just after the latest block if that is later
+    def flush(self, swaps, timestamp):
+        timestamp = max(timestamp, self.last_mined + 1)
+        self.send_swaps(swaps, timestamp)
+        self.last_mined = timestamp
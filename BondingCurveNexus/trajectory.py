@@ -0,0 +1,109 @@
+'''
+Preallocated columnar store for the metrics tracked by the model classes over a projection.
+
+Each tracked metric is a float64 column sized for the whole projection (model_days + 1 rows)
+and a full row is recorded with one call per day, reading each metric from the model instance -
+as an attribute if it is a value or by calling it if it is a method.
+Columns grow by doubling if more rows are recorded than were preallocated.
+
+Batch engines that step many paths at once pass a width, giving columns of shape (rows, width).
+
+The TrajectoryViews mixin keeps the existing <metric>_prediction attribute names working
+as views onto the recorded part of each column.
+'''
+
+import numpy as np
+
+class Trajectory:
+
+    def __init__(self, metrics, length, width=None):
+        self.metrics = list(metrics)
+        self.width = width
+        # number of rows recorded so far
+        self.rows = 0
+        # preallocate one float64 column per metric
+        shape = (length,) if width is None else (length, width)
+        self.columns = {metric: np.empty(shape) for metric in self.metrics}
+
+    def __len__(self):
+        return self.rows
+
+    def __contains__(self, metric):
+        return metric in self.columns
+
+    # recorded part of a single metric column
+    def __getitem__(self, metric):
+        return self.columns[metric][:self.rows]
+
+    # number of rows that fit without growing the columns
+    def capacity(self):
+        return len(self.columns[self.metrics[0]])
+
+    # double the length of all columns, keeping the recorded rows
+    def grow(self):
+        for metric in self.metrics:
+            column = self.columns[metric]
+            new_column = np.empty((2 * max(len(column), 1),) + column.shape[1:])
+            new_column[:self.rows] = column[:self.rows]
+            self.columns[metric] = new_column
+
+    # record one row of all tracked metrics from a model instance
+    def record(self, model):
+        if self.rows == self.capacity():
+            self.grow()
+        for metric in self.metrics:
+            value = getattr(model, metric)
+            self.columns[metric][self.rows] = value() if callable(value) else value
+        self.rows += 1
+
+    # record n more rows equal to the last one, e.g. when fast-forwarding through a steady state
+    def repeat_last(self, n):
+        while self.rows + n > self.capacity():
+            self.grow()
+        for metric in self.metrics:
+            self.columns[metric][self.rows:self.rows + n] = self.columns[metric][self.rows - 1]
+        self.rows += n
+
+    # pickle only the recorded rows, keeping checkpoints compact - record() grows the columns again
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['columns'] = {metric: column[:self.rows].copy() for metric, column in self.columns.items()}
+        return state
+
+    # trajectory holding already recorded columns, e.g. loaded from the result cache
+    @classmethod
+    def from_dict(cls, columns):
+        columns = {metric: np.asarray(column, dtype=float) for metric, column in columns.items()}
+        first = next(iter(columns.values()))
+        trajectory = cls(metrics=columns, length=0, width=first.shape[1] if first.ndim > 1 else None)
+        trajectory.columns = columns
+        trajectory.rows = len(first)
+        return trajectory
+
+    # all recorded metrics as a dictionary of arrays
+    def to_dict(self):
+        return {metric: self[metric] for metric in self.metrics}
+
+    # all recorded metrics as a pandas DataFrame indexed by day
+    # batch trajectories are returned in long format indexed by day and path
+    def to_frame(self):
+        import pandas as pd
+
+        if self.width is None:
+            frame = pd.DataFrame(self.to_dict())
+            frame.index.name = 'day'
+            return frame
+
+        index = pd.MultiIndex.from_product([range(self.rows), range(self.width)], names=['day', 'path'])
+        return pd.DataFrame({metric: self[metric].ravel() for metric in self.metrics}, index=index)
+
+
+class TrajectoryViews:
+
+    # expose tracked metrics under the <metric>_prediction attribute names
+    def __getattr__(self, name):
+        if name.endswith('_prediction') and 'trajectory' in self.__dict__:
+            metric = name[:-len('_prediction')]
+            if metric in self.trajectory:
+                return self.trajectory[metric]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
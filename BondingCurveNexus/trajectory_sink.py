@@ -0,0 +1,195 @@
+'''
+Streaming writer of simulation trajectories to a partitioned on-disk dataset.
+
+Keeping every simulation instance alive until the end of a study grows memory with paths x days x metrics.
+A TrajectorySink instead takes each completed path as it finishes, buffers at most rows_per_file rows
+and appends them to the dataset as one Parquet (or Arrow IPC) file, so memory stays flat however many paths are run:
+    sink = TrajectorySink('paths', metrics=sim.trajectory.metrics, partition='cell')
+    for ...:
+        sink.write(sim.trajectory, cell=cell, sim=number, seed=seed)
+    sink.close()
+
+The schema is taken from the tracked metrics - a float64 column per metric, after the key columns
+given to write() (e.g. cell, sim, seed), typed by their first values, and the day. With a partition key the files are laid out hive-style,
+one directory per value (paths/cell=3/part-00012.parquet), so filters on it skip whole directories.
+A path is always written whole to a single file.
+
+A sink refuses a directory that already has files in it, so that a new study never silently mixes
+with an old one - pass overwrite=True to clear the directory first, or append=True to add files after
+the ones already there (with the same schema).
+
+open_dataset() gives a lazy pyarrow dataset over the files - Arrow IPC files are memory-mapped -
+so downstream analysis only reads the columns and partitions it asks for.
+final_rows() reads the last recorded day of every path one file at a time.
+
+Needs pyarrow.
+'''
+
+import os
+import shutil
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# raise a ValueError if pyarrow isn't installed
+def require_pyarrow():
+    if pa is None:
+        raise ValueError('trajectory datasets need pyarrow')
+
+# make sure a dataset directory can be written to - an error if it already has files,
+# unless it is to be overwritten (cleared here) or appended to
+def prepare_directory(directory, overwrite=False, append=False):
+    if overwrite and append:
+        raise ValueError('a dataset is either overwritten or appended to, not both')
+    if os.path.isdir(directory) and any(files for path, dirs, files in os.walk(directory)):
+        if overwrite:
+            shutil.rmtree(directory)
+        elif not append:
+            raise ValueError(f'dataset directory {directory} is not empty - pass overwrite=True or append=True')
+    os.makedirs(directory, exist_ok=True)
+
+class TrajectorySink:
+
+    def __init__(self, directory, metrics, format='parquet', partition=None, rows_per_file=1_000_000,
+                 overwrite=False, append=False):
+        require_pyarrow()
+        prepare_directory(directory, overwrite=overwrite, append=append)
+        if format not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}, not {format!r}")
+        self.directory = directory
+        self.metrics = list(metrics)
+        self.format = format
+        self.partition = partition
+        self.rows_per_file = rows_per_file
+        # key columns and schema, fixed by the first path written
+        self.keys = None
+        self.schema = None
+        # buffered record batches and their total number of rows
+        self.batches = []
+        self.buffered_rows = 0
+        # number of files written - continues from any files already in the directory when appending
+        self.files = sum(len(files) for path, dirs, files in os.walk(directory))
+        # number of paths and rows written
+        self.paths = 0
+        self.rows = 0
+
+    # add one completed path - a Trajectory, or a dictionary of metric arrays (with an optional day array) -
+    # with scalar keys identifying it (e.g. cell=3, sim=12, seed=...)
+    def write(self, trajectory, **keys):
+        columns = trajectory.to_dict() if hasattr(trajectory, 'to_dict') else trajectory
+        length = len(columns[self.metrics[0]])
+        days = columns['day'] if 'day' in columns else np.arange(length)
+
+        if self.keys is None:
+            if self.partition is not None and self.partition not in keys:
+                raise ValueError(f'partition key {self.partition!r} missing from the keys written')
+            self.keys = list(keys)
+            fields = [pa.field(name, pa.scalar(value).type) for name, value in keys.items()]
+            fields += [pa.field('day', pa.int32())] + [pa.field(metric, pa.float64()) for metric in self.metrics]
+            self.schema = pa.schema(fields)
+        elif list(keys) != self.keys:
+            raise ValueError(f'keys {list(keys)} differ from the keys {self.keys} of the dataset')
+
+        arrays = [pa.array(np.full(length, keys[name]), type=self.schema.field(name).type) for name in self.keys]
+        arrays.append(pa.array(np.asarray(days, dtype=np.int32)))
+        arrays += [pa.array(np.asarray(columns[metric], dtype=np.float64)) for metric in self.metrics]
+        self.batches.append(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.buffered_rows += length
+        self.paths += 1
+        self.rows += length
+
+        if self.buffered_rows >= self.rows_per_file:
+            self.flush()
+
+    # write the buffered paths out, one file per partition value
+    def flush(self):
+        if not self.batches:
+            return
+        table = pa.Table.from_batches(self.batches, schema=self.schema)
+        self.batches = []
+        self.buffered_rows = 0
+
+        if self.partition is None:
+            self.write_file(self.directory, table)
+            return
+        values = table.column(self.partition).to_numpy()
+        for value in np.unique(values):
+            directory = os.path.join(self.directory, f'{self.partition}={value}')
+            os.makedirs(directory, exist_ok=True)
+            self.write_file(directory, table.filter(pa.array(values == value)).drop_columns([self.partition]))
+
+    def write_file(self, directory, table):
+        path = os.path.join(directory, f'part-{self.files:05d}{FORMATS[self.format]}')
+        self.files += 1
+        if self.format == 'parquet':
+            pq.write_table(table, path)
+        else:
+            with pa.ipc.new_file(path, table.schema) as writer:
+                writer.write_table(table)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# format of the files in a dataset directory
+def dataset_format(directory):
+    for path, dirs, files in os.walk(directory):
+        for name in files:
+            for format, suffix in FORMATS.items():
+                if name.endswith(suffix):
+                    return format
+    raise ValueError(f'no dataset files found in {directory}')
+
+def open_dataset(directory, format=None):
+    '''
+    Lazy pyarrow dataset over the files written by a TrajectorySink, with hive partitions as columns.
+    Arrow IPC files are memory-mapped.
+    '''
+    require_pyarrow()
+    format = format or dataset_format(directory)
+    return ds.dataset(directory,
+                      format='parquet' if format == 'parquet' else 'ipc',
+                      partitioning='hive',
+                      filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True))
+
+def final_rows(directory, keys=('cell', 'sim'), columns=None, filter=None):
+    '''
+    DataFrame of the last recorded day of every path in a dataset.
+    keys are the columns identifying a path, columns the metrics to read (defaults to all).
+    Files are read one at a time, as every path is written whole to a single file.
+    '''
+    import pandas as pd
+
+    dataset = open_dataset(directory)
+    keys = [key for key in keys if key in dataset.schema.names]
+    if columns is not None:
+        columns = keys + ['day'] + [column for column in columns if column not in keys]
+    frames = []
+    for fragment in dataset.get_fragments(filter=filter):
+        table = fragment.to_table(schema=dataset.schema, columns=columns, filter=filter)
+        if table.num_rows == 0:
+            continue
+        frame = table.to_pandas()
+        # the last row of each path - rows of a path are contiguous and in day order
+        ids = frame[keys].to_numpy()
+        last = np.ones(len(frame), dtype=bool)
+        last[:-1] = (ids[1:] != ids[:-1]).any(axis=1)
+        frames.append(frame[last])
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
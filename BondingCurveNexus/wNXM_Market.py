@@ -11,15 +11,34 @@ The market class the following features:
  - arbitrage functions that allow for:
     arb_sale_transaction(n_nxm) - buying wNXM, unwrapping and selling to below pool
     arb_buy_transaction(eth) - buying NXM from above pool, wrapping and selling to open market
+
+Arbitrage is either chunked (the default) - fixed-size swaps until the prices meet,
+three calls and a transaction per chunk - or sized, with arb='sized':
+the reserves are read once, the exact equalising trade against the linear wNXM impact model is worked out
+off-chain and executed as one swap. A few more swaps are allowed to correct for the reserves moving
+to the next block and to retry at half size if a swap reverts, e.g. on a circuit breaker limit.
+Only a revert (ape's ContractLogicError, or EmulatorRevert on a RammEmulator) is retried - any other error propagates.
+self.swaps counts the swap transactions sent.
 '''
 
 import numpy as np
 
 from BondingCurveNexus import sys_params, model_params
+from BondingCurveNexus.arbitrage import linear_equilibrium_nxm_reserve
+from BondingCurveNexus.ramm_emulator import EmulatorRevert
+
+# ape's contract revert, if installed
+try:
+    from ape.exceptions import ContractLogicError
+except ImportError:
+    ContractLogicError = EmulatorRevert
+
+# errors of a reverted swap - on a node or on a RammEmulator
+SWAP_REVERTS = (ContractLogicError, EmulatorRevert)
 
 class wNxmMarket:
 
-    def __init__(self, nxm, ramm, pool, dev):
+    def __init__(self, nxm, ramm, pool, dev, arb='chunked', max_arb_swaps=4):
         
         # takes the contract deployments as arguments,
         # so that we can call solidity functions from within the class 
@@ -37,6 +56,18 @@ class wNxmMarket:
         self.wnxm_move_size = model_params.wnxm_move_size
         self.arb_sale_size_nxm = model_params.det_NXM_exit
         self.arb_buy_size_eth = model_params.det_entry_size
+
+        # arbitrage mode - 'chunked' or 'sized'
+        if arb not in ('chunked', 'sized'):
+            raise ValueError(f"arb must be 'chunked' or 'sized', not {arb!r}")
+        self.arb = arb
+        # maximum number of swaps per direction of a sized arbitrage
+        self.max_arb_swaps = max_arb_swaps
+        # relative price gap below which a sized arbitrage stops -
+        # the ratchet moves the pool a little in every new block, so the prices never meet exactly
+        self.arb_tolerance = 1e-4
+        # number of swap transactions sent
+        self.swaps = 0
     
     
     # WNXM MARKET FUNCTIONS
@@ -85,6 +116,7 @@ class wNxmMarket:
         self.market_buy(n_wnxm=num, remove=True)
         # sell to protocol
         self.ramm.swap(int(num*1e18), sender=self.dev)
+        self.swaps += 1
 
     def arb_buy_transaction(self, eth):
         
@@ -93,6 +125,7 @@ class wNxmMarket:
         
         # buy from protocol
         self.ramm.swap(0, value=int(eth*1e18), sender=self.dev)
+        self.swaps += 1
         
         # establish nxm obtained
         
@@ -102,6 +135,10 @@ class wNxmMarket:
         self.market_sell(n_wnxm=num, create=True)
 
     def arbitrage(self):
+        if self.arb == 'sized':
+            self.sized_arbitrage()
+            return
+
         # system price > wnxm_price arb
             # protocol sale price has to be higher than wnxm price for arbitrage
             # nxm supply has to be greater than zero
@@ -115,3 +152,55 @@ class wNxmMarket:
         while self.ramm.getSpotPriceA()/1e18 < self.wnxm_price and \
                 self.nxm.balanceOf(self.dev)/1e18 > 0:
             self.arb_buy_transaction(eth=self.arb_buy_size_eth)
+
+    # SIZED ARBITRAGE
+    # NXM sale into the below pool that brings its price down to the wNXM price as it is bought
+    def arb_sale_size(self, liq_eth, liq_nxm_b):
+        if liq_eth / liq_nxm_b <= self.wnxm_price * (1 + self.arb_tolerance):
+            return 0
+        u = linear_equilibrium_nxm_reserve(liq_eth, liq_nxm_b, self.wnxm_price, self.wnxm_move_size)
+        return float(u) - liq_nxm_b
+
+    # ETH buy from the above pool that brings its price up to the wNXM price as the NXM is sold
+    def arb_buy_size(self, liq_eth, liq_nxm_a):
+        if liq_eth / liq_nxm_a >= self.wnxm_price * (1 - self.arb_tolerance):
+            return 0
+        u = float(linear_equilibrium_nxm_reserve(liq_eth, liq_nxm_a, self.wnxm_price, self.wnxm_move_size))
+        # ETH in that takes the NXM reserve from liq_nxm_a down to u
+        return liq_eth * (liq_nxm_a / u - 1)
+
+    # one swap of the sized arbitrage - returns False once the prices have met or a limit is reached
+    def sized_arb_swap(self, sale, scale):
+        liq_eth, liq_nxm_a, liq_nxm_b = (value / 1e18 for value in self.ramm.getReserves()[:3])
+        balance = self.nxm.balanceOf(self.dev)/1e18
+        if balance <= 0:
+            return False
+
+        if sale:
+            # limit to number of nxm supply and wnxm supply
+            num = min(self.arb_sale_size(liq_eth, liq_nxm_b) * scale, self.wnxm_supply, balance)
+            if num <= 0:
+                return False
+            self.ramm.swap(int(num*1e18), sender=self.dev)
+            self.market_buy(n_wnxm=num, remove=True)
+        else:
+            eth = self.arb_buy_size(liq_eth, liq_nxm_a) * scale
+            if eth <= 0:
+                return False
+            old_sup = balance
+            self.ramm.swap(0, value=int(eth*1e18), sender=self.dev)
+            self.market_sell(n_wnxm=self.nxm.balanceOf(self.dev)/1e18 - old_sup, create=True)
+        self.swaps += 1
+        return True
+
+    def sized_arbitrage(self):
+        # system price > wnxm_price arb, then system price < wnxm_price arb
+        for sale in (True, False):
+            scale = 1
+            for i in range(self.max_arb_swaps):
+                try:
+                    if not self.sized_arb_swap(sale, scale):
+                        break
+                except SWAP_REVERTS:
+                    # reverted, e.g. on a circuit breaker limit - retry at half size
+                    scale /= 2
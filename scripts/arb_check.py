@@ -0,0 +1,48 @@
+from ape import networks, accounts, Contract
+import json
+from BondingCurveNexus.wNXM_Market import wNxmMarket
+
+
+def main():
+
+    # snapshot the current state so the node is left as it was
+    snapshot = networks.provider.snapshot()
+
+    # load addresses file into dictionary
+    addresses_file = "./deployment/addresses.json"
+    with open(addresses_file, 'r') as file:
+      addresses = json.load(file)
+
+    # define dev account and load up with lots of ETH
+    dev = accounts.test_accounts[0]
+    dev.balance = int(1e27)
+
+    # initialize contracts
+    nxm = Contract(addresses.get('NXMToken'), abi="./deployment/abis/NXMToken.json")
+    pool = Contract(addresses.get('Pool'), abi="./deployment/abis/Pool.json")
+    ramm = Contract(addresses.get('Ramm'), abi="./deployment/abis/Ramm.json")
+
+    # dev gives permission to TokenController to use NXM and circuit breakers are turned off
+    nxm.approve(addresses.get('TokenController'), 2 ** 256 - 1, sender=dev)
+    ramm.setCircuitBreakerLimits(2 ** 32 - 1, 2 ** 32 - 1, sender=dev)
+    setup = networks.provider.snapshot()
+
+    # wNXM prices below and above the RAMM's opening prices
+    for wnxm_price in [0.010, 0.012, 0.040, 0.060]:
+        results = {}
+        for arb in ['chunked', 'sized']:
+            market = wNxmMarket(nxm, ramm, pool, dev, arb=arb)
+            market.wnxm_price = wnxm_price
+            market.arbitrage()
+            results[arb] = (market.swaps, ramm.getSpotPriceB()/1e18, ramm.getSpotPriceA()/1e18, market.wnxm_price)
+
+            # back to the same starting state for the other mode
+            networks.provider.revert(setup)
+            setup = networks.provider.snapshot()
+
+        for arb, (swaps, spot_price_b, spot_price_a, end_price) in results.items():
+            print(f'wNXM at {wnxm_price}: {arb} - {swaps} swaps, price below = {spot_price_b:.6f}, '
+                  f'price above = {spot_price_a:.6f}, wNXM price = {end_price:.6f}')
+
+    # revert the node to where it started
+    networks.provider.revert(snapshot)
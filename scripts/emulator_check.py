@@ -0,0 +1,54 @@
+from ape import networks, accounts, Contract
+import numpy as np
+import json
+from BondingCurveNexus.ramm_emulator import RammEmulator, differential_check
+
+
+def main():
+
+    # snapshot the current state so the node is left as it was
+    snapshot = networks.provider.snapshot()
+
+    # load addresses file into dictionary
+    addresses_file = "./deployment/addresses.json"
+    with open(addresses_file, 'r') as file:
+      addresses = json.load(file)
+
+    # define dev account and load up with lots of ETH
+    dev = accounts.test_accounts[0]
+    dev.balance = int(1e27)
+
+    # initialize contracts
+    nxm = Contract(addresses.get('NXMToken'), abi="./deployment/abis/NXMToken.json")
+    pool = Contract(addresses.get('Pool'), abi="./deployment/abis/Pool.json")
+    ramm = Contract(addresses.get('Ramm'), abi="./deployment/abis/Ramm.json")
+    mcr = Contract(addresses.get('MCR'), abi="./deployment/abis/MCR.json")
+
+    # dev gives permission to TokenController to use NXM and circuit breakers are turned off
+    nxm.approve(addresses.get('TokenController'), 2 ** 256 - 1, sender=dev)
+    ramm.setCircuitBreakerLimits(2 ** 32 - 1, 2 ** 32 - 1, sender=dev)
+
+    # emulator in the same state as the node
+    block = networks.provider.get_block('latest')
+    emulator = RammEmulator.from_contracts(ramm, pool, nxm, mcr=mcr.getMCR(), timestamp=block.timestamp, holder=dev)
+    emulator.setCircuitBreakerLimits(2 ** 32 - 1, 2 ** 32 - 1)
+
+    # random time moves of up to a day, each followed by an ETH buy, an NXM sale or nothing
+    rng = np.random.default_rng(0)
+    num_actions = 200
+    actions = []
+    for i in range(num_actions):
+        seconds = int(rng.integers(1, 86_400))
+        kind = rng.integers(3)
+        eth_in = int(rng.uniform(1, 100) * 1e18) if kind == 0 else 0
+        nxm_in = int(rng.uniform(100, 5_000) * 1e18) if kind == 1 else 0
+        actions.append((seconds, nxm_in, eth_in))
+
+    mismatches = differential_check((ramm, networks.provider), emulator, dev, actions)
+
+    for number, view, node_value, emulator_value in mismatches:
+        print(f'action {number} {actions[number]}: {view} node = {node_value}, emulator = {emulator_value}')
+    print(f'{len(actions)} actions, {len(mismatches)} mismatches')
+
+    # revert the node to where it started
+    networks.provider.revert(snapshot)
@@ -0,0 +1,82 @@
+from ape import Contract
+import os
+import json
+from functools import partial
+from BondingCurveNexus.model_params import NXM_exit_values
+from BondingCurveNexus.ramm_state import RammStateReader
+from BondingCurveNexus.farm import farm
+
+
+# set up the contracts on one node - called once per node before its snapshot
+def connect(provider):
+    from ape import accounts
+
+    # load addresses file into dictionary
+    addresses_file = "./deployment/addresses.json"
+    with open(addresses_file, 'r') as file:
+      addresses = json.load(file)
+
+    # define dev account and load up with lots of ETH
+    dev = accounts.test_accounts[0]
+    dev.balance = int(1e27)
+
+    # initialize contracts
+    nxm = Contract(addresses.get('NXMToken'), abi="./deployment/abis/NXMToken.json")
+    pool = Contract(addresses.get('Pool'), abi="./deployment/abis/Pool.json")
+    ramm = Contract(addresses.get('Ramm'), abi="./deployment/abis/Ramm.json")
+
+    # dev gives permission to TokenController to use NXM and circuit breakers are turned off
+    nxm.approve(addresses.get('TokenController'), 2 ** 256 - 1, sender=dev)
+    ramm.setCircuitBreakerLimits(2 ** 32 - 1, 2 ** 32 - 1, sender=dev)
+
+    reader = RammStateReader(ramm, pool, nxm, holder=dev, provider=provider)
+    return {'provider': provider, 'ramm': ramm, 'dev': dev, 'reader': reader}
+
+# NXM exiting over a month in quarter-day swaps, as long as the price is above a threshold percentage of BV
+def exit_scenario(node, initial_nxm_exiting, bv_threshold=0.95, quarter_days=365):
+    provider, ramm, dev, reader = node['provider'], node['ramm'], node['dev'], node['reader']
+
+    remaining_nxm_exiting = initial_nxm_exiting
+    nxm_out_per_qday = initial_nxm_exiting / 30.417 / 4
+
+    trajectory = reader.trajectory(length=quarter_days + 1)
+    state = reader.read()
+    trajectory.record(state)
+    block = provider.get_block('latest')
+
+    # main time loop
+    for i in range(quarter_days):
+
+        # MOVE TIME
+        provider.set_timestamp(block.timestamp + 21_600)
+        provider.mine()
+        block = provider.get_block('latest')
+        state = reader.read()
+
+        # swap if NXM price is above a threshold percentage of BV until all NXM exiting has exited
+        if remaining_nxm_exiting > 0 and state.spot_price_b > state.book_value * bv_threshold:
+            ramm.swap(int(min(nxm_out_per_qday, remaining_nxm_exiting)*1e18), 0, 32503680000, sender=dev)
+            remaining_nxm_exiting = max(remaining_nxm_exiting - nxm_out_per_qday, 0)
+
+        # RECORD METRICS
+        trajectory.record(reader.read())
+
+    return trajectory
+
+
+def main():
+
+    # all exit sizes at once, one hardhat node each
+    # nodes fork FORK_URL at FORK_BLOCK if set, otherwise as configured in hardhat.config
+    scenarios = {f'{i + 1:02d}_{nxm_exiting:,}NXMExiting': partial(exit_scenario, initial_nxm_exiting=nxm_exiting)
+                 for i, nxm_exiting in enumerate(NXM_exit_values)}
+
+    results = farm(scenarios, connect, num_nodes=len(scenarios),
+                   fork_url=os.environ.get('FORK_URL'), fork_block=os.environ.get('FORK_BLOCK'))
+
+    results.to_csv('./graphs/initial_state_exits.csv', index=False)
+    print(results.groupby('scenario')[['cap_pool', 'nxm_supply', 'spot_price_b', 'book_value']].last())
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ import os
 import shutil
 import json
 from BondingCurveNexus.model_params import NXM_exit_values
+from BondingCurveNexus.ramm_state import RammStateReader
+from BondingCurveNexus.timewarp import TimeWarp, buy, observe
 
 
 def main():
@@ -65,14 +67,16 @@ def main():
     # networks.provider._make_request("hardhat_setNextBlockBaseFeePerGas", ['0x0'])
     # nxm.mint(dev, int(1e18), sender=TC)
 
+    # reader of the tracked contract state - fetched once per block
+    reader = RammStateReader(ramm, pool, nxm, holder=dev, provider=networks.provider)
+    state = reader.read()
+
     # print some initial variables - NXM supply and Capital Pool
-    print (f'NXM supply = {nxm.totalSupply() / 1e18}')
-    print (f'NXM Dev balance = {nxm.balanceOf(dev) / 1e18}')
-    print (f'Pool value in ETH = {pool.getPoolValueInEth() / 1e18}')
+    print (f'NXM supply = {state.nxm_supply}')
+    print (f'NXM Dev balance = {state.nxm_balance}')
+    print (f'Pool value in ETH = {state.cap_pool}')
     
-    block = networks.provider.get_block('latest')
-    times = np.array([(datetime.datetime.fromtimestamp(block.timestamp) - datetime.datetime.now())
-                      / datetime.timedelta(days=1)])
+    start_time = datetime.datetime.now().timestamp()
     
     run_name = "12_5,000OpenLiq_100LiqRemoved_3000ETHEnteringPerDayAfterDay8_HourlyIntervals_4%RatchetSpeed_NoPriceThreshold"
     
@@ -88,74 +92,31 @@ def main():
     # hoursquarter_days = 120
     hours = 720
     
-    # Tracking Metrics
-    cap_pool_prediction = np.array([pool.getPoolValueInEth()/1e18])
-    cap_pool_change_prediction = np.array([cap_pool_prediction[0] - cap_pool_prediction[-1]])
-    nxm_supply_prediction = np.array([nxm.totalSupply()/1e18])
-    book_value_prediction = np.array([ramm.getBookValue()/1e18])
-    liq_prediction = np.array([ramm.getReserves()[0]/1e18])
-    spot_price_b_prediction = np.array([ramm.getSpotPrices()[1]/1e18])
-    spot_price_a_prediction = np.array([ramm.getSpotPrices()[0]/1e18])
-    liq_NXM_b_prediction = np.array([ramm.getReserves()[2]/1e18])
-    liq_NXM_a_prediction = np.array([ramm.getReserves()[1]/1e18])
-    ip_prediction = np.array([ramm.getInternalPrice()/1e18])
-    nxm_minted_prediction = np.array([nxm_supply_prediction[-1] - nxm_supply_prediction[0]])
-    
-    # MAIN TIME LOOP
+    # SCHEDULE - read the opening state, then swap ETH and read every hour
+    # assume swapping only happens after the first 193 hours
+    actions = [observe(0)]
     for i in range(hours):
-
-        # MOVE TIME
-        print(f'time = {times[-1]}')
-        networks.provider.set_timestamp(block.timestamp + 3_600)
-        networks.provider.mine()
-        block = networks.provider.get_block('latest')
-
-        # SWAP ETH EVERY TIME
-        
-        # print metrics
-        print(f'before swap pool = {cap_pool_prediction[-1]}')
-        print(f'before swap supply = {nxm_supply_prediction[-1]}')
-        print(f'before swap BV = {book_value_prediction[-1]}')
-        print(f'before swap liq = {liq_prediction[-1]}')
-        print(f'before swap spot_b = {spot_price_b_prediction[-1]}')
-        print(f'before swap spot_a = {spot_price_a_prediction[-1]}')
-        print(f'before swap NXM_b = {liq_NXM_b_prediction[-1]}')
-        print(f'before swap NXM_a = {liq_NXM_a_prediction[-1]}')
-        print(f'before swap ip = {ip_prediction[-1]}')
-        print(f'nxm minted = {nxm_minted_prediction[-1]}')
-        
-        # assume swapping only happens if NXM price is above a certain percentage of BV
-        if i > 192: 
-                ramm.swap(0, 0, 32503680000,
-                          value=int(eth_in * 1e18), sender=dev)
-        
-        # RECORD METRICS & TIME
-
-        times = np.append(times, [(datetime.datetime.fromtimestamp(block.timestamp) - datetime.datetime.now())
-                                  / datetime.timedelta(days=1)])
-
-        cap_pool_prediction = np.append(cap_pool_prediction, [pool.getPoolValueInEth()/1e18])
-        cap_pool_change_prediction = np.append(cap_pool_change_prediction, [cap_pool_prediction[0] - cap_pool_prediction[-1]])
-        nxm_supply_prediction = np.append(nxm_supply_prediction, [nxm.balanceOf(dev)/1e18])
-        book_value_prediction = np.append(book_value_prediction, [ramm.getBookValue()/1e18])
-        liq_prediction = np.append(liq_prediction, [ramm.getReserves()[0]/1e18])
-        spot_price_b_prediction = np.append(spot_price_b_prediction, [ramm.getSpotPrices()[1]/1e18])
-        spot_price_a_prediction = np.append(spot_price_a_prediction, [ramm.getSpotPrices()[0]/1e18])
-        liq_NXM_b_prediction = np.append(liq_NXM_b_prediction, [ramm.getReserves()[2]/1e18])
-        liq_NXM_a_prediction = np.append(liq_NXM_a_prediction, [ramm.getReserves()[1]/1e18])
-        ip_prediction = np.append(ip_prediction, [ramm.getInternalPrice()/1e18])
-        nxm_minted_prediction = np.append(nxm_minted_prediction, [nxm_supply_prediction[-1] - nxm_supply_prediction[0]])
-        
-        print(f'after swap pool = {cap_pool_prediction[-1]}')
-        print(f'after swap supply = {nxm_supply_prediction[-1]}')
-        print(f'after swap BV = {book_value_prediction[-1]}')
-        print(f'after swap liq = {liq_prediction[-1]}')
-        print(f'after swap spot_b = {spot_price_b_prediction[-1]}')
-        print(f'after swap spot_a = {spot_price_a_prediction[-1]}')
-        print(f'after swap NXM_b = {liq_NXM_b_prediction[-1]}')
-        print(f'after swap NXM_a = {liq_NXM_a_prediction[-1]}')
-        print(f'after swap ip = {ip_prediction[-1]}')
-        print(f'after swap nxm minted = {nxm_minted_prediction[-1]}')
+        if i > 192:
+            actions.append(buy((i + 1) * 3_600, eth_in))
+        actions.append(observe((i + 1) * 3_600))
+
+    # RUN - jump between the scheduled times and record the state at every observation
+    trajectory = TimeWarp(ramm, networks.provider, dev, reader).run(actions)
+
+    print(f'{len(trajectory)} observations with {reader.fetches} state reads')
+
+    # recorded metrics
+    times = (trajectory['timestamp'] - start_time) / 86_400
+    cap_pool_prediction = trajectory['cap_pool']
+    nxm_supply_prediction = trajectory['nxm_supply']
+    book_value_prediction = trajectory['book_value']
+    liq_prediction = trajectory['liq']
+    spot_price_b_prediction = trajectory['spot_price_b']
+    spot_price_a_prediction = trajectory['spot_price_a']
+    liq_NXM_b_prediction = trajectory['liq_NXM_b']
+    liq_NXM_a_prediction = trajectory['liq_NXM_a']
+    ip_prediction = trajectory['internal_price']
+    nxm_minted_prediction = nxm_supply_prediction - nxm_supply_prediction[0]
   
     #-----GRAPHS-----#
     # Destructuring initialization
@@ -200,34 +161,11 @@ def main():
 
     fig.savefig('graphs/graph.png')
 
-    #-----COPY + RENAME SCRIPT AND GRAPH-----#
-    src_dir = os.getcwd() # get the current working dir
-
-    # copy graph
-    graph_dest_dir = src_dir + "/graphs/implementation_minting"
-    graph_src_file = os.path.join(src_dir, "graphs", "graph.png")
-    # copy the file to destination dir
-    shutil.copy(graph_src_file , graph_dest_dir)
-
-    # rename the file
-    graph_dest_file = os.path.join(graph_dest_dir, 'graph.png')
+    #-----COPY + RENAME GRAPH-----#
+    # the run itself is recorded as a spec in scenarios/implementation_minting rather than by copying this script
+    graph_dest_dir = os.path.join(os.getcwd(), "graphs", "implementation_minting")
+    os.makedirs(graph_dest_dir, exist_ok=True)
     new_graph_file_name = os.path.join(graph_dest_dir, f'{run_name}.png')
+    shutil.copy(os.path.join("graphs", "graph.png"), new_graph_file_name)
 
-    os.rename(graph_dest_file, new_graph_file_name)
-
-    # print message that it's happened
     print(f'graph copied to {new_graph_file_name}')
-
-    # copy script
-    script_dest_dir = src_dir + "/script_archive/Implementation_Minting"
-    script_src_file = os.path.join(src_dir, "scripts", "sim.py")
-    # copy the file to destination dir
-    shutil.copy(script_src_file , script_dest_dir)
-
-    # rename the file
-    script_dest_file = os.path.join(script_dest_dir, 'sim.py')
-    new_script_file_name = os.path.join(script_dest_dir, f'{run_name}.py')
-
-    os.rename(script_dest_file, new_script_file_name) # rename
-
-    print(f'script copied to {new_script_file_name}')
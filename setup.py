@@ -10,6 +10,9 @@ setup(name='BondingCurveNexus',
       description="Modelling Nexus Tokenomics and Bonding Curve",
       packages=find_packages(),
       install_requires=requirements,
+      # optional engines and formats - trajectory datasets (trajectory_sink.py) and the numba day loop
+      extras_require={'datasets': ['pyarrow'],
+                      'numba': ['numba']},
       test_suite='tests',
       # include_package_data: to install data from MANIFEST.in
       include_package_data=True,
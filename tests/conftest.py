@@ -0,0 +1,24 @@
+'''
+Every test runs offline on a pinned market snapshot rather than live CoinGecko values.
+'''
+
+import json
+
+import pytest
+
+from BondingCurveNexus import market_data
+
+# market values the tests run on
+MARKET_VALUES = {'wnxm_supply_now': 6_800_000, 'nxm_supply_now': 6_800_000}
+
+@pytest.fixture(autouse=True)
+def pinned_market_snapshot(tmp_path_factory, monkeypatch):
+    # kept out of the test's own tmp_path
+    directory = tmp_path_factory.mktemp('market')
+    # also pinned by file for any worker process started without this process' snapshot
+    path = directory / 'market_snapshot.json'
+    path.write_text(json.dumps(MARKET_VALUES))
+    monkeypatch.setenv('NEXUS_MARKET_SNAPSHOT', str(path))
+    monkeypatch.setattr(market_data, '_snapshot', None)
+    return market_data.set_source(market_data.fixture_source(MARKET_VALUES),
+                                  cache_path=str(directory / 'market_cache.json'))
@@ -0,0 +1,52 @@
+'''
+Closed-form arbitrage against the original chunked loop, from the same shocked starting states.
+'''
+
+import numpy as np
+import pytest
+from scipy.special import lambertw
+
+from BondingCurveNexus.arbitrage import lambertw_real, arb_sale_size, arb_buy_size
+from BondingCurveNexus.RAMM_markets_stoch import RAMMMarketsStoch
+
+# wNXM price shocks relative to the pool price on the relevant side
+SHOCKS = [0.5, 0.7, 0.9, 1.1, 1.3, 2.0]
+# state compared after arbitrage
+METRICS = ['cap_pool', 'nxm_supply', 'wnxm_supply', 'wnxm_price']
+
+# simulation with its wNXM price shocked below the sale price or above the buy price
+def shocked_sim(arb_mode, shock):
+    sim = RAMMMarketsStoch(arb_mode=arb_mode, seed=0)
+    if shock < 1:
+        sim.wnxm_price = sim.sell_nxm_price() * shock
+    else:
+        sim.wnxm_price = sim.buy_nxm_price() * shock
+    return sim
+
+@pytest.mark.parametrize('shock', SHOCKS)
+def test_modes_converge_to_the_same_state(shock):
+    states = {}
+    for mode in ['chunked', 'analytic']:
+        sim = shocked_sim(mode, shock)
+        sim.arbitrage()
+        states[mode] = np.array([getattr(sim, metric) for metric in METRICS])
+
+    # the chunked loop overshoots by up to one random lot
+    np.testing.assert_allclose(states['chunked'], states['analytic'], rtol=5e-3)
+
+@pytest.mark.parametrize('shock', SHOCKS)
+def test_analytic_arbitrage_equalises_prices(shock):
+    sim = shocked_sim('analytic', shock)
+    sim.arbitrage()
+    pool_price = sim.sell_nxm_price() if shock < 1 else sim.buy_nxm_price()
+    assert pool_price == pytest.approx(sim.wnxm_price, rel=1e-9)
+
+def test_arb_sizes_are_zero_without_a_price_gap():
+    assert arb_sale_size(5000.0, 200_000.0, 0.03, 5e-7) == 0
+    assert arb_buy_size(5000.0, 200_000.0, 0.02, 5e-7) == 0
+
+def test_lambertw_real_matches_scipy():
+    z = np.exp(np.linspace(-50, 300, 1000))
+    expected = lambertw(z).real
+    np.testing.assert_allclose(lambertw_real(z), expected, rtol=1e-14)
+    np.testing.assert_allclose([lambertw_real(value) for value in z], expected, rtol=1e-14)
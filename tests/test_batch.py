@@ -0,0 +1,55 @@
+'''
+The batch markets engine gives the same final-day distributions as the scalar stochastic class,
+for both arbitrage modes and the compiled engine - run as plain python if numba isn't installed.
+'''
+
+import numpy as np
+import pytest
+from scipy.stats import ks_2samp
+
+from BondingCurveNexus.RAMM_markets_batch import RAMMMarketsBatch
+from BondingCurveNexus.RAMM_markets_stoch import RAMMMarketsStoch
+from BondingCurveNexus.sim_params import SimParams
+
+DAYS = 30
+METRICS = ['cap_pool', 'book_value', 'nxm_supply', 'wnxm_price', 'sell_nxm_price', 'buy_nxm_price']
+
+@pytest.mark.parametrize('arb_mode, engine', [('analytic', 'numpy'), ('chunked', 'numpy'), ('analytic', 'numba')])
+def test_batch_matches_scalar_distributions(arb_mode, engine):
+    params = SimParams.from_modules(model_days=DAYS)
+
+    sims = [RAMMMarketsStoch(params=params, seed=seed, arb_mode=arb_mode) for seed in range(100)]
+    for sim in sims:
+        for day in range(DAYS):
+            sim.one_day_passes()
+
+    batch = RAMMMarketsBatch(n_paths=2000, seed=1, params=params, arb_mode=arb_mode, engine=engine)
+    for day in range(DAYS):
+        batch.one_day_passes()
+
+    for metric in METRICS:
+        scalar_final = np.array([sim.trajectory[metric][-1] for sim in sims])
+        assert ks_2samp(scalar_final, batch.trajectory[metric][-1]).pvalue > 0.001, metric
+
+def test_analytic_arbitrage_closes_price_gaps():
+    batch = RAMMMarketsBatch(n_paths=500, seed=2, params=SimParams.from_modules(model_days=DAYS))
+    for day in range(DAYS):
+        batch.one_day_passes()
+    batch.arbitrage(np.ones(batch.n_paths, dtype=bool))
+
+    # no path is left with its sale price above the wNXM price after arbitrage
+    arbitraging = (batch.nxm_supply > 0) & (batch.wnxm_supply > 0)
+    assert np.all(batch.sell_nxm_price()[arbitraging] <= batch.wnxm_price[arbitraging] * (1 + 1e-9))
+
+def test_compiled_engine_replays_a_seed():
+    params = SimParams.from_modules(model_days=DAYS)
+    runs = [RAMMMarketsBatch(n_paths=200, seed=4, params=params, engine='numba') for run in range(2)]
+    for batch in runs:
+        for day in range(DAYS):
+            batch.one_day_passes()
+    for metric in runs[0].trajectory.metrics:
+        assert np.array_equal(runs[0].trajectory[metric], runs[1].trajectory[metric]), metric
+
+def test_compiled_engine_needs_analytic_arbitrage():
+    with pytest.raises(ValueError):
+        RAMMMarketsBatch(n_paths=10, arb_mode='chunked', engine='numba')
@@ -0,0 +1,53 @@
+'''
+Seeded runs interrupted part way and resumed from their checkpoint against the same runs never stopped.
+'''
+
+import os
+
+import numpy as np
+import pytest
+
+from BondingCurveNexus.HighLowCap.RAMM_HighLowCap_Markets_det import RAMMHighLowCapMarketsDet
+from BondingCurveNexus.RAMM_markets_stoch import RAMMMarketsStoch
+from BondingCurveNexus.result_cache import run_model
+from BondingCurveNexus.sim_params import SimParams
+
+DAYS = 100
+SEED = 7
+
+class Interrupted(Exception):
+    pass
+
+@pytest.mark.parametrize('model', [RAMMMarketsStoch, RAMMHighLowCapMarketsDet])
+def test_resumed_run_reproduces_an_uninterrupted_run(model, tmp_path, monkeypatch):
+    # built in the test, after the market snapshot is pinned
+    params = SimParams.from_modules(model_days=DAYS)
+    expected = run_model(model, params, SEED, cache=None, fast_forward=False)
+
+    # stop the run on day 70, after its checkpoints on days 30 and 60
+    one_day_passes = model.one_day_passes
+
+    def interrupted_day(sim):
+        if sim.current_day == 70:
+            raise Interrupted
+        one_day_passes(sim)
+
+    monkeypatch.setattr(model, 'one_day_passes', interrupted_day)
+    with pytest.raises(Interrupted):
+        run_model(model, params, SEED, cache=None, checkpoint_dir=str(tmp_path), checkpoint_every=30,
+                  fast_forward=False)
+    monkeypatch.undo()
+    assert len(os.listdir(tmp_path)) == 1
+
+    # running again picks up from day 60
+    resumed_days = []
+    monkeypatch.setattr(model, 'one_day_passes', lambda sim: (resumed_days.append(sim.current_day),
+                                                               one_day_passes(sim)))
+    resumed = run_model(model, params, SEED, cache=None, checkpoint_dir=str(tmp_path), checkpoint_every=30,
+                        fast_forward=False)
+    assert resumed_days[0] == 60
+    assert os.listdir(tmp_path) == []
+
+    assert resumed.trajectory.metrics == expected.trajectory.metrics
+    for metric in expected.trajectory.metrics:
+        assert np.array_equal(resumed.trajectory[metric], expected.trajectory[metric]), metric
@@ -0,0 +1,129 @@
+'''
+Closed-form elapse/advance_to of the continuous clock, and the discrete schedule it must leave alone.
+'''
+
+import copy
+
+import numpy as np
+import pytest
+
+from BondingCurveNexus.HighLowCap.RAMM_HighLowCap_Protocol_det import RAMMHighLowCapProtocolDet
+from BondingCurveNexus.RAMM_markets_det import RAMMMarketsDet
+from BondingCurveNexus.schedule import PLATFORM_BUY, PLATFORM_SALE, RATCHET, SECONDS_PER_DAY, EventSchedule
+
+# move the pools away from book value and their liquidity away from target, keeping the invariants consistent
+def ramm_markets_off_target():
+    sim = RAMMMarketsDet(seed=1, clock='continuous')
+    sim.sell_liquidity_eth = sim.sell_target_liq / 2
+    sim.sell_liquidity_nxm = sim.sell_liquidity_eth / (sim.book_value() * 0.7)
+    sim.sell_invariant = sim.sell_liquidity_eth * sim.sell_liquidity_nxm
+    sim.buy_liquidity_eth = sim.buy_target_liq * 2
+    sim.buy_liquidity_nxm = sim.buy_liquidity_eth / (sim.book_value() * 1.3)
+    sim.buy_invariant = sim.buy_liquidity_eth * sim.buy_liquidity_nxm
+    return sim
+
+def highlowcap_off_target():
+    sim = RAMMHighLowCapProtocolDet(seed=1, clock='continuous')
+    sim.liq = sim.target_liq / 2
+    sim.liq_NXM_b = sim.liq / sim.spot_price_b()
+    sim.liq_NXM_a = sim.liq / sim.spot_price_a()
+    sim.k_a = sim.liq * sim.liq_NXM_a
+    sim.k_b = sim.liq * sim.liq_NXM_b
+    return sim
+
+def ramm_markets_state(sim):
+    return (sim.sell_nxm_price(), sim.buy_nxm_price(), sim.sell_liquidity_eth, sim.buy_liquidity_eth)
+
+def highlowcap_state(sim):
+    return (sim.spot_price_b(), sim.spot_price_a(), sim.liq)
+
+@pytest.mark.parametrize('make, state', [(ramm_markets_off_target, ramm_markets_state),
+                                         (highlowcap_off_target, highlowcap_state)])
+def test_hourly_and_single_step_advances_agree(make, state):
+    hourly = make()
+    single = copy.deepcopy(hourly)
+    start = state(hourly)
+
+    for hour in range(1, 25):
+        hourly.advance_to(hour * SECONDS_PER_DAY / 24)
+    single.advance_to(SECONDS_PER_DAY)
+
+    assert hourly.timestamp == single.timestamp == SECONDS_PER_DAY
+    assert state(hourly) == pytest.approx(state(single), rel=1e-12)
+    # the day did move the pools
+    assert state(single) != pytest.approx(start)
+
+def test_advance_to_ignores_the_past():
+    sim = ramm_markets_off_target()
+    sim.advance_to(SECONDS_PER_DAY)
+    state = ramm_markets_state(sim)
+    sim.advance_to(SECONDS_PER_DAY / 2)
+    assert sim.timestamp == SECONDS_PER_DAY
+    assert ramm_markets_state(sim) == state
+
+def test_ramm_markets_elapse_is_capped_at_targets():
+    sim = ramm_markets_off_target()
+    sim.elapse(100 * SECONDS_PER_DAY)
+
+    assert sim.sell_nxm_price() == pytest.approx(sim.book_value() * sim.params.buffer_below, rel=1e-12)
+    assert sim.buy_nxm_price() == pytest.approx(sim.book_value() * sim.params.buffer_above, rel=1e-12)
+    assert sim.sell_liquidity_eth == sim.sell_target_liq
+    assert sim.buy_liquidity_eth == sim.buy_target_liq
+
+    # at the targets, further time changes nothing
+    state = ramm_markets_state(sim)
+    sim.elapse(SECONDS_PER_DAY)
+    assert ramm_markets_state(sim) == pytest.approx(state, rel=1e-12)
+
+def test_highlowcap_elapse_is_capped_at_targets():
+    sim = highlowcap_off_target()
+    target = sim.ratchet_target()
+    sim.elapse(100 * SECONDS_PER_DAY)
+
+    assert sim.spot_price_b() == pytest.approx(target * sim.params.buffer_below, rel=1e-12)
+    assert sim.spot_price_a() == pytest.approx(target * sim.params.buffer_above, rel=1e-12)
+    assert sim.liq == sim.target_liq
+
+    # liquidity above target is taken out down to it and no further
+    sim.liq = sim.target_liq * 3
+    sim.elapse(100 * SECONDS_PER_DAY)
+    assert sim.liq == sim.target_liq
+
+def test_untimed_schedule_is_unchanged():
+    counts = {RATCHET: 3, PLATFORM_BUY: np.arange(20) % 4, PLATFORM_SALE: 2}
+    untimed = EventSchedule.build(counts=counts, days=20, rng=np.random.default_rng(5))
+    timed = EventSchedule.build(counts=counts, days=20, rng=np.random.default_rng(5), timed=True)
+
+    # the shuffle of the discrete schedule: a lexsort on day, then one uniform key per event
+    rng = np.random.default_rng(5)
+    daily_counts = np.column_stack([np.broadcast_to(count, 20) for count in counts.values()])
+    events = np.repeat(np.tile(list(counts), 20), daily_counts.ravel())
+    event_days = np.repeat(np.arange(20), daily_counts.sum(axis=1))
+    expected = events[np.lexsort((rng.random(len(events)), event_days))]
+
+    assert untimed.times is None
+    assert np.array_equal(untimed.events, expected)
+    assert np.array_equal(timed.events, untimed.events)
+    assert np.array_equal(timed.day_starts, untimed.day_starts)
+    # timed events are in time order within their own day
+    for day in range(20):
+        times = timed.day_times(day)
+        assert np.all(np.diff(times) >= 0)
+        assert np.all((times >= day * SECONDS_PER_DAY) & (times < (day + 1) * SECONDS_PER_DAY))
+
+@pytest.mark.parametrize('model', [RAMMMarketsDet, RAMMHighLowCapProtocolDet])
+def test_discrete_clock_is_the_default(model):
+    default = model(seed=3)
+    discrete = model(seed=3, clock='discrete')
+    assert default.clock == 'discrete'
+    assert default.event_schedule().times is None
+    assert np.array_equal(default.event_schedule().events, discrete.event_schedule().events)
+    assert default.event_schedule().counts(RATCHET).min() == default.params.ratchets_per_day
+
+    for _ in range(10):
+        default.one_day_passes()
+        discrete.one_day_passes()
+    # no time passes on the discrete clock
+    assert default.timestamp == 0
+    for metric in default.trajectory.metrics:
+        assert np.array_equal(default.trajectory[metric], discrete.trajectory[metric]), metric
@@ -0,0 +1,21 @@
+'''
+The compiled HighLowCap day loop against the python engine - run as plain python if numba isn't installed.
+'''
+
+import numpy as np
+
+from BondingCurveNexus.HighLowCap.RAMM_HighLowCap_Markets_det import RAMMHighLowCapMarketsDet
+
+# whole trajectory of a path run with one engine
+def run_path(engine, seed):
+    sim = RAMMHighLowCapMarketsDet(engine=engine, seed=seed)
+    for day in range(sim.params.model_days):
+        sim.one_day_passes()
+    return sim.trajectory
+
+def test_engines_give_the_same_trajectory():
+    python, compiled = run_path('python', 3), run_path('numba', 3)
+    assert python.metrics == compiled.metrics
+    assert len(python) == len(compiled)
+    for metric in python.metrics:
+        np.testing.assert_allclose(compiled[metric], python[metric], rtol=1e-10, err_msg=metric)
@@ -0,0 +1,56 @@
+'''
+The optimiser - space sampling, the Gaussian process surrogate, successive halving,
+and the command line parsing shared with the sensitivity CLI.
+'''
+
+import numpy as np
+
+from BondingCurveNexus.optimize import (GaussianProcess, expected_improvement, latin_hypercube, optimize,
+                                        parse_overrides, parse_space, parse_space_args, propose)
+from BondingCurveNexus.RAMM_protocol_det import RAMMProtocolDet
+
+def test_space_args():
+    space = parse_space_args(['target_liq_sell=1000:50000:log', 'ratchet_up_perc=0.005:0.1'])
+    assert space == {'target_liq_sell': (1000, 50000, 'log'), 'ratchet_up_perc': (0.005, 0.1)}
+    assert parse_space(space)['ratchet_up_perc'] == (0.005, 0.1, 'linear')
+
+def test_overrides():
+    assert parse_overrides(['lambda_exits=20', 'liq_out_perc=0.05']) == {'lambda_exits': 20, 'liq_out_perc': 0.05}
+
+def test_latin_hypercube_has_one_point_per_stratum():
+    n, d = 16, 3
+    sample = latin_hypercube(n, d, np.random.default_rng(1))
+    assert sample.shape == (n, d)
+    for column in sample.T:
+        assert sorted(np.floor(column * n).astype(int)) == list(range(n))
+
+def test_gaussian_process_interpolates_noiseless_points():
+    rng = np.random.default_rng(2)
+    x = rng.random((12, 2))
+    y = np.sin(3 * x[:, 0]) + x[:, 1] ** 2
+    mean, std = GaussianProcess(x, y, np.zeros(len(y))).predict(x)
+    np.testing.assert_allclose(mean, y, atol=1e-3)
+    assert np.all(std < 1e-2 * y.std())
+
+def test_expected_improvement_prefers_low_means_and_uncertainty():
+    ei = expected_improvement(np.array([0.0, 1.0, 1.0]), np.array([0.1, 0.1, 1.0]), best=0.5)
+    assert ei[0] > ei[2] > ei[1] > 0
+
+def test_propose_stays_in_the_unit_cube():
+    rng = np.random.default_rng(3)
+    x = rng.random((6, 2))
+    picks = propose(x, (x ** 2).sum(axis=1), np.zeros(6), 3, rng, pool_size=256)
+    assert picks.shape == (3, 2)
+    assert np.all((picks >= 0) & (picks <= 1))
+
+def test_optimize_runs_the_halving_schedule():
+    results = optimize(RAMMProtocolDet, {'ratchet_up_perc': (0.01, 0.1), 'liq_out_perc': (0.01, 0.1)},
+                       rounds=2, batch_size=4, min_paths=1, max_paths=2, eta=2, fixed={'model_days': 30},
+                       seed=1, max_workers=1, cache=None, progress=False)
+    assert len(results) == 8
+    # per round every candidate runs 1 path, then the best half a second path
+    assert results.attrs['simulations'] == 2 * (4 * 1 + 2 * 1)
+    assert sorted(results['paths']) == [1] * 4 + [2] * 4
+    best = results[results['paths'] == 2].sort_values('objective').iloc[0]
+    assert results.attrs['best'] == {name: best[name] for name in ('ratchet_up_perc', 'liq_out_perc')}
+    assert results.attrs['best_objective'] == best['objective']
@@ -0,0 +1,78 @@
+'''
+PathAggregator statistics against numpy on the same values, split across merged aggregators.
+'''
+
+import copy
+
+import numpy as np
+import pytest
+
+from BondingCurveNexus.path_quantiles import PathAggregator, QuantileSketch
+
+DAYS = 5
+ACCURACY = 0.002
+
+# (days, paths) values spanning orders of magnitude, with negatives and zeros
+def sample_values(paths, seed=1):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(0, 2, size=(DAYS, paths)) * rng.choice([-1, 1], p=[0.2, 0.8], size=(DAYS, paths))
+    values[rng.random((DAYS, paths)) < 0.05] = 0
+    return values
+
+# aggregators of the paths split into chunks, added in batches and one path at a time
+def split_aggregators(values, chunks=3):
+    aggregators = []
+    for chunk in np.array_split(values, chunks, axis=1):
+        stats = PathAggregator(['x'], DAYS, ACCURACY)
+        half = chunk.shape[1] // 2
+        stats.add({'x': chunk[:, :half]})
+        for path in chunk[:, half:].T:
+            stats.add({'x': path})
+        aggregators.append(stats)
+    return aggregators
+
+def test_sketch_quantiles_within_relative_accuracy():
+    values = sample_values(2000)
+    sketch = QuantileSketch(DAYS, ACCURACY)
+    sketch.add(np.repeat(np.arange(DAYS), values.shape[1]), values.ravel())
+    q = np.array([0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1])
+    expected = np.quantile(values, q, axis=1, method='lower').T
+    np.testing.assert_allclose(sketch.quantiles(q), expected, rtol=ACCURACY * 1.001, atol=0)
+
+def test_merged_aggregators_match_numpy():
+    values = sample_values(3000)
+    first, *others = split_aggregators(values)
+    for other in others:
+        first.merge(other)
+
+    assert first.paths == values.shape[1]
+    np.testing.assert_array_equal(first.count('x'), np.full(DAYS, values.shape[1]))
+    np.testing.assert_allclose(first.mean('x'), values.mean(axis=1), rtol=1e-10)
+    np.testing.assert_allclose(first.variance('x'), values.var(axis=1, ddof=1), rtol=1e-10)
+    np.testing.assert_array_equal(first.min('x'), values.min(axis=1))
+    np.testing.assert_array_equal(first.max('x'), values.max(axis=1))
+    np.testing.assert_allclose(first.quantiles('x', [0.5]), np.quantile(values, [0.5], axis=1, method='lower').T,
+                               rtol=ACCURACY * 1.001)
+
+def test_merge_is_associative():
+    a, b, c = split_aggregators(sample_values(900))
+    left = copy.deepcopy(a).merge(copy.deepcopy(b)).merge(copy.deepcopy(c))
+    right = copy.deepcopy(a).merge(copy.deepcopy(b).merge(copy.deepcopy(c)))
+    left_sketch, right_sketch = left.stats['x'].sketch, right.stats['x'].sketch
+    for sign in ('positive', 'negative'):
+        assert getattr(left_sketch, f'{sign}_offset') == getattr(right_sketch, f'{sign}_offset')
+        np.testing.assert_array_equal(getattr(left_sketch, sign), getattr(right_sketch, sign))
+    np.testing.assert_array_equal(left_sketch.zeros, right_sketch.zeros)
+    np.testing.assert_allclose(left.mean('x'), right.mean('x'), rtol=1e-12)
+    np.testing.assert_allclose(left.variance('x'), right.variance('x'), rtol=1e-12)
+
+def test_paths_that_stop_early_count_on_the_days_they_ran():
+    stats = PathAggregator(['x'], DAYS, ACCURACY)
+    stats.add({'x': np.array([1.0, 2.0, 3.0, 4.0, 5.0])})
+    stats.add({'x': np.array([3.0, 4.0])})
+    np.testing.assert_array_equal(stats.count('x'), [2, 2, 1, 1, 1])
+    np.testing.assert_allclose(stats.mean('x'), [2, 3, 3, 4, 5])
+
+def test_merge_needs_the_same_metrics_and_days():
+    with pytest.raises(ValueError):
+        PathAggregator(['x'], DAYS).merge(PathAggregator(['x'], DAYS + 1))
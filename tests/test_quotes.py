@@ -0,0 +1,116 @@
+'''
+Vectorized quotes of the protocol classes against the trades they quote, run one at a time on fresh copies.
+'''
+
+import copy
+
+import numpy as np
+import pytest
+
+from BondingCurveNexus.HighLowCap.RAMM_HighLowCap_Protocol_det import RAMMHighLowCapProtocolDet
+from BondingCurveNexus.RAMM_protocol_det import RAMMProtocolDet
+from BondingCurveNexus.SinglePoolModel.uni_protocol_det import UniProtocolDet
+
+# RAMMPools pools moved to book value, so that both sales and buys are enabled
+def ramm_at_book():
+    model = RAMMProtocolDet()
+    model.sell_liquidity_nxm = model.sell_liquidity_eth / model.book_value()
+    model.sell_invariant = model.sell_liquidity_eth * model.sell_liquidity_nxm
+    return model
+
+def uni_at_book():
+    model = UniProtocolDet()
+    model.liquidity_nxm = model.liquidity_eth / model.book_value()
+    model.invariant = model.liquidity_eth * model.liquidity_nxm
+    return model
+
+# model in a state with both trades enabled, its sale and buy functions and the spot prices they trade at
+MODELS = {'ramm': (ramm_at_book, 'platform_nxm_sale', 'platform_nxm_buy', 'sell_nxm_price', 'buy_nxm_price'),
+          'highlowcap': (RAMMHighLowCapProtocolDet, 'protocol_nxm_sale', 'protocol_nxm_buy',
+                         'spot_price_b', 'spot_price_a'),
+          'uni': (uni_at_book, 'platform_nxm_sale', 'platform_nxm_buy', 'nxm_price', 'nxm_price')}
+
+# sizes up to well past the NXM supply and half of the pools' NXM liquidity
+SIZES = np.array([1, 100, 10_000, 300_000, 1e7, 1e9])
+
+# every scalar of a model's state
+def state(model):
+    return {name: value for name, value in vars(model).items() if isinstance(value, (int, float, np.number))}
+
+# NXM traded, ETH moved, spot price and book value of one trade on a fresh copy of a model
+def traded(model, trade, price, n_nxm):
+    model = copy.deepcopy(model)
+    # from the cumulative counters, which start at zero, rather than the difference of large totals
+    getattr(model, trade)(n_nxm)
+    return (model.nxm_burned + model.nxm_minted, model.eth_sold + model.eth_acquired,
+            getattr(model, price)(), model.book_value())
+
+@pytest.mark.parametrize('name', MODELS)
+@pytest.mark.parametrize('side', ['sale', 'buy'])
+def test_quotes_match_trades(name, side):
+    make, sale, buy, sale_price, buy_price = MODELS[name]
+    model = make()
+    before = state(model)
+    quote = model.quote_sale(SIZES) if side == 'sale' else model.quote_buy(n_nxm=SIZES)
+    assert state(model) == before
+
+    trade, price = (sale, sale_price) if side == 'sale' else (buy, buy_price)
+    for i, size in enumerate(SIZES):
+        expected = traded(model, trade, price, size)
+        actual = (quote.nxm[i], quote.eth[i], quote.spot_price[i], quote.book_value[i])
+        np.testing.assert_allclose(actual, expected, rtol=1e-12)
+
+@pytest.mark.parametrize('name', MODELS)
+def test_buys_are_capped_at_half_the_nxm_liquidity(name):
+    model = MODELS[name][0]()
+    liquidity_nxm = model.quote_buy(n_nxm=1e12).nxm / 0.5
+    assert model.quote_buy(n_nxm=liquidity_nxm).nxm == pytest.approx(0.5 * liquidity_nxm)
+    assert model.quote_buy(n_nxm=0.25 * liquidity_nxm).nxm == pytest.approx(0.25 * liquidity_nxm)
+
+@pytest.mark.parametrize('name', MODELS)
+def test_eth_in_quotes_match_trades(name):
+    make, sale, buy, sale_price, buy_price = MODELS[name]
+    model = make()
+    eth_in = np.array([1, 50, 1_000])
+    quote = model.quote_buy(eth_in=eth_in)
+    np.testing.assert_allclose(quote.eth, eth_in, rtol=1e-12)
+    for i, nxm in enumerate(quote.nxm):
+        np.testing.assert_allclose(traded(model, buy, buy_price, nxm)[1:],
+                                   (quote.eth[i], quote.spot_price[i], quote.book_value[i]), rtol=1e-12)
+    # more ETH than half the NXM liquidity costs is capped like an NXM size
+    assert model.quote_buy(eth_in=1e12).nxm == model.quote_buy(n_nxm=1e12).nxm
+
+def test_quote_buy_needs_exactly_one_size():
+    model = RAMMHighLowCapProtocolDet()
+    with pytest.raises(ValueError):
+        model.quote_buy()
+    with pytest.raises(ValueError):
+        model.quote_buy(n_nxm=SIZES, eth_in=SIZES)
+
+# model with a disabled trade, the quote of it and the trade function and price it gates
+def ramm_buys_disabled():
+    # opening state - the price below is under book value less the buffer
+    model = RAMMProtocolDet()
+    return model, model.quote_buy(n_nxm=SIZES), 'platform_nxm_buy', model.buy_nxm_price()
+
+def highlowcap_buys_disabled():
+    model = RAMMHighLowCapProtocolDet()
+    model.params = model.params.replace(nxm_book_value_multiple=1)
+    return model, model.quote_buy(eth_in=SIZES), 'protocol_nxm_buy', model.spot_price_a()
+
+def uni_sales_disabled():
+    model = UniProtocolDet()
+    model.liquidity_nxm = model.liquidity_eth / (1.1 * model.book_value())
+    model.invariant = model.liquidity_eth * model.liquidity_nxm
+    return model, model.quote_sale(SIZES), 'platform_nxm_sale', model.nxm_price()
+
+@pytest.mark.parametrize('disabled', [ramm_buys_disabled, highlowcap_buys_disabled, uni_sales_disabled])
+def test_disabled_trades_quote_no_trade(disabled):
+    model, quote, trade, price = disabled()
+    assert np.all(quote.nxm == 0) and np.all(quote.eth == 0)
+    assert np.all(quote.spot_price == price) and np.all(quote.book_value == model.book_value())
+    assert quote.nxm.shape == SIZES.shape
+    # and the trade itself does nothing
+    before = state(model)
+    getattr(model, trade)(SIZES[2])
+    assert state(model) == before
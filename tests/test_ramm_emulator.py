@@ -0,0 +1,88 @@
+'''
+RammEmulator against the contract's rules, offline - liquidity and ratchets over time, reverts and snapshots.
+'''
+
+import copy
+
+import pytest
+
+from BondingCurveNexus.ramm_emulator import (EmulatorRevert, LIQ_SPEED_A, PRICE_BUFFER, PRICE_BUFFER_DENOMINATOR,
+                                             RammEmulator, TARGET_LIQUIDITY, WAD)
+
+DAY = 86_400
+
+# move the emulator's chain on to a timestamp
+def mine_at(ramm, timestamp):
+    ramm.provider.set_timestamp(timestamp)
+    ramm.provider.mine()
+
+def test_extraction_stops_at_target_liquidity():
+    ramm = RammEmulator(eth=8_000 * WAD, holder='dev')
+    assert ramm.reserves_at(DAY)[0] == 8_000 * WAD - LIQ_SPEED_A
+    assert ramm.reserves_at(100 * DAY)[0] == TARGET_LIQUIDITY
+
+def test_injection_stops_at_target_liquidity():
+    ramm = RammEmulator(eth=1_000 * WAD, holder='dev')
+    eth, nxm_a, nxm_b, budget = ramm.reserves_at(DAY)
+    assert 1_000 * WAD < eth < TARGET_LIQUIDITY
+    assert budget == ramm.budget - (eth - 1_000 * WAD)
+    assert ramm.reserves_at(100 * DAY)[0] == TARGET_LIQUIDITY
+
+def test_injection_is_limited_to_capital_above_mcr_and_target():
+    mcr = 100_000 * WAD
+    ramm = RammEmulator(eth=1_000 * WAD, mcr=mcr, capital=mcr + TARGET_LIQUIDITY + 300 * WAD, holder='dev')
+    assert ramm.reserves_at(100 * DAY)[0] == 1_300 * WAD
+
+def test_ratchets_stop_at_book_value_plus_minus_the_buffer():
+    ramm = RammEmulator(holder='dev')
+    book_value = ramm.getBookValue()
+    price_a, price_b = ramm.getSpotPrices()
+    assert price_b < book_value < price_a
+
+    # part of the way after an hour, clamped at the buffered book value after a long time
+    mine_at(ramm, 3_600)
+    hour_a, hour_b = ramm.getSpotPrices()
+    assert price_a > hour_a > book_value and price_b < hour_b < book_value
+    mine_at(ramm, 365 * DAY)
+    final_a, final_b = ramm.getSpotPrices()
+    assert final_a == pytest.approx(book_value * (PRICE_BUFFER_DENOMINATOR + PRICE_BUFFER) / PRICE_BUFFER_DENOMINATOR,
+                                    rel=1e-12)
+    assert final_b == pytest.approx(book_value * (PRICE_BUFFER_DENOMINATOR - PRICE_BUFFER) / PRICE_BUFFER_DENOMINATOR,
+                                    rel=1e-12)
+
+@pytest.mark.parametrize('swap', [dict(nxm_in=0, value=100 * WAD, min_amount_out=10 ** 30),
+                                  dict(nxm_in=10 ** 30),
+                                  dict(nxm_in=0, value=100 * WAD, deadline=1)])
+def test_reverted_swap_rolls_back_all_state(swap):
+    ramm = RammEmulator(holder='dev')
+    # the swap would first bring the reserves and TWAP forward to the new block
+    ramm.provider.set_timestamp(2 * DAY)
+    before = copy.deepcopy(ramm.state_dict())
+    with pytest.raises(EmulatorRevert):
+        ramm.swap(sender='dev', **swap)
+    assert ramm.state_dict() == before
+
+def test_provider_snapshot_and_revert():
+    ramm = RammEmulator(holder='dev')
+    before, block = copy.deepcopy(ramm.state_dict()), ramm.provider.get_block('latest')
+    snapshot_id = ramm.provider.snapshot()
+
+    mine_at(ramm, DAY)
+    ramm.swap(0, value=100 * WAD, sender='dev')
+    ramm.swap(10 * WAD, sender='dev')
+    assert ramm.state_dict() != before
+
+    ramm.provider.revert(snapshot_id)
+    assert ramm.state_dict() == before
+    assert ramm.provider.get_block('latest') == block
+
+def test_views_are_1e18_integers():
+    ramm = RammEmulator(holder='dev')
+    reserves = ramm.getReserves()
+    # (eth, nxm_a, nxm_b, budget), as the contract's getReserves
+    assert reserves == (ramm.eth, ramm.nxm_a, ramm.nxm_b, ramm.budget)
+    assert ramm.getSpotPrices() == (WAD * ramm.eth // ramm.nxm_a, WAD * ramm.eth // ramm.nxm_b)
+    values = [*reserves, *ramm.getSpotPrices(), ramm.getBookValue(), ramm.getInternalPrice(),
+              ramm.pool.getPoolValueInEth(), ramm.nxm.totalSupply(), ramm.nxm.balanceOf('dev'),
+              ramm.swap(0, value=WAD, sender='dev')]
+    assert all(type(value) is int for value in values)
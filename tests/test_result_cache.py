@@ -0,0 +1,36 @@
+'''
+Source version of the result cache keys.
+'''
+
+from BondingCurveNexus import result_cache
+from BondingCurveNexus.RAMM_markets_stoch import RAMMMarketsStoch
+
+# package_version of a package directory, recomputed
+def version_of(monkeypatch, directory):
+    monkeypatch.setattr(result_cache, 'PACKAGE_DIR', str(directory))
+    result_cache.package_version.cache_clear()
+    try:
+        return result_cache.package_version()
+    finally:
+        result_cache.package_version.cache_clear()
+
+def test_package_version_covers_helper_modules(tmp_path, monkeypatch):
+    (tmp_path / 'model.py').write_text('class Model:\n    pass\n')
+    (tmp_path / 'helpers').mkdir()
+    helper = tmp_path / 'helpers' / 'arbitrage.py'
+    helper.write_text('SIZE = 1\n')
+    before = version_of(monkeypatch, tmp_path)
+
+    helper.write_text('SIZE = 2\n')
+    assert version_of(monkeypatch, tmp_path) != before
+    # files other than sources don't count
+    (tmp_path / 'notes.txt').write_text('notes')
+    (tmp_path / 'helpers' / '__pycache__').mkdir()
+    (tmp_path / 'helpers' / '__pycache__' / 'arbitrage.py').write_text('stale')
+    helper.write_text('SIZE = 1\n')
+    assert version_of(monkeypatch, tmp_path) == before
+
+def test_model_version_changes_with_the_package(monkeypatch):
+    before = result_cache.model_version(RAMMMarketsStoch)
+    monkeypatch.setattr(result_cache, 'package_version', lambda: 'edited')
+    assert result_cache.model_version(RAMMMarketsStoch) != before
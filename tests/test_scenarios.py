@@ -0,0 +1,30 @@
+'''
+Scenario specs - [ramm] overrides of the emulator's opening state and the source version in the cache key.
+'''
+
+import pytest
+
+from BondingCurveNexus import scenarios
+
+SPEC = {'name': 'buys', 'horizon_days': 1, 'step_hours': 6, 'swaps': [{'kind': 'buy', 'per_step': 50}]}
+
+def test_ramm_overrides_set_the_emulator_opening_state():
+    spec = dict(SPEC, ramm={'eth': 2500, 'ratchet_speed_b': 400})
+    scenarios.validate_spec(spec)
+    results = scenarios.run_specs([spec], backend='emulator', cache_dir=None, progress=False)['buys']
+    assert results['liq'].iloc[0] == pytest.approx(2500)
+    assert scenarios.spec_hash(spec, 'emulator') != scenarios.spec_hash(SPEC, 'emulator')
+
+def test_ramm_overrides_are_refused_on_chain():
+    spec = dict(SPEC, ramm={'eth': 2500})
+    with pytest.raises(ValueError):
+        scenarios.run_specs([spec], backend='chain', cache_dir=None, progress=False)
+
+def test_unknown_ramm_keys_are_refused():
+    with pytest.raises(ValueError):
+        scenarios.validate_spec(dict(SPEC, ramm={'open_liquidity': 2500}))
+
+def test_spec_hash_changes_with_the_package_source(monkeypatch):
+    before = scenarios.spec_hash(SPEC, 'emulator')
+    monkeypatch.setattr(scenarios, 'package_version', lambda: 'edited')
+    assert scenarios.spec_hash(SPEC, 'emulator') != before
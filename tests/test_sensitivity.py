@@ -0,0 +1,61 @@
+'''
+Sobol indices - the estimators against the analytic indices of the Ishigami function, and a small model run.
+'''
+
+import math
+
+import numpy as np
+import pytest
+
+from BondingCurveNexus.RAMM_protocol_det import RAMMProtocolDet
+from BondingCurveNexus.sensitivity import sample_matrices, sensitivity, sobol_indices
+
+A, B = 7, 0.1
+
+def ishigami(x):
+    return np.sin(x[..., 0]) + A * np.sin(x[..., 1]) ** 2 + B * x[..., 2] ** 4 * np.sin(x[..., 0])
+
+# analytic first order and total indices of the Ishigami function
+def ishigami_indices():
+    v1 = 0.5 * (1 + B * math.pi ** 4 / 5) ** 2
+    v2 = A ** 2 / 8
+    v13 = 8 * B ** 2 * math.pi ** 8 / 225
+    variance = v1 + v2 + v13
+    return np.array([v1, v2, 0]) / variance, np.array([v1 + v13, v2, v13]) / variance
+
+# outputs on A, B and every AB_i of n rows of sobol samples of [-pi, pi]^3
+def ishigami_outputs(n):
+    d = 3
+    a, b = sample_matrices(n, d, 'sobol', np.random.default_rng(1))
+    a, b = -math.pi + 2 * math.pi * a, -math.pi + 2 * math.pi * b
+    ab = np.stack([np.where(np.arange(d) == i, b, a) for i in range(d)])
+    return ishigami(a), ishigami(b), ishigami(ab)
+
+def test_indices_of_the_ishigami_function():
+    first_order, total = sobol_indices(*ishigami_outputs(2 ** 14))
+    expected_first_order, expected_total = ishigami_indices()
+    np.testing.assert_allclose(first_order, expected_first_order, atol=0.01)
+    np.testing.assert_allclose(total, expected_total, atol=0.01)
+
+def test_bootstrap_resamples_of_the_indices():
+    n, resamples = 256, 50
+    f_a, f_b, f_ab = ishigami_outputs(n)
+    rows = np.random.default_rng(2).integers(n, size=(resamples, n))
+    first_order, total = sobol_indices(f_a, f_b, f_ab, rows)
+    assert first_order.shape == total.shape == (resamples, 3)
+    # each resample is the estimate on its rows
+    single_first_order, single_total = sobol_indices(f_a[rows[0]], f_b[rows[0]], f_ab[:, rows[0]])
+    np.testing.assert_allclose(first_order[0], single_first_order)
+    np.testing.assert_allclose(total[0], single_total)
+
+def test_sobol_rows_must_be_a_power_of_two():
+    with pytest.raises(ValueError):
+        sample_matrices(6, 2, 'sobol', np.random.default_rng(0))
+
+def test_sensitivity_runs_every_matrix():
+    space = {'ratchet_up_perc': (0.01, 0.1), 'liq_out_perc': (0.01, 0.1)}
+    results = sensitivity(RAMMProtocolDet, space, outputs=['eth_drained', 'book_value'], n=4,
+                          fixed={'model_days': 10}, seed=1, n_bootstrap=20, max_workers=1, cache=None, progress=False)
+    assert results.attrs['simulations'] == 4 * (len(space) + 2)
+    assert list(results['output']) == ['eth_drained'] * 2 + ['book_value'] * 2
+    assert list(results['parameter']) == list(space) * 2
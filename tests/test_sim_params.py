@@ -0,0 +1,42 @@
+'''
+SimParams overrides, in particular of the projection length.
+'''
+
+import pytest
+
+from BondingCurveNexus.HighLowCap.RAMM_HighLowCap_Protocol_det import RAMMHighLowCapProtocolDet
+from BondingCurveNexus.RAMM_markets_det import RAMMMarketsDet
+from BondingCurveNexus.RAMM_protocol_det import RAMMProtocolDet
+from BondingCurveNexus.result_cache import run_model
+from BondingCurveNexus.sim_params import SimParams
+
+def test_model_days_override_extends_det_arrays():
+    base = SimParams.from_modules()
+    params = base.replace(model_days=base.model_days + 200)
+
+    assert len(params.det_entry_array) == params.model_days
+    assert len(params.det_exit_array) == params.model_days
+    # the extra days carry on with the last day's counts
+    assert params.det_entry_array[-1] == base.det_entry_array[-1]
+    assert params.det_exit_array[-1] == base.det_exit_array[-1]
+
+def test_shorter_det_arrays_are_extended():
+    params = SimParams.from_modules(model_days=10, det_entry_array=[1, 2, 3], det_exit_array=[])
+    assert params.det_entry_array == (1, 2, 3) + (3,) * 7
+    assert params.det_exit_array == (params.lambda_exits,) * 10
+
+@pytest.mark.parametrize('model', [RAMMProtocolDet, RAMMMarketsDet, RAMMHighLowCapProtocolDet])
+def test_det_models_run_past_the_default_horizon(model):
+    params = SimParams.from_modules().replace(model_days=400)
+    sim = run_model(model, params, seed=1, cache=None)
+    assert len(sim.trajectory) == params.model_days + 1
+
+def test_wnxm_diffusion_follows_shifts_per_day():
+    params = SimParams.from_modules(wnxm_daily_diffusion=0.065)
+    four_shifts = params.replace(wnxm_shifts_per_day=4)
+    assert (1 + four_shifts.wnxm_diffusion) ** 4 == pytest.approx(1 + params.wnxm_daily_diffusion)
+    assert params.wnxm_diffusion == pytest.approx(0.065)
+
+def test_derived_constants_cannot_be_overridden():
+    with pytest.raises(ValueError):
+        SimParams.from_modules(wnxm_diffusion=0.1)
@@ -0,0 +1,27 @@
+'''
+Steady-state detection and fast-forward of the deterministic models.
+'''
+
+import numpy as np
+
+from BondingCurveNexus.RAMM_protocol_det import RAMMProtocolDet
+from BondingCurveNexus.result_cache import run_model
+from BondingCurveNexus.sim_params import SimParams
+
+def test_quiet_run_converges_to_the_same_trajectory():
+    params = SimParams.from_modules(det_entry_array=(0,), det_exit_array=(0,))
+    fast = run_model(RAMMProtocolDet, params, seed=1, cache=None)
+    full = run_model(RAMMProtocolDet, params, seed=1, cache=None, fast_forward=False)
+
+    assert fast.converged_day == 2
+    assert full.converged_day is None
+    assert len(fast.trajectory) == len(full.trajectory) == params.model_days + 1
+    for metric in full.trajectory.metrics:
+        assert np.array_equal(fast.trajectory[metric], full.trajectory[metric]), metric
+
+def test_changing_schedule_never_converges():
+    # entries cycling through 0, 1, 2 a day until the last day - never the same events on every remaining day
+    params = SimParams.from_modules(det_entry_array=tuple(day % 3 for day in range(180)), det_exit_array=(0,))
+    sim = run_model(RAMMProtocolDet, params, seed=1, cache=None)
+    assert sim.converged_day is None
+    assert sim.current_day == params.model_days
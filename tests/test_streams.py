@@ -0,0 +1,28 @@
+'''
+LognormalStream draws against scipy's lognorm with the same parameters.
+'''
+
+import numpy as np
+from scipy.stats import kstest, lognorm
+
+from BondingCurveNexus.streams import LognormalStream
+
+SHAPE, LOC, SCALE = 0.8, 2, 50
+
+def test_draws_match_scipy_lognorm():
+    stream = LognormalStream(SHAPE, LOC, SCALE, rng=np.random.default_rng(1), block_size=1000)
+    # single draws and block draws, across several refills
+    values = [stream.draw() for _ in range(2500)] + list(stream.draws(2500))
+    assert kstest(values, lognorm(s=SHAPE, loc=LOC, scale=SCALE).cdf).pvalue > 0.001
+
+def test_same_generator_seed_gives_same_draws():
+    first = LognormalStream(SHAPE, LOC, SCALE, rng=np.random.default_rng(7))
+    second = LognormalStream(SHAPE, LOC, SCALE, rng=np.random.default_rng(7))
+    assert np.array_equal(first.draws(100), second.draws(100))
+
+def test_default_streams_are_independent_of_global_state():
+    np.random.seed(0)
+    first = LognormalStream(SHAPE, LOC, SCALE).draws(10)
+    np.random.seed(0)
+    second = LognormalStream(SHAPE, LOC, SCALE).draws(10)
+    assert not np.array_equal(first, second)
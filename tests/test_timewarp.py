@@ -0,0 +1,68 @@
+'''
+TimeWarp runs - on a RammEmulator through ramm.swap, and raw swap transactions checked by their receipts.
+'''
+
+from types import SimpleNamespace
+
+import pytest
+
+from BondingCurveNexus.ramm_emulator import EmulatorRevert
+from BondingCurveNexus.scenarios import emulator_node
+from BondingCurveNexus.timewarp import SwapReverted, TimeWarp, buy, observe, sell
+
+def emulator_warp():
+    node = emulator_node()
+    return node['ramm'], TimeWarp(node['ramm'], node['provider'], node['dev'], node['reader'])
+
+def test_emulator_run_records_swaps():
+    ramm, warp = emulator_warp()
+    assert not warp.raw
+    trajectory = warp.run([observe(0), buy(3_600, 100), observe(3_600), sell(7_200, 1_000), observe(7_200)])
+    states = trajectory.to_dict()
+    assert states['cap_pool'][1] == pytest.approx(states['cap_pool'][0] + 100)
+    assert states['nxm_supply'][2] == pytest.approx(states['nxm_supply'][1] - 1_000)
+    assert list(states['timestamp']) == [0, 3_600, 7_200]
+
+def test_emulator_run_raises_on_reverted_swap():
+    ramm, warp = emulator_warp()
+    ramm.setCircuitBreakerLimits(2 ** 32 - 1, 1, sender='dev')
+    with pytest.raises(EmulatorRevert):
+        warp.run([buy(3_600, 100), observe(3_600)])
+
+# provider answering raw requests, with the receipt status given to every transaction
+class RawProvider:
+
+    def __init__(self, status):
+        self.status = status
+        self.requests = []
+
+    def _make_request(self, method, params):
+        self.requests.append(method)
+        if method == 'eth_sendTransaction':
+            return f'0x{len(self.requests):064x}'
+        if method == 'eth_getTransactionReceipt':
+            return {'transactionHash': params[0], 'status': self.status}
+        return None
+
+    def get_block(self, block_id):
+        return SimpleNamespace(timestamp=0)
+
+def raw_warp(status):
+    ramm = SimpleNamespace(address='0xramm', swap=SimpleNamespace(encode_input=lambda *args: b'\x01'))
+    reader = SimpleNamespace(trajectory=lambda length: SimpleNamespace(record=lambda state: None),
+                             read=lambda: None)
+    provider = RawProvider(status)
+    return provider, TimeWarp(ramm, provider, SimpleNamespace(address='0xdev'), reader)
+
+def test_raw_swaps_check_their_receipts():
+    provider, warp = raw_warp('0x1')
+    warp.run([buy(60, 1), sell(60, 1), observe(60)])
+    assert provider.requests.count('eth_getTransactionReceipt') == 2
+    assert len(warp.transactions) == 2
+
+def test_raw_reverted_swap_raises():
+    provider, warp = raw_warp('0x0')
+    with pytest.raises(SwapReverted):
+        warp.run([buy(60, 1), observe(60)])
+    # automine is switched back on
+    assert provider.requests[-1] == 'evm_setAutomine'
@@ -0,0 +1,39 @@
+'''
+TrajectorySink directory handling - refusing, overwriting or appending to an existing dataset.
+'''
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from BondingCurveNexus.RAMM_markets_stoch import RAMMMarketsStoch
+from BondingCurveNexus.sweep import sweep
+from BondingCurveNexus.trajectory_sink import TrajectorySink, open_dataset
+
+METRICS = ['price', 'supply']
+
+# write n paths of 5 days to a dataset directory
+def write_paths(directory, n, **kwargs):
+    with TrajectorySink(str(directory), metrics=METRICS, **kwargs) as sink:
+        for sim in range(n):
+            sink.write({metric: np.arange(5.0) for metric in METRICS}, sim=sim)
+
+def test_existing_dataset_is_refused(tmp_path):
+    write_paths(tmp_path, 2)
+    with pytest.raises(ValueError):
+        write_paths(tmp_path, 1)
+    with pytest.raises(ValueError):
+        write_paths(tmp_path, 1, overwrite=True, append=True)
+
+def test_overwrite_replaces_and_append_adds(tmp_path):
+    write_paths(tmp_path, 2)
+    write_paths(tmp_path, 3, overwrite=True)
+    assert open_dataset(str(tmp_path)).count_rows() == 3 * 5
+    write_paths(tmp_path, 1, append=True)
+    assert open_dataset(str(tmp_path)).count_rows() == 4 * 5
+
+def test_sweep_refuses_an_existing_dataset_before_running(tmp_path):
+    (tmp_path / 'part-00000.parquet').write_bytes(b'')
+    with pytest.raises(ValueError):
+        sweep(RAMMMarketsStoch, n_sims=1, seed=1, dataset=str(tmp_path), progress=False, cache=None)
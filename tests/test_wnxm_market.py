@@ -0,0 +1,47 @@
+'''
+Sized arbitrage of wNxmMarket against a RammEmulator - retrying reverted swaps only.
+'''
+
+import pytest
+
+from BondingCurveNexus.ramm_emulator import RammEmulator
+from BondingCurveNexus.wNXM_Market import wNxmMarket
+
+# market with the wNXM price well below the pool's price below, so the arb sells NXM to the pool
+def sale_market():
+    ramm = RammEmulator(holder='dev')
+    market = wNxmMarket(ramm.nxm, ramm, ramm.pool, 'dev', arb='sized')
+    market.wnxm_price = 0.001
+    return ramm, market
+
+def test_sized_arbitrage_retries_reverted_swaps_at_half_size():
+    ramm, market = sale_market()
+    # circuit breakers far below the equalising trade - every swap reverts
+    ramm.setCircuitBreakerLimits(5, 500, sender='dev')
+    swap, sizes = ramm.swap, []
+
+    def recording_swap(nxm_in, *args, **kwargs):
+        sizes.append(nxm_in)
+        return swap(nxm_in, *args, **kwargs)
+
+    ramm.swap = recording_swap
+    market.arbitrage()
+    assert market.swaps == 0
+    assert len(sizes) == market.max_arb_swaps
+    assert all(later < earlier for earlier, later in zip(sizes, sizes[1:]))
+
+def test_sized_arbitrage_propagates_other_errors():
+    ramm, market = sale_market()
+
+    def failing_swap(*args, **kwargs):
+        raise RuntimeError('node connection lost')
+
+    ramm.swap = failing_swap
+    with pytest.raises(RuntimeError):
+        market.arbitrage()
+
+def test_sized_arbitrage_closes_the_gap_without_limits():
+    ramm, market = sale_market()
+    market.arbitrage()
+    assert market.swaps > 0
+    assert ramm.getSpotPriceB() / 1e18 == pytest.approx(market.wnxm_price, rel=1e-4)